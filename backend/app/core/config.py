@@ -6,7 +6,34 @@ class Settings(BaseSettings):
     environment: str = "development"
     database_url: str = "sqlite:///./carbon_mvp.db"
     eu_ets_mock_price_eur_per_tco2: float = 85.0
+    gwp_set: str = "AR5"
+    anomaly_z_threshold: float = 4.0
+    anomaly_min_history: int = 3
+    metrics_enabled: bool = True
+    admin_token: str = ""
+    profile_all_requests: bool = False
+    profiling_slow_ms: float = 500.0
+    profiling_interval_ms: float = 5.0
+    profiling_buffer_size: int = 20
     openai_api_key: str = ""
+    openai_base_url: str = ""
+    llm_enabled: bool = False
+    llm_mock: bool = False
+    llm_call_timeout_s: float = 20.0
+    llm_max_concurrency: int = 4
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry_s: float = 30.0
+    llm_max_retries: int = 3
+    llm_retry_base_delay_s: float = 0.5
+    llm_retry_max_delay_s: float = 8.0
+    llm_cache_path: str = "./llm_cache.db"
+    llm_cache_ttl_s: float = 86_400.0
+    llm_cache_maxsize: int = 256
+    llm_cache_disk_maxsize: int = 10_000
+    meter_store_path: str = "./meter_data"
+    grid_intensity_path: str = "./grid_intensity.csv"
+    eeio_path: str = "./eeio"
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,229 @@
+"""
+Request instrumentation
+
+`TimingMiddleware` times every HTTP request and records per-route latency,
+database query count and time, and request/response sizes in fixed-bucket
+histograms. Database statements are counted with SQLAlchemy cursor events
+into a per-request context variable (copied into the threadpool that runs
+sync endpoints). Each response gets a `Server-Timing` header, and the
+registry is rendered in Prometheus text format for `/metrics`.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+MAX_CAPTURED_STATEMENTS = 500
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_time_s", "statements")
+
+    def __init__(self, capture_statements: bool = False):
+        self.queries = 0
+        self.query_time_s = 0.0
+        # SQL text and duration of each statement, only kept while profiling
+        self.statements: Optional[List[dict]] = [] if capture_statements else None
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def bind_stats(stats: RequestStats):
+    """Make `stats` the current request's stats; pass the token to `unbind_stats`."""
+    return _current.set(stats)
+
+
+def unbind_stats(token) -> None:
+    _current.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    starts = conn.info.get("query_start")
+    if stats is None or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.queries += 1
+    stats.query_time_s += elapsed
+    if stats.statements is not None and len(stats.statements) < MAX_CAPTURED_STATEMENTS:
+        stats.statements.append(
+            {"sql": statement, "duration_ms": round(elapsed * 1000, 3), "executemany": executemany}
+        )
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple."""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts + [sum, count]
+
+    def observe(self, label_values: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+        idx = bisect_left(self.buckets, value)
+        if idx < len(self.buckets):
+            series[idx] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in sorted(self._series.items()):
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = "," if labels else ""
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound:g}"}} {cumulative:g}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]:g}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6g}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]:g}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        route_labels = ("method", "route", "status")
+        self.latency = Histogram(
+            "http_request_duration_seconds", "Request latency.", route_labels, LATENCY_BUCKETS
+        )
+        self.db_queries = Histogram(
+            "http_request_db_queries", "Database statements per request.", route_labels, QUERY_COUNT_BUCKETS
+        )
+        self.db_time = Histogram(
+            "http_request_db_seconds", "Database time per request.", route_labels, LATENCY_BUCKETS
+        )
+        self.request_size = Histogram(
+            "http_request_size_bytes", "Request body size.", route_labels, SIZE_BUCKETS
+        )
+        self.response_size = Histogram(
+            "http_response_size_bytes", "Response body size as sent.", route_labels, SIZE_BUCKETS
+        )
+
+    def record(self, labels: Tuple[str, str, str], seconds: float, stats: RequestStats, request_bytes: int, response_bytes: int) -> None:
+        with self._lock:
+            self.latency.observe(labels, seconds)
+            self.db_queries.observe(labels, stats.queries)
+            self.db_time.observe(labels, stats.query_time_s)
+            self.request_size.observe(labels, request_bytes)
+            self.response_size.observe(labels, response_bytes)
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = (self.latency, self.db_queries, self.db_time, self.request_size, self.response_size)
+            lines = [line for h in histograms for line in h.render()]
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            for h in (self.latency, self.db_queries, self.db_time, self.request_size, self.response_size):
+                h._series.clear()
+
+
+registry = MetricsRegistry()
+
+
+_templates: Dict[object, str] = {}
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route (bounded label cardinality), or "unmatched"."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _templates.get(endpoint)
+    if template is None:
+        template = next(
+            (r.path for r in getattr(scope.get("app"), "routes", ()) if getattr(r, "endpoint", None) is endpoint),
+            "unmatched",
+        )
+        _templates[endpoint] = template
+    return template
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware so the header can be added before the response starts."""
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = bind_stats(stats)
+        started = time.perf_counter()
+        request_bytes = 0
+        response_bytes = 0
+        status = 500
+        # Taken when the last body chunk goes out, before any background task runs
+        finished: Optional[Tuple[float, RequestStats]] = None
+
+        async def receive_counted():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_timed(message):
+            nonlocal response_bytes, status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                app_ms = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'db;dur={stats.query_time_s * 1000:.1f};desc="{stats.queries} queries", '
+                    f"app;dur={app_ms:.1f}"
+                )
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", timing.encode())]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done = RequestStats()
+                    done.queries, done.query_time_s = stats.queries, stats.query_time_s
+                    finished = (time.perf_counter() - started, done)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_counted, send_timed)
+        finally:
+            unbind_stats(token)
+            labels = (scope["method"], route_template(scope), str(status))
+            seconds, done = finished or (time.perf_counter() - started, stats)
+            self.registry.record(labels, seconds, done, request_bytes, response_bytes)
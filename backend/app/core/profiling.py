@@ -0,0 +1,253 @@
+"""
+On-demand request profiling
+
+`ProfilingMiddleware` runs a sampling profiler around selected requests:
+
+- requests carrying `X-Profile: <admin token>` are always profiled and
+  stored, and the response gets an `X-Profile-Id` header;
+- with `PROFILE_ALL_REQUESTS=true` every request is sampled and only those
+  slower than `PROFILING_SLOW_MS` are kept.
+
+A background thread snapshots `sys._current_frames()` every
+`PROFILING_INTERVAL_MS`. It samples the event-loop thread and any worker
+thread that is running the matched endpoint, so sync endpoints in the
+threadpool are covered. Stacks are counted per thread and exported as
+collapsed stacks or speedscope JSON. The SQL statements executed during
+the request are captured through the cursor events in `core.metrics`. The
+last `PROFILING_BUFFER_SIZE` profiles are kept in memory for `/admin/profiles`.
+"""
+
+import hmac
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+from .metrics import RequestStats, bind_stats, current_stats, route_template, unbind_stats
+
+MAX_STACK_DEPTH = 128
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+Frame = Tuple[str, str, int]  # function, file, first line
+
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return code.co_name, "/".join(parts[-2:]), code.co_firstlineno
+
+
+class StackSampler:
+    """Counts stacks of the event-loop thread and of threads running `endpoint`."""
+
+    def __init__(self, loop_thread: int, scope, interval_s: float):
+        self.loop_thread = loop_thread
+        self.scope = scope
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            endpoint = self.scope.get("endpoint")
+            target = getattr(endpoint, "__code__", None)
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                f = frame
+                while f is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(f)
+                    f = f.f_back
+                if ident != self.loop_thread and not any(fr.f_code is target for fr in stack):
+                    continue
+                if ident not in names:
+                    names[ident] = next((t.name for t in threading.enumerate() if t.ident == ident), str(ident))
+                self.stacks[(names[ident],) + tuple(_frame_key(fr) for fr in reversed(stack))] += 1
+            self.samples += 1
+
+
+class RequestProfile:
+    def __init__(self, profile_id: str, method: str, path: str, trigger: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.route = "unmatched"
+        self.status = 500
+        self.started_at = datetime.now(timezone.utc)
+        self.duration_ms = 0.0
+        self.interval_ms = 0.0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.statements: List[dict] = []
+        self.query_count = 0
+        self.query_time_ms = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "samples": self.samples,
+            "interval_ms": self.interval_ms,
+            "query_count": self.query_count,
+            "query_time_ms": round(self.query_time_ms, 3),
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format (`thread;frame;frame count`)."""
+        lines = []
+        for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+            frames = [stack[0]] + [f"{name} ({file}:{line})" for name, file, line in stack[1:]]
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """speedscope file with one sampled profile per thread."""
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        per_thread: Dict[str, Tuple[list, list]] = {}
+        for stack, count in self.stacks.items():
+            indices = []
+            for key in stack[1:]:
+                idx = frame_index.get(key)
+                if idx is None:
+                    idx = frame_index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                indices.append(idx)
+            samples, weights = per_thread.setdefault(stack[0], ([], []))
+            samples.append(indices)
+            weights.append(count * self.interval_ms)
+        profiles = [
+            {
+                "type": "sampled",
+                "name": f"{self.method} {self.path} [{thread}]",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+            for thread, (samples, weights) in per_thread.items()
+        ]
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": f"{self.method} {self.path} ({self.id})",
+            "exporter": "carbonlens",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class ProfileStore:
+    """Ring buffer of the most recent profiles."""
+
+    def __init__(self, maxlen: int):
+        self._lock = threading.Lock()
+        self._profiles: deque = deque(maxlen=maxlen)
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore(settings.profiling_buffer_size)
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(settings.admin_token) and bool(token) and hmac.compare_digest(token, settings.admin_token)
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; a pass-through unless the request is selected."""
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+
+    def _trigger(self, scope) -> Optional[str]:
+        if settings.admin_token:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-profile" and is_admin(value.decode("latin-1")):
+                    return "header"
+        if settings.profile_all_requests:
+            return "slow"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(uuid.uuid4().hex[:12], scope["method"], scope["path"], trigger)
+        stats = current_stats()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = bind_stats(stats)
+        stats.statements = []
+        queries_before, query_time_before = stats.queries, stats.query_time_s
+
+        async def send_tagged(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if trigger == "header":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        interval_s = settings.profiling_interval_ms / 1000
+        sampler = StackSampler(threading.get_ident(), scope, interval_s)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_tagged)
+        finally:
+            sampler.stop()
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            profile.route = route_template(scope)
+            profile.interval_ms = settings.profiling_interval_ms
+            profile.samples = sampler.samples
+            profile.stacks = sampler.stacks
+            profile.statements = stats.statements
+            profile.query_count = stats.queries - queries_before
+            profile.query_time_ms = (stats.query_time_s - query_time_before) * 1000
+            stats.statements = None
+            if token is not None:
+                unbind_stats(token)
+            if trigger == "header" or profile.duration_ms >= settings.profiling_slow_ms:
+                self.store.add(profile)
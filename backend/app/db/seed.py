@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
 
 from ..db.database import Base, engine, SessionLocal
+from ..services.ghg import GWP_VALUES
+from ..services.hierarchy import rebuild_closure
 from ..models import (
     Group,
     Entity,
@@ -9,9 +11,20 @@ from ..models import (
     GasGWP,
     UploadedActivity,
     EUETSAllowanceLedger,
+    FacilityRevenue,
 )
 
 
+# code, name, unit, kg CO2, kg CH4, kg N2O per unit, scope
+FACTORS = [
+    ("electricity_TR", "Electricity TR Grid", "kWh", 0.42, 0.0, 0.0, "Scope2"),
+    ("diesel", "Diesel", "L", 2.68, 0.0001, 0.00013, "Scope1"),
+    ("petrol", "Petrol", "L", 2.31, 0.0008, 0.00007, "Scope1"),
+    ("natural_gas", "Natural Gas", "m3", 1.90, 0.00004, 0.000004, "Scope1"),
+    ("road_km", "Road Freight", "km", 0.12, 0.0, 0.0, "Scope3"),
+    ("air_km", "Business Air Travel", "km", 0.25, 0.0, 0.0, "Scope3"),
+]
+
 def seed():
     Base.metadata.create_all(bind=engine)
     db: Session = SessionLocal()
@@ -31,26 +44,24 @@ def seed():
         db.add_all([izmir, ankara])
         db.flush()
 
-        # Factors
-        factors = [
-            ("electricity_TR", "Electricity TR Grid", "kWh", 0.42, "Scope2"),
-            ("diesel", "Diesel", "L", 2.68, "Scope1"),
-            ("petrol", "Petrol", "L", 2.31, "Scope1"),
-            ("natural_gas", "Natural Gas", "m3", 1.90, "Scope1"),
-            ("road_km", "Road Freight", "km", 0.12, "Scope3"),
-            ("air_km", "Business Air Travel", "km", 0.25, "Scope3"),
-        ]
+        # Factors (kg CO2, kg CH4, kg N2O per unit)
         db.add_all(
             [
                 EmissionFactor(
-                    code=c, name=n, unit=u, factor_kgco2_per_unit=f, scope_hint=s
+                    code=c,
+                    name=n,
+                    unit=u,
+                    factor_kgco2_per_unit=f,
+                    factor_kgch4_per_unit=ch4,
+                    factor_kgn2o_per_unit=n2o,
+                    scope_hint=s,
                 )
-                for (c, n, u, f, s) in factors
+                for (c, n, u, f, ch4, n2o, s) in FACTORS
             ]
         )
 
-        # GWP
-        db.add_all([GasGWP(gas="CH4", gwp100=28), GasGWP(gas="N2O", gwp100=265)])
+        # GWP (IPCC AR5 and AR6, 100-year horizon)
+        db.add_all([GasGWP(gas=gas, gwp_set=gwp_set, gwp100=v) for gas, gwp_set, v in GWP_VALUES])
 
         # Activities (2025-Q3)
         db.add_all(
@@ -98,6 +109,20 @@ def seed():
             ]
         )
 
+        # Monthly revenue denominators (EUR) for 2024-2025
+        db.add_all(
+            [
+                FacilityRevenue(
+                    facility_id=facility.id,
+                    period=f"{year}-{month:02d}",
+                    revenue_eur=base * (1 + 0.03 * (year - 2024)) * (1 + 0.1 * ((month % 12) // 6)),
+                )
+                for facility, base in ((izmir, 2_400_000.0), (ankara, 900_000.0))
+                for year in (2024, 2025)
+                for month in range(1, 13)
+            ]
+        )
+
         # EU ETS ledger starting allowances
         db.add_all(
             [
@@ -107,6 +132,7 @@ def seed():
         )
 
         db.commit()
+        rebuild_closure(db)
         print("Seed completed.")
     finally:
         db.close()
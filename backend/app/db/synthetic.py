@@ -0,0 +1,357 @@
+"""
+Deterministic synthetic dataset generator for load testing.
+
+Builds `groups × entities × facilities` org units. Each facility has a
+number of activity streams: one factor each, reported monthly over the
+requested years. Values are drawn with NumPy from a seeded generator.
+
+Realism:
+- facility sizes are log-normally skewed, so a few facilities dominate;
+- each facility has its own Dirichlet-drawn factor mix;
+- every factor has its own seasonal profile (electricity peaks in summer,
+  natural gas in winter);
+- every facility has a yearly trend.
+
+Rows are written month by month in chunks through the DBAPI `executemany`,
+bypassing the ORM. Emission records (AR5), monthly revenues, yearly
+allowance allocations and entity budgets are generated alongside.
+
+    cd backend && python -m app.db.synthetic --groups 10 --entities 50 --facilities 20 \\
+        --streams 8 --years 2021-2025 --database-url sqlite:///./load.db
+"""
+
+import argparse
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models import (
+    EmissionFactor,
+    EmissionRecord,
+    Entity,
+    EUETSAllowanceLedger,
+    Facility,
+    FacilityRevenue,
+    GasGWP,
+    Group,
+    UploadedActivity,
+)
+from ..services.anomaly import rebuild_series_stats
+from ..services.cache import bump_revision
+from ..services.calendar import resolve_period_ids
+from ..services.hierarchy import rebuild_closure
+from .database import Base
+from .seed import FACTORS, GWP_VALUES
+
+# Typical monthly amount of one activity stream at a median-sized facility, in the factor unit
+BASE_MONTHLY_AMOUNT = {
+    "electricity_TR": 120_000.0,
+    "diesel": 6_000.0,
+    "petrol": 2_000.0,
+    "natural_gas": 15_000.0,
+    "road_km": 80_000.0,
+    "air_km": 20_000.0,
+}
+# (amplitude, peak month) of a cosine seasonal profile per factor
+SEASONALITY = {
+    "electricity_TR": (0.25, 7),
+    "natural_gas": (0.6, 1),
+    "diesel": (0.05, 9),
+    "petrol": (0.05, 7),
+    "road_km": (0.1, 10),
+    "air_km": (0.3, 5),
+}
+DEFAULT_CHUNK_SIZE = 200_000
+AR5 = {gas: gwp for gas, gwp_set, gwp in GWP_VALUES if gwp_set == "AR5"}
+
+
+def seasonal_profile(codes: Sequence[str]) -> np.ndarray:
+    """(len(codes), 12) multipliers averaging 1.0 over the year."""
+    months = np.arange(1, 13)
+    amplitude, peak = np.array([SEASONALITY.get(c, (0.1, 6)) for c in codes], dtype=float).T
+    return 1 + amplitude[:, None] * np.cos(2 * np.pi * (months[None, :] - peak[:, None]) / 12)
+
+
+def _placeholders(conn: Connection, n: int) -> str:
+    style = conn.dialect.paramstyle
+    if style == "qmark":
+        return ", ".join("?" * n)
+    if style in ("format", "pyformat"):
+        return ", ".join(["%s"] * n)
+    if style == "numeric":
+        return ", ".join(f":{i + 1}" for i in range(n))
+    raise ValueError(f"Unsupported DBAPI paramstyle: {style}")
+
+
+def bulk_insert(conn: Connection, table, columns: Sequence[str], rows: Iterable[tuple]) -> None:
+    """executemany of positional rows, skipping ORM and Core statement compilation per row."""
+    rows = list(rows)
+    if rows:
+        sql = f"INSERT INTO {table.__tablename__} ({', '.join(columns)}) VALUES ({_placeholders(conn, len(columns))})"
+        conn.exec_driver_sql(sql, rows)
+
+
+def _next_id(conn: Connection, model) -> int:
+    return int(conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _ensure_reference_data(conn: Connection) -> None:
+    existing = set(conn.execute(select(EmissionFactor.code)).scalars())
+    bulk_insert(
+        conn,
+        EmissionFactor,
+        ["code", "name", "unit", "factor_kgco2_per_unit", "factor_kgch4_per_unit", "factor_kgn2o_per_unit", "scope_hint"],
+        [f for f in FACTORS if f[0] not in existing],
+    )
+    existing_gwp = set(conn.execute(select(GasGWP.gas, GasGWP.gwp_set)).tuples())
+    bulk_insert(conn, GasGWP, ["gas", "gwp_set", "gwp100"], [g for g in GWP_VALUES if (g[0], g[1]) not in existing_gwp])
+
+
+def generate(
+    engine: Engine,
+    groups: int = 1,
+    entities: int = 2,
+    facilities: int = 3,
+    streams: int = 4,
+    years: Sequence[int] = (2024, 2025),
+    seed: int = 42,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    with_emissions: bool = True,
+    prefix: str = "Synthetic",
+    defer_indexes: bool = True,
+    anomaly_baseline: bool = True,
+) -> Dict[str, int]:
+    """
+    Generate a synthetic organisation and its activity history.
+
+    Args:
+        engine: Target database; tables are created when missing
+        groups, entities, facilities: Fan-out per level (entities per group, facilities per entity)
+        streams: Activity lines per facility, each reported once a month
+        years: Reporting years
+        seed: Seed of the NumPy generator; equal arguments give identical data
+        chunk_size: Rows per executemany call
+        with_emissions: Also write AR5 emission records for every activity
+        prefix: Name prefix of generated groups/entities/facilities (names are unique)
+        defer_indexes: Drop the activity/emission secondary indexes during the load and rebuild them once
+        anomaly_baseline: Mark the loaded activities as scanned for anomalies and seed the series
+            statistics from them, so the next scan only reads rows added afterwards
+
+    Returns:
+        Row counts per table
+    """
+    if min(groups, entities, facilities, streams) < 1 or not years:
+        raise ValueError("groups, entities, facilities, streams and years must be positive")
+    Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(seed)
+    years = sorted(int(y) for y in years)
+    n_entities = groups * entities
+    n_facilities = n_entities * facilities
+    n_streams = n_facilities * streams
+
+    codes = [f[0] for f in FACTORS]
+    gas_factors = np.array([f[3:6] for f in FACTORS], dtype=float)
+    gwp = np.array([AR5["CO2"], AR5["CH4"], AR5["N2O"]], dtype=float)
+    base = np.array([BASE_MONTHLY_AMOUNT.get(c, 1_000.0) for c in codes])
+    season = seasonal_profile(codes)
+
+    # Per-facility size (heavy tail), trend and factor mix; per-stream factor and scale
+    facility_scale = rng.lognormal(0.0, 1.0, n_facilities)
+    facility_trend = rng.normal(-0.02, 0.03, n_facilities)
+    mix = rng.dirichlet(np.full(len(codes), 0.5), n_facilities).cumsum(axis=1)
+    stream_facility = np.repeat(np.arange(n_facilities), streams)
+    draws = rng.random(n_streams)
+    stream_factor = np.minimum((draws[:, None] > mix[stream_facility]).sum(axis=1), len(codes) - 1)
+    stream_level = base[stream_factor] * facility_scale[stream_facility] * rng.lognormal(0.0, 0.5, n_streams)
+    stream_co2e = gas_factors[stream_factor] @ gwp  # kg CO2e per unit
+
+    counts = {"groups": groups, "entities": n_entities, "facilities": n_facilities}
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+            conn.exec_driver_sql("PRAGMA journal_mode = MEMORY")
+        _ensure_reference_data(conn)
+        deferred = (
+            [index for model in (UploadedActivity, EmissionRecord) for index in model.__table__.indexes]
+            if defer_indexes
+            else []
+        )
+        for index in deferred:
+            index.drop(conn, checkfirst=True)
+
+        group_id0 = _next_id(conn, Group)
+        entity_id0 = _next_id(conn, Entity)
+        facility_id0 = _next_id(conn, Facility)
+        activity_id = _next_id(conn, UploadedActivity)
+        bulk_insert(conn, Group, ["id", "name"], [(group_id0 + g, f"{prefix} Group {g}") for g in range(groups)])
+        bulk_insert(
+            conn,
+            Entity,
+            ["id", "group_id", "name", "yearly_budget_tco2e"],
+            [(entity_id0 + e, group_id0 + e // entities, f"{prefix} Entity {e // entities}.{e % entities}", 0.0)
+             for e in range(n_entities)],
+        )
+        facility_entity = entity_id0 + np.arange(n_facilities) // facilities
+        bulk_insert(
+            conn,
+            Facility,
+            ["id", "entity_id", "name"],
+            [(facility_id0 + f, int(facility_entity[f]), f"{prefix} Facility {f // facilities // entities}."
+              f"{f // facilities % entities}.{f % facilities}") for f in range(n_facilities)],
+        )
+
+        stream_entity = stream_facility // facilities
+        stream_facility_id = (facility_id0 + stream_facility).tolist()
+        stream_entity_id = (entity_id0 + stream_entity).tolist()
+        stream_code = np.array(codes, dtype=object)[stream_factor].tolist()
+        stream_name = [f"{FACTORS[k][1]} #{i % streams + 1}" for i, k in enumerate(stream_factor.tolist())]
+        stream_unit = np.array([f[2] for f in FACTORS], dtype=object)[stream_factor].tolist()
+        stream_scope = np.array([f[6] for f in FACTORS], dtype=object)[stream_factor].tolist()
+
+        period_ids = resolve_period_ids(conn, [f"{year}-{month:02d}" for year in years for month in range(1, 13)])
+        entity_year_t = np.zeros((n_entities, len(years)))
+        activities = emissions = 0
+        for y, year in enumerate(years):
+            growth = (1 + facility_trend[stream_facility]) ** (year - years[0])
+            for month in range(1, 13):
+                period = f"{year}-{month:02d}"
+                period_id = period_ids[period]
+                amount = np.round(
+                    stream_level * growth * season[stream_factor, month - 1] * rng.lognormal(0.0, 0.08, n_streams), 2
+                )
+                kg = amount * stream_co2e
+                entity_year_t[:, y] += np.bincount(stream_entity, kg, n_entities) / 1000
+                for lo in range(0, n_streams, chunk_size):
+                    hi = min(lo + chunk_size, n_streams)
+                    ids = range(activity_id, activity_id + hi - lo)
+                    bulk_insert(
+                        conn,
+                        UploadedActivity,
+                        ["id", "entity_id", "facility_id", "scope", "activity_name", "unit", "amount", "factor_code",
+                         "period", "period_id"],
+                        zip(ids, stream_entity_id[lo:hi], stream_facility_id[lo:hi], stream_scope[lo:hi],
+                            stream_name[lo:hi], stream_unit[lo:hi], amount[lo:hi].tolist(), stream_code[lo:hi],
+                            [period] * (hi - lo), [period_id] * (hi - lo)),
+                    )
+                    if with_emissions:
+                        gases = amount[lo:hi, None] * gas_factors[stream_factor[lo:hi]]
+                        bulk_insert(
+                            conn,
+                            EmissionRecord,
+                            ["activity_id", "co2e_kg", "co2_kg", "ch4_kg", "n2o_kg", "gwp_set", "scope", "period",
+                             "period_id"],
+                            zip(ids, kg[lo:hi].tolist(), gases[:, 0].tolist(), gases[:, 1].tolist(),
+                                gases[:, 2].tolist(), ["AR5"] * (hi - lo), stream_scope[lo:hi], [period] * (hi - lo),
+                                [period_id] * (hi - lo)),
+                        )
+                        emissions += hi - lo
+                    activity_id += hi - lo
+                    activities += hi - lo
+        for index in deferred:
+            index.create(conn)
+
+        # Revenues follow facility size with a mild year-end peak
+        months = np.arange(len(years) * 12)
+        revenue = (
+            1.5e6 * facility_scale[:, None] ** 0.8
+            * (1 + 0.1 * np.cos(2 * np.pi * (months % 12 - 11) / 12))[None, :]
+            * rng.lognormal(0.0, 0.05, (n_facilities, months.size))
+        )
+        periods = [f"{year}-{month:02d}" for year in years for month in range(1, 13)]
+        bulk_insert(
+            conn,
+            FacilityRevenue,
+            ["facility_id", "period", "period_id", "revenue_eur"],
+            ((facility_id0 + f, periods[m], period_ids[periods[m]], float(revenue[f, m]))
+             for f in range(n_facilities) for m in months.tolist()),
+        )
+
+        # Yearly allocations cover 75-110% of emissions; budgets sit around the mean annual total
+        allocation = np.round(entity_year_t * rng.uniform(0.75, 1.1, entity_year_t.shape), 1)
+        bulk_insert(
+            conn,
+            EUETSAllowanceLedger,
+            ["entity_id", "delta_allowances", "note"],
+            ((entity_id0 + e, float(allocation[e, y]), f"allocation:{year}")
+             for e in range(n_entities) for y, year in enumerate(years)),
+        )
+        budgets = np.round(entity_year_t.mean(axis=1) * rng.uniform(0.85, 1.15, n_entities), 1)
+        conn.exec_driver_sql(
+            f"UPDATE {Entity.__tablename__} SET yearly_budget_tco2e = {_placeholders(conn, 1)} WHERE id = {_placeholders(conn, 1)}",
+            [(float(b), entity_id0 + e) for e, b in enumerate(budgets.tolist())],
+        )
+        # Raw DBAPI writes skip the Session's revision tracking
+        bump_revision(
+            conn, EmissionFactor, GasGWP, Group, Entity, Facility, UploadedActivity, EmissionRecord, FacilityRevenue,
+            EUETSAllowanceLedger,
+        )
+
+    counts.update(
+        activities=activities,
+        emission_records=emissions,
+        revenues=n_facilities * len(periods),
+        ledger_entries=n_entities * len(years),
+    )
+    with Session(engine) as db:
+        counts["closure_rows"] = rebuild_closure(db)
+        if anomaly_baseline:
+            last_id = db.execute(select(func.max(UploadedActivity.id))).scalar() or 0
+            counts["anomaly_series"] = rebuild_series_stats(db, through_id=last_id)
+    return counts
+
+
+def _years(value: str) -> List[int]:
+    if "-" in value:
+        lo, hi = value.split("-", 1)
+        return list(range(int(lo), int(hi) + 1))
+    return [int(v) for v in value.split(",")]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset for load testing.")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--groups", type=int, default=1)
+    parser.add_argument("--entities", type=int, default=5, help="entities per group")
+    parser.add_argument("--facilities", type=int, default=4, help="facilities per entity")
+    parser.add_argument("--streams", type=int, default=4, help="monthly activity lines per facility")
+    parser.add_argument("--years", type=_years, default=[2024, 2025], help="e.g. 2021-2025 or 2024,2025")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--no-emissions", action="store_true", help="skip emission records")
+    parser.add_argument("--prefix", default="Synthetic")
+    parser.add_argument("--keep-indexes", action="store_true", help="maintain indexes during the load")
+    parser.add_argument("--no-anomaly-baseline", action="store_true", help="leave the activities for the next anomaly scan")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(
+        args.database_url,
+        connect_args={"check_same_thread": False} if args.database_url.startswith("sqlite") else {},
+    )
+    started = time.perf_counter()
+    counts = generate(
+        engine,
+        groups=args.groups,
+        entities=args.entities,
+        facilities=args.facilities,
+        streams=args.streams,
+        years=args.years,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+        with_emissions=not args.no_emissions,
+        prefix=args.prefix,
+        defer_indexes=not args.keep_indexes,
+        anomaly_baseline=not args.no_anomaly_baseline,
+    )
+    elapsed = time.perf_counter() - started
+    for table, n in counts.items():
+        print(f"{table:<18} {n:>12,}")
+    print(f"done in {elapsed:.1f}s ({counts['activities'] / elapsed:,.0f} activities/s)")
+
+
+if __name__ == "__main__":
+    main()
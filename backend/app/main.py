@@ -1,7 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
+from . import models  # noqa: F401  (registers tables on Base.metadata)
+from .core.config import settings
+from .core.metrics import TimingMiddleware
+from .core.profiling import ProfilingMiddleware
+from .db.database import Base, SessionLocal, engine
+from .services.allowance_lots import backfill_opening_lots
+from .services.anomaly import ensure_anomaly_columns
+from .services.calendar import backfill_period_ids
+from .services.factor_library import ensure_recalc_column
+from .services.ghg import ensure_gas_columns
+from .services.hierarchy import ensure_closure
+from .services.llm_service import llm_service
 from .routes import health
+from .routes import admin as admin_routes
+from .routes import metrics as metrics_routes
 from .routes import factors as factors_routes
 from .routes import org as org_routes
 from .routes import upload as upload_routes
@@ -11,11 +26,33 @@ from .routes import eu_ets as eu_ets_routes
 from .routes import llm as llm_routes
 from .routes import compliance as compliance_routes
 from .routes import intensity as intensity_routes
+from .routes import meters as meters_routes
+from .routes import scope2 as scope2_routes
+from .routes import scope3 as scope3_routes
 
 
 def create_app() -> FastAPI:
     app = FastAPI(title="CarbonLens API", version="1.0.0")
 
+    Base.metadata.create_all(bind=engine)
+
+    @app.on_event("startup")
+    def sync_org_closure():
+        db = SessionLocal()
+        try:
+            ensure_gas_columns(db)
+            ensure_closure(db)
+            ensure_recalc_column(db)
+            ensure_anomaly_columns(db)
+            backfill_period_ids(db)
+            backfill_opening_lots(db)
+        finally:
+            db.close()
+
+    @app.on_event("shutdown")
+    async def close_llm_clients():
+        await llm_service.aclose()
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["http://localhost:5173", "https://carbon-smart-mvp.vercel.app"],
@@ -23,8 +60,16 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+    app.add_middleware(ProfilingMiddleware)
+    if settings.metrics_enabled:
+        # Added last so it is outermost: timings cover the whole stack and sizes are as sent
+        app.add_middleware(TimingMiddleware)
 
     app.include_router(health.router)
+    if settings.metrics_enabled:
+        app.include_router(metrics_routes.router)
+    app.include_router(admin_routes.router)
     app.include_router(factors_routes.router)
     app.include_router(org_routes.router)
     app.include_router(upload_routes.router)
@@ -34,6 +79,9 @@ def create_app() -> FastAPI:
     app.include_router(llm_routes.router)
     app.include_router(compliance_routes.router)
     app.include_router(intensity_routes.router)
+    app.include_router(meters_routes.router)
+    app.include_router(scope2_routes.router)
+    app.include_router(scope3_routes.router)
 
     return app
 
@@ -1,18 +1,43 @@
-from .org import Group, Entity, Facility
-from .factors import EmissionFactor, GasGWP
+from .org import Group, Entity, Facility, OrgClosure
+from .period import Period
+from .factors import ActiveGWPSet, EmissionFactor, EmissionFactorVersion, GasGWP
 from .activity import UploadedActivity
 from .emission import EmissionRecord
-from .allowance import EUETSAllowanceLedger, EUETSTransfer
+from .allowance import AllowanceLot, AllowanceLotMatch, EUETSAllowanceLedger, EUETSTransfer
+from .revenue import FacilityRevenue
+from .anomaly import ActivitySeriesStats, ActivityAnomaly, AnomalyScanState
+from .insight import EntityInsight
+from .meter import Meter, MeterBlock
+from .instrument import EnergyInstrument
+from .purchase import PurchaseRecord, FxRate
+from .revision import DataRevision
 
 __all__ = [
     "Group",
     "Entity",
     "Facility",
+    "OrgClosure",
+    "Period",
     "EmissionFactor",
+    "EmissionFactorVersion",
     "GasGWP",
+    "ActiveGWPSet",
     "UploadedActivity",
     "EmissionRecord",
     "EUETSAllowanceLedger",
     "EUETSTransfer",
+    "AllowanceLot",
+    "AllowanceLotMatch",
+    "FacilityRevenue",
+    "ActivitySeriesStats",
+    "ActivityAnomaly",
+    "AnomalyScanState",
+    "EntityInsight",
+    "Meter",
+    "MeterBlock",
+    "EnergyInstrument",
+    "PurchaseRecord",
+    "FxRate",
+    "DataRevision",
 ]
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Float, ForeignKey
 from sqlalchemy.orm import relationship
 
 from ..db.database import Base
@@ -16,4 +16,9 @@ class UploadedActivity(Base):
     amount = Column(Float, nullable=False)
     factor_code = Column(String, nullable=False)
     period = Column(String, nullable=False)
+    period_id = Column(Integer, ForeignKey("periods.id"), nullable=True, index=True)
+    # Emission records are stale (factor or amount changed since the last recalculation)
+    needs_recalc = Column(Boolean, nullable=False, default=False, server_default="0", index=True)
+    # Amount changed in place since the row was scored for anomalies
+    needs_rescore = Column(Boolean, nullable=False, default=False, server_default="0", index=True)
 
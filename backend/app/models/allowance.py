@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Date, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 
 from ..db.database import Base
@@ -24,3 +24,38 @@ class EUETSTransfer(Base):
     note = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+
+class AllowanceLot(Base):
+    """
+    Allowances of one vintage acquired at one price.
+
+    The ledger stays the source of balances; lots say which vintages make
+    up the balance and at what cost. `remaining` falls as the lot is
+    surrendered or transferred. A transferred lot continues at the receiver
+    as a new lot with the same vintage, price and acquisition date.
+    """
+
+    __tablename__ = "allowance_lots"
+    __table_args__ = (Index("ix_allowance_lots_holding", "entity_id", "remaining"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_id = Column(Integer, ForeignKey("entities.id"), nullable=False, index=True)
+    vintage = Column(Integer, nullable=True)  # None: opening balance of unknown vintage
+    price_eur = Column(Float, nullable=False, default=0.0)  # acquisition price per allowance; 0 for free allocation
+    acquired_on = Column(Date, nullable=False)
+    quantity = Column(Float, nullable=False)
+    remaining = Column(Float, nullable=False)
+    source_lot_id = Column(Integer, ForeignKey("allowance_lots.id"), nullable=True)
+    note = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class AllowanceLotMatch(Base):
+    """Quantity of a lot consumed by an outgoing ledger entry (surrender or transfer out)."""
+
+    __tablename__ = "allowance_lot_matches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ledger_id = Column(Integer, ForeignKey("euets_allowance_ledger.id"), nullable=False, index=True)
+    lot_id = Column(Integer, ForeignKey("allowance_lots.id"), nullable=False, index=True)
+    quantity = Column(Float, nullable=False)
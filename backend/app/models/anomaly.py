@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+
+from ..db.database import Base
+
+
+class ActivitySeriesStats(Base):
+    """Running count/mean/M2 of the monthly amounts (in factor units) of each activity series."""
+
+    __tablename__ = "activity_series_stats"
+    __table_args__ = (UniqueConstraint("facility_id", "factor_code", "month", name="uq_activity_series"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id"), nullable=False, index=True)
+    factor_code = Column(String, nullable=False)
+    month = Column(Integer, nullable=False, default=0)  # calendar month stream (1-12); 0 is the whole series
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)  # sum of squared deviations (Welford)
+
+
+class ActivityAnomaly(Base):
+    __tablename__ = "activity_anomalies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    activity_id = Column(Integer, ForeignKey("uploaded_activities.id"), nullable=False, index=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id"), nullable=False, index=True)
+    factor_code = Column(String, nullable=False)
+    period = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    expected = Column(Float, nullable=False)
+    score = Column(Float, nullable=False)  # z-score (history) or robust MAD z-score (batch)
+    method = Column(String, nullable=False)  # zscore/mad
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class AnomalyScanState(Base):
+    """Watermark of the last activity id scored, so each run only reads new rows."""
+
+    __tablename__ = "anomaly_scan_state"
+
+    id = Column(Integer, primary_key=True)
+    last_activity_id = Column(Integer, nullable=False, default=0)
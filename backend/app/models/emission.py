@@ -9,6 +9,11 @@ class EmissionRecord(Base):
     id = Column(Integer, primary_key=True, index=True)
     activity_id = Column(Integer, ForeignKey("uploaded_activities.id"), nullable=False, index=True)
     co2e_kg = Column(Float, nullable=False)
+    co2_kg = Column(Float, nullable=False, default=0.0)
+    ch4_kg = Column(Float, nullable=False, default=0.0)
+    n2o_kg = Column(Float, nullable=False, default=0.0)
+    gwp_set = Column(String, nullable=True)
     scope = Column(String, nullable=False)
     period = Column(String, nullable=False)
+    period_id = Column(Integer, ForeignKey("periods.id"), nullable=True, index=True)
 
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy.sql import func
 
 from ..db.database import Base
 
@@ -11,13 +12,46 @@ class EmissionFactor(Base):
     name = Column(String, nullable=False)
     unit = Column(String, nullable=False)
     factor_kgco2_per_unit = Column(Float, nullable=False)
+    factor_kgch4_per_unit = Column(Float, nullable=False, default=0.0)
+    factor_kgn2o_per_unit = Column(Float, nullable=False, default=0.0)
     scope_hint = Column(String, nullable=False)  # Scope1/Scope2/Scope3
 
 
 class GasGWP(Base):
     __tablename__ = "gas_gwp"
+    __table_args__ = (UniqueConstraint("gas", "gwp_set", name="uq_gas_gwp_set"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    gas = Column(String, unique=True, nullable=False)
+    gas = Column(String, nullable=False)
+    gwp_set = Column(String, nullable=False, default="AR5", index=True)  # AR5/AR6
     gwp100 = Column(Float, nullable=False)
 
+
+class ActiveGWPSet(Base):
+    """The GWP set stored emission records are weighted with (single row, id 1)."""
+
+    __tablename__ = "active_gwp_set"
+
+    id = Column(Integer, primary_key=True)
+    gwp_set = Column(String, nullable=False)
+
+
+class EmissionFactorVersion(Base):
+    """Immutable snapshot of a factor's content; `emission_factors` holds the latest version."""
+
+    __tablename__ = "emission_factor_versions"
+    __table_args__ = (UniqueConstraint("code", "version", name="uq_factor_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    factor_id = Column(Integer, ForeignKey("emission_factors.id"), nullable=False, index=True)
+    code = Column(String, nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    name = Column(String, nullable=False)
+    unit = Column(String, nullable=False)
+    factor_kgco2_per_unit = Column(Float, nullable=False)
+    factor_kgch4_per_unit = Column(Float, nullable=False, default=0.0)
+    factor_kgn2o_per_unit = Column(Float, nullable=False, default=0.0)
+    scope_hint = Column(String, nullable=False)
+    content_hash = Column(String(40), nullable=False)
+    source = Column(String, nullable=True)  # dataset the version was imported from
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
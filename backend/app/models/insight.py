@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+
+from ..db.database import Base
+
+
+class EntityInsight(Base):
+    """Rule-based insights precomputed per entity (entity_id NULL for the whole portfolio)."""
+
+    __tablename__ = "entity_insights"
+    __table_args__ = (UniqueConstraint("entity_id", name="uq_entity_insight"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_id = Column(Integer, ForeignKey("entities.id"), nullable=True, index=True)
+    year = Column(Integer, nullable=True)
+    snapshot = Column(JSON, nullable=False)  # the figures the insights were derived from
+    analysis = Column(JSON, nullable=False)
+    recommendations = Column(JSON, nullable=False)
+    risk_assessment = Column(JSON, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
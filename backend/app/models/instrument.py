@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy.sql import func
+
+from ..db.database import Base
+
+
+class EnergyInstrument(Base):
+    """
+    Contractual electricity instrument for market-based Scope 2.
+
+    A PPA delivers up to `capacity_kw` in every hour of its validity; a
+    certificate (GO/REC) covers `volume_kwh` in total. Instruments with a
+    facility apply to that facility's meters, otherwise to all meters of
+    the entity.
+    """
+
+    __tablename__ = "energy_instruments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_id = Column(Integer, ForeignKey("entities.id"), nullable=False, index=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id"), nullable=True, index=True)
+    kind = Column(String, nullable=False)  # PPA/GO/REC
+    valid_from = Column(Date, nullable=False)
+    valid_to = Column(Date, nullable=False)  # inclusive
+    capacity_kw = Column(Float, nullable=True)
+    volume_kwh = Column(Float, nullable=True)
+    factor_kgco2e_per_kwh = Column(Float, nullable=False, default=0.0)
+    note = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy.sql import func
+
+from ..db.database import Base
+
+
+class Meter(Base):
+    """Fixed-interval meter of a facility; readings live in array blocks on disk (see services/meters.py)."""
+
+    __tablename__ = "meters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    unit = Column(String, nullable=False, default="kWh")
+    interval_minutes = Column(Integer, nullable=False, default=15)
+    factor_code = Column(String, nullable=False, default="electricity_TR")
+    scope = Column(String, nullable=False, default="Scope2")
+    grid_region = Column(String, nullable=False, default="TR")  # key into the hourly grid-intensity curves
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class MeterBlock(Base):
+    """One meter-month of readings: block file location plus aggregates kept in sync on ingest."""
+
+    __tablename__ = "meter_blocks"
+    __table_args__ = (UniqueConstraint("meter_id", "month", name="uq_meter_block_month"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    meter_id = Column(Integer, ForeignKey("meters.id"), nullable=False, index=True)
+    month = Column(Date, nullable=False, index=True)  # first day of the month
+    path = Column(String, nullable=False)
+    slots = Column(Integer, nullable=False)
+    readings = Column(Integer, nullable=False, default=0)  # non-missing slots
+    total = Column(Float, nullable=False, default=0.0)
+    peak = Column(Float, nullable=True)
+    peak_slot = Column(Integer, nullable=True)
+    activity_id = Column(Integer, ForeignKey("uploaded_activities.id"), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 
 from ..db.database import Base
@@ -34,3 +34,15 @@ class Facility(Base):
 
     entity = relationship("Entity", back_populates="facilities")
 
+
+class OrgClosure(Base):
+    """Precomputed ancestor -> descendant facility paths of the Group → Entity → Facility tree."""
+
+    __tablename__ = "org_closure"
+    __table_args__ = (Index("ix_org_closure_ancestor", "ancestor_level", "ancestor_id", "facility_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    ancestor_level = Column(String, nullable=False)  # group/entity/facility
+    ancestor_id = Column(Integer, nullable=False)
+    facility_id = Column(Integer, ForeignKey("facilities.id"), nullable=False, index=True)
+    depth = Column(Integer, nullable=False)  # 0 for the facility itself
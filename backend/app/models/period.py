@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Date, Index, Integer, String, UniqueConstraint
+
+from ..db.database import Base
+
+
+class Period(Base):
+    """Reporting period dimension; activity and emission rows reference it through `period_id`."""
+
+    __tablename__ = "periods"
+    __table_args__ = (
+        UniqueConstraint("period_start", "period_end", name="uq_period_range"),
+        Index("ix_periods_range", "period_start", "period_end"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    label = Column(String, unique=True, nullable=False, index=True)  # canonical, e.g. 2025-Q3
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False, index=True)  # inclusive
+    granularity = Column(String, nullable=False)  # month/quarter/half/year
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, String, UniqueConstraint
+
+from ..db.database import Base
+
+
+class PurchaseRecord(Base):
+    """Purchase ledger line for spend-based Scope 3: spend in `currency` on a sector, sourced from a country."""
+
+    __tablename__ = "purchase_ledger"
+    __table_args__ = (Index("ix_purchase_ledger_entity_period", "entity_id", "period_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_id = Column(Integer, ForeignKey("entities.id"), nullable=False, index=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id"), nullable=True)
+    period = Column(String, nullable=False)
+    period_id = Column(Integer, ForeignKey("periods.id"), nullable=True, index=True)
+    sector = Column(String, nullable=False)  # classification code of the EEIO model
+    country = Column(String, nullable=False)  # ISO code of the supplier country
+    currency = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    category = Column(String, nullable=True)  # GHG Protocol Scope 3 category
+    description = Column(String, nullable=True)
+
+
+class FxRate(Base):
+    """Annual average rate: units of the EEIO base currency per one unit of `currency`."""
+
+    __tablename__ = "fx_rates"
+    __table_args__ = (UniqueConstraint("currency", "year", name="uq_fx_rate_year"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String, nullable=False, index=True)
+    year = Column(Integer, nullable=False)
+    rate = Column(Float, nullable=False)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, UniqueConstraint
+
+from ..db.database import Base
+
+
+class FacilityRevenue(Base):
+    """Revenue/production denominator per facility and reporting period."""
+
+    __tablename__ = "facility_revenues"
+    __table_args__ = (UniqueConstraint("facility_id", "period", name="uq_facility_revenue_period"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    facility_id = Column(Integer, ForeignKey("facilities.id"), nullable=False, index=True)
+    period = Column(String, nullable=False, index=True)
+    period_id = Column(Integer, ForeignKey("periods.id"), nullable=True, index=True)
+    revenue_eur = Column(Float, nullable=False, default=0.0)
+    production_units = Column(Float, nullable=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, String
+
+from ..db.database import Base
+
+
+class DataRevision(Base):
+    """Revision token per table; changes whenever the table is written (see services/cache.py)."""
+
+    __tablename__ = "data_revisions"
+
+    name = Column(String, primary_key=True)  # table name
+    revision = Column(BigInteger, nullable=False)
@@ -0,0 +1,44 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from ..core.profiling import is_admin, profile_store
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(x_admin_token: str = Header("")):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    """Most recent request profiles first."""
+    return [p.summary() for p in profile_store.list()]
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str, format: Literal["json", "speedscope", "collapsed"] = Query("json")):
+    """
+    A stored profile.
+
+    `json` returns the summary, the SQL statements and the collapsed stacks;
+    `speedscope` can be opened at speedscope.app; `collapsed` feeds
+    flamegraph.pl and similar tools.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "speedscope":
+        return profile.speedscope()
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return {**profile.summary(), "statements": profile.statements, "collapsed": profile.collapsed().splitlines()}
+
+
+@router.delete("/profiles", dependencies=[Depends(require_admin)])
+def clear_profiles():
+    profile_store.clear()
+    return {"cleared": True}
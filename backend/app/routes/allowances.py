@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from ..db.database import get_db
-from ..schemas.allowance import AllowanceAdjustRequest, TransferRequest
-from ..services.budget import allowance_summary, perform_transfer
-from ..models.allowance import EUETSAllowanceLedger
+from ..schemas.allowance import (
+    AllowanceAdjustRequest,
+    AllowanceLotRead,
+    EntityHolding,
+    SurrenderRequest,
+    SurrenderResponse,
+    TransferRequest,
+)
+from ..services.allowance_lots import EPSILON, weighted_average_cost
+from ..services.budget import acquire_allowances, allowance_summary, perform_transfer, surrender_allowances
+from ..services.insights import refresh_balances
+from ..models.allowance import AllowanceLot
 
 
 router = APIRouter(prefix="/allowances", tags=["allowances"])
@@ -12,22 +23,76 @@ router = APIRouter(prefix="/allowances", tags=["allowances"])
 
 @router.post("/adjust")
 def adjust_allowances(payload: AllowanceAdjustRequest, db: Session = Depends(get_db)):
-    entry = EUETSAllowanceLedger(
-        entity_id=payload.entity_id,
-        delta_allowances=payload.delta_allowances,
-        note=payload.note,
-    )
-    db.add(entry)
-    db.commit()
+    """Positive adjustments open a lot; negative ones are surrenders matched against lots."""
+    try:
+        if payload.delta_allowances > 0:
+            acquire_allowances(
+                db,
+                payload.entity_id,
+                payload.delta_allowances,
+                vintage=payload.vintage,
+                price_eur=payload.price_eur,
+                acquired_on=payload.acquired_on,
+                note=payload.note,
+            )
+        else:
+            surrender_allowances(db, payload.entity_id, -payload.delta_allowances, payload.method, payload.note)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    refresh_balances(db, [payload.entity_id])
     return allowance_summary(db, payload.entity_id)
 
 
+@router.post("/surrender", response_model=SurrenderResponse)
+def surrender(payload: SurrenderRequest, db: Session = Depends(get_db)):
+    try:
+        result = surrender_allowances(db, payload.entity_id, payload.allowances, payload.method, payload.note)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    refresh_balances(db, [payload.entity_id])
+    return result
+
+
 @router.post("/transfer")
 def transfer_allowances(payload: TransferRequest, db: Session = Depends(get_db)):
-    return perform_transfer(db, payload.from_entity_id, payload.to_entity_id, payload.allowances, payload.note)
+    try:
+        result = perform_transfer(
+            db, payload.from_entity_id, payload.to_entity_id, payload.allowances, payload.note, payload.method
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    refresh_balances(db, [payload.from_entity_id, payload.to_entity_id])
+    return result
 
 
 @router.get("/summary")
 def get_summary(entity_id: int, db: Session = Depends(get_db)):
     return allowance_summary(db, entity_id)
 
+
+@router.get("/lots", response_model=list[AllowanceLotRead])
+def list_lots(
+    entity_id: int,
+    include_closed: bool = False,
+    limit: int = Query(500, ge=1, le=5000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Lots of an entity in acquisition order; open lots only unless `include_closed`."""
+    q = db.query(AllowanceLot).filter(AllowanceLot.entity_id == entity_id)
+    if not include_closed:
+        q = q.filter(AllowanceLot.remaining > EPSILON)
+    return q.order_by(AllowanceLot.acquired_on, AllowanceLot.id).offset(offset).limit(limit).all()
+
+
+@router.get("/cost", response_model=list[EntityHolding])
+def get_cost(
+    entities: Optional[str] = Query(None, description="Comma-separated list of entity IDs"),
+    db: Session = Depends(get_db),
+):
+    """Weighted-average acquisition cost of held allowances, per entity and vintage."""
+    try:
+        entity_list = [int(e) for e in entities.split(",") if e.strip()] if entities else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid entity IDs format. Use comma-separated integers.")
+    return weighted_average_cost(db, entity_list)
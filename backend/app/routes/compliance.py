@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
+from ..db.database import get_db
 from ..schemas.compliance import ComplianceResponse
 from ..services.calc import calc_compliance
 
@@ -12,7 +14,8 @@ async def get_compliance(
     start: date = Query(..., description="Start date (YYYY-MM-DD)"),
     end: date = Query(..., description="End date (YYYY-MM-DD)"),
     entities: Optional[str] = Query(None, description="Comma-separated entity IDs"),
-    prices: Optional[str] = Query(None, description="Comma-separated price scenarios in EUR/tCO2e")
+    prices: Optional[str] = Query(None, description="Comma-separated price scenarios in EUR/tCO2e"),
+    db: Session = Depends(get_db),
 ):
     """
     Get compliance data for EU ETS allowances and cost scenarios.
@@ -44,7 +47,8 @@ async def get_compliance(
         compliance_data = calc_compliance(
             date_range=(start, end),
             entities=entity_list,
-            price_inputs=price_inputs
+            price_inputs=price_inputs,
+            db=db,
         )
         
         return compliance_data
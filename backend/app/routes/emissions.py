@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from datetime import date
@@ -7,8 +7,10 @@ from typing import List, Optional
 from ..db.database import get_db
 from ..models.activity import UploadedActivity
 from ..models.emission import EmissionRecord
-from ..models.factors import EmissionFactor
-from ..services.calc import compute_emissions_for_activity, calc_emissions
+from ..services.calc import calc_emissions
+from ..services.ghg import recalculate_activities, apply_gwp_set
+from ..services.anomaly import list_anomalies, scan_in_background
+from ..services.insights import refresh_in_background
 from ..schemas.emission import EmissionsResponse
 
 
@@ -16,25 +18,32 @@ router = APIRouter(prefix="/emissions", tags=["emissions"])
 
 
 @router.post("/recalculate")
-def recalculate_emissions(period: str | None = None, db: Session = Depends(get_db)):
-    q = db.query(UploadedActivity)
-    if period:
-        q = q.filter(UploadedActivity.period == period)
-    activities = q.all()
-    factors = {f.code: f for f in db.query(EmissionFactor).all()}
-
-    inserted = 0
-    for act in activities:
-        factor = factors.get(act.factor_code)
-        if not factor:
-            # skip unknown factor rows
-            continue
-        co2e_kg = compute_emissions_for_activity(act.amount, factor.factor_kgco2_per_unit)
-        rec = EmissionRecord(activity_id=act.id, co2e_kg=co2e_kg, scope=act.scope, period=act.period)
-        db.add(rec)
-        inserted += 1
-    db.commit()
-    return {"status": "ok", "inserted": inserted}
+def recalculate_emissions(
+    background_tasks: BackgroundTasks,
+    period: str | None = None,
+    gwp_set: str | None = None,
+    dirty_only: bool = False,
+    db: Session = Depends(get_db),
+):
+    try:
+        result = recalculate_activities(db, period=period, gwp_set=gwp_set, dirty_only=dirty_only)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    # Anomalies first: the insights count them
+    background_tasks.add_task(scan_in_background, db.get_bind())
+    background_tasks.add_task(refresh_in_background, db.get_bind())
+    return {"status": "ok", **result, "anomaly_scan": "scheduled", "insights_refresh": "scheduled"}
+
+
+@router.post("/gwp-set")
+def switch_gwp_set(gwp_set: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Re-weight all stored emission records with another GWP set (e.g. AR5 -> AR6)."""
+    try:
+        updated = apply_gwp_set(db, gwp_set)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    background_tasks.add_task(refresh_in_background, db.get_bind())
+    return {"status": "ok", "gwp_set": gwp_set, "updated": updated}
 
 
 @router.get("", response_model=EmissionsResponse)
@@ -43,6 +52,7 @@ def get_emissions(
     end: Optional[date] = Query(None, description="End date for emissions data"),
     entities: Optional[str] = Query(None, description="Comma-separated list of entity IDs"),
     pareto: bool = Query(False, description="Apply 80/20 Pareto analysis to categories"),
+    db: Session = Depends(get_db),
 ):
     """
     Get emissions data with summary, time series, scope breakdown, and top categories.
@@ -72,13 +82,25 @@ def get_emissions(
         emissions_response = calc_emissions(
             date_range=(start, end),
             entities=entity_ids,
-            pareto=pareto
+            pareto=pareto,
+            db=db,
         )
         return emissions_response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating emissions: {str(e)}")
 
 
+@router.get("/anomalies")
+def get_anomalies(
+    entity_id: int | None = None,
+    facility_id: int | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Flagged activity rows, strongest deviation first."""
+    return {"items": list_anomalies(db, entity_id=entity_id, facility_id=facility_id, limit=limit)}
+
+
 @router.get("/legacy")
 def list_emissions_legacy(
     entity_id: int | None = None,
@@ -112,7 +134,17 @@ def list_emissions_legacy(
         "size": size,
         "total": total,
         "items": [
-            {"id": r.id, "activity_id": r.activity_id, "co2e_kg": r.co2e_kg, "scope": r.scope, "period": r.period}
+            {
+                "id": r.id,
+                "activity_id": r.activity_id,
+                "co2e_kg": r.co2e_kg,
+                "co2_kg": r.co2_kg,
+                "ch4_kg": r.ch4_kg,
+                "n2o_kg": r.n2o_kg,
+                "gwp_set": r.gwp_set,
+                "scope": r.scope,
+                "period": r.period,
+            }
             for r in items
         ],
         "totals_by_scope": totals_by_scope,
@@ -1,9 +1,20 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from ..db.database import get_db
-from ..models.factors import EmissionFactor, GasGWP
-from ..schemas.factors import EmissionFactorRead, GasGWPRead
+from ..models.factors import EmissionFactor, EmissionFactorVersion, GasGWP
+from ..schemas.factors import (
+    EmissionFactorRead,
+    EmissionFactorVersionRead,
+    FactorSearchBatch,
+    FactorSuggestion,
+    GasGWPRead,
+    RowSuggestions,
+)
+from ..services.factor_library import import_factors, read_factor_file
+from ..services.factor_search import get_index, suggest_for_rows
+from ..services.parser import read_dataframe
 
 
 router = APIRouter(prefix="/factors", tags=["factors"])
@@ -15,6 +26,70 @@ def list_factors(db: Session = Depends(get_db)):
 
 
 @router.get("/gwp", response_model=list[GasGWPRead])
-def list_gwp(db: Session = Depends(get_db)):
-    return db.query(GasGWP).all()
+def list_gwp(gwp_set: str | None = None, db: Session = Depends(get_db)):
+    q = db.query(GasGWP)
+    if gwp_set:
+        q = q.filter(GasGWP.gwp_set == gwp_set)
+    return q.all()
 
+
+@router.post("/import")
+async def import_factor_library(
+    file: UploadFile = File(...),
+    source: str | None = Query(None, description="Dataset name recorded on the new versions"),
+    dry_run: bool = Query(False, description="Only report what would change"),
+    db: Session = Depends(get_db),
+):
+    """Bulk import of a factor dataset; only new or changed factors are written, as new versions."""
+    content = await file.read()
+    # Parsing and the import are seconds of blocking work: keep them off the event loop
+    try:
+        df, missing = await run_in_threadpool(read_factor_file, content, file.filename)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
+    result = await run_in_threadpool(import_factors, db, df, source=source or file.filename, dry_run=dry_run)
+    return {"status": "ok", **result}
+
+
+@router.get("/{code}/versions", response_model=list[EmissionFactorVersionRead])
+def list_factor_versions(code: str, db: Session = Depends(get_db)):
+    return (
+        db.query(EmissionFactorVersion)
+        .filter(EmissionFactorVersion.code == code)
+        .order_by(EmissionFactorVersion.version)
+        .all()
+    )
+
+
+@router.get("/search", response_model=list[FactorSuggestion])
+def search_factors(
+    q: str = Query(..., min_length=1, description="Free-text activity name"),
+    unit: str | None = Query(None, description="Only factors whose unit has this unit's dimension"),
+    k: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    return get_index(db).search(q, unit, k)
+
+
+@router.post("/search/batch", response_model=list[RowSuggestions])
+def search_factors_batch(payload: FactorSearchBatch, db: Session = Depends(get_db)):
+    """Suggestions for every row without a usable factor code (unknown code or incompatible unit)."""
+    return suggest_for_rows(db, [r.dict() for r in payload.rows], payload.k)
+
+
+@router.post("/search/upload", response_model=list[RowSuggestions])
+async def search_factors_upload(file: UploadFile = File(...), k: int = Query(3, ge=1, le=20), db: Session = Depends(get_db)):
+    """Batch suggestions for the unmatched rows of an activity file, as `/upload` would read it."""
+    content = await file.read()
+    try:
+        df = await run_in_threadpool(read_dataframe, content, file.filename)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if "activity_name" not in df.columns:
+        raise HTTPException(status_code=400, detail="Missing columns: activity_name")
+    columns = [c for c in ("activity_name", "unit", "factor_code") if c in df.columns]
+    rows = df[columns].astype(object).where(df[columns].notna(), None).to_dict("records")
+    # Index build and batch search are blocking: keep them off the event loop
+    return await run_in_threadpool(suggest_for_rows, db, rows, k)
@@ -7,9 +7,11 @@ Provides endpoints for carbon intensity analysis including:
 - Revenue vs emissions correlation analysis
 """
 
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy.orm import Session
 from datetime import date
 from typing import List, Optional
+from ..db.database import get_db
 from ..schemas.intensity import IntensityResponse
 from ..services.calc import calc_intensity
 
@@ -20,7 +22,8 @@ router = APIRouter(prefix="/intensity", tags=["intensity"])
 async def get_intensity(
     start: date = Query(..., description="Start date for analysis"),
     end: date = Query(..., description="End date for analysis"),
-    entities: Optional[str] = Query(None, description="Comma-separated list of entity IDs")
+    entities: Optional[str] = Query(None, description="Comma-separated list of entity IDs"),
+    db: Session = Depends(get_db),
 ):
     """
     Get carbon intensity analysis data.
@@ -52,7 +55,7 @@ async def get_intensity(
             )
         
         # Calculate intensity data
-        intensity_data = calc_intensity((start, end), entity_list)
+        intensity_data = calc_intensity((start, end), entity_list, db=db)
         
         return intensity_data
         
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, List, Any, Literal
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Any, Literal, Optional, Tuple
 from pydantic import BaseModel
+from app.services import prompts
 from app.services.llm_service import llm_service
+from app.services.anomaly import list_anomalies
+from app.services.insights import stored_insights
 from app.db.database import get_db
 from sqlalchemy.orm import Session
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -43,22 +48,61 @@ async def explain_data(request: LLMExplainRequest):
         # Return fallback response
         return _get_fallback_response(request.context)
 
+@router.post("/explain/stream")
+async def explain_data_stream(request: LLMExplainRequest):
+    """
+    Stream an AI-powered explanation as Server-Sent Events
+    
+    Events: `token` (raw text delta), `summary` and `action` (parsed
+    incrementally), then a final `done` carrying the LLMExplainResponse.
+    """
+    prompt = _build_context_prompt(request.context, request.data)
+    
+    async def events():
+        parser = _ExplainStreamParser(request.context)
+        try:
+            async for delta in llm_service.stream_explanation(prompt):
+                yield _sse("token", {"text": delta})
+                for event, data in parser.feed(delta):
+                    yield _sse(event, data)
+            tail, final = parser.close()
+            for event, data in tail:
+                yield _sse(event, data)
+        except Exception as e:
+            logger.error(f"LLM explain stream failed: {e}")
+            final = _get_fallback_response(request.context)
+        yield _sse("done", final.model_dump())
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # identity keeps GZipMiddleware from buffering the stream
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
+
+def _load_insights(db: Session, entity_id: Optional[int]) -> Dict[str, Any]:
+    try:
+        return stored_insights(db, entity_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
 @router.get("/analysis")
-async def get_emissions_analysis(db: Session = Depends(get_db)):
+async def get_emissions_analysis(entity_id: Optional[int] = None, db: Session = Depends(get_db)):
     """
-    Get AI-powered emissions analysis
+    Get emissions analysis (precomputed rule-based insights unless the LLM is enabled)
     """
+    stored = _load_insights(db, entity_id)
     try:
-        # Get current emissions data
-        emissions_data = await get_current_emissions_data(db)
-        
-        # Get LLM analysis
-        analysis = await llm_service.analyze_emissions_data(emissions_data)
+        if llm_service.enabled:
+            emissions_data = await get_current_emissions_data(db, entity_id)
+            analysis = await llm_service.analyze_emissions_data(emissions_data)
+        else:
+            analysis = stored["analysis"]
         
         return {
             "success": True,
             "data": analysis,
-            "timestamp": "2024-01-15T10:30:00Z"
+            "timestamp": stored["computed_at"]
         }
         
     except Exception as e:
@@ -66,21 +110,22 @@ async def get_emissions_analysis(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @router.get("/recommendations")
-async def get_recommendations(db: Session = Depends(get_db)):
+async def get_recommendations(entity_id: Optional[int] = None, db: Session = Depends(get_db)):
     """
-    Get AI-powered carbon reduction recommendations
+    Get carbon reduction recommendations (precomputed unless the LLM is enabled)
     """
+    stored = _load_insights(db, entity_id)
     try:
-        # Get current emissions data
-        emissions_data = await get_current_emissions_data(db)
-        
-        # Get LLM recommendations
-        recommendations = await llm_service.generate_recommendations(emissions_data)
+        if llm_service.enabled:
+            emissions_data = await get_current_emissions_data(db, entity_id)
+            recommendations = await llm_service.generate_recommendations(emissions_data)
+        else:
+            recommendations = stored["recommendations"]
         
         return {
             "success": True,
             "data": recommendations,
-            "timestamp": "2024-01-15T10:30:00Z"
+            "timestamp": stored["computed_at"]
         }
         
     except Exception as e:
@@ -88,21 +133,22 @@ async def get_recommendations(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Recommendations failed: {str(e)}")
 
 @router.get("/risk-assessment")
-async def get_risk_assessment(db: Session = Depends(get_db)):
+async def get_risk_assessment(entity_id: Optional[int] = None, db: Session = Depends(get_db)):
     """
-    Get AI-powered risk assessment
+    Get risk assessment (precomputed unless the LLM is enabled)
     """
+    stored = _load_insights(db, entity_id)
     try:
-        # Get current emissions data
-        emissions_data = await get_current_emissions_data(db)
-        
-        # Get LLM risk assessment
-        risk_assessment = await llm_service.assess_risks(emissions_data)
+        if llm_service.enabled:
+            emissions_data = await get_current_emissions_data(db, entity_id)
+            risk_assessment = await llm_service.assess_risks(emissions_data)
+        else:
+            risk_assessment = stored["risk_assessment"]
         
         return {
             "success": True,
             "data": risk_assessment,
-            "timestamp": "2024-01-15T10:30:00Z"
+            "timestamp": stored["computed_at"]
         }
         
     except Exception as e:
@@ -110,28 +156,30 @@ async def get_risk_assessment(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Risk assessment failed: {str(e)}")
 
 @router.get("/insights")
-async def get_all_insights(db: Session = Depends(get_db)):
+async def get_all_insights(entity_id: Optional[int] = None, db: Session = Depends(get_db)):
     """
-    Get all LLM insights in one call
+    Get all insights in one call
     """
+    stored = _load_insights(db, entity_id)
     try:
-        # Get current emissions data
-        emissions_data = await get_current_emissions_data(db)
+        emissions_data = await get_current_emissions_data(db, entity_id)
         
-        # Get all LLM insights
-        analysis = await llm_service.analyze_emissions_data(emissions_data)
-        recommendations = await llm_service.generate_recommendations(emissions_data)
-        risk_assessment = await llm_service.assess_risks(emissions_data)
+        if llm_service.enabled:
+            # Get all LLM insights concurrently
+            insights = await llm_service.gather_insights(emissions_data)
+        else:
+            insights = {**stored, "degraded": []}
         
         return {
             "success": True,
             "data": {
-                "executive_summary": analysis,
-                "recommendations": recommendations,
-                "risk_analysis": risk_assessment,
+                "executive_summary": insights["analysis"],
+                "recommendations": insights["recommendations"],
+                "risk_analysis": insights["risk_assessment"],
                 "performance_metrics": get_performance_metrics(emissions_data)
             },
-            "timestamp": "2024-01-15T10:30:00Z"
+            "degraded": insights["degraded"],
+            "timestamp": stored["computed_at"]
         }
         
     except Exception as e:
@@ -150,65 +198,33 @@ async def analyze_custom_data(data: Dict[str, Any]):
             if field not in data:
                 raise HTTPException(status_code=400, detail=f"Missing required field: {field}")
         
-        # Get LLM analysis for custom data
-        analysis = await llm_service.analyze_emissions_data(data)
-        recommendations = await llm_service.generate_recommendations(data)
-        risk_assessment = await llm_service.assess_risks(data)
+        # Get LLM analysis for custom data concurrently
+        insights = await llm_service.gather_insights(data)
         
         return {
             "success": True,
             "data": {
-                "analysis": analysis,
-                "recommendations": recommendations,
-                "risk_assessment": risk_assessment
+                "analysis": insights["analysis"],
+                "recommendations": insights["recommendations"],
+                "risk_assessment": insights["risk_assessment"]
             },
+            "degraded": insights["degraded"],
             "timestamp": "2024-01-15T10:30:00Z"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Custom data analysis failed: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-async def get_current_emissions_data(db: Session) -> Dict[str, Any]:
+async def get_current_emissions_data(db: Session, entity_id: Optional[int] = None) -> Dict[str, Any]:
     """
-    Get current emissions data from database
+    Get current emissions figures (the snapshot stored with the insights) and recent anomalies
     """
-    try:
-        # This would normally query the database
-        # For now, return mock data that matches our frontend
-        return {
-            "total_emissions": 2847,
-            "scope1": 1247,
-            "scope2": 1456,
-            "scope3": 144,
-            "eu_ets_allowances": 2800,
-            "eu_ets_used": 2847,
-            "eu_ets_price": 85.50,
-            "entities": [
-                {
-                    "name": "Acme Foods",
-                    "emissions": 2403,
-                    "facilities": ["Izmir Plant"]
-                },
-                {
-                    "name": "Acme Logistics", 
-                    "emissions": 444,
-                    "facilities": ["Ankara Hub"]
-                }
-            ]
-        }
-    except Exception as e:
-        logger.error(f"Failed to get emissions data: {e}")
-        # Return fallback data
-        return {
-            "total_emissions": 2847,
-            "scope1": 1247,
-            "scope2": 1456,
-            "scope3": 144,
-            "eu_ets_allowances": 2800,
-            "eu_ets_used": 2847,
-            "eu_ets_price": 85.50
-        }
+    data = dict(_load_insights(db, entity_id)["snapshot"])
+    data["anomalies"] = list_anomalies(db, entity_id=entity_id, limit=5)
+    return data
 
 def get_performance_metrics(emissions_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -247,44 +263,39 @@ def _build_context_prompt(context: str, data: Dict[str, Any]) -> str:
     Build context-specific prompt with actual data
     """
     if context == "overview":
-        total_emissions = data.get("total_tco2e", 0)
-        yoy_change = data.get("yoy_pct", 0)
-        return f"""Analyze this carbon emissions overview:
-- Total Emissions: {total_emissions} tCO₂e
-- Year-over-Year Change: {yoy_change}%
-Provide a concise summary and 3 actionable recommendations."""
+        return prompts.render(
+            "explain_overview",
+            total_emissions=data.get("total_tco2e", 0),
+            yoy_change=data.get("yoy_pct", 0)
+        )
 
     elif context == "emissions":
-        total_emissions = data.get("total_tco2e", 0)
-        scope1 = data.get("scopes", [{}])[0].get("tco2e", 0) if data.get("scopes") else 0
-        scope2 = data.get("scopes", [{}])[1].get("tco2e", 0) if len(data.get("scopes", [])) > 1 else 0
-        scope3 = data.get("scopes", [{}])[2].get("tco2e", 0) if len(data.get("scopes", [])) > 2 else 0
-        return f"""Analyze these emissions data:
-- Total: {total_emissions} tCO₂e
-- Scope 1: {scope1} tCO₂e
-- Scope 2: {scope2} tCO₂e  
-- Scope 3: {scope3} tCO₂e
-Provide insights and 3 specific actions to reduce emissions."""
+        scopes = data.get("scopes") or []
+        scope_values = [scopes[i].get("tco2e", 0) if len(scopes) > i else 0 for i in range(3)]
+        return prompts.render(
+            "explain_emissions",
+            total_emissions=data.get("total_tco2e", 0),
+            scope1=scope_values[0],
+            scope2=scope_values[1],
+            scope3=scope_values[2]
+        )
 
     elif context == "compliance":
-        overshoot = data.get("current_overshoot_tco2e", 0)
-        cost = data.get("ytd_cost_eur", 0)
-        return f"""Analyze EU ETS compliance status:
-- Overshoot: {overshoot} tCO₂e
-- Additional Cost: €{cost:,.0f}
-Provide compliance insights and 3 urgent actions."""
+        return prompts.render(
+            "explain_compliance",
+            overshoot=data.get("current_overshoot_tco2e", 0),
+            cost=f"{data.get('ytd_cost_eur', 0):,.0f}"
+        )
 
     elif context == "intensity":
-        current_intensity = data.get("current_intensity", 0)
-        yoy_change = data.get("yoy_change_pct", 0)
-        correlation = data.get("correlation", 0)
-        return f"""Analyze carbon intensity metrics:
-- Current Intensity: {current_intensity} tCO₂e/€M
-- YoY Change: {yoy_change}%
-- Revenue Correlation: {correlation}
-Provide intensity insights and 3 efficiency actions."""
+        return prompts.render(
+            "explain_intensity",
+            current_intensity=data.get("current_intensity", 0),
+            yoy_change=data.get("yoy_change_pct", 0),
+            correlation=data.get("correlation", 0)
+        )
 
-    return "Analyze this data and provide insights with 3 actionable recommendations."
+    return prompts.render("explain_generic")
 
 def _parse_llm_response(response: str, context: str) -> tuple[str, List[str]]:
     """
@@ -297,16 +308,11 @@ def _parse_llm_response(response: str, context: str) -> tuple[str, List[str]]:
         
         actions = []
         for line in lines[1:]:
-            if line.strip() and (line.startswith('-') or line.startswith('•') or line.startswith('*')):
-                action = line.strip().lstrip('-•* ').strip()
-                if action:
-                    actions.append(action)
-        
-        # Ensure we have exactly 3 actions
-        while len(actions) < 3:
-            actions.append(f"Review {context} data for optimization opportunities")
+            action = _parse_action_line(line)
+            if action:
+                actions.append(action)
         
-        return summary, actions[:3]
+        return summary, _pad_actions(actions, context)
         
     except Exception as e:
         logger.error(f"Failed to parse LLM response: {e}")
@@ -316,6 +322,68 @@ def _parse_llm_response(response: str, context: str) -> tuple[str, List[str]]:
             "Monitor progress regularly"
         ]
 
+def _parse_action_line(line: str) -> Optional[str]:
+    """Action text of a bullet line ('-', '•' or '*'), or None."""
+    if line.strip() and (line.startswith('-') or line.startswith('•') or line.startswith('*')):
+        return line.strip().lstrip('-•* ').strip() or None
+    return None
+
+def _pad_actions(actions: List[str], context: str) -> List[str]:
+    """Ensure we have exactly 3 actions"""
+    actions = list(actions)
+    while len(actions) < 3:
+        actions.append(f"Review {context} data for optimization opportunities")
+    return actions[:3]
+
+class _ExplainStreamParser:
+    """
+    Incremental version of `_parse_llm_response`.
+    
+    Text deltas are buffered into lines; the first line becomes the summary
+    and later bullet lines become actions as soon as they are complete.
+    """
+    
+    def __init__(self, context: str):
+        self.context = context
+        self.buffer = ""
+        self.started = False
+        self.summary: Optional[str] = None
+        self.actions: List[str] = []
+    
+    def feed(self, text: str) -> List[Tuple[str, Dict[str, Any]]]:
+        self.buffer += text
+        events = []
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            events.extend(self._line(line))
+        return events
+    
+    def close(self) -> Tuple[List[Tuple[str, Dict[str, Any]]], LLMExplainResponse]:
+        events = self._line(self.buffer) if self.buffer.strip() else []
+        self.buffer = ""
+        response = LLMExplainResponse(
+            summary=self.summary or "Analysis completed.",
+            actions=_pad_actions(self.actions, self.context)
+        )
+        return events, response
+    
+    def _line(self, line: str) -> List[Tuple[str, Dict[str, Any]]]:
+        # Leading blank lines are dropped, as `response.strip()` does
+        if not self.started:
+            if not line.strip():
+                return []
+            self.started = True
+            self.summary = line.strip()
+            return [("summary", {"summary": self.summary})]
+        action = _parse_action_line(line)
+        if action and len(self.actions) < 3:
+            self.actions.append(action)
+            return [("action", {"index": len(self.actions) - 1, "action": action})]
+        return []
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 def _get_fallback_response(context: str) -> LLMExplainResponse:
     """
     Get fallback response when LLM fails
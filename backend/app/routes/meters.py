@@ -0,0 +1,101 @@
+from datetime import date, datetime
+from typing import List
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from ..db.database import get_db
+from ..models.meter import Meter
+from ..models.org import Facility
+from ..schemas.meter import IngestResult, MeterAggregate, MeterCreate, MeterPeak, MeterRead, ReadingsIngest
+from ..services.meters import (
+    BLOCK_DTYPE,
+    daily_totals,
+    ingest_readings,
+    monthly_totals,
+    peak_reading,
+    regular_timestamps,
+    to_utc_minutes,
+)
+
+
+router = APIRouter(prefix="/meters", tags=["meters"])
+
+
+def _meter(db: Session, meter_id: int) -> Meter:
+    meter = db.get(Meter, meter_id)
+    if meter is None:
+        raise HTTPException(status_code=404, detail="Meter not found")
+    return meter
+
+
+@router.post("", response_model=MeterRead)
+def create_meter(payload: MeterCreate, db: Session = Depends(get_db)):
+    if not db.get(Facility, payload.facility_id):
+        raise HTTPException(status_code=404, detail="Facility not found")
+    if 1440 % payload.interval_minutes:
+        raise HTTPException(status_code=400, detail="interval_minutes must divide a day evenly")
+    obj = Meter(**payload.dict())
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+
+@router.get("", response_model=list[MeterRead])
+def list_meters(facility_id: int | None = None, db: Session = Depends(get_db)):
+    q = db.query(Meter)
+    if facility_id:
+        q = q.filter(Meter.facility_id == facility_id)
+    return q.all()
+
+
+@router.post("/{meter_id}/readings", response_model=IngestResult)
+def ingest(meter_id: int, payload: ReadingsIngest, db: Session = Depends(get_db)):
+    """Bulk ingest of a regular series (`start` + `values`) or of explicit `timestamps`."""
+    meter = _meter(db, meter_id)
+    if (payload.start is None) == (payload.timestamps is None):
+        raise HTTPException(status_code=400, detail="Provide either start or timestamps")
+    values = np.array([np.nan if v is None else v for v in payload.values], dtype=BLOCK_DTYPE)
+    if payload.start is not None:
+        timestamps = regular_timestamps(meter, payload.start, len(values))
+    else:
+        timestamps = to_utc_minutes(payload.timestamps)
+    try:
+        result = ingest_readings(db, meter, timestamps, values)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"meter_id": meter.id, **result}
+
+
+@router.post("/{meter_id}/readings/binary", response_model=IngestResult)
+async def ingest_binary(meter_id: int, request: Request, start: datetime, db: Session = Depends(get_db)):
+    """Bulk ingest of little-endian float32 readings (NaN = gap) at the meter interval from `start`."""
+    meter = await run_in_threadpool(_meter, db, meter_id)
+    body = await request.body()
+    if len(body) % 4:
+        raise HTTPException(status_code=400, detail="Body must be a whole number of float32 values")
+    values = np.frombuffer(body, dtype="<f4")
+    try:
+        # Block I/O and the commit are blocking: keep them off the event loop
+        result = await run_in_threadpool(ingest_readings, db, meter, regular_timestamps(meter, start, len(values)), values)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"meter_id": meter.id, **result}
+
+
+@router.get("/{meter_id}/daily", response_model=List[MeterAggregate])
+def get_daily(meter_id: int, start: date, end: date = Query(..., description="exclusive"), db: Session = Depends(get_db)):
+    return daily_totals(db, _meter(db, meter_id), start, end)
+
+
+@router.get("/{meter_id}/monthly", response_model=List[MeterAggregate])
+def get_monthly(meter_id: int, start: date, end: date = Query(..., description="exclusive"), db: Session = Depends(get_db)):
+    return monthly_totals(db, _meter(db, meter_id), start, end)
+
+
+@router.get("/{meter_id}/peak", response_model=MeterPeak)
+def get_peak(meter_id: int, start: date, end: date = Query(..., description="exclusive"), db: Session = Depends(get_db)):
+    return peak_reading(db, _meter(db, meter_id), start, end)
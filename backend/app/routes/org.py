@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, selectinload
 
 from ..db.database import get_db
 from ..models.org import Group, Entity, Facility
@@ -10,7 +11,10 @@ from ..schemas.org import (
     EntityRead,
     FacilityCreate,
     FacilityRead,
+    OrgRollupRow,
+    OrgTreeGroup,
 )
+from ..services.hierarchy import add_facility_paths, rebuild_closure, rollup_emissions
 
 
 router = APIRouter(prefix="/org", tags=["org"])
@@ -52,6 +56,8 @@ def create_facility(payload: FacilityCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Entity not found")
     obj = Facility(**payload.dict())
     db.add(obj)
+    db.flush()
+    add_facility_paths(db, obj)
     db.commit()
     db.refresh(obj)
     return obj
@@ -61,3 +67,61 @@ def create_facility(payload: FacilityCreate, db: Session = Depends(get_db)):
 def list_facilities(db: Session = Depends(get_db)):
     return db.query(Facility).all()
 
+
+
+@router.get("/tree", response_model=list[OrgTreeGroup])
+def get_tree(
+    group_id: int | None = Query(None, description="Only return this group's subtree"),
+    db: Session = Depends(get_db),
+):
+    """Full Group → Entity → Facility hierarchy, loaded with one query per level."""
+    q = db.query(Group).options(selectinload(Group.entities).selectinload(Entity.facilities)).order_by(Group.id)
+    if group_id is not None:
+        q = q.filter(Group.id == group_id)
+    groups = q.all()
+    if group_id is not None and not groups:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    tree = [
+        {
+            "id": g.id,
+            "name": g.name,
+            "entities": [
+                {
+                    "id": e.id,
+                    "name": e.name,
+                    "yearly_budget_tco2e": e.yearly_budget_tco2e or 0.0,
+                    "facilities": [{"id": f.id, "name": f.name} for f in e.facilities],
+                }
+                for e in g.entities
+            ],
+        }
+        for g in groups
+    ]
+    # Already plain JSON types; skip response_model re-validation of large trees
+    return JSONResponse(content=tree)
+
+
+@router.get("/rollup", response_model=list[OrgRollupRow])
+def get_rollup(
+    level: str = Query("entity", description="Hierarchy level to aggregate to: group, entity or facility"),
+    ids: str | None = Query(None, description="Comma-separated node IDs at that level"),
+    by_scope: bool = Query(False, description="Include totals per scope"),
+    db: Session = Depends(get_db),
+):
+    """Emissions rolled up along the Group → Entity → Facility hierarchy."""
+    node_ids = None
+    if ids:
+        try:
+            node_ids = [int(i.strip()) for i in ids.split(",") if i.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid node IDs format")
+    try:
+        return rollup_emissions(db, level, node_ids, by_scope=by_scope)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/closure/rebuild")
+def rebuild_org_closure(db: Session = Depends(get_db)):
+    return {"status": "ok", "paths": rebuild_closure(db)}
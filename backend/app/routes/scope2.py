@@ -0,0 +1,54 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..db.database import get_db
+from ..models.instrument import EnergyInstrument
+from ..models.org import Entity, Facility
+from ..schemas.scope2 import EnergyInstrumentCreate, EnergyInstrumentRead, Scope2Response
+from ..services.scope2 import calc_scope2
+
+
+router = APIRouter(prefix="/scope2", tags=["scope2"])
+
+
+@router.get("", response_model=Scope2Response)
+def get_scope2(
+    year: int = Query(..., ge=1900, le=2200),
+    entities: Optional[str] = Query(None, description="Comma-separated list of entity IDs"),
+    gwp_set: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Location- and market-based Scope 2 of metered electricity, per facility."""
+    try:
+        entity_list = [int(e) for e in entities.split(",") if e.strip()] if entities else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid entity IDs format. Use comma-separated integers.")
+    try:
+        return calc_scope2(db, year, entity_list, gwp_set=gwp_set)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/instruments", response_model=EnergyInstrumentRead)
+def create_instrument(payload: EnergyInstrumentCreate, db: Session = Depends(get_db)):
+    if not db.get(Entity, payload.entity_id):
+        raise HTTPException(status_code=404, detail="Entity not found")
+    if payload.facility_id is not None:
+        facility = db.get(Facility, payload.facility_id)
+        if facility is None or facility.entity_id != payload.entity_id:
+            raise HTTPException(status_code=404, detail="Facility not found for entity")
+    obj = EnergyInstrument(**payload.dict())
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+
+@router.get("/instruments", response_model=list[EnergyInstrumentRead])
+def list_instruments(entity_id: int | None = None, db: Session = Depends(get_db)):
+    q = db.query(EnergyInstrument)
+    if entity_id:
+        q = q.filter(EnergyInstrument.entity_id == entity_id)
+    return q.order_by(EnergyInstrument.valid_from).all()
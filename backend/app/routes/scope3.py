@@ -0,0 +1,54 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..db.database import get_db
+from ..models.purchase import FxRate
+from ..schemas.scope3 import FxRateIn, PurchaseCreate, SpendScope3Response
+from ..services.scope3 import calc_spend_scope3, ingest_purchases
+
+
+router = APIRouter(prefix="/scope3", tags=["scope3"])
+
+
+@router.post("/purchases")
+def add_purchases(payload: List[PurchaseCreate], db: Session = Depends(get_db)):
+    """Bulk insert of purchase ledger lines."""
+    try:
+        inserted = ingest_purchases(db, [p.dict() for p in payload])
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"status": "ok", "inserted": inserted}
+
+
+@router.put("/fx-rates")
+def put_fx_rates(payload: List[FxRateIn], db: Session = Depends(get_db)):
+    """Insert or replace annual FX rates into the EEIO base currency."""
+    for item in payload:
+        currency = item.currency.strip().upper()
+        rate = db.query(FxRate).filter(FxRate.currency == currency, FxRate.year == item.year).first()
+        if rate is None:
+            db.add(FxRate(currency=currency, year=item.year, rate=item.rate))
+        else:
+            rate.rate = item.rate
+    db.commit()
+    return {"status": "ok", "rates": len(payload)}
+
+
+@router.get("/spend", response_model=SpendScope3Response)
+def get_spend_scope3(
+    year: int = Query(..., ge=1900, le=2200),
+    entities: Optional[str] = Query(None, description="Comma-separated list of entity IDs"),
+    gwp_set: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Spend-based Scope 3 per entity and category, computed for all requested entities in one batch."""
+    try:
+        entity_list = [int(e) for e in entities.split(",") if e.strip()] if entities else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid entity IDs format. Use comma-separated integers.")
+    try:
+        return calc_spend_scope3(db, year, entity_list, gwp_set=gwp_set)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
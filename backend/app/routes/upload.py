@@ -1,26 +1,47 @@
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+import pandas as pd
+from fastapi import APIRouter, BackgroundTasks, Depends, File, UploadFile, HTTPException
 from sqlalchemy.orm import Session
 
 from ..db.database import get_db
 from ..models.org import Entity, Facility
 from ..models.activity import UploadedActivity
+from ..models.factors import EmissionFactor
+from ..services.anomaly import scan_in_background
+from ..services.calendar import resolve_period_ids
 from ..services.parser import parse_activity_file
+from ..services.units import convert_amounts
 
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
 
 @router.post("")
-async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_file(
+    background_tasks: BackgroundTasks, file: UploadFile = File(...), db: Session = Depends(get_db)
+):
     content = await file.read()
     df, missing = parse_activity_file(content, file.filename)
     if missing:
         raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
 
+    # Vectorized unit validation against the referenced factor's unit
+    factor_units = dict(db.query(EmissionFactor.code, EmissionFactor.unit).all())
+    codes = df["factor_code"].astype(str).str.strip()
+    matched = codes.isin(list(factor_units)).to_numpy()
+    _, unit_errors = convert_amounts(
+        pd.to_numeric(df.loc[matched, "amount"], errors="coerce").to_numpy(dtype=float),
+        df.loc[matched, "unit"].astype(str).tolist(),
+        codes[matched].map(factor_units).tolist(),
+    )
+    row_unit_errors = {df.index[matched][i]: msg for i, msg in unit_errors.items()}
+    period_ids = resolve_period_ids(db, df["period"].astype(str).str.strip().unique())
+
     inserted = 0
     errors: list[dict] = []
     for idx, row in df.iterrows():
         try:
+            if idx in row_unit_errors:
+                raise ValueError(row_unit_errors[idx])
             entity = db.query(Entity).filter(Entity.name == str(row["entity"]).strip()).first()
             facility = (
                 db.query(Facility)
@@ -38,6 +59,7 @@ async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db
                 amount=float(row["amount"]),
                 factor_code=str(row["factor_code"]).strip(),
                 period=str(row["period"]).strip(),
+                period_id=period_ids.get(str(row["period"]).strip()),
             )
             db.add(obj)
             inserted += 1
@@ -46,5 +68,14 @@ async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db
 
     db.commit()
 
-    return {"status": "ok", "inserted": inserted, "errors": errors, "total_rows": len(df)}
+    # Scored after the response; flags show up under /emissions/anomalies
+    background_tasks.add_task(scan_in_background, db.get_bind())
+
+    return {
+        "status": "ok",
+        "inserted": inserted,
+        "errors": errors,
+        "total_rows": len(df),
+        "anomaly_scan": "scheduled",
+    }
 
@@ -1,4 +1,4 @@
-from .org import GroupCreate, GroupRead, EntityCreate, EntityRead, FacilityCreate, FacilityRead
+from .org import GroupCreate, GroupRead, EntityCreate, EntityRead, FacilityCreate, FacilityRead, OrgRollupRow, OrgTreeGroup
 from .factors import EmissionFactorRead, GasGWPRead
 from .activity import UploadedActivityCreate, UploadedActivityRead
 from .emission import EmissionRecordRead
@@ -11,6 +11,8 @@ __all__ = [
     "EntityRead",
     "FacilityCreate",
     "FacilityRead",
+    "OrgRollupRow",
+    "OrgTreeGroup",
     "EmissionFactorRead",
     "GasGWPRead",
     "UploadedActivityCreate",
@@ -1,10 +1,20 @@
-from pydantic import BaseModel
+from datetime import date
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+MatchingMethod = Literal["fifo", "lowest_cost", "highest_cost"]
 
 
 class AllowanceAdjustRequest(BaseModel):
     entity_id: int
     delta_allowances: float
     note: str | None = None
+    # Positive adjustments open a lot; negative ones consume lots in `method` order
+    vintage: int | None = None
+    price_eur: float = Field(0.0, ge=0)
+    acquired_on: date | None = None
+    method: MatchingMethod = "fifo"
 
 
 class TransferRequest(BaseModel):
@@ -12,6 +22,14 @@ class TransferRequest(BaseModel):
     to_entity_id: int
     allowances: float
     note: str | None = None
+    method: MatchingMethod = "fifo"
+
+
+class SurrenderRequest(BaseModel):
+    entity_id: int
+    allowances: float = Field(..., gt=0)
+    method: MatchingMethod = "fifo"
+    note: str | None = None
 
 
 class AllowanceSummary(BaseModel):
@@ -20,3 +38,57 @@ class AllowanceSummary(BaseModel):
     committed: float
     available: float
 
+
+class AllowanceLotRead(BaseModel):
+    id: int
+    entity_id: int
+    vintage: Optional[int]
+    price_eur: float
+    acquired_on: date
+    quantity: float
+    remaining: float
+    source_lot_id: Optional[int]
+    note: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+
+class MatchedLot(BaseModel):
+    lot_id: int
+    vintage: Optional[int]
+    price_eur: float
+    acquired_on: date
+    quantity: float
+
+
+class VintageCost(BaseModel):
+    vintage: Optional[int]
+    allowances: float
+    cost_eur: float
+
+
+class SurrenderResponse(BaseModel):
+    ledger_id: int
+    entity_id: int
+    allowances: float
+    method: MatchingMethod
+    cost_eur: float
+    lots: List[MatchedLot]
+    by_vintage: List[VintageCost]
+    balance: AllowanceSummary
+
+
+class VintageHolding(BaseModel):
+    vintage: Optional[int]
+    allowances: float
+    book_value_eur: float
+    weighted_average_price_eur: float
+
+
+class EntityHolding(BaseModel):
+    entity_id: int
+    allowances: float
+    book_value_eur: float
+    weighted_average_price_eur: float
+    vintages: List[VintageHolding]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 
 class AllowancePoint(BaseModel):
@@ -18,4 +18,8 @@ class ComplianceResponse(BaseModel):
     current_overshoot_tco2e: float
     ytd_cost_eur: float
     allowances: List[AllowancePoint]
-    scenarios: List[PriceScenario]
\ No newline at end of file
+    scenarios: List[PriceScenario]
+    projected_year_end_tco2e: Optional[float] = None  # forecast, None without recorded data
+    projected_overshoot_tco2e: Optional[float] = None
+    projected_overshoot_low_tco2e: Optional[float] = None  # 90% prediction interval
+    projected_overshoot_high_tco2e: Optional[float] = None
\ No newline at end of file
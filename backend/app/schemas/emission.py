@@ -25,6 +25,10 @@ class EmissionRecordRead(BaseModel):
     id: int
     activity_id: int
     co2e_kg: float
+    co2_kg: float = 0.0
+    ch4_kg: float = 0.0
+    n2o_kg: float = 0.0
+    gwp_set: Optional[str] = None
     scope: str
     period: str
 
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
 
 
 class EmissionFactorRead(BaseModel):
@@ -7,7 +10,26 @@ class EmissionFactorRead(BaseModel):
     name: str
     unit: str
     factor_kgco2_per_unit: float
+    factor_kgch4_per_unit: float = 0.0
+    factor_kgn2o_per_unit: float = 0.0
+    scope_hint: str
+
+    class Config:
+        from_attributes = True
+
+
+class EmissionFactorVersionRead(BaseModel):
+    code: str
+    version: int
+    name: str
+    unit: str
+    factor_kgco2_per_unit: float
+    factor_kgch4_per_unit: float = 0.0
+    factor_kgn2o_per_unit: float = 0.0
     scope_hint: str
+    content_hash: str
+    source: Optional[str] = None
+    created_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -16,8 +38,35 @@ class EmissionFactorRead(BaseModel):
 class GasGWPRead(BaseModel):
     id: int
     gas: str
+    gwp_set: str
     gwp100: float
 
     class Config:
         from_attributes = True
 
+
+
+class FactorSuggestion(BaseModel):
+    code: str
+    name: str
+    unit: str
+    scope_hint: str
+    score: float
+
+
+class FactorSearchRow(BaseModel):
+    activity_name: str
+    unit: Optional[str] = None
+    factor_code: Optional[str] = None
+
+
+class FactorSearchBatch(BaseModel):
+    rows: List[FactorSearchRow]
+    k: int = Field(3, ge=1, le=20)
+
+
+class RowSuggestions(BaseModel):
+    row: int
+    activity_name: str
+    unit: Optional[str] = None
+    suggestions: List[FactorSuggestion]
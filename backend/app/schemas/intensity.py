@@ -8,7 +8,7 @@ Provides data structures for carbon intensity analysis including:
 """
 
 from datetime import date
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -16,6 +16,8 @@ class IntensitySeriesPoint(BaseModel):
     """Single data point in intensity time series"""
     date: date
     intensity: float  # tCO₂e per €M revenue
+    rolling_12m_intensity: Optional[float] = None  # trailing 12-month tCO₂e / €M
+    yoy_pct: Optional[float] = None  # change vs same month previous year
 
 
 class IntensityScatterPoint(BaseModel):
@@ -24,6 +26,7 @@ class IntensityScatterPoint(BaseModel):
     revenue_meur: float  # Revenue in millions EUR
     tco2e: float  # Total CO2e emissions
     intensity: float  # tCO₂e per €M revenue
+    trend_slope: Optional[float] = None  # Theil–Sen slope of monthly intensity per month
 
 
 class IntensityResponse(BaseModel):
@@ -32,4 +35,5 @@ class IntensityResponse(BaseModel):
     yoy_change_pct: float  # Year-over-year change percentage
     series: List[IntensitySeriesPoint]  # Time series data
     site_scatter: List[IntensityScatterPoint]  # Site-level scatter data
-    correlation: float  # Pearson correlation between revenue and emissions
\ No newline at end of file
+    correlation: float  # Pearson correlation between revenue and emissions
+    spearman_correlation: float = 0.0  # Rank correlation between revenue and emissions
\ No newline at end of file
@@ -0,0 +1,49 @@
+from datetime import date, datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class MeterCreate(BaseModel):
+    facility_id: int
+    name: str
+    unit: str = "kWh"
+    interval_minutes: int = Field(15, gt=0, le=1440)
+    factor_code: str = "electricity_TR"
+    scope: str = "Scope2"
+    grid_region: str = "TR"
+
+
+class MeterRead(MeterCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class ReadingsIngest(BaseModel):
+    """Either a regular series from `start` or explicit `timestamps`; null values are gaps."""
+
+    start: Optional[datetime] = None
+    timestamps: Optional[List[datetime]] = None
+    values: List[Optional[float]]
+
+
+class IngestResult(BaseModel):
+    meter_id: int
+    readings: int
+    months: List[date]
+    activities_synced: int
+
+
+class MeterAggregate(BaseModel):
+    start: date
+    total: float
+    readings: int
+    peak: Optional[float] = None
+
+
+class MeterPeak(BaseModel):
+    timestamp: Optional[datetime] = None
+    value: Optional[float] = None
+    demand_kw: Optional[float] = None
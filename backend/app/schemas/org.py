@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 from pydantic import BaseModel
 
 
@@ -48,3 +50,29 @@ class FacilityRead(FacilityBase):
     class Config:
         from_attributes = True
 
+
+
+class OrgRollupRow(BaseModel):
+    level: str
+    id: int
+    name: Optional[str] = None
+    co2e_kg: float
+    totals_by_scope: Optional[Dict[str, float]] = None
+
+
+class OrgTreeFacility(BaseModel):
+    id: int
+    name: str
+
+
+class OrgTreeEntity(BaseModel):
+    id: int
+    name: str
+    yearly_budget_tco2e: float = 0.0
+    facilities: List[OrgTreeFacility]
+
+
+class OrgTreeGroup(BaseModel):
+    id: int
+    name: str
+    entities: List[OrgTreeEntity]
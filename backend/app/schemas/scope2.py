@@ -0,0 +1,61 @@
+from datetime import date
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class EnergyInstrumentCreate(BaseModel):
+    entity_id: int
+    facility_id: Optional[int] = None
+    kind: str = Field(..., description="PPA, GO or REC")
+    valid_from: date
+    valid_to: date
+    capacity_kw: Optional[float] = Field(None, gt=0)
+    volume_kwh: Optional[float] = Field(None, gt=0)
+    factor_kgco2e_per_kwh: float = Field(0.0, ge=0)
+    note: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _check(self):
+        if (self.capacity_kw is None) == (self.volume_kwh is None):
+            raise ValueError("Provide exactly one of capacity_kw or volume_kwh")
+        if self.valid_to < self.valid_from:
+            raise ValueError("valid_to must not be before valid_from")
+        return self
+
+
+class EnergyInstrumentRead(EnergyInstrumentCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class Scope2Figures(BaseModel):
+    consumption_kwh: float
+    location_kgco2e: float
+    market_kgco2e: float
+    instrument_kwh: float
+    residual_kwh: float
+
+
+class Scope2Facility(Scope2Figures):
+    facility_id: int
+    facility: str
+    entity_id: int
+
+
+class InstrumentAllocation(BaseModel):
+    id: int
+    kind: str
+    allocated_kwh: float
+
+
+class Scope2Response(BaseModel):
+    year: int
+    hours: int
+    meters: int
+    totals: Scope2Figures
+    facilities: List[Scope2Facility]
+    instruments: List[InstrumentAllocation]
+    errors: List[dict]
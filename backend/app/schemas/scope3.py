@@ -0,0 +1,45 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class PurchaseCreate(BaseModel):
+    entity_id: int
+    facility_id: Optional[int] = None
+    period: str
+    sector: str
+    country: str = Field(..., description="ISO code of the supplier country")
+    currency: str
+    amount: float
+    category: Optional[str] = None
+    description: Optional[str] = None
+
+
+class FxRateIn(BaseModel):
+    currency: str
+    year: int
+    rate: float = Field(..., gt=0, description="Base currency units per unit of `currency`")
+
+
+class CategorySpend(BaseModel):
+    category: str
+    spend: float
+    co2e_kg: float
+
+
+class EntitySpendEmissions(BaseModel):
+    entity_id: int
+    spend: float  # in the model's base currency
+    co2e_kg: float
+    co2_kg: float
+    ch4_kg: float
+    n2o_kg: float
+    categories: List[CategorySpend]
+
+
+class SpendScope3Response(BaseModel):
+    year: int
+    base_currency: str
+    entities: List[EntitySpendEmissions]
+    unmatched: List[dict]
+    missing_fx: List[dict]
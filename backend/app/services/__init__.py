@@ -1,15 +1,25 @@
 from .parser import parse_activity_file
 from .calc import compute_emissions_for_activity, aggregate_emissions
+from .ghg import compute_gas_emissions, recalculate_activities, apply_gwp_set
 from .eu_ets import price_feed, financial_impact
-from .budget import perform_transfer, allowance_summary
+from .budget import perform_transfer, allowance_summary, acquire_allowances, surrender_allowances
+from .calendar import resolve_period_ids, backfill_period_ids, allocate_monthly
 
 __all__ = [
     "parse_activity_file",
     "compute_emissions_for_activity",
     "aggregate_emissions",
+    "compute_gas_emissions",
+    "recalculate_activities",
+    "apply_gwp_set",
     "price_feed",
     "financial_impact",
     "perform_transfer",
     "allowance_summary",
+    "acquire_allowances",
+    "surrender_allowances",
+    "resolve_period_ids",
+    "backfill_period_ids",
+    "allocate_monthly",
 ]
 
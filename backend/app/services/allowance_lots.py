@@ -0,0 +1,320 @@
+"""
+Allowance lots
+
+Every acquisition of allowances is a lot: vintage, acquisition price and
+quantity remaining. Surrenders and transfers consume an entity's open lots
+first-in-first-out (by acquisition date) or by cost, cheapest or dearest
+first. Matching pops lots off a heap for the chosen order. The heaps and
+the lot arrays form the entity's `LotBook`, which is cached under the
+entity's latest ledger and lot ids and kept warm across its own
+surrenders. A surrender therefore costs O(k log n) for k lots touched
+instead of reloading hundreds of thousands of lots. Weighted-average cost is
+aggregated in SQL over open lots, per entity and vintage.
+
+Ledger balances without lots (history before lots existed, or seed
+entries written straight to the ledger) are covered by an opening lot of
+unknown vintage at zero cost. It is created at start-up and again before
+matching, whenever needed.
+"""
+
+import heapq
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models.allowance import AllowanceLot, AllowanceLotMatch, EUETSAllowanceLedger
+from .cache import RevisionCache
+
+METHODS = ("fifo", "lowest_cost", "highest_cost")
+EPSILON = 1e-9  # remaining quantities below this count as exhausted
+OPENING_NOTE = "opening balance"
+
+_books = RevisionCache(maxsize=32)
+
+
+class LotBook:
+    """Open lots of one entity as parallel lists, with a heap per matching order built on first use."""
+
+    def __init__(self, rows: Sequence[Tuple[int, Optional[int], float, date, float]]):
+        """`rows` are (id, vintage, price_eur, acquired_on, remaining) tuples."""
+        self.ids: List[int] = []
+        self.vintages: List[Optional[int]] = []
+        self.prices: List[float] = []
+        self.acquired: List[date] = []
+        self.remaining: List[float] = []
+        self.heaps: Dict[str, list] = {}
+        self.bind = None  # engine the book was loaded from (see _fingerprint)
+        for row in rows:
+            self.add(*row)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def total(self) -> float:
+        return sum(self.remaining)
+
+    def _key(self, method: str, row: int) -> tuple:
+        # The lot id breaks ties, so rows are never compared
+        order = (self.acquired[row].toordinal(), self.ids[row], row)
+        if method == "lowest_cost":
+            return (self.prices[row], *order)
+        if method == "highest_cost":
+            return (-self.prices[row], *order)
+        return order
+
+    def add(self, lot_id: int, vintage: Optional[int], price_eur: float, acquired_on: date, remaining: float) -> None:
+        row = len(self.ids)
+        self.ids.append(lot_id)
+        self.vintages.append(vintage)
+        self.prices.append(float(price_eur))
+        self.acquired.append(acquired_on)
+        self.remaining.append(float(remaining))
+        for method, heap in self.heaps.items():
+            heapq.heappush(heap, self._key(method, row))
+
+    def take(self, quantity: float, method: str = "fifo") -> List[Tuple[int, float]]:
+        """
+        Consume `quantity` from the open lots in the given order.
+
+        Returns:
+            (row, quantity taken) per lot touched, in matching order
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown matching method: {method}. Use one of {', '.join(METHODS)}")
+        heap = self.heaps.get(method)
+        if heap is None:
+            heap = [self._key(method, row) for row in range(len(self.ids)) if self.remaining[row] > EPSILON]
+            heapq.heapify(heap)
+            self.heaps[method] = heap
+
+        taken: List[Tuple[int, float]] = []
+        left = float(quantity)
+        while left > EPSILON:
+            if not heap:
+                raise ValueError("insufficient allowance lots")
+            row = heap[0][-1]
+            available = self.remaining[row]
+            if available <= EPSILON:  # exhausted through another order's heap
+                heapq.heappop(heap)
+                continue
+            amount = min(available, left)
+            self.remaining[row] = available - amount if available - amount > EPSILON else 0.0
+            left -= amount
+            taken.append((row, amount))
+            if self.remaining[row] == 0.0:
+                heapq.heappop(heap)
+        return taken
+
+
+def _fingerprint(db: Session, entity_id: int) -> tuple:
+    """
+    Cache key of an entity's lots; two index seeks.
+
+    Lots only change together with a new ledger entry of the entity (or a
+    new lot), and neither table deletes rows, so the latest ids identify the
+    state. The engine is part of the key and the cached book holds on to it,
+    so a key can't be reused by another database while the book is cached.
+    """
+    bind = db.get_bind()
+    ledger_id = db.execute(
+        select(func.max(EUETSAllowanceLedger.id)).where(EUETSAllowanceLedger.entity_id == entity_id)
+    ).scalar()
+    lot_id = db.execute(select(func.max(AllowanceLot.id)).where(AllowanceLot.entity_id == entity_id)).scalar()
+    return (id(bind), entity_id, int(ledger_id or 0), int(lot_id or 0))
+
+
+def _load_book(db: Session, entity_id: int) -> LotBook:
+    rows = db.execute(
+        select(AllowanceLot.id, AllowanceLot.vintage, AllowanceLot.price_eur, AllowanceLot.acquired_on, AllowanceLot.remaining)
+        .where(AllowanceLot.entity_id == entity_id, AllowanceLot.remaining > EPSILON)
+        .order_by(AllowanceLot.id)
+    ).all()
+    return LotBook([tuple(r) for r in rows])
+
+
+@contextmanager
+def lot_book(db: Session, entity_id: int) -> Iterator[LotBook]:
+    """
+    The entity's book, checked out of the cache while lots are matched.
+
+    The caller commits inside the block; the book is cached again under the
+    new fingerprint afterwards. If the block raises, the book (which may
+    already be partly consumed) is dropped and reloaded next time.
+    """
+    book = _books.pop(_fingerprint(db, entity_id))
+    if book is None:
+        book = _load_book(db, entity_id)
+        book.bind = db.get_bind()
+    yield book
+    _books.set(_fingerprint(db, entity_id), book)
+
+
+def add_lot(
+    db: Session,
+    book: Optional[LotBook],
+    entity_id: int,
+    quantity: float,
+    vintage: Optional[int],
+    price_eur: float,
+    acquired_on: date,
+    note: Optional[str] = None,
+) -> AllowanceLot:
+    lot = AllowanceLot(
+        entity_id=entity_id,
+        vintage=vintage,
+        price_eur=price_eur,
+        acquired_on=acquired_on,
+        quantity=quantity,
+        remaining=quantity,
+        note=note,
+    )
+    db.add(lot)
+    db.flush()
+    if book is not None:
+        book.add(lot.id, vintage, price_eur, acquired_on, quantity)
+    return lot
+
+
+def cover_untracked_balance(db: Session, book: LotBook, entity_id: int, balance: float) -> Optional[AllowanceLot]:
+    """Opening lot for the part of a ledger balance that no lot accounts for."""
+    untracked = balance - book.total()
+    if untracked <= EPSILON:
+        return None
+    first = db.execute(
+        select(EUETSAllowanceLedger.created_at)
+        .where(EUETSAllowanceLedger.entity_id == entity_id)
+        .order_by(EUETSAllowanceLedger.created_at)
+        .limit(1)
+    ).scalar()
+    acquired_on = first.date() if first is not None else date.today()
+    return add_lot(db, book, entity_id, untracked, None, 0.0, acquired_on, OPENING_NOTE)
+
+
+def consume_lots(db: Session, book: LotBook, quantity: float, method: str, ledger_id: int) -> List[Dict]:
+    """
+    Match an outgoing ledger entry against the book's lots and write the result.
+
+    Returns:
+        One dict per lot consumed, with its vintage, price and the quantity taken
+    """
+    taken = book.take(quantity, method)
+    if not taken:
+        return []
+    db.execute(update(AllowanceLot), [{"id": book.ids[row], "remaining": book.remaining[row]} for row, _ in taken])
+    db.execute(
+        insert(AllowanceLotMatch),
+        [{"ledger_id": ledger_id, "lot_id": book.ids[row], "quantity": amount} for row, amount in taken],
+    )
+    return [
+        {
+            "lot_id": book.ids[row],
+            "vintage": book.vintages[row],
+            "price_eur": book.prices[row],
+            "acquired_on": book.acquired[row],
+            "quantity": amount,
+        }
+        for row, amount in taken
+    ]
+
+
+def carry_lots(db: Session, entity_id: int, matched: List[Dict], note: Optional[str] = None) -> None:
+    """Continue consumed lots at a receiving entity with the same vintage, price and acquisition date."""
+    if not matched:
+        return
+    db.execute(
+        insert(AllowanceLot),
+        [
+            {
+                "entity_id": entity_id,
+                "vintage": m["vintage"],
+                "price_eur": m["price_eur"],
+                "acquired_on": m["acquired_on"],
+                "quantity": m["quantity"],
+                "remaining": m["quantity"],
+                "source_lot_id": m["lot_id"],
+                "note": note,
+            }
+            for m in matched
+        ],
+    )
+
+
+def by_vintage(matched: List[Dict]) -> List[Dict]:
+    """Quantity and acquisition cost of matched lots per vintage."""
+    out: Dict[Optional[int], Dict] = {}
+    for m in matched:
+        item = out.setdefault(m["vintage"], {"vintage": m["vintage"], "allowances": 0.0, "cost_eur": 0.0})
+        item["allowances"] += m["quantity"]
+        item["cost_eur"] += m["quantity"] * m["price_eur"]
+    return sorted(out.values(), key=lambda v: (v["vintage"] is not None, v["vintage"] or 0))
+
+
+def weighted_average_cost(db: Session, entity_ids: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Weighted-average acquisition cost of the open lots of every entity (optionally a subset).
+
+    Returns:
+        Per entity: allowances held, book value, weighted-average price and
+        the same figures per vintage
+    """
+    q = (
+        select(
+            AllowanceLot.entity_id,
+            AllowanceLot.vintage,
+            func.sum(AllowanceLot.remaining),
+            func.sum(AllowanceLot.remaining * AllowanceLot.price_eur),
+        )
+        .where(AllowanceLot.remaining > EPSILON)
+        .group_by(AllowanceLot.entity_id, AllowanceLot.vintage)
+        .order_by(AllowanceLot.entity_id, AllowanceLot.vintage)
+    )
+    if entity_ids:
+        q = q.where(AllowanceLot.entity_id.in_(entity_ids))
+
+    entities: Dict[int, Dict] = {}
+    for entity_id, vintage, held, value in db.execute(q).all():
+        entry = entities.setdefault(
+            entity_id, {"entity_id": entity_id, "allowances": 0.0, "book_value_eur": 0.0, "vintages": []}
+        )
+        entry["allowances"] += held
+        entry["book_value_eur"] += value
+        entry["vintages"].append(
+            {"vintage": vintage, "allowances": held, "book_value_eur": value, "weighted_average_price_eur": value / held}
+        )
+    for entry in entities.values():
+        entry["weighted_average_price_eur"] = entry["book_value_eur"] / entry["allowances"]
+    return list(entities.values())
+
+
+def backfill_opening_lots(db: Session) -> int:
+    """Opening lots for ledger balances not covered by lots; returns the number of lots created."""
+    ledger = db.execute(
+        select(
+            EUETSAllowanceLedger.entity_id,
+            func.sum(EUETSAllowanceLedger.delta_allowances),
+            func.min(EUETSAllowanceLedger.created_at),
+        ).group_by(EUETSAllowanceLedger.entity_id)
+    ).all()
+    tracked = dict(
+        db.execute(select(AllowanceLot.entity_id, func.sum(AllowanceLot.remaining)).group_by(AllowanceLot.entity_id)).all()
+    )
+    lots = []
+    for entity_id, balance, first in ledger:
+        untracked = float(balance or 0.0) - float(tracked.get(entity_id) or 0.0)
+        if untracked > EPSILON:
+            lots.append({
+                "entity_id": entity_id,
+                "vintage": None,
+                "price_eur": 0.0,
+                "acquired_on": first.date() if first is not None else date.today(),
+                "quantity": untracked,
+                "remaining": untracked,
+                "note": OPENING_NOTE,
+            })
+    if lots:
+        db.execute(insert(AllowanceLot), lots)
+    db.commit()
+    return len(lots)
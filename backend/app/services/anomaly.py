@@ -0,0 +1,499 @@
+"""
+Anomaly detection for ingested activity data
+
+Amounts are scored as monthly amounts in the unit of their emission factor:
+each row is converted to the factor's unit and divided by the number of
+months its period covers. Every (facility, factor_code) series keeps running
+count/mean/M2 statistics twice: over the whole series (month 0) and per
+calendar month for monthly rows (months 1-12), so a winter gas bill is
+compared with earlier winters rather than with the summer.
+
+New activities are scored in id-ordered chunks against the calendar-month
+stream (z-score) once it has enough history, otherwise against the whole
+series, and for series without any history against the other rows of the
+same chunk (robust MAD z-score). Non-anomalous rows are then merged into the
+running statistics, so no run ever rescans the full history. Rows whose
+amount is updated in place are flagged `needs_rescore`; the next run rebuilds
+only their series and scores them again.
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert, inspect, select, text, tuple_, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.activity import UploadedActivity
+from ..models.anomaly import ActivityAnomaly, ActivitySeriesStats, AnomalyScanState
+from ..models.factors import EmissionFactor
+from .factor_library import IN_CHUNK
+from .periods import month_index, parse_period
+from .units import convert_amounts
+
+MAD_SCALE = 0.6745  # makes MAD-based z-scores comparable to normal z-scores
+MIN_STD_FRACTION = 0.05  # std floor relative to the mean, avoids flagging tiny wiggles in flat series
+
+
+def grouped_median(groups: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Median of `values` within each group id (0..n_groups-1) using one lexsort."""
+    medians = np.full(n_groups, np.nan)
+    if values.size == 0:
+        return medians
+    order = np.lexsort((values, groups))
+    sorted_groups, sorted_values = groups[order], values[order]
+    counts = np.bincount(sorted_groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    lo = starts + (counts - 1) // 2
+    hi = starts + counts // 2
+    medians[present] = (sorted_values[lo[present]] + sorted_values[hi[present]]) / 2
+    return medians
+
+
+def score_batch(
+    groups: np.ndarray,
+    amounts: np.ndarray,
+    hist_count: np.ndarray,
+    hist_mean: np.ndarray,
+    hist_m2: np.ndarray,
+    min_history: int = 3,
+) -> Dict[str, np.ndarray]:
+    """
+    Score a batch of observations against their series.
+
+    Args:
+        groups: Series id of each observation (0..n_series-1)
+        amounts: Observed amounts
+        hist_count, hist_mean, hist_m2: Running statistics per series
+
+    Returns:
+        Dict with score, expected and method ("zscore"/"mad"/"") per observation;
+        score is NaN when the series has too little data to judge
+    """
+    n_series = len(hist_count)
+    score = np.full(amounts.shape, np.nan)
+    expected = np.full(amounts.shape, np.nan)
+    method = np.full(amounts.shape, "", dtype=object)
+
+    # Series with history: classic z-score against the running mean/std
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(np.where(hist_count > 1, hist_m2 / (hist_count - 1), 0.0))
+    std = np.maximum(std, MIN_STD_FRACTION * np.abs(hist_mean))
+    has_history = (hist_count >= min_history) & (std > 0)
+    use_z = has_history[groups]
+    score[use_z] = (amounts[use_z] - hist_mean[groups[use_z]]) / std[groups[use_z]]
+    expected[use_z] = hist_mean[groups[use_z]]
+    method[use_z] = "zscore"
+
+    # Series without history: robust z-score within the batch
+    batch_count = np.bincount(groups, minlength=n_series)
+    use_mad = ~use_z & (batch_count[groups] >= min_history)
+    if use_mad.any():
+        med = grouped_median(groups, amounts, n_series)
+        deviation = np.abs(amounts - med[groups])
+        mad = grouped_median(groups, deviation, n_series)
+        mad = np.maximum(mad, MIN_STD_FRACTION * np.abs(med))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            robust = MAD_SCALE * (amounts - med[groups]) / mad[groups]
+        valid = use_mad & (mad[groups] > 0)
+        score[valid] = robust[valid]
+        expected[valid] = med[groups[valid]]
+        method[valid] = "mad"
+
+    return {"score": score, "expected": expected, "method": method}
+
+
+def merge_stats(
+    groups: np.ndarray,
+    amounts: np.ndarray,
+    count: np.ndarray,
+    mean: np.ndarray,
+    m2: np.ndarray,
+):
+    """Merge batch observations into running statistics (Chan et al. parallel update)."""
+    n_series = len(count)
+    nb = np.bincount(groups, minlength=n_series).astype(float)
+    sums = np.bincount(groups, weights=amounts, minlength=n_series)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mb = np.where(nb > 0, sums / nb, 0.0)
+    m2b = np.bincount(groups, weights=(amounts - mb[groups]) ** 2, minlength=n_series)
+
+    total = count + nb
+    delta = mb - mean
+    with np.errstate(divide="ignore", invalid="ignore"):
+        new_mean = np.where(total > 0, mean + delta * nb / total, 0.0)
+        new_m2 = m2 + m2b + np.where(total > 0, delta**2 * count * nb / total, 0.0)
+    return total.astype(int), new_mean, new_m2
+
+
+def _scan_state(db: Session) -> AnomalyScanState:
+    state = db.get(AnomalyScanState, 1)
+    if state is None:
+        state = AnomalyScanState(id=1, last_activity_id=0)
+        db.add(state)
+        db.flush()
+    return state
+
+
+_COLUMNS = (
+    UploadedActivity.id,
+    UploadedActivity.facility_id,
+    UploadedActivity.factor_code,
+    UploadedActivity.period,
+    UploadedActivity.unit,
+    UploadedActivity.amount,
+)
+
+SeriesKey = Tuple[int, str, int]  # (facility_id, factor_code, month); month 0 is the whole series
+
+
+def _monthly_amounts(db: Session, rows: Sequence) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Monthly amount in the factor's unit of each activity row, the multiplier
+    that produced it from the row's amount, and the row's calendar month.
+
+    The month is 1-12 for monthly periods and 0 for longer ones. Rows with an
+    unknown factor, an incompatible unit or an unparseable period get NaN.
+    """
+    codes = sorted({r.factor_code for r in rows})
+    factor_units: Dict[str, str] = {}
+    for lo in range(0, len(codes), IN_CHUNK):
+        factor_units.update(
+            db.query(EmissionFactor.code, EmissionFactor.unit)
+            .filter(EmissionFactor.code.in_(codes[lo : lo + IN_CHUNK]))
+            .all()
+        )
+    unit_pairs: Dict[Tuple[str, str], int] = {}
+    pair_of_row = np.fromiter(
+        (unit_pairs.setdefault((r.unit, r.factor_code), len(unit_pairs)) for r in rows), dtype=np.int64, count=len(rows)
+    )
+    pair_multipliers, _ = convert_amounts(
+        np.ones(len(unit_pairs)), [u for u, _ in unit_pairs], [factor_units.get(c, "?") for _, c in unit_pairs]
+    )
+    multipliers = pair_multipliers[pair_of_row]
+
+    periods: Dict[str, Tuple[float, int]] = {}
+    for label in {r.period for r in rows}:
+        try:
+            start, end = parse_period(label)
+        except ValueError:
+            periods[label] = (np.nan, 0)
+            continue
+        n_months = month_index(end) - month_index(start) + 1
+        periods[label] = (float(n_months), start.month if n_months == 1 else 0)
+
+    spans = np.fromiter((periods[r.period][0] for r in rows), dtype=float, count=len(rows))
+    months = np.fromiter((periods[r.period][1] for r in rows), dtype=np.int64, count=len(rows))
+    amounts = np.fromiter((r.amount or 0.0 for r in rows), dtype=float, count=len(rows))
+    scale = multipliers / spans
+    return amounts * scale, scale, months
+
+
+def _load_stats(db: Session, keys: List[SeriesKey]) -> Dict[SeriesKey, ActivitySeriesStats]:
+    wanted = set(keys)
+    facility_ids = sorted({k[0] for k in keys})
+    existing = {}
+    for lo in range(0, len(facility_ids), IN_CHUNK):
+        for s in db.query(ActivitySeriesStats).filter(ActivitySeriesStats.facility_id.in_(facility_ids[lo : lo + IN_CHUNK])):
+            key = (s.facility_id, s.factor_code, s.month)
+            if key in wanted:
+                existing[key] = s
+    return existing
+
+
+def _store_stats(db: Session, keys: List[SeriesKey], existing: Dict, count, mean, m2) -> None:
+    for i, key in enumerate(keys):
+        stats = existing.get(key)
+        if stats is None:
+            db.add(
+                ActivitySeriesStats(
+                    facility_id=key[0],
+                    factor_code=key[1],
+                    month=key[2],
+                    count=int(count[i]),
+                    mean=float(mean[i]),
+                    m2=float(m2[i]),
+                )
+            )
+        else:
+            stats.count, stats.mean, stats.m2 = int(count[i]), float(mean[i]), float(m2[i])
+
+
+def _score_rows(db: Session, rows: Sequence, threshold: float, min_history: int) -> int:
+    """
+    Score rows against their calendar-month stream, falling back to the whole series; returns rows flagged.
+
+    Non-anomalous rows are then added to the running statistics.
+    """
+    values, scale, months = _monthly_amounts(db, rows)
+    valid = np.flatnonzero(np.isfinite(values))
+    if valid.size == 0:
+        return 0
+
+    row_keys = [(rows[i].facility_id, rows[i].factor_code) for i in valid.tolist()]
+    series_keys = sorted({(*k, 0) for k in row_keys})
+    month_keys = sorted({(*k, int(months[i])) for k, i in zip(row_keys, valid.tolist()) if months[i]})
+    keys = series_keys + month_keys
+    index = {k: i for i, k in enumerate(keys)}
+    series_groups = np.fromiter((index[(*k, 0)] for k in row_keys), dtype=np.int64, count=valid.size)
+    month_groups = np.fromiter(
+        (index.get((*k, int(months[i])), -1) for k, i in zip(row_keys, valid.tolist())), dtype=np.int64, count=valid.size
+    )
+    amounts = values[valid]
+
+    existing = _load_stats(db, keys)
+    count = np.array([existing[k].count if k in existing else 0 for k in keys], dtype=float)
+    mean = np.array([existing[k].mean if k in existing else 0.0 for k in keys])
+    m2 = np.array([existing[k].m2 if k in existing else 0.0 for k in keys])
+
+    result = score_batch(series_groups, amounts, count, mean, m2, min_history=min_history)
+    seasonal = month_groups >= 0
+    if seasonal.any():
+        by_month = score_batch(month_groups[seasonal], amounts[seasonal], count, mean, m2, min_history=min_history)
+        use = np.isfinite(by_month["score"])
+        judged = np.flatnonzero(seasonal)[use]
+        for name in ("score", "expected", "method"):
+            result[name][judged] = by_month[name][use]
+    is_anomaly = np.abs(np.nan_to_num(result["score"])) > threshold
+
+    hits = np.flatnonzero(is_anomaly)
+    if hits.size:
+        db.execute(
+            insert(ActivityAnomaly),
+            [
+                {
+                    "activity_id": rows[i].id,
+                    "facility_id": rows[i].facility_id,
+                    "factor_code": rows[i].factor_code,
+                    "period": rows[i].period,
+                    "amount": float(rows[i].amount),
+                    # Expected monthly amount back in the row's own unit and period length
+                    "expected": float(result["expected"][j] / scale[i]),
+                    "score": float(result["score"][j]),
+                    "method": result["method"][j],
+                }
+                for j, i in zip(hits.tolist(), valid[hits].tolist())
+            ],
+        )
+
+    # Anomalies stay out of the baseline so one bad upload cannot shift it
+    keep = ~is_anomaly
+    count, mean, m2 = merge_stats(series_groups[keep], amounts[keep], count, mean, m2)
+    keep_month = keep & seasonal
+    count, mean, m2 = merge_stats(month_groups[keep_month], amounts[keep_month], count, mean, m2)
+    _store_stats(db, keys, existing, count, mean, m2)
+    return int(hits.size)
+
+
+def detect_new_anomalies(
+    db: Session,
+    threshold: float = 4.0,
+    min_history: int = 3,
+    chunk_size: int = 100_000,
+) -> Dict[str, int]:
+    """
+    Score every activity added since the last run, and every row updated in place, and persist flags.
+
+    New activities are read in id order in chunks of `chunk_size`; each chunk
+    is scored, merged into the series statistics and committed together with
+    the advanced watermark, so an interrupted run resumes where it stopped.
+    Rows flagged `needs_rescore` lose their old flags, their series are
+    rebuilt without them, and they are scored and merged like new rows.
+    """
+    state = _scan_state(db)
+    scanned = flagged = 0
+
+    while True:
+        rows = db.execute(
+            select(*_COLUMNS)
+            .where(UploadedActivity.id > state.last_activity_id)
+            .order_by(UploadedActivity.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        flagged += _score_rows(db, rows, threshold, min_history)
+        state.last_activity_id = rows[-1].id
+        db.commit()
+        scanned += len(rows)
+
+    while True:
+        rows = db.execute(
+            select(*_COLUMNS)
+            .where(UploadedActivity.needs_rescore.is_(True), UploadedActivity.id <= state.last_activity_id)
+            .order_by(UploadedActivity.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        ids = [r.id for r in rows]
+        for lo in range(0, len(ids), IN_CHUNK):
+            db.execute(delete(ActivityAnomaly).where(ActivityAnomaly.activity_id.in_(ids[lo : lo + IN_CHUNK])))
+        # The statistics still hold the old amounts: rebuild the touched series without these rows
+        _rebuild_series(db, sorted({(r.facility_id, r.factor_code) for r in rows}), state.last_activity_id, chunk_size)
+        for lo in range(0, len(ids), IN_CHUNK):
+            chunk = ids[lo : lo + IN_CHUNK]
+            db.execute(update(UploadedActivity).where(UploadedActivity.id.in_(chunk)).values(needs_rescore=False))
+        flagged += _score_rows(db, rows, threshold, min_history)
+        db.commit()
+        scanned += len(rows)
+
+    return {"scanned": scanned, "flagged": flagged}
+
+
+_scan_lock = threading.Lock()
+
+
+def scan_in_background(bind) -> None:
+    """Background-task entry point: run `detect_new_anomalies` on its own session, one scan at a time."""
+    with _scan_lock, Session(bind=bind) as db:
+        detect_new_anomalies(db, threshold=settings.anomaly_z_threshold, min_history=settings.anomaly_min_history)
+
+
+def _series_stats(db: Session, conditions: Sequence, chunk_size: int) -> Tuple[List[SeriesKey], np.ndarray, np.ndarray, np.ndarray]:
+    """Statistics of every stream over the activities matching `conditions`, read in id-ordered chunks."""
+    series: Dict[Tuple[int, str], int] = {}
+    series_ids: List[np.ndarray] = []
+    months: List[np.ndarray] = []
+    amounts: List[np.ndarray] = []
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(*_COLUMNS)
+            .where(UploadedActivity.id > last_id, *conditions)
+            .order_by(UploadedActivity.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        values, _, row_months = _monthly_amounts(db, rows)
+        valid = np.flatnonzero(np.isfinite(values))
+        series_ids.append(np.fromiter(
+            (series.setdefault((rows[i].facility_id, rows[i].factor_code), len(series)) for i in valid.tolist()),
+            dtype=np.int64,
+            count=valid.size,
+        ))
+        months.append(row_months[valid])
+        amounts.append(values[valid])
+
+    # Stream code series * 13 + month: the whole series (0) for every row, its calendar month for monthly rows
+    series_id = np.concatenate(series_ids) if series_ids else np.zeros(0, dtype=np.int64)
+    month = np.concatenate(months) if months else np.zeros(0, dtype=np.int64)
+    value = np.concatenate(amounts) if amounts else np.zeros(0)
+    seasonal = month > 0
+    streams, groups = np.unique(
+        np.concatenate((series_id * 13, series_id[seasonal] * 13 + month[seasonal])), return_inverse=True
+    )
+    series_keys = list(series)
+    keys = [(*series_keys[code // 13], code % 13) for code in streams.tolist()]
+    zeros = np.zeros(len(keys))
+    count, mean, m2 = merge_stats(groups, np.concatenate((value, value[seasonal])), zeros, zeros, zeros)
+    return keys, count, mean, m2
+
+
+def _insert_stats(db: Session, keys: List[SeriesKey], count, mean, m2) -> None:
+    if keys:
+        db.execute(
+            insert(ActivitySeriesStats),
+            [
+                {"facility_id": k[0], "factor_code": k[1], "month": k[2], "count": int(count[i]),
+                 "mean": float(mean[i]), "m2": float(m2[i])}
+                for i, k in enumerate(keys)
+            ],
+        )
+
+
+def _rebuild_series(db: Session, pairs: List[Tuple[int, str]], watermark: int, chunk_size: int) -> None:
+    """
+    Recompute the statistics of the given (facility_id, factor_code) series from
+    their scanned, unflagged rows, leaving out rows still waiting for a rescore.
+    """
+    flagged = select(ActivityAnomaly.activity_id)
+    for lo in range(0, len(pairs), IN_CHUNK):
+        chunk = pairs[lo : lo + IN_CHUNK]
+        db.execute(
+            delete(ActivitySeriesStats)
+            .where(tuple_(ActivitySeriesStats.facility_id, ActivitySeriesStats.factor_code).in_(chunk))
+            .execution_options(synchronize_session="fetch")
+        )
+        _insert_stats(db, *_series_stats(db, (
+            UploadedActivity.id <= watermark,
+            UploadedActivity.id.not_in(flagged),
+            UploadedActivity.needs_rescore.is_(False),
+            tuple_(UploadedActivity.facility_id, UploadedActivity.factor_code).in_(chunk),
+        ), chunk_size))
+
+
+def rebuild_series_stats(db: Session, through_id: Optional[int] = None, chunk_size: int = 100_000) -> int:
+    """
+    Recompute the series statistics from every scanned activity, leaving flagged rows out.
+
+    `through_id` first moves the watermark there, marking all activities up
+    to it as scanned (used after a bulk load). Returns the number of series.
+    """
+    state = _scan_state(db)
+    if through_id is not None:
+        state.last_activity_id = through_id
+    keys, count, mean, m2 = _series_stats(
+        db,
+        (UploadedActivity.id <= state.last_activity_id, UploadedActivity.id.not_in(select(ActivityAnomaly.activity_id))),
+        chunk_size,
+    )
+    db.execute(delete(ActivitySeriesStats))
+    _insert_stats(db, keys, count, mean, m2)
+    db.commit()
+    return len(keys)
+
+
+def ensure_anomaly_columns(db: Session) -> None:
+    """
+    Upgrade anomaly tables created before calendar-month scoring.
+
+    Adds `needs_rescore` to activities and rebuilds the per-series statistics,
+    which were kept without a calendar month and on raw amounts.
+    """
+    inspector = inspect(db.connection())
+    table = UploadedActivity.__tablename__
+    if "needs_rescore" not in {c["name"] for c in inspector.get_columns(table)}:
+        db.execute(text(f"ALTER TABLE {table} ADD COLUMN needs_rescore BOOLEAN NOT NULL DEFAULT 0"))
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_needs_rescore ON {table} (needs_rescore)"))
+    stats = ActivitySeriesStats.__table__
+    if "month" not in {c["name"] for c in inspector.get_columns(stats.name)}:
+        db.execute(text(f"DROP TABLE {stats.name}"))
+        db.commit()
+        stats.create(bind=db.get_bind())
+        rebuild_series_stats(db)
+    db.commit()
+
+
+def list_anomalies(
+    db: Session,
+    entity_id: Optional[int] = None,
+    facility_id: Optional[int] = None,
+    limit: int = 100,
+) -> List[Dict]:
+    q = db.query(ActivityAnomaly, UploadedActivity.entity_id).join(
+        UploadedActivity, UploadedActivity.id == ActivityAnomaly.activity_id
+    )
+    if entity_id:
+        q = q.filter(UploadedActivity.entity_id == entity_id)
+    if facility_id:
+        q = q.filter(ActivityAnomaly.facility_id == facility_id)
+    rows = q.order_by(func.abs(ActivityAnomaly.score).desc()).limit(limit).all()
+    return [
+        {
+            "activity_id": a.activity_id,
+            "entity_id": entity,
+            "facility_id": a.facility_id,
+            "factor_code": a.factor_code,
+            "period": a.period,
+            "amount": a.amount,
+            "expected": a.expected,
+            "score": round(a.score, 2),
+            "method": a.method,
+        }
+        for a, entity in rows
+    ]
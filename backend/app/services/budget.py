@@ -1,7 +1,10 @@
+from datetime import date
+
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from ..models.allowance import EUETSAllowanceLedger, EUETSTransfer
+from .allowance_lots import add_lot, by_vintage, carry_lots, consume_lots, cover_untracked_balance, lot_book
 
 
 def _balance_query(db: Session, entity_id: int) -> float:
@@ -17,34 +20,97 @@ def allowance_summary(db: Session, entity_id: int) -> dict:
     return {"entity_id": entity_id, "owned": owned, "committed": 0.0, "available": owned}
 
 
-def perform_transfer(db: Session, from_entity_id: int, to_entity_id: int, allowances: float, note: str | None = None) -> dict:
+def acquire_allowances(
+    db: Session,
+    entity_id: int,
+    allowances: float,
+    vintage: int | None = None,
+    price_eur: float = 0.0,
+    acquired_on: date | None = None,
+    note: str | None = None,
+) -> dict:
     if allowances <= 0:
         raise ValueError("allowances must be positive")
+    if price_eur < 0:
+        raise ValueError("price_eur must not be negative")
+    acquired_on = acquired_on or date.today()
 
-    from_balance = _balance_query(db, from_entity_id)
-    if from_balance < allowances:
-        raise ValueError("insufficient allowances")
+    with lot_book(db, entity_id) as book:
+        db.add(EUETSAllowanceLedger(entity_id=entity_id, delta_allowances=allowances, note=note))
+        lot = add_lot(db, book, entity_id, allowances, vintage or acquired_on.year, price_eur, acquired_on, note)
+        db.commit()
+    return {"lot_id": lot.id, "balance": allowance_summary(db, entity_id)}
 
-    transfer = EUETSTransfer(
-        from_entity_id=from_entity_id,
-        to_entity_id=to_entity_id,
-        allowances=allowances,
-        note=note,
-    )
-    db.add(transfer)
+
+def _withdraw(db: Session, book, entity_id: int, allowances: float, method: str, note: str | None):
+    """Outgoing ledger entry matched against the entity's lots (caller commits)."""
+    if allowances <= 0:
+        raise ValueError("allowances must be positive")
+    balance = _balance_query(db, entity_id)
+    if balance < allowances:
+        raise ValueError("insufficient allowances")
+    cover_untracked_balance(db, book, entity_id, balance)
+    entry = EUETSAllowanceLedger(entity_id=entity_id, delta_allowances=-allowances, note=note)
+    db.add(entry)
     db.flush()
+    return entry, consume_lots(db, book, allowances, method, entry.id)
 
-    db.add_all(
-        [
-            EUETSAllowanceLedger(entity_id=from_entity_id, delta_allowances=-allowances, note=f"transfer_out:{transfer.id}"),
-            EUETSAllowanceLedger(entity_id=to_entity_id, delta_allowances=allowances, note=f"transfer_in:{transfer.id}"),
-        ]
-    )
-    db.commit()
+
+def surrender_allowances(
+    db: Session, entity_id: int, allowances: float, method: str = "fifo", note: str | None = None
+) -> dict:
+    """Surrender allowances, consuming lots in `method` order; reports the vintages and cost surrendered."""
+    try:
+        with lot_book(db, entity_id) as book:
+            entry, matched = _withdraw(db, book, entity_id, allowances, method, note or "surrender")
+            db.commit()
+    except ValueError:
+        db.rollback()
+        raise
+    return {
+        "ledger_id": entry.id,
+        "entity_id": entity_id,
+        "allowances": allowances,
+        "method": method,
+        "cost_eur": sum(m["quantity"] * m["price_eur"] for m in matched),
+        "lots": matched,
+        "by_vintage": by_vintage(matched),
+        "balance": allowance_summary(db, entity_id),
+    }
+
+
+def perform_transfer(
+    db: Session,
+    from_entity_id: int,
+    to_entity_id: int,
+    allowances: float,
+    note: str | None = None,
+    method: str = "fifo",
+) -> dict:
+    if allowances <= 0:
+        raise ValueError("allowances must be positive")
+
+    try:
+        with lot_book(db, from_entity_id) as book:
+            transfer = EUETSTransfer(
+                from_entity_id=from_entity_id,
+                to_entity_id=to_entity_id,
+                allowances=allowances,
+                note=note,
+            )
+            db.add(transfer)
+            db.flush()
+            _, matched = _withdraw(db, book, from_entity_id, allowances, method, f"transfer_out:{transfer.id}")
+            db.add(EUETSAllowanceLedger(entity_id=to_entity_id, delta_allowances=allowances, note=f"transfer_in:{transfer.id}"))
+            carry_lots(db, to_entity_id, matched, note=f"transfer_in:{transfer.id}")
+            db.commit()
+    except ValueError:
+        db.rollback()
+        raise
 
     return {
         "transfer_id": transfer.id,
         "from_balance": allowance_summary(db, from_entity_id),
         "to_balance": allowance_summary(db, to_entity_id),
+        "lots": matched,
     }
-
@@ -0,0 +1,117 @@
+"""
+Data revisions
+
+`data_revisions` keeps one row per table with a token that changes whenever
+the table is written. Session writes are tracked automatically:
+
+- ORM flushes (new, modified and deleted objects);
+- INSERT/UPDATE/DELETE statements run through `Session.execute`, such as
+  bulk inserts, bulk updates by primary key and `query.delete()`.
+
+Each write gets a fresh token for its tables in the same transaction, so the
+token commits or rolls back with the data and every worker sees it. Writers
+that bypass the Session (DBAPI executemany in db/synthetic.py) call
+`bump_revision` themselves.
+
+Tokens are random, not counters. A token from a rolled-back transaction or
+from another database never comes back, so a cache key built from tokens
+can't be reused for different data. `data_revision` reads tokens by primary
+key, so a cache lookup is one indexed query instead of an aggregate over
+each table.
+"""
+
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models.revision import DataRevision
+
+_revisions = DataRevision.__table__
+
+
+def _table_name(table) -> str:
+    if isinstance(table, str):
+        return table
+    return getattr(table, "__tablename__", None) or table.name
+
+
+def bump_revision(conn, *tables) -> None:
+    """
+    Give the tables a new revision token inside the caller's transaction.
+
+    Args:
+        conn: Session or Connection the data was written with
+        tables: Models, Table objects or table names
+    """
+    names = sorted({_table_name(t) for t in tables} - {_revisions.name})
+    if not names:
+        return
+    if isinstance(conn, Session):
+        conn = conn.connection()  # plain Connection: no ORM events for the token write itself
+    token = secrets.randbits(62)
+    result = conn.execute(update(_revisions).where(_revisions.c.name.in_(names)).values(revision=token))
+    if result.rowcount != len(names):
+        existing = set(conn.execute(select(_revisions.c.name).where(_revisions.c.name.in_(names))).scalars())
+        conn.execute(insert(_revisions), [{"name": n, "revision": token} for n in names if n not in existing])
+
+
+def data_revision(db: Session, *models) -> tuple:
+    """Revision tokens of the given tables (None for a table never written since tracking began)."""
+    names = [_table_name(m) for m in models]
+    tokens = dict(db.execute(select(_revisions.c.name, _revisions.c.revision).where(_revisions.c.name.in_(names))).all())
+    return tuple((name, tokens.get(name)) for name in names)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    written = {type(obj).__tablename__ for obj in (*session.new, *session.dirty, *session.deleted)}
+    if written:
+        bump_revision(session.connection(), *written)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(state):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return None
+    table = getattr(state.statement, "table", None)
+    name = getattr(table, "name", None)
+    if name is None or name == _revisions.name:
+        return None
+    result = state.invoke_statement()
+    bump_revision(state.session.connection(), name)
+    return result
+
+
+class RevisionCache:
+    """Thread-safe LRU cache; callers put the data revision into the key so new data misses."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
@@ -1,10 +1,20 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import date, timedelta
 import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from ..models.activity import UploadedActivity
+from ..models.allowance import EUETSAllowanceLedger
+from ..models.emission import EmissionRecord
+from ..models.period import Period
 from ..schemas.emission import EmissionPoint, ScopeShare, CategoryEmission, EmissionsResponse
 from ..schemas.compliance import AllowancePoint, PriceScenario, ComplianceResponse
-from ..schemas.intensity import IntensitySeriesPoint, IntensityScatterPoint, IntensityResponse
-from .mock_data import generate_time_series, get_mock_category_emissions
+from ..schemas.intensity import IntensityResponse
+from .calendar import overlaps
+from .hierarchy import descendant_facilities
+from .intensity import cached_intensity, dated_month_matrix
+from .periods import month_from_index, month_index
+from .forecast import project_year_end
 
 
 def compute_emissions_for_activity(amount: float, factor_kgco2_per_unit: float) -> float:
@@ -27,7 +37,12 @@ def aggregate_emissions(records: list[dict]) -> Dict[str, Any]:
     }
 
 
-def calc_emissions(date_range: tuple[date, date], entities: Optional[List[int]] = None, pareto: bool = False) -> EmissionsResponse:
+def calc_emissions(
+    date_range: tuple[date, date],
+    entities: Optional[List[int]] = None,
+    pareto: bool = False,
+    db: Optional[Session] = None,
+) -> EmissionsResponse:
     """
     Calculate emissions data for the given date range and entities.
     
@@ -35,26 +50,34 @@ def calc_emissions(date_range: tuple[date, date], entities: Optional[List[int]]
         date_range: Tuple of (start_date, end_date)
         entities: List of entity IDs to filter by (None for all)
         pareto: Whether to apply 80/20 Pareto analysis to categories
+        db: Database session
     
     Returns:
         EmissionsResponse with summary, series, scopes, and top_categories
     """
+    if db is None:
+        raise ValueError("calc_emissions requires a database session")
     start_date, end_date = date_range
+    first = month_index(start_date)
+    n_months = month_index(end_date) - first + 1
     
-    # Generate monthly series for 2025
-    monthly_series = _generate_monthly_series(start_date, end_date)
+    # Recorded emissions from the same months of the previous year to the end of the range
+    keys, matrix = _emission_matrix(db, entities, month_from_index(first - 12), end_date)
+    current = matrix[:, 12:]
     
-    # Calculate total emissions
-    total_tco2e = sum(point.tco2e for point in monthly_series)
+    monthly_series = [
+        EmissionPoint(date=month_from_index(first + i), tco2e=round(float(v), 2))
+        for i, v in enumerate(current.sum(axis=0))
+    ]
+    total_tco2e = float(current.sum())
     
     # Calculate YoY percentage (comparing to same period previous year)
-    yoy_pct = _calculate_yoy_percentage(monthly_series, start_date, end_date)
-    
-    # Calculate scope breakdown
-    scopes = _calculate_scope_breakdown(monthly_series)
+    prev_total = float(matrix[:, :n_months].sum())
+    yoy_pct = (total_tco2e - prev_total) / prev_total * 100 if prev_total > 0 else None
     
-    # Get top categories (with optional Pareto analysis)
-    top_categories = _get_top_categories(pareto)
+    by_row = current.sum(axis=1)
+    scopes = _calculate_scope_breakdown(keys, by_row)
+    top_categories = _get_top_categories(keys, by_row, pareto)
     
     return EmissionsResponse(
         summary={
@@ -67,84 +90,70 @@ def calc_emissions(date_range: tuple[date, date], entities: Optional[List[int]]
     )
 
 
-def _generate_monthly_series(start_date: date, end_date: date) -> List[EmissionPoint]:
-    """Generate monthly emission points for the date range."""
-    monthly_points = []
-    current_date = start_date.replace(day=1)  # Start from first day of month
-    
-    while current_date <= end_date:
-        # Generate realistic monthly emissions with seasonal variation
-        base_emissions = 200  # Base monthly emissions in tCO2e
-        seasonal_factor = 1 + 0.4 * abs((current_date.month - 6) / 6)  # Higher in summer/winter
-        monthly_variation = 0.8 + 0.4 * (hash(str(current_date)) % 100) / 100
-        
-        monthly_emissions = base_emissions * seasonal_factor * monthly_variation
-        
-        monthly_points.append(EmissionPoint(
-            date=current_date,
-            tco2e=round(monthly_emissions, 2)
-        ))
-        
-        # Move to next month
-        if current_date.month == 12:
-            current_date = current_date.replace(year=current_date.year + 1, month=1)
-        else:
-            current_date = current_date.replace(month=current_date.month + 1)
-    
-    return monthly_points
-
+def _emission_matrix(
+    db: Session, entities: Optional[List[int]], start_date: date, end_date: date
+) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+    """
+    Recorded tCO2e per (scope, activity) × month, from `start_date`'s month to `end_date`'s.
 
-def _calculate_yoy_percentage(monthly_series: List[EmissionPoint], start_date: date, end_date: date) -> Optional[float]:
-    """Calculate year-over-year percentage change."""
-    if not monthly_series:
-        return None
-    
-    # Calculate current period total
-    current_total = sum(point.tco2e for point in monthly_series)
-    
-    # Calculate previous year period total
-    prev_start = start_date.replace(year=start_date.year - 1)
-    prev_end = end_date.replace(year=end_date.year - 1)
-    prev_series = _generate_monthly_series(prev_start, prev_end)
-    prev_total = sum(point.tco2e for point in prev_series)
-    
-    if prev_total == 0:
-        return None
-    
-    return ((current_total - prev_total) / prev_total) * 100
+    Entities are resolved to their facilities through the org closure.
+    """
+    q = (
+        select(
+            EmissionRecord.scope,
+            UploadedActivity.activity_name,
+            Period.period_start,
+            Period.period_end,
+            func.sum(EmissionRecord.co2e_kg),
+        )
+        .join(UploadedActivity, UploadedActivity.id == EmissionRecord.activity_id)
+        .join(Period, Period.id == EmissionRecord.period_id)
+        .where(overlaps(start_date, end_date))
+        .group_by(EmissionRecord.scope, UploadedActivity.activity_name, Period.period_start, Period.period_end)
+    )
+    if entities:
+        q = q.where(UploadedActivity.facility_id.in_(descendant_facilities("entity", entities)))
+    rows = db.execute(q).all()
+
+    keys = sorted({(r[0], r[1]) for r in rows})
+    position = {key: i for i, key in enumerate(keys)}
+    first = month_index(start_date)
+    matrix = dated_month_matrix(
+        [(position[(r[0], r[1])], r[2], r[3], r[4]) for r in rows],
+        np.arange(len(keys)),
+        first,
+        month_index(end_date) - first + 1,
+    )
+    return keys, matrix / 1_000.0
 
 
-def _calculate_scope_breakdown(monthly_series: List[EmissionPoint]) -> List[ScopeShare]:
-    """Calculate scope breakdown from monthly series."""
-    total_emissions = sum(point.tco2e for point in monthly_series)
-    
-    # Typical scope distribution
-    scope_distribution = {
-        "Scope 1": 0.40,  # 40% Scope 1
-        "Scope 2": 0.35,  # 35% Scope 2
-        "Scope 3": 0.25   # 25% Scope 3
-    }
+def _calculate_scope_breakdown(keys: List[Tuple[str, str]], totals: np.ndarray) -> List[ScopeShare]:
+    """Calculate scope breakdown from per (scope, activity) totals."""
+    by_scope: Dict[str, float] = {}
+    for (scope, _), tco2e in zip(keys, totals):
+        by_scope[scope] = by_scope.get(scope, 0.0) + float(tco2e)
+    total_emissions = sum(by_scope.values())
     
-    scopes = []
-    for scope, percentage in scope_distribution.items():
-        scope_emissions = total_emissions * percentage
-        scopes.append(ScopeShare(
+    return [
+        ScopeShare(
             scope=scope,
-            tco2e=round(scope_emissions, 2),
-            pct=round(percentage * 100, 1)
-        ))
-    
-    return scopes
+            tco2e=round(tco2e, 2),
+            pct=round(tco2e / total_emissions * 100, 1) if total_emissions > 0 else 0.0
+        )
+        for scope, tco2e in sorted(by_scope.items())
+    ]
 
 
-def _get_top_categories(pareto: bool = False) -> List[CategoryEmission]:
-    """Get top emission categories, optionally applying Pareto analysis."""
-    categories = get_mock_category_emissions()
+def _get_top_categories(keys: List[Tuple[str, str]], totals: np.ndarray, pareto: bool = False) -> List[CategoryEmission]:
+    """Get top emission categories (recorded activities), optionally applying Pareto analysis."""
+    by_category: Dict[str, float] = {}
+    for (_, category), tco2e in zip(keys, totals):
+        by_category[category] = by_category.get(category, 0.0) + float(tco2e)
     
     # Convert to CategoryEmission format
     category_emissions = [
-        CategoryEmission(category=cat.category, tco2e=cat.emissions)
-        for cat in categories
+        CategoryEmission(category=category, tco2e=round(tco2e, 2))
+        for category, tco2e in by_category.items()
     ]
     
     if pareto:
@@ -198,7 +207,12 @@ def pareto_80_20_cutoff(categories: List[CategoryEmission]) -> bool:
     return False
 
 
-def calc_compliance(date_range: tuple[date, date], entities: Optional[List[int]] = None, price_inputs: List[float] = [90, 120, 150]) -> ComplianceResponse:
+def calc_compliance(
+    date_range: tuple[date, date],
+    entities: Optional[List[int]] = None,
+    price_inputs: List[float] = [90, 120, 150],
+    db: Optional[Session] = None,
+) -> ComplianceResponse:
     """
     Calculate compliance data for EU ETS allowances and cost scenarios.
     
@@ -206,6 +220,7 @@ def calc_compliance(date_range: tuple[date, date], entities: Optional[List[int]]
         date_range: Tuple of (start_date, end_date)
         entities: List of entity IDs to filter by (None for all)
         price_inputs: List of price scenarios in EUR per tCO2e
+        db: Database session
     
     Returns:
         ComplianceResponse with overshoot, costs, allowances, and scenarios
@@ -213,15 +228,14 @@ def calc_compliance(date_range: tuple[date, date], entities: Optional[List[int]]
     start_date, end_date = date_range
     
     # Calculate current emissions for the period
-    emissions_data = calc_emissions(date_range, entities, pareto=False)
+    emissions_data = calc_emissions(date_range, entities, pareto=False, db=db)
     current_emissions = emissions_data.summary["total_tco2e"]
     
-    # Mock EU ETS allowance data for 2025
-    # In reality, this would come from a database or external API
-    allocated_allowances = _get_mock_allowances(start_date.year)
+    # EU ETS allowances held by the selected entities (None without ledger entries)
+    allocated_allowances = _allowances_held(db, entities)
     
     # Calculate overshoot
-    current_overshoot = max(0, current_emissions - allocated_allowances)
+    current_overshoot = max(0, current_emissions - (allocated_allowances or 0.0))
     
     # Current EU ETS price (mock data - in reality from market API)
     current_price = 85.5  # EUR per tCO2e
@@ -229,53 +243,73 @@ def calc_compliance(date_range: tuple[date, date], entities: Optional[List[int]]
     # Calculate YTD cost
     ytd_cost = current_overshoot * current_price
     
+    # Year-end projection from the fitted entity/scope forecast (None without recorded data)
+    projection = project_year_end(db, start_date.year, entities)
+    
     # Generate allowance points for the year
-    allowances = _generate_allowance_points(start_date.year, allocated_allowances, current_emissions)
+    allowances = []
+    if allocated_allowances is not None:
+        monthly_actuals = _monthly_actuals(emissions_data.series, start_date.year, projection)
+        allowances = _generate_allowance_points(start_date.year, allocated_allowances, monthly_actuals)
     
     # Generate price scenarios
     scenarios = _generate_price_scenarios(price_inputs, current_overshoot)
     
-    return ComplianceResponse(
+    response = ComplianceResponse(
         current_overshoot_tco2e=round(current_overshoot, 2),
         ytd_cost_eur=round(ytd_cost, 2),
         allowances=allowances,
         scenarios=scenarios
     )
+    if projection:
+        response.projected_year_end_tco2e = round(projection["projected_tco2e"], 2)
+        if allocated_allowances is not None:
+            response.projected_overshoot_tco2e = round(max(0.0, projection["projected_tco2e"] - allocated_allowances), 2)
+            response.projected_overshoot_low_tco2e = round(max(0.0, projection["projected_low_tco2e"] - allocated_allowances), 2)
+            response.projected_overshoot_high_tco2e = round(max(0.0, projection["projected_high_tco2e"] - allocated_allowances), 2)
+    return response
 
 
-def _get_mock_allowances(year: int) -> float:
-    """Get mock EU ETS allowances for the given year."""
-    # Mock allowance data - in reality this would come from EU ETS registry
-    allowance_data = {
-        2025: 2500.0,  # 2500 tCO2e allocated for 2025
-        2024: 2600.0,  # 2600 tCO2e allocated for 2024
-        2023: 2700.0   # 2700 tCO2e allocated for 2023
-    }
-    return allowance_data.get(year, 2500.0)
+def _allowances_held(db: Session, entities: Optional[List[int]]) -> Optional[float]:
+    """Ledger balance of the selected entities (all when unfiltered); None when they have no entries."""
+    q = select(func.count(EUETSAllowanceLedger.id), func.sum(EUETSAllowanceLedger.delta_allowances))
+    if entities:
+        q = q.where(EUETSAllowanceLedger.entity_id.in_(entities))
+    count, balance = db.execute(q).one()
+    return float(balance or 0.0) if count else None
+
+
+def _monthly_actuals(series: List[EmissionPoint], year: int, projection: Optional[Dict[str, Any]]) -> List[float]:
+    """
+    Monthly emissions for the year: recorded months in the range, other months from the forecast.
+
+    Without a forecast only the recorded months are returned.
+    """
+    actuals: List[Optional[float]] = [None] * 12
+    for point in series:
+        if point.date.year == year:
+            actuals[point.date.month - 1] = point.tco2e
+    if not projection:
+        return [v for v in actuals if v is not None]
+    forecast = projection["monthly_tco2e"]
+    return [v if v is not None else forecast[i] for i, v in enumerate(actuals)]
 
 
-def _generate_allowance_points(year: int, allocated: float, actual: float) -> List[AllowancePoint]:
+def _generate_allowance_points(year: int, allocated: float, monthly_actuals: List[float]) -> List[AllowancePoint]:
     """Generate allowance points for the year showing monthly progression."""
     points = []
     
-    # Distribute actual emissions across months (simplified)
-    monthly_actual = actual / 12
+    # Allocated allowances are typically distributed evenly
+    monthly_allocated = allocated / 12
     
-    for month in range(1, 13):
-        # Allocated allowances are typically distributed evenly
-        monthly_allocated = allocated / 12
-        
-        # Actual emissions with some monthly variation
-        monthly_variation = 0.8 + 0.4 * (month % 3) / 3  # Some seasonal variation
-        monthly_actual_emissions = monthly_actual * monthly_variation
-        
+    for actual in monthly_actuals:
         # Calculate overshoot for this month
-        monthly_overshoot = max(0, monthly_actual_emissions - monthly_allocated)
+        monthly_overshoot = max(0, actual - monthly_allocated)
         
         points.append(AllowancePoint(
             year=year,
             allocated=round(monthly_allocated, 2),
-            actual=round(monthly_actual_emissions, 2),
+            actual=round(actual, 2),
             over_by=round(monthly_overshoot, 2)
         ))
     
@@ -296,147 +330,26 @@ def _generate_price_scenarios(price_inputs: List[float], overshoot: float) -> Li
     return scenarios
 
 
-def calc_intensity(date_range: tuple[date, date], entities: Optional[List[int]] = None) -> IntensityResponse:
+def calc_intensity(
+    date_range: tuple[date, date],
+    entities: Optional[List[int]] = None,
+    db: Optional[Session] = None,
+) -> IntensityResponse:
     """
     Calculate carbon intensity data for the given date range and entities.
     
+    Intensity is derived from recorded emissions and facility revenues; the
+    result is deterministic and cached until the underlying data changes.
+    
     Args:
         date_range: Tuple of (start_date, end_date)
         entities: List of entity IDs to filter by (None for all)
+        db: Database session
     
     Returns:
         IntensityResponse with intensity series, site scatter data, and correlation
     """
+    if db is None:
+        raise ValueError("calc_intensity requires a database session")
     start_date, end_date = date_range
-    
-    # Generate monthly intensity series
-    intensity_series = _generate_intensity_series(start_date, end_date)
-    
-    # Calculate current intensity (latest month)
-    current_intensity = intensity_series[-1].intensity if intensity_series else 0.0
-    
-    # Calculate YoY change
-    yoy_change_pct = _calculate_intensity_yoy_change(intensity_series)
-    
-    # Generate site-level scatter data
-    site_scatter = _generate_site_scatter_data()
-    
-    # Calculate correlation between revenue and emissions
-    correlation = _calculate_revenue_emissions_correlation(site_scatter)
-    
-    return IntensityResponse(
-        current_intensity=round(current_intensity, 2),
-        yoy_change_pct=round(yoy_change_pct, 1),
-        series=intensity_series,
-        site_scatter=site_scatter,
-        correlation=round(correlation, 3)
-    )
-
-
-def _generate_intensity_series(start_date: date, end_date: date) -> List[IntensitySeriesPoint]:
-    """Generate monthly intensity time series with realistic patterns"""
-    series = []
-    current_date = start_date.replace(day=1)  # Start from first day of month
-    
-    # Base intensity values (tCO₂e per €M revenue)
-    base_intensity = 2.5
-    seasonal_factor = 0.3
-    trend_factor = -0.02  # Slight downward trend
-    
-    month_count = 0
-    while current_date <= end_date:
-        # Add seasonal variation (higher in winter months)
-        seasonal = seasonal_factor * np.sin(2 * np.pi * current_date.month / 12)
-        
-        # Add trend
-        trend = trend_factor * month_count
-        
-        # Add some random noise
-        noise = np.random.normal(0, 0.1)
-        
-        intensity = base_intensity + seasonal + trend + noise
-        intensity = max(0.5, intensity)  # Ensure positive values
-        
-        series.append(IntensitySeriesPoint(
-            date=current_date,
-            intensity=round(intensity, 2)
-        ))
-        
-        # Move to next month
-        if current_date.month == 12:
-            current_date = current_date.replace(year=current_date.year + 1, month=1)
-        else:
-            current_date = current_date.replace(month=current_date.month + 1)
-        month_count += 1
-    
-    return series
-
-
-def _calculate_intensity_yoy_change(series: List[IntensitySeriesPoint]) -> float:
-    """Calculate year-over-year percentage change in intensity"""
-    if len(series) < 12:
-        return 0.0
-    
-    # Compare current year average to previous year average
-    current_year_avg = np.mean([point.intensity for point in series[-12:]])
-    previous_year_avg = np.mean([point.intensity for point in series[-24:-12]]) if len(series) >= 24 else current_year_avg
-    
-    if previous_year_avg == 0:
-        return 0.0
-    
-    return ((current_year_avg - previous_year_avg) / previous_year_avg) * 100
-
-
-def _generate_site_scatter_data() -> List[IntensityScatterPoint]:
-    """Generate site-level scatter plot data with realistic revenue-emissions relationship"""
-    sites = [
-        "Munich HQ", "Berlin Office", "Hamburg Plant", "Frankfurt Lab",
-        "Stuttgart Facility", "Cologne Branch", "Düsseldorf Center", "Leipzig Site"
-    ]
-    
-    scatter_data = []
-    base_revenue = 15.0  # Base revenue in M€
-    base_emissions = 35.0  # Base emissions in tCO₂e
-    
-    for i, site in enumerate(sites):
-        # Generate correlated revenue and emissions
-        revenue_factor = np.random.uniform(0.5, 2.0)
-        revenue_meur = base_revenue * revenue_factor
-        
-        # Emissions correlate with revenue but with some variation
-        correlation_factor = 0.8  # Strong positive correlation
-        noise_factor = np.random.uniform(0.7, 1.3)
-        emissions_factor = (correlation_factor * revenue_factor + (1 - correlation_factor)) * noise_factor
-        tco2e = base_emissions * emissions_factor
-        
-        # Calculate intensity
-        intensity = tco2e / revenue_meur if revenue_meur > 0 else 0
-        
-        scatter_data.append(IntensityScatterPoint(
-            site=site,
-            revenue_meur=round(revenue_meur, 1),
-            tco2e=round(tco2e, 1),
-            intensity=round(intensity, 2)
-        ))
-    
-    return scatter_data
-
-
-def _calculate_revenue_emissions_correlation(scatter_data: List[IntensityScatterPoint]) -> float:
-    """Calculate Pearson correlation between revenue and emissions"""
-    if len(scatter_data) < 2:
-        return 0.0
-    
-    revenues = [point.revenue_meur for point in scatter_data]
-    emissions = [point.tco2e for point in scatter_data]
-    
-    # Calculate Pearson correlation coefficient
-    correlation_matrix = np.corrcoef(revenues, emissions)
-    correlation = correlation_matrix[0, 1]
-    
-    # Handle NaN values
-    if np.isnan(correlation):
-        return 0.0
-    
-    return correlation
-
+    return cached_intensity(db, start_date, end_date, entities)
@@ -0,0 +1,178 @@
+"""
+Calendar service
+
+Maps free-form period labels onto the `periods` dimension and spreads
+period amounts over monthly buckets.
+
+Activity, emission, purchase and revenue rows carry an integer `period_id`. ORM
+inserts get it from the listeners below, bulk writers call
+`resolve_period_ids` once per batch, and `backfill_period_ids` fills rows written before the column
+existed. Date-range filters are predicates on `periods.period_start` and
+`periods.period_end` (see `overlaps`), so they are index range scans
+instead of label parsing. Unparseable labels keep a NULL key.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from sqlalchemy import and_, event, insert, inspect, select, text, update
+
+from ..models.activity import UploadedActivity
+from ..models.emission import EmissionRecord
+from ..models.period import Period
+from ..models.purchase import PurchaseRecord
+from ..models.revenue import FacilityRevenue
+from .periods import canonical_label, granularity, parse_period
+
+_EPOCH_MONTH = 1970 * 12  # month_index of numpy's datetime64[M] zero
+
+
+def _parsed(labels: Iterable[str]) -> Dict[str, tuple]:
+    """{label: (start, end, canonical label)} for the labels that parse."""
+    out = {}
+    for label in set(labels):
+        try:
+            start, end = parse_period(label)
+        except ValueError:
+            continue
+        out[label] = (start, end, canonical_label(start, end))
+    return out
+
+
+def resolve_period_ids(conn, labels: Iterable[str]) -> Dict[str, Optional[int]]:
+    """
+    Period keys of the given labels, creating missing periods.
+
+    Args:
+        conn: Session or Connection
+        labels: Period labels as written on activity rows
+
+    Returns:
+        {label: period id}, with None for labels that don't parse
+    """
+    labels = list(labels)
+    parsed = _parsed(labels)
+    wanted = {canon: (start, end) for start, end, canon in parsed.values()}
+    ids = {}
+    if wanted:
+        ids = dict(conn.execute(select(Period.label, Period.id).where(Period.label.in_(list(wanted)))).all())
+        missing = [canon for canon in wanted if canon not in ids]
+        if missing:
+            conn.execute(
+                insert(Period),
+                [
+                    {
+                        "label": canon,
+                        "period_start": wanted[canon][0],
+                        "period_end": wanted[canon][1],
+                        "granularity": granularity(*wanted[canon]),
+                    }
+                    for canon in missing
+                ],
+            )
+            ids.update(conn.execute(select(Period.label, Period.id).where(Period.label.in_(missing))).all())
+    return {label: ids.get(parsed[label][2]) if label in parsed else None for label in labels}
+
+
+@event.listens_for(UploadedActivity, "before_insert")
+@event.listens_for(EmissionRecord, "before_insert")
+@event.listens_for(PurchaseRecord, "before_insert")
+@event.listens_for(FacilityRevenue, "before_insert")
+def _assign_period_id(mapper, connection, target):
+    if target.period_id is None and target.period:
+        target.period_id = resolve_period_ids(connection, [target.period])[target.period]
+
+
+def _ensure_period_columns(db) -> None:
+    """Add `period_id` to activity/emission/revenue tables created before the column existed."""
+    inspector = inspect(db.connection())
+    for model in (UploadedActivity, EmissionRecord, FacilityRevenue):
+        table = model.__tablename__
+        if "period_id" not in {c["name"] for c in inspector.get_columns(table)}:
+            db.execute(text(f"ALTER TABLE {table} ADD COLUMN period_id INTEGER REFERENCES periods(id)"))
+            db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_period_id ON {table} (period_id)"))
+    db.commit()
+
+
+def backfill_period_ids(db) -> int:
+    """Set `period_id` on activity/emission/revenue rows that lack it; returns the number of rows updated."""
+    _ensure_period_columns(db)
+    updated = 0
+    for model in (UploadedActivity, EmissionRecord, FacilityRevenue):
+        labels = db.execute(select(model.period).where(model.period_id.is_(None)).distinct()).scalars().all()
+        for label, period_id in resolve_period_ids(db, labels).items():
+            if period_id is not None:
+                table = model.__table__
+                result = db.execute(
+                    update(table).where(table.c.period_id.is_(None), table.c.period == label).values(period_id=period_id)
+                )
+                updated += result.rowcount or 0
+    db.commit()
+    return updated
+
+
+def overlaps(start: date, end: date):
+    """Predicate on `Period` for periods intersecting [start, end]; served by the range index."""
+    return and_(Period.period_start <= end, Period.period_end >= start)
+
+
+def month_weights(
+    starts: np.ndarray, ends: np.ndarray, first_month: int, n_months: int, basis: str = "days"
+) -> np.ndarray:
+    """
+    Share of each period that falls into each month of a grid.
+
+    Args:
+        starts, ends: datetime64[D]-compatible arrays of inclusive period bounds
+        first_month: month_index of the first grid month
+        n_months: Grid length
+        basis: "days" weights months by the days they share with the period;
+            "months" gives every touched calendar month an equal share
+
+    Returns:
+        (len(starts), n_months) weights. A row sums to 1 when the period lies
+        inside the grid; shares outside the grid are dropped.
+    """
+    starts = np.asarray(starts, dtype="datetime64[D]")
+    ends = np.asarray(ends, dtype="datetime64[D]")
+    edges = (np.arange(first_month, first_month + n_months + 1) - _EPOCH_MONTH).astype("datetime64[M]").astype(
+        "datetime64[D]"
+    )
+    if basis == "days":
+        lo = np.maximum(starts[:, None], edges[None, :-1])
+        hi = np.minimum(ends[:, None] + 1, edges[None, 1:])
+        overlap = np.clip((hi - lo).astype(np.int64), 0, None)
+        total = (ends - starts).astype(np.int64) + 1
+        return overlap / total[:, None]
+    if basis == "months":
+        first = starts.astype("datetime64[M]").astype(np.int64) + _EPOCH_MONTH
+        last = ends.astype("datetime64[M]").astype(np.int64) + _EPOCH_MONTH
+        grid = np.arange(first_month, first_month + n_months)
+        inside = (grid[None, :] >= first[:, None]) & (grid[None, :] <= last[:, None])
+        return inside / (last - first + 1)[:, None]
+    raise ValueError(f"Unknown allocation basis: {basis}")
+
+
+def allocate_monthly(
+    rows: np.ndarray,
+    values: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    n_rows: int,
+    first_month: int,
+    n_months: int,
+    basis: str = "days",
+) -> np.ndarray:
+    """
+    Pro-rata allocation of period amounts onto an (n_rows, n_months) monthly matrix.
+
+    `rows[i]` is the output row of amount `values[i]` covering starts[i]..ends[i].
+    """
+    matrix = np.zeros((n_rows, n_months))
+    if len(values) == 0 or n_months <= 0:
+        return matrix
+    weights = month_weights(starts, ends, first_month, n_months, basis)
+    np.add.at(matrix, np.asarray(rows, dtype=np.int64), weights * np.asarray(values, dtype=float)[:, None])
+    return matrix
+
@@ -0,0 +1,165 @@
+"""
+EEIO factor store
+
+An environmentally-extended input-output model maps spend on a product
+(sector classification code + country of origin) to kg of each gas per
+unit of the model's base currency. Models cover thousands of sector-country
+rows, and most gases are zero for most rows, so the matrix is kept in CSR
+form as plain `.npy` arrays under `EEIO_PATH`:
+
+    meta.json     base_currency, price_year, gases, products [[sector, country], ...]
+    indptr.npy    int64, len(products) + 1
+    indices.npy   int32 gas column of every stored value
+    data.npy      float64 kg per base currency unit
+
+The arrays are memory-mapped once per process and reloaded when meta.json
+changes. Spend is multiplied with the matrix as a sparse-sparse product,
+so a batch over every entity is a handful of vector operations.
+
+Build a store from a CSV with columns sector, country, gas, kg_per_unit:
+
+    cd backend && python -m app.services.eeio factors.csv --out ./eeio --currency EUR --price-year 2022
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+FALLBACK_COUNTRY = "ROW"  # rest-of-world row used when a country has no specific factors
+
+_loaded: Dict[str, tuple] = {}
+
+
+class EEIOModel:
+    """Read-only CSR view of a stored EEIO matrix (products x gases)."""
+
+    def __init__(self, meta: dict, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.base_currency = meta["base_currency"]
+        self.price_year = meta.get("price_year")
+        self.gases: List[str] = list(meta["gases"])
+        self.products: List[Tuple[str, str]] = [tuple(p) for p in meta["products"]]
+        self.index = {p: i for i, p in enumerate(self.products)}
+        self.indptr, self.indices, self.data = indptr, indices, data
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.products), len(self.gases)
+
+    def product_index(self, sector: str, country: str) -> int:
+        """Row of a sector bought from a country, falling back to rest-of-world; -1 if the sector is unknown."""
+        row = self.index.get((sector, country))
+        if row is None:
+            row = self.index.get((sector, FALLBACK_COUNTRY), -1)
+        return row
+
+
+def write_eeio(
+    path: str, entries: Iterable[Tuple[str, str, str, float]], base_currency: str, price_year: Optional[int] = None
+) -> EEIOModel:
+    """Write (sector, country, gas, kg per base currency unit) entries as a CSR store; zeros are dropped."""
+    entries = [(str(s).strip(), str(c).strip().upper(), str(g).strip(), float(v)) for s, c, g, v in entries]
+    products = sorted({(s, c) for s, c, _, _ in entries})
+    gases = sorted({g for _, _, g, _ in entries})
+    p_index = {p: i for i, p in enumerate(products)}
+    g_index = {g: i for i, g in enumerate(gases)}
+    rows = np.array([p_index[(s, c)] for s, c, _, _ in entries], dtype=np.int64)
+    cols = np.array([g_index[g] for _, _, g, _ in entries], dtype=np.int32)
+    vals = np.array([v for *_, v in entries], dtype=np.float64)
+    keep = vals != 0
+    rows, cols, vals = rows[keep], cols[keep], vals[keep]
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(len(products) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(products)), out=indptr[1:])
+
+    target = Path(path)
+    target.mkdir(parents=True, exist_ok=True)
+    np.save(target / "indptr.npy", indptr)
+    np.save(target / "indices.npy", cols[order])
+    np.save(target / "data.npy", vals[order])
+    meta = {"base_currency": base_currency, "price_year": price_year, "gases": gases, "products": products}
+    # meta.json last: it is the cache key, so readers never pair new metadata with old arrays
+    tmp = target / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, target / "meta.json")
+    _loaded.pop(str(target.resolve()), None)
+    return load_eeio(path)
+
+
+def load_eeio(path: str) -> Optional[EEIOModel]:
+    """Memory-mapped model at `path`, or None when no store exists."""
+    target = Path(path)
+    meta_path = target / "meta.json"
+    if not meta_path.exists():
+        return None
+    key = str(target.resolve())
+    mtime = meta_path.stat().st_mtime_ns
+    cached = _loaded.get(key)
+    if cached is None or cached[0] != mtime:
+        model = EEIOModel(
+            json.loads(meta_path.read_text(encoding="utf-8")),
+            np.load(target / "indptr.npy", mmap_mode="r"),
+            np.load(target / "indices.npy", mmap_mode="r"),
+            np.load(target / "data.npy", mmap_mode="r"),
+        )
+        _loaded[key] = cached = (mtime, model)
+    return cached[1]
+
+
+def spend_emissions(model: EEIOModel, rows: np.ndarray, products: np.ndarray, spend: np.ndarray, n_rows: int) -> np.ndarray:
+    """
+    Sparse spend matrix times the EEIO matrix.
+
+    Args:
+        rows, products, spend: COO entries of an (n_rows, n_products) spend
+            matrix in base currency; duplicates add up
+        n_rows: Number of output rows (e.g. entities)
+
+    Returns:
+        (n_rows, n_gases) kg per gas
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    products = np.asarray(products, dtype=np.int64)
+    spend = np.asarray(spend, dtype=np.float64)
+    n_gases = len(model.gases)
+    if len(spend) == 0:
+        return np.zeros((n_rows, n_gases))
+    # Expand every spend entry into the stored values of its product row
+    starts = np.asarray(model.indptr[products])
+    counts = np.asarray(model.indptr[products + 1]) - starts
+    total = int(counts.sum())
+    entry = np.repeat(np.arange(len(spend)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = starts[entry] + offsets
+    cells = rows[entry] * n_gases + np.asarray(model.indices[positions], dtype=np.int64)
+    kg = spend[entry] * np.asarray(model.data[positions])
+    return np.bincount(cells, weights=kg, minlength=n_rows * n_gases).reshape(n_rows, n_gases)
+
+
+def read_csv_entries(path: str) -> List[Tuple[str, str, str, float]]:
+    with open(path, newline="", encoding="utf-8") as fh:
+        return [(r["sector"], r["country"], r["gas"], float(r["kg_per_unit"])) for r in csv.DictReader(fh)]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build an EEIO factor store from a CSV")
+    parser.add_argument("csv", help="columns: sector, country, gas, kg_per_unit")
+    parser.add_argument("--out", default=None, help="store directory (default: EEIO_PATH)")
+    parser.add_argument("--currency", required=True, help="base currency of the factors")
+    parser.add_argument("--price-year", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    model = write_eeio(args.out or settings.eeio_path, read_csv_entries(args.csv), args.currency, args.price_year)
+    print(f"{model.shape[0]} products x {model.shape[1]} gases, {len(model.data)} stored values")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Factor library import
+
+Loads a whole factor dataset (CSV/XLSX, one row per factor code) into
+`emission_factors`. Each row is reduced to a content hash and compared with
+the hash of the current factor, so only new and changed codes are written:
+new codes are bulk-inserted, changed codes bulk-updated in place, and every
+written state is recorded as a row of `emission_factor_versions`. Codes the
+file doesn't mention are left alone. Activities using a written code are
+flagged `needs_recalc`, so `POST /emissions/recalculate?dirty_only=true`
+recomputes just those.
+
+    cd backend && python -m app.services.factor_library factors.xlsx --source "DEFRA 2025" [--dry-run]
+"""
+
+import argparse
+import hashlib
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+from ..db.database import Base, SessionLocal, engine
+from ..models.activity import UploadedActivity
+from ..models.factors import EmissionFactor, EmissionFactorVersion
+from .parser import read_dataframe
+
+REQUIRED_COLUMNS = ["code", "name", "unit", "factor_kgco2_per_unit", "scope_hint"]
+GAS_COLUMNS = ["factor_kgco2_per_unit", "factor_kgch4_per_unit", "factor_kgn2o_per_unit"]
+CONTENT_COLUMNS = ["name", "unit", *GAS_COLUMNS, "scope_hint"]
+IN_CHUNK = 500  # bound parameters per IN (...) list
+
+
+def ensure_recalc_column(db: Session) -> None:
+    """Add `needs_recalc` to activity tables created before the column existed."""
+    inspector = inspect(db.connection())
+    table = UploadedActivity.__tablename__
+    if "needs_recalc" not in {c["name"] for c in inspector.get_columns(table)}:
+        db.execute(text(f"ALTER TABLE {table} ADD COLUMN needs_recalc BOOLEAN NOT NULL DEFAULT 0"))
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_needs_recalc ON {table} (needs_recalc)"))
+    db.commit()
+
+
+def read_factor_file(content: bytes, filename: str) -> Tuple[pd.DataFrame, List[str]]:
+    df = read_dataframe(content, filename)
+    return df, [c for c in REQUIRED_COLUMNS if c not in df.columns]
+
+
+def content_hashes(df: pd.DataFrame) -> np.ndarray:
+    """SHA-1 of the normalised content columns of every row (the code is the key, not content)."""
+    key = df["name"].astype(str)
+    for col in CONTENT_COLUMNS[1:]:
+        values = df[col].astype(float).map(repr) if col in GAS_COLUMNS else df[col].astype(str)
+        key = key + "\x1f" + values
+    return np.array([hashlib.sha1(k.encode("utf-8")).hexdigest() for k in key], dtype=object)
+
+
+def _normalise(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[Dict]]:
+    """Clean rows keyed by code, plus row-level errors for rows that were dropped."""
+    out = pd.DataFrame({c: df[c].astype(str).str.strip() for c in ("code", "name", "unit", "scope_hint")})
+    for col in GAS_COLUMNS:
+        out[col] = pd.to_numeric(df[col], errors="coerce").astype(float) if col in df.columns else 0.0
+    out[GAS_COLUMNS[1:]] = out[GAS_COLUMNS[1:]].fillna(0.0)
+
+    reasons = pd.Series("", index=out.index)
+    reasons[out[GAS_COLUMNS].lt(0).any(axis=1)] = "Negative factor"
+    reasons[out["factor_kgco2_per_unit"].isna()] = "factor_kgco2_per_unit is not a number"
+    blank = out[["code", "name", "unit", "scope_hint"]].isin(["", "nan", "None"]).any(axis=1)
+    reasons[blank] = "Missing code, name, unit or scope_hint"
+    reasons[out["code"].duplicated(keep=False) & (reasons == "")] = "Duplicate code in file"
+    bad = reasons != ""
+    errors = [{"row": int(i), "code": out.at[i, "code"], "error": reasons[i]} for i in out.index[bad]]
+    return out[~bad].reset_index(drop=True), errors
+
+
+def _chunks(values: Sequence, size: int = IN_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def import_factors(db: Session, df: pd.DataFrame, source: Optional[str] = None, dry_run: bool = False) -> Dict:
+    """
+    Diff a factor table against the library and write new/changed factors as new versions.
+
+    Returns:
+        Dict with inserted/updated/unchanged counts, the number of
+        activities flagged for recalculation and row-level errors
+    """
+    rows, errors = _normalise(df)
+    rows["hash"] = content_hashes(rows) if len(rows) else []
+
+    content = [getattr(EmissionFactor, c) for c in CONTENT_COLUMNS]
+    current = pd.DataFrame(
+        db.execute(select(EmissionFactor.id, EmissionFactor.code, *content)).all(),
+        columns=["id", "code", *CONTENT_COLUMNS],
+    )
+    current["hash"] = content_hashes(current) if len(current) else []
+    merged = rows.merge(current[["id", "code", "hash"]], on="code", how="left", suffixes=("", "_current"))
+    is_new = merged["id"].isna().to_numpy()
+    is_changed = ~is_new & (merged["hash"] != merged["hash_current"]).to_numpy()
+    new, changed = merged[is_new], merged[is_changed]
+    summary = {
+        "source": source,
+        "rows": len(df),
+        "inserted": int(is_new.sum()),
+        "updated": int(is_changed.sum()),
+        "unchanged": int((~is_new & ~is_changed).sum()),
+        "errors": errors,
+        "activities_marked": 0,
+        "dry_run": dry_run,
+    }
+    if dry_run or not (len(new) or len(changed)):
+        return summary
+
+    fields = ["code", *CONTENT_COLUMNS]
+    if len(new):
+        db.execute(insert(EmissionFactor), new[fields].to_dict("records"))
+    if len(changed):
+        db.execute(
+            update(EmissionFactor),
+            changed[fields].assign(id=changed["id"].astype(int)).to_dict("records"),
+        )
+
+    # Versions: a changed factor without history first gets its previous content as version 1
+    written = pd.concat([new, changed])
+    version = func.max(EmissionFactorVersion.version)
+    latest = dict(db.execute(select(EmissionFactorVersion.code, version).group_by(EmissionFactorVersion.code)).all())
+    ids = dict(db.execute(select(EmissionFactor.code, EmissionFactor.id)).all())
+    baseline = current[current["code"].isin(changed["code"]) & ~current["code"].isin(list(latest))]
+    latest.update(dict.fromkeys(baseline["code"], 1))
+    versions = [
+        {**r, "factor_id": ids[r["code"]], "version": 1, "source": None}
+        for r in baseline[fields].assign(content_hash=baseline["hash"]).to_dict("records")
+    ]
+    versions.extend(
+        {**r, "factor_id": ids[r["code"]], "version": latest.get(r["code"], 0) + 1, "source": source}
+        for r in written[fields].assign(content_hash=written["hash"]).to_dict("records")
+    )
+    db.execute(insert(EmissionFactorVersion), versions)
+
+    marked = 0
+    for codes in _chunks(written["code"].tolist()):
+        result = db.execute(
+            update(UploadedActivity)
+            .where(UploadedActivity.factor_code.in_(codes), UploadedActivity.needs_recalc.is_(False))
+            .values(needs_recalc=True)
+            .execution_options(synchronize_session=False)
+        )
+        marked += result.rowcount or 0
+    db.commit()
+    summary["activities_marked"] = int(marked)
+    return summary
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import a factor library (CSV/XLSX)")
+    parser.add_argument("file", type=Path)
+    parser.add_argument("--source", default=None, help="dataset name recorded on the new versions")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    df, missing = read_factor_file(args.file.read_bytes(), args.file.name)
+    if missing:
+        print(f"Missing columns: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    db = SessionLocal()
+    try:
+        ensure_recalc_column(db)
+        result = import_factors(db, df, source=args.source or args.file.name, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(
+        f"{result['inserted']} new, {result['updated']} changed, {result['unchanged']} unchanged, "
+        f"{len(result['errors'])} rejected; {result['activities_marked']} activities flagged for recalculation"
+    )
+    for err in result["errors"][:20]:
+        print(f"  row {err['row']} ({err['code']}): {err['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Emission-factor search
+
+Suggests factor codes for free-text activity names. Every factor is
+indexed under the word tokens and the character trigrams of its name and
+code. Trigrams make near misses like "electricty" or "diesel oil" still
+match. The index is an in-memory CSR inverted index (term -> doc ids,
+with idf / document-norm weights). A query scores every document in one
+`np.bincount` over the postings of its terms. Batches are scored in
+chunks of queries with the same trick, and results can be restricted to
+factors whose unit has the query unit's dimension (energy, volume, ...).
+
+The index is rebuilt when the factor table changes (see services/cache.py).
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models.factors import EmissionFactor
+from .cache import RevisionCache, data_revision
+from .units import normalize_unit, unit_dimension
+
+TOKEN_WEIGHT = 2.0  # a whole-word hit counts double relative to a trigram hit
+QUERY_CHUNK = 16  # queries scored per (chunk, docs) score matrix
+# Query trigrams shared by more than this share of a large library carry almost no signal but
+# dominate the postings to scan; they are skipped (word tokens are always kept)
+COMMON_TRIGRAM_SHARE = 0.05
+COMMON_TRIGRAM_MIN_DF = 500
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_index_cache = RevisionCache(maxsize=1)
+
+
+def tokens(text: str) -> List[str]:
+    return _TOKEN.findall(str(text).lower())
+
+
+@lru_cache(maxsize=65_536)
+def _trigrams(tok: str) -> Tuple[str, ...]:
+    padded = f" {tok} "
+    return tuple("g:" + padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def terms(text: str) -> Dict[str, float]:
+    """Index terms of a text with their weight: word tokens and padded character trigrams."""
+    out: Dict[str, float] = {}
+    for tok in tokens(text):
+        out["w:" + tok] = TOKEN_WEIGHT
+        for gram in _trigrams(tok):
+            out.setdefault(gram, 1.0)
+    return out
+
+
+def _dimension(unit: str) -> str:
+    """Unit dimension; units outside the conversion table only match themselves."""
+    return unit_dimension(unit) or f"unit:{normalize_unit(unit)}"
+
+
+class FactorIndex:
+    """Inverted index over factor names and codes."""
+
+    def __init__(self, factors: Sequence[Tuple[str, str, str, str]]):
+        """`factors` are (code, name, unit, scope_hint) tuples."""
+        self.factors = list(factors)
+        self.vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        term_weights: List[float] = []
+        for doc, (code, name, _, _) in enumerate(self.factors):
+            for term, weight in terms(f"{name} {code.replace('_', ' ')}").items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(doc)
+                term_weights.append(weight)
+
+        n_docs, n_terms = len(self.factors), len(self.vocab)
+        tid = np.array(term_ids, dtype=np.int64)
+        did = np.array(doc_ids, dtype=np.int32)
+        tw = np.array(term_weights)
+        df = np.bincount(tid, minlength=n_terms)
+        self.idf = np.log1p(n_docs / np.maximum(df, 1))
+        w = tw * self.idf[tid]
+        norm = np.sqrt(np.bincount(did, weights=w**2, minlength=n_docs))
+        order = np.argsort(tid, kind="stable")
+        self.indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(df, out=self.indptr[1:])
+        self.postings = did[order]
+        self.weights = (w / np.where(norm > 0, norm, 1.0)[did])[order]
+        self.skip = np.zeros(n_terms, dtype=bool)
+        grams = np.array([t.startswith("g:") for t in self.vocab], dtype=bool)
+        self.skip[grams] = df[grams] > max(COMMON_TRIGRAM_MIN_DF, COMMON_TRIGRAM_SHARE * n_docs)
+
+        dims = np.array([_dimension(f[2]) for f in self.factors], dtype=str)
+        self.dim_names, self.dims = np.unique(dims, return_inverse=True)
+
+    def __len__(self) -> int:
+        return len(self.factors)
+
+    def _dimension_id(self, unit: Optional[str]) -> int:
+        """Dimension id of a query unit; -1 for no filter, -2 when no factor shares the dimension."""
+        if not unit:
+            return -1
+        dim = _dimension(unit)
+        pos = int(np.searchsorted(self.dim_names, dim))
+        return pos if pos < len(self.dim_names) and self.dim_names[pos] == dim else -2
+
+    def search_many(self, queries: Sequence[Tuple[str, Optional[str]]], k: int = 5) -> List[List[Dict]]:
+        """Top-k factors for each (text, unit) query; the unit (if given) restricts results to its dimension."""
+        n_docs = len(self.factors)
+        results: List[List[Dict]] = []
+        for start in range(0, len(queries), QUERY_CHUNK):
+            chunk = queries[start : start + QUERY_CHUNK]
+            q_rows, q_terms, q_weights = [], [], []
+            for row, (text, _) in enumerate(chunk):
+                found = [(self.vocab[t], w) for t, w in terms(text).items() if t in self.vocab]
+                found = [(t, w) for t, w in found if not self.skip[t]] or found
+                if not found:
+                    continue
+                tids, tws = zip(*found)
+                qw = np.array(tws) * self.idf[list(tids)]
+                q_rows.extend([row] * len(tids))
+                q_terms.extend(tids)
+                q_weights.extend(qw / np.sqrt((qw**2).sum()))
+            scores = self._scores(np.array(q_rows, dtype=np.int64), np.array(q_terms, dtype=np.int64),
+                                  np.array(q_weights), len(chunk), n_docs)
+            dims = np.array([self._dimension_id(unit) for _, unit in chunk])
+            filtered = dims != -1
+            if filtered.any():
+                allowed = self.dims[None, :] == dims[filtered, None]
+                scores[filtered] = np.where(allowed, scores[filtered], 0.0)
+            results.extend(self._top(scores, k))
+        return results
+
+    def search(self, text: str, unit: Optional[str] = None, k: int = 5) -> List[Dict]:
+        return self.search_many([(text, unit)], k)[0]
+
+    def _scores(self, rows: np.ndarray, tids: np.ndarray, qweights: np.ndarray, n_rows: int, n_docs: int) -> np.ndarray:
+        """(n_rows, n_docs) cosine scores from the query-term COO entries."""
+        if len(tids) == 0 or n_docs == 0:
+            return np.zeros((n_rows, n_docs))
+        starts = self.indptr[tids]
+        counts = self.indptr[tids + 1] - starts
+        entry = np.repeat(np.arange(len(tids)), counts)
+        positions = starts[entry] + np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = rows[entry] * n_docs + self.postings[positions]
+        flat = np.bincount(cells, weights=qweights[entry] * self.weights[positions], minlength=n_rows * n_docs)
+        return flat.reshape(n_rows, n_docs)
+
+    def _top(self, scores: np.ndarray, k: int) -> List[List[Dict]]:
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(len(scores))]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        out = []
+        for row, cand in zip(scores, top):
+            cand = cand[np.argsort(-row[cand], kind="stable")]
+            out.append([
+                {
+                    "code": self.factors[d][0],
+                    "name": self.factors[d][1],
+                    "unit": self.factors[d][2],
+                    "scope_hint": self.factors[d][3],
+                    "score": round(float(row[d]), 4),
+                }
+                for d in cand
+                if row[d] > 0
+            ])
+        return out
+
+
+def get_index(db: Session) -> FactorIndex:
+    """Index of the current factor table, rebuilt when the table changes."""
+    key = data_revision(db, EmissionFactor)
+    index = _index_cache.get(key)
+    if index is None:
+        rows = db.query(EmissionFactor.code, EmissionFactor.name, EmissionFactor.unit, EmissionFactor.scope_hint)
+        index = FactorIndex([tuple(r) for r in rows.order_by(EmissionFactor.id).all()])
+        _index_cache.set(key, index)
+    return index
+
+
+def suggest_for_rows(db: Session, rows: Sequence[Dict], k: int = 3) -> List[Dict]:
+    """
+    Suggestions for activity rows whose factor code is unknown or whose unit doesn't fit the factor.
+
+    Args:
+        rows: Dicts with activity_name, unit and (optionally) factor_code, in upload order
+
+    Returns:
+        One entry per unmatched row with its position and suggestions
+    """
+    factor_units = dict(db.query(EmissionFactor.code, EmissionFactor.unit).all())
+    unmatched = []
+    for i, row in enumerate(rows):
+        code = str(row.get("factor_code") or "").strip()
+        unit = str(row.get("unit") or "").strip() or None
+        if code in factor_units and (unit is None or _dimension(unit) == _dimension(factor_units[code])):
+            continue
+        unmatched.append((i, str(row.get("activity_name") or ""), unit))
+    if not unmatched:
+        return []
+    # Identical name/unit pairs are scored once
+    distinct = list(dict.fromkeys((name, unit) for _, name, unit in unmatched))
+    found = dict(zip(distinct, get_index(db).search_many(distinct, k)))
+    return [
+        {"row": i, "activity_name": name, "unit": unit, "suggestions": found[(name, unit)]}
+        for i, name, unit in unmatched
+    ]
@@ -0,0 +1,227 @@
+"""
+Emissions forecasting engine
+
+Fits an additive Holt-Winters model to every (entity, scope) monthly series
+at once: the recursion runs over months while each step is a vectorized
+update of all series, so thousands of series fit in a single pass.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.activity import UploadedActivity
+from ..models.emission import EmissionRecord
+from ..models.period import Period
+from .cache import RevisionCache, data_revision
+from .intensity import dated_month_matrix
+from .periods import month_from_index, month_index
+
+SEASON = 12
+Z_90 = 1.6449  # two-sided 90% prediction interval
+
+_cache = RevisionCache(maxsize=32)
+
+
+def holt_winters(
+    values: np.ndarray,
+    horizon: int,
+    alpha: float = 0.4,
+    beta: float = 0.1,
+    gamma: float = 0.3,
+    season: int = SEASON,
+    z: float = Z_90,
+) -> Dict[str, np.ndarray]:
+    """
+    Batched additive Holt-Winters forecast.
+
+    Series with at least two full seasons get level, trend and seasonality;
+    shorter series fall back to level + trend, and series shorter than two
+    points to their mean. Prediction intervals use the one-step residual
+    spread scaled by sqrt(h).
+
+    Args:
+        values: History matrix, shape (series, months)
+        horizon: Number of months to forecast
+
+    Returns:
+        Dict with mean, lower, upper (series × horizon) and sigma (series,)
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n, t = values.shape
+    empty = np.zeros((n, horizon))
+    if t == 0:
+        return {"mean": empty, "lower": empty, "upper": empty, "sigma": np.zeros(n)}
+
+    seasonal_model = t >= 2 * season
+    if seasonal_model:
+        first = values[:, :season].mean(axis=1)
+        second = values[:, season : 2 * season].mean(axis=1)
+        level = first.copy()
+        trend = (second - first) / season
+        seasonal = values[:, :season] - first[:, None]
+    else:
+        level = values[:, 0].copy()
+        trend = (values[:, -1] - values[:, 0]) / (t - 1) if t > 1 else np.zeros(n)
+        seasonal = np.zeros((n, season))
+
+    residuals = np.zeros((n, t))
+    for step in range(t):
+        s_idx = step % season
+        fitted = level + trend + seasonal[:, s_idx]
+        observed = values[:, step]
+        residuals[:, step] = observed - fitted
+        prev_level = level
+        level = alpha * (observed - seasonal[:, s_idx]) + (1 - alpha) * (level + trend)
+        trend = beta * (level - prev_level) + (1 - beta) * trend
+        if seasonal_model:
+            seasonal[:, s_idx] = gamma * (observed - level) + (1 - gamma) * seasonal[:, s_idx]
+
+    steps = np.arange(1, horizon + 1)
+    seasonal_idx = (t + steps - 1) % season
+    mean = level[:, None] + trend[:, None] * steps[None, :] + seasonal[:, seasonal_idx]
+    if t < 2:
+        mean = np.repeat(values.mean(axis=1, keepdims=True), horizon, axis=1)
+    mean = np.maximum(mean, 0.0)
+
+    warmup = min(t, season) if seasonal_model else 1
+    sigma = residuals[:, warmup:].std(axis=1) if t > warmup else np.zeros(n)
+    width = z * sigma[:, None] * np.sqrt(steps)[None, :]
+    return {
+        "mean": mean,
+        "lower": np.maximum(mean - width, 0.0),
+        "upper": mean + width,
+        "sigma": sigma,
+    }
+
+
+def entity_scope_matrix(db: Session, entities: Optional[List[int]] = None):
+    """
+    Monthly emissions (tCO2e) per (entity, scope) series.
+
+    Returns:
+        Tuple of (keys [(entity_id, scope)], matrix series × months, first_month_index)
+    """
+    q = (
+        select(UploadedActivity.entity_id, EmissionRecord.scope, Period.period_start, Period.period_end,
+               func.sum(EmissionRecord.co2e_kg))
+        .join(UploadedActivity, UploadedActivity.id == EmissionRecord.activity_id)
+        .join(Period, Period.id == EmissionRecord.period_id)
+        .group_by(UploadedActivity.entity_id, EmissionRecord.scope, Period.period_start, Period.period_end)
+    )
+    if entities:
+        q = q.where(UploadedActivity.entity_id.in_(entities))
+    rows = db.execute(q).all()
+    if not rows:
+        return [], np.zeros((0, 0)), 0
+
+    keys = sorted({(r[0], r[1]) for r in rows})
+    code = {k: i for i, k in enumerate(keys)}
+    coded = [(code[(r[0], r[1])], r[2], r[3], r[4]) for r in rows]
+
+    # Grid spans every month touched by the data
+    first = month_index(min(r[2] for r in rows))
+    last = month_index(max(r[3] for r in rows))
+    matrix = dated_month_matrix(coded, np.arange(len(keys)), first, last - first + 1) / 1_000.0
+    return keys, matrix, first
+
+
+def _fit_year(matrix: np.ndarray, first: int, year: int) -> Optional[Dict]:
+    """Fit every series on its history up to the year's end; None without history before then."""
+    year_first = month_index(date(year, 1, 1))
+    hist_end = min(first + matrix.shape[1] - 1, year_first + 11)
+    if matrix.shape[0] == 0 or hist_end < first:
+        return None
+    history = matrix[:, : hist_end - first + 1]
+    horizon = year_first + 11 - hist_end
+    return {
+        "history": history,
+        "fit": holt_winters(history, horizon),
+        "first": first,
+        "year_first": year_first,
+        "hist_end": hist_end,
+        "horizon": horizon,
+    }
+
+
+def _year_end(fitted: Dict, rows=slice(None)) -> Dict:
+    """Year-end projection of the sum of the given fitted series."""
+    first, year_first, hist_end, horizon = fitted["first"], fitted["year_first"], fitted["hist_end"], fitted["horizon"]
+    forecast_total = fitted["fit"]["mean"][rows].sum(axis=0)  # months hist_end+1 .. year end
+    in_year = min(horizon, 12)
+
+    # Monthly values for the year: actuals, then forecast means
+    observed_total = fitted["history"][rows].sum(axis=0)
+    monthly = np.zeros(12)
+    for idx in range(year_first, hist_end + 1):
+        if idx >= first:
+            monthly[idx - year_first] = observed_total[idx - first]
+    if in_year:
+        monthly[12 - in_year :] = forecast_total[horizon - in_year :]
+
+    ytd = float(monthly[: 12 - in_year].sum())
+    remaining = float(monthly[12 - in_year :].sum())
+    # Variance of a sum of h-step forecasts: sigma^2 * sum(h) per series, added across series
+    steps_sum = float(np.arange(horizon - in_year + 1, horizon + 1).sum())
+    sigma = fitted["fit"]["sigma"][rows]
+    spread = Z_90 * float(np.sqrt((sigma**2).sum() * steps_sum))
+    return {
+        "as_of": month_from_index(hist_end),
+        "ytd_tco2e": ytd,
+        "projected_tco2e": ytd + remaining,
+        "projected_low_tco2e": ytd + max(0.0, remaining - spread),
+        "projected_high_tco2e": ytd + remaining + spread,
+        "monthly_tco2e": monthly.tolist(),
+        "series_fitted": int(sigma.size),
+    }
+
+
+def project_year_end(db: Session, year: int, entities: Optional[List[int]] = None) -> Optional[Dict]:
+    """
+    Project year-end emissions for the selection from the fitted entity/scope series.
+
+    The forecast covers the months after the latest recorded month up to
+    December; series are summed and their variances added for the interval.
+    Results are cached until new emission data arrives.
+
+    Returns:
+        Dict with ytd_tco2e, projected_tco2e, lower/upper bounds, monthly means
+        (12 values for the year) and the as-of month, or None without data
+    """
+    key = (year, tuple(sorted(entities)) if entities else None, data_revision(db, EmissionRecord, UploadedActivity))
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    keys, matrix, first = entity_scope_matrix(db, entities)
+    fitted = _fit_year(matrix, first, year) if keys else None
+    result = _year_end(fitted) if fitted else None
+    _cache.set(key, result)
+    return result
+
+
+def project_entities(db: Session, year: int) -> Dict[Optional[int], Dict]:
+    """
+    Year-end projections of every entity, and of the portfolio under the key None.
+
+    One query and one batched fit cover all (entity, scope) series; each
+    entity's projection sums its own rows. Entities without data are absent.
+    """
+    key = ("entities", year, data_revision(db, EmissionRecord, UploadedActivity))
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    keys, matrix, first = entity_scope_matrix(db)
+    fitted = _fit_year(matrix, first, year) if keys else None
+    result: Dict[Optional[int], Dict] = {}
+    if fitted:
+        entity_of_row = np.array([k[0] for k in keys])
+        for entity_id in np.unique(entity_of_row).tolist():
+            result[entity_id] = _year_end(fitted, np.flatnonzero(entity_of_row == entity_id))
+        result[None] = _year_end(fitted)
+    _cache.set(key, result)
+    return result
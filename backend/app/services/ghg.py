@@ -0,0 +1,249 @@
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import exists, insert, inspect, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.activity import UploadedActivity
+from ..models.emission import EmissionRecord
+from ..models.factors import ActiveGWPSet, EmissionFactor, GasGWP
+from .units import convert_amounts
+
+# Column order of every gas matrix/vector in this module
+GASES = ("CO2", "CH4", "N2O")
+
+# IPCC AR5 and AR6, 100-year horizon
+GWP_VALUES = [
+    ("CO2", "AR5", 1),
+    ("CH4", "AR5", 28),
+    ("N2O", "AR5", 265),
+    ("CO2", "AR6", 1),
+    ("CH4", "AR6", 27.9),
+    ("N2O", "AR6", 273),
+]
+
+
+def load_gwp_vector(db: Session, gwp_set: str) -> np.ndarray:
+    """Return the GWP100 vector (CO2, CH4, N2O) for the given assessment report set."""
+    rows = db.query(GasGWP.gas, GasGWP.gwp100).filter(GasGWP.gwp_set == gwp_set).all()
+    if not rows:
+        raise ValueError(f"Unknown GWP set: {gwp_set}")
+    by_gas = {gas: float(gwp) for gas, gwp in rows}
+    missing = [g for g in GASES[1:] if g not in by_gas]
+    if missing:
+        raise ValueError(f"GWP set {gwp_set} is missing gases: {', '.join(missing)}")
+    return np.array([by_gas.get("CO2", 1.0), by_gas["CH4"], by_gas["N2O"]], dtype=float)
+
+
+def active_gwp_set(db: Session) -> str:
+    """GWP set of the stored records: the last one switched to, else `settings.gwp_set`."""
+    row = db.get(ActiveGWPSet, 1)
+    return row.gwp_set if row is not None else settings.gwp_set
+
+
+def _store_active_gwp_set(db: Session, gwp_set: str) -> None:
+    row = db.get(ActiveGWPSet, 1)
+    if row is None:
+        db.add(ActiveGWPSet(id=1, gwp_set=gwp_set))
+    else:
+        row.gwp_set = gwp_set
+
+
+def ensure_gas_columns(db: Session) -> None:
+    """
+    Upgrade tables created before per-gas emissions existed.
+
+    Adds the per-gas columns to emission records and factors. Existing
+    records were pure CO2e figures, so they get co2_kg = co2e_kg under
+    AR5. `gas_gwp` was unique per gas; it is rebuilt keyed by
+    (gas, gwp_set), and its rows become the AR5 set. Standard AR5/AR6
+    values missing from the table are then added.
+    """
+    inspector = inspect(db.connection())
+    columns = {t: {c["name"] for c in inspector.get_columns(t)} for t in ("emission_records", "emission_factors", "gas_gwp")}
+
+    added = []
+    for name in ("co2_kg", "ch4_kg", "n2o_kg"):
+        if name not in columns["emission_records"]:
+            db.execute(text(f"ALTER TABLE emission_records ADD COLUMN {name} FLOAT NOT NULL DEFAULT 0"))
+            added.append(name)
+    if "gwp_set" not in columns["emission_records"]:
+        db.execute(text("ALTER TABLE emission_records ADD COLUMN gwp_set VARCHAR"))
+        db.execute(update(EmissionRecord.__table__).values(gwp_set="AR5"))
+    if "co2_kg" in added:
+        db.execute(update(EmissionRecord.__table__).values(co2_kg=EmissionRecord.__table__.c.co2e_kg))
+    for name in ("factor_kgch4_per_unit", "factor_kgn2o_per_unit"):
+        if name not in columns["emission_factors"]:
+            db.execute(text(f"ALTER TABLE emission_factors ADD COLUMN {name} FLOAT NOT NULL DEFAULT 0"))
+
+    if "gwp_set" not in columns["gas_gwp"]:
+        # The old unique constraint on `gas` can't be dropped in place on SQLite: rebuild the table
+        rows = db.execute(text("SELECT gas, gwp100 FROM gas_gwp")).all()
+        db.execute(text("DROP TABLE gas_gwp"))
+        GasGWP.__table__.create(bind=db.connection())
+        if rows:
+            db.execute(insert(GasGWP.__table__), [{"gas": g, "gwp_set": "AR5", "gwp100": v} for g, v in rows])
+    existing = set(db.execute(select(GasGWP.gas, GasGWP.gwp_set)).tuples())
+    missing = [{"gas": g, "gwp_set": s, "gwp100": v} for g, s, v in GWP_VALUES if (g, s) not in existing]
+    if missing:
+        db.execute(insert(GasGWP.__table__), missing)
+    db.commit()
+
+
+def factor_gas_row(factor: EmissionFactor) -> tuple[float, float, float]:
+    return (
+        float(factor.factor_kgco2_per_unit or 0.0),
+        float(factor.factor_kgch4_per_unit or 0.0),
+        float(factor.factor_kgn2o_per_unit or 0.0),
+    )
+
+
+def compute_gas_emissions(amounts: np.ndarray, gas_factors: np.ndarray, gwp: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute per-gas and total CO2e emissions for a batch of activities in one pass.
+
+    Args:
+        amounts: Activity amounts, shape (n,)
+        gas_factors: kg of CO2/CH4/N2O per unit for each activity, shape (n, 3)
+        gwp: GWP100 vector for CO2/CH4/N2O, shape (3,)
+
+    Returns:
+        Dict with co2_kg, ch4_kg, n2o_kg and co2e_kg arrays of shape (n,)
+    """
+    amounts = np.nan_to_num(np.asarray(amounts, dtype=float))
+    gas_factors = np.nan_to_num(np.asarray(gas_factors, dtype=float).reshape(-1, len(GASES)))
+    per_gas = amounts[:, None] * gas_factors
+    return {
+        "co2_kg": per_gas[:, 0],
+        "ch4_kg": per_gas[:, 1],
+        "n2o_kg": per_gas[:, 2],
+        "co2e_kg": per_gas @ np.asarray(gwp, dtype=float),
+    }
+
+
+def recalculate_activities(
+    db: Session, period: Optional[str] = None, gwp_set: Optional[str] = None, dirty_only: bool = False
+) -> dict:
+    """
+    Recompute emission records for all activities (optionally of one period) as a single batch.
+
+    Existing records of the recomputed activities are replaced, so repeated calls are idempotent.
+    Amounts are converted into the factor's unit first; activities referencing an unknown
+    factor code or an incompatible unit are skipped and reported in `errors`.
+    With `dirty_only`, only activities flagged `needs_recalc` or without any record are recomputed.
+
+    `gwp_set` defaults to the active set. A full recalculation with another
+    set makes it the active one; a partial one (by period or `dirty_only`)
+    would mix sets in the table and is refused.
+    """
+    active = active_gwp_set(db)
+    gwp_set = gwp_set or active
+    if gwp_set != active and (period or dirty_only):
+        raise ValueError(f"Records are weighted with {active}; switch all records with /emissions/gwp-set first")
+    gwp = load_gwp_vector(db, gwp_set)
+
+    q = db.query(
+        UploadedActivity.id,
+        UploadedActivity.amount,
+        UploadedActivity.unit,
+        UploadedActivity.factor_code,
+        UploadedActivity.scope,
+        UploadedActivity.period,
+        UploadedActivity.period_id,
+    )
+    if period:
+        q = q.filter(UploadedActivity.period == period)
+    if dirty_only:
+        q = q.filter(
+            or_(
+                UploadedActivity.needs_recalc.is_(True),
+                ~exists().where(EmissionRecord.activity_id == UploadedActivity.id),
+            )
+        )
+    activities = q.all()
+
+    factors = {f.code: f for f in db.query(EmissionFactor).all()}
+    factor_rows = {code: factor_gas_row(f) for code, f in factors.items()}
+    known = [a for a in activities if a.factor_code in factor_rows]
+    errors = [
+        {"activity_id": a.id, "error": f"Unknown factor code: {a.factor_code}"}
+        for a in activities
+        if a.factor_code not in factor_rows
+    ]
+
+    stale = db.query(EmissionRecord).filter(EmissionRecord.activity_id.in_(q.with_entities(UploadedActivity.id)))
+    stale.delete(synchronize_session=False)
+    # After the delete: clearing the flag first would drop rows from the dirty_only selection
+    db.execute(
+        update(UploadedActivity)
+        .where(UploadedActivity.id.in_(q.with_entities(UploadedActivity.id)), UploadedActivity.needs_recalc.is_(True))
+        .values(needs_recalc=False)
+        .execution_options(synchronize_session=False)
+    )
+
+    if known:
+        amounts, unit_errors = convert_amounts(
+            [a.amount for a in known],
+            [a.unit for a in known],
+            [factors[a.factor_code].unit for a in known],
+        )
+        if unit_errors:
+            errors.extend({"activity_id": known[i].id, "error": msg} for i, msg in unit_errors.items())
+            keep = np.ones(len(known), dtype=bool)
+            keep[list(unit_errors)] = False
+            known = [a for a, k in zip(known, keep) if k]
+            amounts = amounts[keep]
+
+    if known:
+        gas_factors = np.array([factor_rows[a.factor_code] for a in known], dtype=float)
+        result = compute_gas_emissions(amounts, gas_factors, gwp)
+        db.execute(
+            insert(EmissionRecord),
+            [
+                {
+                    "activity_id": a.id,
+                    "co2e_kg": co2e,
+                    "co2_kg": co2,
+                    "ch4_kg": ch4,
+                    "n2o_kg": n2o,
+                    "gwp_set": gwp_set,
+                    "scope": a.scope,
+                    "period": a.period,
+                    "period_id": a.period_id,
+                }
+                for a, co2e, co2, ch4, n2o in zip(
+                    known,
+                    result["co2e_kg"].tolist(),
+                    result["co2_kg"].tolist(),
+                    result["ch4_kg"].tolist(),
+                    result["n2o_kg"].tolist(),
+                )
+            ],
+        )
+    if gwp_set != active:
+        _store_active_gwp_set(db, gwp_set)
+    db.commit()
+    return {"inserted": len(known), "skipped": len(errors), "errors": errors, "gwp_set": gwp_set}
+
+
+def apply_gwp_set(db: Session, gwp_set: str) -> int:
+    """
+    Re-weight every stored emission record with another GWP set.
+
+    Per-gas masses are stored on each record, so switching AR5 <-> AR6 is a single
+    bulk UPDATE instead of a recalculation of every activity. The set is stored
+    as the active one, the default of later calculations.
+    """
+    gwp = load_gwp_vector(db, gwp_set)
+    result = db.execute(
+        update(EmissionRecord).values(
+            co2e_kg=EmissionRecord.co2_kg * float(gwp[0])
+            + EmissionRecord.ch4_kg * float(gwp[1])
+            + EmissionRecord.n2o_kg * float(gwp[2]),
+            gwp_set=gwp_set,
+        )
+    )
+    _store_active_gwp_set(db, gwp_set)
+    db.commit()
+    return int(result.rowcount or 0)
@@ -0,0 +1,130 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from ..models.activity import UploadedActivity
+from ..models.emission import EmissionRecord
+from ..models.org import Entity, Facility, Group, OrgClosure
+
+LEVELS = ("group", "entity", "facility")
+LEVEL_MODELS = {"group": Group, "entity": Entity, "facility": Facility}
+
+
+def _check_level(level: str) -> None:
+    if level not in LEVELS:
+        raise ValueError(f"Unknown hierarchy level: {level}. Use one of {', '.join(LEVELS)}.")
+
+
+def rebuild_closure(db: Session) -> int:
+    """Rebuild the closure table from the org tree with three INSERT ... SELECT statements."""
+    db.query(OrgClosure).delete(synchronize_session=False)
+    columns = ["ancestor_level", "ancestor_id", "facility_id", "depth"]
+    db.execute(
+        insert(OrgClosure).from_select(
+            columns,
+            select(literal("facility"), Facility.id, Facility.id, literal(0)),
+        )
+    )
+    db.execute(
+        insert(OrgClosure).from_select(
+            columns,
+            select(literal("entity"), Facility.entity_id, Facility.id, literal(1)),
+        )
+    )
+    db.execute(
+        insert(OrgClosure).from_select(
+            columns,
+            select(literal("group"), Entity.group_id, Facility.id, literal(2)).join(
+                Entity, Entity.id == Facility.entity_id
+            ),
+        )
+    )
+    db.commit()
+    return db.query(func.count(OrgClosure.id)).scalar() or 0
+
+
+def add_facility_paths(db: Session, facility: Facility) -> None:
+    """Insert the closure rows of a newly created facility."""
+    entity = db.get(Entity, facility.entity_id)
+    db.add_all(
+        [
+            OrgClosure(ancestor_level="facility", ancestor_id=facility.id, facility_id=facility.id, depth=0),
+            OrgClosure(ancestor_level="entity", ancestor_id=entity.id, facility_id=facility.id, depth=1),
+            OrgClosure(ancestor_level="group", ancestor_id=entity.group_id, facility_id=facility.id, depth=2),
+        ]
+    )
+
+
+def ensure_closure(db: Session) -> None:
+    """Populate the closure table for databases created before it existed."""
+    has_facilities = db.query(Facility.id).first() is not None
+    has_paths = db.query(OrgClosure.id).first() is not None
+    if has_facilities and not has_paths:
+        rebuild_closure(db)
+
+
+def descendant_facilities(level: str, ancestor_ids: List[int]):
+    """Select of facility ids below any of the given nodes (a single indexed lookup)."""
+    _check_level(level)
+    return select(OrgClosure.facility_id).where(
+        OrgClosure.ancestor_level == level,
+        OrgClosure.ancestor_id.in_(ancestor_ids),
+    )
+
+
+def resolve_facility_ids(db: Session, level: str, ancestor_ids: List[int]) -> List[int]:
+    return [fid for (fid,) in db.execute(descendant_facilities(level, ancestor_ids).distinct())]
+
+
+def rollup_emissions(
+    db: Session,
+    level: str,
+    ancestor_ids: Optional[List[int]] = None,
+    by_scope: bool = False,
+) -> List[Dict]:
+    """
+    Aggregate emission records onto every node of a hierarchy level.
+
+    Records are joined to their facility's closure rows and summed per
+    ancestor in SQL, so no Python tree traversal is needed.
+
+    Args:
+        db: Database session
+        level: Hierarchy level to roll up to (group, entity or facility)
+        ancestor_ids: Restrict to these nodes (None for all)
+        by_scope: Also return totals per scope
+
+    Returns:
+        List of dicts with id, name, co2e_kg and (optionally) totals_by_scope
+    """
+    _check_level(level)
+    group_cols = [OrgClosure.ancestor_id]
+    if by_scope:
+        group_cols.append(EmissionRecord.scope)
+
+    q = (
+        select(*group_cols, func.sum(EmissionRecord.co2e_kg))
+        .select_from(OrgClosure)
+        .join(UploadedActivity, UploadedActivity.facility_id == OrgClosure.facility_id)
+        .join(EmissionRecord, EmissionRecord.activity_id == UploadedActivity.id)
+        .where(OrgClosure.ancestor_level == level)
+        .group_by(*group_cols)
+    )
+    if ancestor_ids:
+        q = q.where(OrgClosure.ancestor_id.in_(ancestor_ids))
+
+    rows: Dict[int, Dict] = {}
+    for row in db.execute(q):
+        node_id, total = row[0], float(row[-1] or 0.0)
+        entry = rows.setdefault(node_id, {"id": node_id, "co2e_kg": 0.0})
+        entry["co2e_kg"] += total
+        if by_scope:
+            entry.setdefault("totals_by_scope", {})[row[1]] = total
+
+    model = LEVEL_MODELS[level]
+    names = dict(db.query(model.id, model.name).filter(model.id.in_(list(rows))).all()) if rows else {}
+    for node_id, entry in rows.items():
+        entry["name"] = names.get(node_id)
+        entry["level"] = level
+    return sorted(rows.values(), key=lambda r: r["co2e_kg"], reverse=True)
@@ -0,0 +1,447 @@
+"""
+Rule-based insight engine
+
+Derives analysis, recommendations and risk assessment for every entity and
+for the whole portfolio from recorded emissions, allowance balances, the
+year-end projection and flagged anomalies. Results are stored in
+`entity_insights`, so the insight endpoints read one row instead of
+computing anything. Recalculations refresh every row in a background task;
+allowance movements only update the rows of the entities involved.
+"""
+
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.activity import UploadedActivity
+from ..models.allowance import EUETSAllowanceLedger
+from ..models.anomaly import ActivityAnomaly
+from ..models.emission import EmissionRecord
+from ..models.insight import EntityInsight
+from ..models.org import Entity
+from ..models.period import Period
+from .eu_ets import price_feed
+from .forecast import project_entities
+
+SCOPES = ("Scope1", "Scope2", "Scope3")
+SCOPE_KEYS = {"Scope1": "scope1", "Scope2": "scope2", "Scope3": "scope3"}
+SCOPE_LABELS = {"scope1": "Scope 1 (direct)", "scope2": "Scope 2 (electricity)", "scope3": "Scope 3 (value chain)"}
+
+# Reduction potential assumed for each lever, as a share of the scope's emissions
+RENEWABLE_SCOPE2_SHARE = 0.8
+FUEL_SWITCH_SCOPE1_SHARE = 0.25
+SUPPLIER_SCOPE3_SHARE = 0.1
+PRICE_SHOCK = 0.2  # carbon price stress for the volatility risk
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+
+def latest_year(db: Session) -> Optional[int]:
+    """Latest year in which a recorded emission period starts."""
+    start = db.execute(
+        select(func.max(Period.period_start)).join(EmissionRecord, EmissionRecord.period_id == Period.id)
+    ).scalar()
+    return start.year if start else None
+
+
+def _grouped(db: Session, query) -> Dict:
+    """{group key: aggregate} of a grouped query; composite keys become tuples."""
+    out = {}
+    for *keys, value in db.execute(query):
+        out[keys[0] if len(keys) == 1 else tuple(keys)] = float(value or 0.0)
+    return out
+
+
+def entity_snapshots(db: Session, year: Optional[int] = None) -> List[Dict]:
+    """
+    Figures behind the insights: one snapshot per entity plus the portfolio (entity_id None).
+
+    Everything is read with grouped queries over all entities at once, and
+    the year-end projections come from one batched fit of every series.
+    """
+    year = year or latest_year(db)
+    in_year = (
+        EmissionRecord.period_id.in_(
+            select(Period.id).where(Period.period_start.between(date(year, 1, 1), date(year, 12, 31)))
+        )
+        if year
+        else EmissionRecord.id.is_(None)
+    )
+    by_scope = _grouped(
+        db,
+        select(UploadedActivity.entity_id, EmissionRecord.scope, func.sum(EmissionRecord.co2e_kg))
+        .join(UploadedActivity, UploadedActivity.id == EmissionRecord.activity_id)
+        .where(in_year)
+        .group_by(UploadedActivity.entity_id, EmissionRecord.scope),
+    )
+    by_source = _grouped(
+        db,
+        select(UploadedActivity.entity_id, UploadedActivity.factor_code, func.sum(EmissionRecord.co2e_kg))
+        .join(UploadedActivity, UploadedActivity.id == EmissionRecord.activity_id)
+        .where(in_year)
+        .group_by(UploadedActivity.entity_id, UploadedActivity.factor_code),
+    )
+    balances = _grouped(
+        db,
+        select(EUETSAllowanceLedger.entity_id, func.sum(EUETSAllowanceLedger.delta_allowances)).group_by(
+            EUETSAllowanceLedger.entity_id
+        ),
+    )
+    anomalies = _grouped(
+        db,
+        select(UploadedActivity.entity_id, func.count(ActivityAnomaly.id))
+        .join(UploadedActivity, UploadedActivity.id == ActivityAnomaly.activity_id)
+        .group_by(UploadedActivity.entity_id),
+    )
+    price = price_feed()
+    projections = project_entities(db, year) if year else {}
+
+    snapshots = []
+    for entity in db.query(Entity).order_by(Entity.id):
+        scopes = {SCOPE_KEYS[s]: by_scope.get((entity.id, s), 0.0) / 1_000.0 for s in SCOPES}
+        sources = {code: kg / 1_000.0 for (eid, code), kg in by_source.items() if eid == entity.id}
+        snapshots.append(
+            _snapshot(
+                entity.id,
+                entity.name,
+                year,
+                scopes,
+                sources,
+                balances.get(entity.id, 0.0),
+                float(entity.yearly_budget_tco2e or 0.0),
+                int(anomalies.get(entity.id, 0)),
+                price,
+                projections.get(entity.id),
+            )
+        )
+
+    portfolio_sources: Dict[str, float] = {}
+    for (_, code), kg in by_source.items():
+        portfolio_sources[code] = portfolio_sources.get(code, 0.0) + kg / 1_000.0
+    portfolio = _snapshot(
+        None,
+        "Portfolio",
+        year,
+        {key: sum(s[key] for s in snapshots) for key in SCOPE_KEYS.values()},
+        portfolio_sources,
+        sum(s["eu_ets_allowances"] for s in snapshots),
+        sum(s["budget_tco2e"] for s in snapshots),
+        sum(s["anomaly_count"] for s in snapshots),
+        price,
+        projections.get(None),
+    )
+    portfolio["entities"] = [
+        {"entity_id": s["entity_id"], "name": s["name"], "emissions": s["total_emissions"]} for s in snapshots
+    ]
+    return [portfolio] + snapshots
+
+
+def _snapshot(entity_id, name, year, scopes, sources, allowances, budget, anomaly_count, price, projection) -> Dict:
+    total = sum(scopes.values())
+    top_code = max(sources, key=sources.get) if sources else None
+    return {
+        "entity_id": entity_id,
+        "name": name,
+        "year": year,
+        "total_emissions": round(total, 1),
+        **{key: round(value, 1) for key, value in scopes.items()},
+        "eu_ets_allowances": round(allowances, 1),
+        "eu_ets_used": round(total, 1),
+        "eu_ets_price": price,
+        "budget_tco2e": budget,
+        "anomaly_count": anomaly_count,
+        "top_source": {"factor_code": top_code, "tco2e": round(sources[top_code], 1)} if top_code else None,
+        "projected_tco2e": round(projection["projected_tco2e"], 1) if projection else None,
+        "projected_high_tco2e": round(projection["projected_high_tco2e"], 1) if projection else None,
+    }
+
+
+def _eur(value: float) -> str:
+    return f"€{value:,.0f}"
+
+
+def _priority(reduction: float, total: float) -> str:
+    share = reduction / total if total > 0 else 0.0
+    return "high" if share >= 0.1 else "medium" if share >= 0.03 else "low"
+
+
+def build_insights(snapshot: Dict, surpluses: Optional[Dict[str, float]] = None) -> Dict:
+    """
+    Apply the insight rules to one snapshot.
+
+    Args:
+        snapshot: Output of `entity_snapshots`
+        surpluses: Allowance surplus of other entities by name, used to suggest transfers
+
+    Returns:
+        Dict with analysis, recommendations and risk_assessment in the shapes the LLM endpoints return
+    """
+    # Missing figures get neutral defaults, so ad-hoc dicts (custom data, LLM fallbacks) work too
+    name = snapshot.get("name") or "Portfolio"
+    year = snapshot.get("year")
+    price = float(snapshot.get("eu_ets_price") or price_feed())
+    scopes = {key: float(snapshot.get(key) or 0.0) for key in SCOPE_LABELS}
+    total = float(snapshot.get("total_emissions") or sum(scopes.values()))
+    used = float(snapshot.get("eu_ets_used") or total)
+    allowances = float(snapshot.get("eu_ets_allowances") or 0.0)
+    deficit = max(0.0, used - allowances)
+    surplus = max(0.0, allowances - used)
+    projected = snapshot.get("projected_tco2e")
+    projected_deficit = max(0.0, projected - allowances) if projected is not None else 0.0
+    exposure = deficit * price
+    projected_exposure = projected_deficit * price
+    budget = float(snapshot.get("budget_tco2e") or 0.0)
+    flagged = snapshot.get("anomalies") or []
+    anomalies = int(snapshot.get("anomaly_count") or len(flagged))
+    dominant = max(scopes, key=scopes.get)
+    dominant_share = scopes[dominant] / total * 100 if total > 0 else 0.0
+
+    # Analysis
+    if total <= 0:
+        summary = f"{name}: no emissions recorded yet. Upload activity data and recalculate to get insights."
+        findings = ["No emission records for the selection"]
+    else:
+        summary = (
+            f"{name}: {total:,.0f} tCO₂e recorded{f' in {year}' if year else ''}; {SCOPE_LABELS[dominant]} is "
+            f"{dominant_share:.0f}% of the total. "
+        )
+        summary += (
+            f"Emissions exceed held allowances by {deficit:,.0f} tCO₂e ({_eur(exposure)} at €{price:g}/t)."
+            if deficit > 0
+            else f"Held allowances cover recorded emissions with {surplus:,.0f} tCO₂e to spare."
+        )
+        if projected is not None:
+            summary += f" Projected year-end emissions: {projected:,.0f} tCO₂e."
+        findings = [f"{SCOPE_LABELS[dominant]} dominates: {scopes[dominant]:,.0f} tCO₂e ({dominant_share:.1f}%)"]
+        if deficit > 0:
+            findings.append(f"EU ETS deficit: {deficit:,.0f} tCO₂e, {_eur(exposure)} exposure")
+        elif projected_deficit > 0:
+            findings.append(f"Projected to exceed allowances by {projected_deficit:,.0f} tCO₂e by year-end")
+        else:
+            findings.append(f"Allowance surplus of {surplus:,.0f} tCO₂e")
+        if budget > 0 and projected is not None:
+            findings.append(f"Projected emissions use {projected / budget * 100:.0f}% of the {budget:,.0f} tCO₂e budget")
+        if snapshot.get("top_source"):
+            top = snapshot["top_source"]
+            findings.append(f"Largest source: {top['factor_code']} with {top['tco2e']:,.0f} tCO₂e")
+        if anomalies:
+            finding = f"{anomalies} activity rows flagged as anomalous"
+            if flagged:
+                top = flagged[0]
+                finding += f" (e.g. {top['factor_code']} in {top['period']}: {top['amount']:,.0f} vs ~{top['expected']:,.0f} expected)"
+            findings.append(finding)
+
+    # Recommendations
+    recommendations = []
+    if deficit > 0 or projected_deficit > 0:
+        gap = max(deficit, projected_deficit)
+        donors = {k: v for k, v in (surpluses or {}).items() if k != name and v > 0}
+        if donors:
+            donor = max(donors, key=donors.get)
+            amount = min(gap, donors[donor])
+            recommendations.append(
+                {
+                    "title": f"Transfer allowances from {donor}",
+                    "description": f"{donor} holds a surplus of {donors[donor]:,.0f} allowances; transfer {amount:,.0f} to cover the gap.",
+                    "cost": "€0",
+                    "annual_savings": _eur(amount * price),
+                    "timeline": "1 month",
+                    "priority": "high",
+                    "emission_reduction": "0 tCO₂e",
+                }
+            )
+        recommendations.append(
+            {
+                "title": "Cover the allowance gap",
+                "description": f"Buy or hedge {gap:,.0f} EU ETS allowances ahead of the surrender deadline.",
+                "cost": _eur(gap * price),
+                "annual_savings": "€0",
+                "timeline": "3 months",
+                "priority": "high",
+                "emission_reduction": "0 tCO₂e",
+            }
+        )
+    levers = [
+        ("scope2", RENEWABLE_SCOPE2_SHARE, "Renewable electricity contracts", "Source electricity through PPAs or guarantees of origin.", "6 months"),
+        ("scope1", FUEL_SWITCH_SCOPE1_SHARE, "Fuel switching and electrification", "Replace fossil combustion in boilers and fleet with electric or low-carbon alternatives.", "12 months"),
+        ("scope3", SUPPLIER_SCOPE3_SHARE, "Supplier engagement programme", "Set reduction targets with the largest suppliers and track their emissions.", "12 months"),
+    ]
+    for key, share, title, description, timeline in levers:
+        reduction = scopes[key] * share
+        if reduction <= 0:
+            continue
+        covered = key != "scope3"  # value-chain emissions are outside the EU ETS
+        recommendations.append(
+            {
+                "title": title,
+                "description": description,
+                "cost": "To be assessed",
+                "annual_savings": _eur(reduction * price) if covered else "€0",
+                "timeline": timeline,
+                "priority": _priority(reduction, total),
+                "emission_reduction": f"{reduction:,.0f} tCO₂e",
+            }
+        )
+    if anomalies:
+        recommendations.append(
+            {
+                "title": "Review flagged activity data",
+                "description": f"Check the {anomalies} anomalous activity rows before reporting.",
+                "cost": "€0",
+                "annual_savings": "€0",
+                "timeline": "1 month",
+                "priority": "medium",
+                "emission_reduction": "0 tCO₂e",
+            }
+        )
+    recommendations.sort(key=lambda r: PRIORITY_ORDER[r["priority"]])
+    recommendations = recommendations[:4]
+
+    # Risks
+    risks = []
+    if deficit > 0 or projected_deficit > 0:
+        risks.append(
+            {
+                "risk": "EU ETS non-compliance",
+                "probability": "High" if deficit > 0 else "Medium",
+                "impact": _eur(max(exposure, projected_exposure)),
+                "mitigation": "Close the allowance gap and accelerate reductions",
+                "details": f"Allowances held: {allowances:,.0f} t; recorded: {used:,.0f} t"
+                + (f"; projected: {projected:,.0f} t" if projected is not None else ""),
+            }
+        )
+        risks.append(
+            {
+                "risk": "Carbon price volatility",
+                "probability": "Medium",
+                "impact": _eur(max(deficit, projected_deficit) * price * PRICE_SHOCK),
+                "mitigation": "Hedge the open position with forward purchases",
+                "details": f"Extra cost of a {PRICE_SHOCK:.0%} price rise on the uncovered position",
+            }
+        )
+    if budget > 0 and projected is not None and projected > budget:
+        risks.append(
+            {
+                "risk": "Emissions budget overrun",
+                "probability": "High",
+                "impact": _eur((projected - budget) * price),
+                "mitigation": "Prioritise the largest reduction levers this year",
+                "details": f"Projected {projected:,.0f} t against a budget of {budget:,.0f} t",
+            }
+        )
+    if anomalies:
+        risks.append(
+            {
+                "risk": "Data quality",
+                "probability": "High" if anomalies > 10 else "Medium",
+                "impact": "Reporting accuracy",
+                "mitigation": "Review flagged rows before verification",
+                "details": f"{anomalies} activity rows deviate strongly from their history",
+            }
+        )
+    levels = {r["probability"] for r in risks}
+    overall = "High" if "High" in levels else "Medium" if "Medium" in levels else "Low"
+
+    return {
+        "analysis": {
+            "executive_summary": summary,
+            "key_findings": findings,
+            "priority_areas": [r["title"] for r in recommendations[:3]],
+            "financial_impact": _eur(exposure),
+            "compliance_status": "Deficit" if deficit > 0 else "At risk" if projected_deficit > 0 else "Compliant",
+        },
+        "recommendations": recommendations,
+        "risk_assessment": {
+            "title": "Risk Analysis",
+            "content": f"{len(risks)} risks identified for {name}; overall level {overall}.",
+            "overall_risk_level": overall,
+            "risks": risks,
+        },
+    }
+
+
+def refresh_insights(db: Session, year: Optional[int] = None) -> int:
+    """Recompute and store insights for the portfolio and every entity."""
+    snapshots = entity_snapshots(db, year)
+    surpluses = {
+        s["name"]: max(0.0, s["eu_ets_allowances"] - s["eu_ets_used"]) for s in snapshots if s["entity_id"] is not None
+    }
+    db.query(EntityInsight).delete(synchronize_session=False)
+    for snapshot in snapshots:
+        insights = build_insights(snapshot, surpluses)
+        db.add(EntityInsight(entity_id=snapshot["entity_id"], year=snapshot["year"], snapshot=snapshot, **insights))
+    db.commit()
+    return len(snapshots)
+
+
+_refresh_lock = threading.Lock()
+
+
+def refresh_in_background(bind) -> None:
+    """Background-task entry point: run `refresh_insights` on its own session, one refresh at a time."""
+    with _refresh_lock, Session(bind=bind) as db:
+        refresh_insights(db)
+
+
+def refresh_balances(db: Session, entity_ids: List[int]) -> int:
+    """
+    Update stored insights after allowance movements of the given entities.
+
+    Only the balance-dependent figures are recomputed: the entities' held
+    allowances from the ledger, the portfolio total and the rules applied to
+    those rows. Emissions, projections and anomaly counts keep their stored
+    values until the next full refresh. Returns the number of rows updated.
+    """
+    rows = {r.entity_id: r for r in db.query(EntityInsight)}
+    balances = _grouped(
+        db,
+        select(EUETSAllowanceLedger.entity_id, func.sum(EUETSAllowanceLedger.delta_allowances))
+        .where(EUETSAllowanceLedger.entity_id.in_(entity_ids))
+        .group_by(EUETSAllowanceLedger.entity_id),
+    )
+    changed = {
+        entity_id: {**rows[entity_id].snapshot, "eu_ets_allowances": round(balances.get(entity_id, 0.0), 1)}
+        for entity_id in set(entity_ids)
+        if entity_id in rows
+    }
+    if not changed:
+        return 0
+    snapshots = [changed.get(entity_id, row.snapshot) for entity_id, row in rows.items() if entity_id is not None]
+    if None in rows:
+        changed[None] = {
+            **rows[None].snapshot,
+            "eu_ets_allowances": round(sum(s["eu_ets_allowances"] for s in snapshots), 1),
+        }
+    surpluses = {s["name"]: max(0.0, s["eu_ets_allowances"] - s["eu_ets_used"]) for s in snapshots}
+    for entity_id, snapshot in changed.items():
+        row = rows[entity_id]
+        row.snapshot = snapshot
+        for field, value in build_insights(snapshot, surpluses).items():
+            setattr(row, field, value)
+        row.computed_at = func.now()
+    db.commit()
+    return len(changed)
+
+
+def _stored_row(db: Session, entity_id: Optional[int]) -> Optional[EntityInsight]:
+    column = EntityInsight.entity_id
+    return db.query(EntityInsight).filter(column.is_(None) if entity_id is None else column == entity_id).first()
+
+
+def stored_insights(db: Session, entity_id: Optional[int] = None) -> Dict:
+    """Stored insights of an entity (or the portfolio); computed on first use of an empty table."""
+    row = _stored_row(db, entity_id)
+    if row is None and db.query(EntityInsight.id).first() is None:
+        refresh_insights(db)
+        row = _stored_row(db, entity_id)
+    if row is None:
+        raise ValueError(f"Unknown entity: {entity_id}")
+    return {
+        "snapshot": row.snapshot,
+        "analysis": row.analysis,
+        "recommendations": row.recommendations,
+        "risk_assessment": row.risk_assessment,
+        "computed_at": row.computed_at.isoformat() if row.computed_at else None,
+    }
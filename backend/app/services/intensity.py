@@ -0,0 +1,208 @@
+"""
+Carbon intensity engine
+
+Builds facilities × months matrices of recorded emissions and revenue from
+grouped SQL aggregates and derives the intensity series, site scatter and
+revenue/emissions correlation from them with vectorized NumPy.
+"""
+
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.activity import UploadedActivity
+from ..models.emission import EmissionRecord
+from ..models.org import Facility
+from ..models.period import Period
+from ..models.revenue import FacilityRevenue
+from ..schemas.intensity import IntensityResponse, IntensityScatterPoint, IntensitySeriesPoint
+from .cache import RevisionCache, data_revision
+from .calendar import allocate_monthly, overlaps
+from .hierarchy import descendant_facilities
+from .periods import month_from_index, month_index
+from .stats import rolling_sum, spearman, theil_sen, yoy_change
+
+_cache = RevisionCache(maxsize=64)
+
+
+def dated_month_matrix(
+    rows: Iterable[Tuple[int, date, date, float]],
+    row_ids: np.ndarray,
+    first_month: int,
+    n_months: int,
+) -> np.ndarray:
+    """Scatter (id, period_start, period_end, value) aggregates into an ids × months matrix (even monthly split)."""
+    rows = list(rows)
+    if not rows:
+        return np.zeros((len(row_ids), max(n_months, 0)))
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((r[3] or 0.0 for r in rows), dtype=float, count=len(rows))
+    starts = np.array([r[1] for r in rows], dtype="datetime64[D]")
+    ends = np.array([r[2] for r in rows], dtype="datetime64[D]")
+    positions = np.searchsorted(row_ids, ids)
+    return allocate_monthly(positions, values, starts, ends, len(row_ids), first_month, n_months, basis="months")
+
+
+def pearson(x: np.ndarray, y: np.ndarray) -> float:
+    """Pearson correlation; 0.0 when undefined (fewer than 2 points or zero variance)."""
+    if len(x) < 2:
+        return 0.0
+    xc, yc = x - x.mean(), y - y.mean()
+    denom = np.sqrt((xc * xc).sum() * (yc * yc).sum())
+    if denom == 0:
+        return 0.0
+    return float((xc * yc).sum() / denom)
+
+
+def _aggregates(db: Session, entities: Optional[List[int]], start: date, end: date):
+    emissions_q = (
+        select(UploadedActivity.facility_id, Period.period_start, Period.period_end, func.sum(EmissionRecord.co2e_kg))
+        .join(UploadedActivity, UploadedActivity.id == EmissionRecord.activity_id)
+        .join(Period, Period.id == EmissionRecord.period_id)
+        .where(overlaps(start, end))
+        .group_by(UploadedActivity.facility_id, Period.period_start, Period.period_end)
+    )
+    revenue_q = (
+        select(FacilityRevenue.facility_id, Period.period_start, Period.period_end, func.sum(FacilityRevenue.revenue_eur))
+        .join(Period, Period.id == FacilityRevenue.period_id)
+        .where(overlaps(start, end))
+        .group_by(FacilityRevenue.facility_id, Period.period_start, Period.period_end)
+    )
+    if entities:
+        scope = descendant_facilities("entity", entities)
+        emissions_q = emissions_q.where(UploadedActivity.facility_id.in_(scope))
+        revenue_q = revenue_q.where(FacilityRevenue.facility_id.in_(scope))
+    return db.execute(emissions_q).all(), db.execute(revenue_q).all()
+
+
+def intensity_matrices(
+    db: Session, start_date: date, end_date: date, entities: Optional[List[int]] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Emissions (tCO2e) and revenue (€M) matrices of shape facilities × months.
+
+    The month grid ends at `end_date` and covers at least 24 months so that
+    year-over-year comparisons are available.
+
+    Returns:
+        Tuple of (facility_ids, emissions, revenue, first_month_index)
+    """
+    last = month_index(end_date)
+    first = min(month_index(start_date), last - 23)
+    n_months = last - first + 1
+
+    emission_rows, revenue_rows = _aggregates(db, entities, month_from_index(first), end_date)
+    facility_ids = np.unique(
+        np.array([r[0] for r in emission_rows] + [r[0] for r in revenue_rows], dtype=np.int64)
+    )
+    emissions = dated_month_matrix(emission_rows, facility_ids, first, n_months) / 1_000.0
+    revenue = dated_month_matrix(revenue_rows, facility_ids, first, n_months) / 1_000_000.0
+    return facility_ids, emissions, revenue, first
+
+
+def compute_intensity(
+    db: Session, start_date: date, end_date: date, entities: Optional[List[int]] = None
+) -> IntensityResponse:
+    """Compute the intensity response for the date range from recorded emissions and revenue."""
+    facility_ids, emissions, revenue, first = intensity_matrices(db, start_date, end_date, entities)
+    offset = month_index(start_date) - first
+
+    # Portfolio intensity per month of the requested range
+    e_month = emissions.sum(axis=0)
+    r_month = revenue.sum(axis=0)
+    in_range = np.arange(e_month.size) >= offset
+    has_revenue = in_range & (r_month > 0)
+    cols = np.flatnonzero(has_revenue)
+    monthly_intensity = np.divide(e_month, r_month, out=np.full_like(e_month, np.nan), where=r_month > 0)
+    rolling_intensity = _ratio(rolling_sum(e_month, 12), rolling_sum(r_month, 12))
+    monthly_yoy = yoy_change(monthly_intensity, 12)
+    series = [
+        IntensitySeriesPoint(
+            date=month_from_index(first + int(c)),
+            intensity=round(float(monthly_intensity[c]), 2),
+            rolling_12m_intensity=_rounded(rolling_intensity[c], 2),
+            yoy_pct=_rounded(monthly_yoy[c], 1),
+        )
+        for c in cols
+    ]
+    current_intensity = float(monthly_intensity[cols[-1]]) if cols.size else 0.0
+
+    # Trailing 12 months vs the 12 months before
+    trailing_yoy = yoy_change(rolling_intensity, 12)[-1]
+    yoy_change_pct = 0.0 if np.isnan(trailing_yoy) else float(trailing_yoy)
+
+    # Per-site totals over the requested range
+    e_site = emissions[:, offset:].sum(axis=1)
+    r_site = revenue[:, offset:].sum(axis=1)
+    active = (e_site > 0) | (r_site > 0)
+    site_intensity = np.divide(e_site, r_site, out=np.zeros_like(e_site), where=r_site > 0)
+    site_monthly = np.divide(
+        emissions[active, offset:],
+        revenue[active, offset:],
+        out=np.full(revenue[active, offset:].shape, np.nan),
+        where=revenue[active, offset:] > 0,
+    )
+    site_slopes, _ = theil_sen(site_monthly)
+    active_ids = facility_ids[active]
+    names = (
+        dict(db.query(Facility.id, Facility.name).filter(Facility.id.in_(active_ids.tolist())).all())
+        if active_ids.size
+        else {}
+    )
+    site_scatter = [
+        IntensityScatterPoint(
+            site=names.get(int(fid), f"Facility {int(fid)}"),
+            revenue_meur=round(float(r), 1),
+            tco2e=round(float(e), 1),
+            intensity=round(float(i), 2),
+            trend_slope=_rounded(slope, 4),
+        )
+        for fid, r, e, i, slope in zip(
+            active_ids, r_site[active], e_site[active], site_intensity[active], site_slopes
+        )
+    ]
+
+    return IntensityResponse(
+        current_intensity=round(current_intensity, 2),
+        yoy_change_pct=round(float(yoy_change_pct), 1),
+        series=series,
+        site_scatter=site_scatter,
+        correlation=round(pearson(r_site[active], e_site[active]), 3),
+        spearman_correlation=_spearman(r_site[active], e_site[active]),
+    )
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _rounded(value: float, digits: int) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _spearman(x: np.ndarray, y: np.ndarray) -> float:
+    if len(x) < 2:
+        return 0.0
+    rho = spearman(x, y)
+    return 0.0 if np.isnan(rho) else round(float(rho), 3)
+
+
+def cached_intensity(
+    db: Session, start_date: date, end_date: date, entities: Optional[List[int]] = None
+) -> IntensityResponse:
+    """`compute_intensity` memoized until emissions, activities or revenues change."""
+    key = (
+        start_date,
+        end_date,
+        tuple(sorted(entities)) if entities else None,
+        data_revision(db, EmissionRecord, UploadedActivity, FacilityRevenue),
+    )
+    result = _cache.get(key)
+    if result is None:
+        result = compute_intensity(db, start_date, end_date, entities)
+        _cache.set(key, result)
+    return result
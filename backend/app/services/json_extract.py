@@ -0,0 +1,117 @@
+"""
+Tolerant JSON extraction from LLM replies
+
+Replies usually carry one JSON value wrapped in prose or Markdown fences.
+`extract_json` tries, in order:
+
+1. the whole (stripped) reply, decoded with orjson (a listed requirement;
+   the stdlib decoder is used if it is missing);
+2. `json.JSONDecoder.raw_decode` at the first few opening brackets, which
+   parses in C and ignores any prose after the value;
+3. a single tolerant pass over structural characters that brace-matches
+   candidates while skipping string contents; candidates that fail to
+   decode are retried once without trailing commas.
+"""
+
+import json
+import re
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # speed-up only: the results are the same with the stdlib decoder
+    orjson = None
+
+OPENERS = {"{": "}", "[": "]"}
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]')
+_DECODER = json.JSONDecoder()
+MAX_RAW_ATTEMPTS = 8
+
+
+def _loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _decode(candidate: str) -> Optional[Any]:
+    for attempt in (candidate, _TRAILING_COMMA.sub(r"\1", candidate)):
+        try:
+            return _loads(attempt)
+        except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError
+            continue
+    return None
+
+
+def _matches(value: Any, kind: Optional[str]) -> bool:
+    if kind == "object":
+        return isinstance(value, dict)
+    if kind == "array":
+        return isinstance(value, list)
+    return isinstance(value, (dict, list))
+
+
+def extract_json(text: str, kind: Optional[str] = None) -> Optional[Any]:
+    """
+    Return the first JSON object/array embedded in `text`.
+
+    Args:
+        text: Free-form model output
+        kind: "object", "array" or None for either
+
+    Returns:
+        The decoded value, or None when no candidate of that kind decodes
+    """
+    if not text:
+        return None
+    stripped = text.strip()
+    if stripped[:1] in OPENERS and stripped[-1:] == OPENERS[stripped[0]]:
+        value = _decode(stripped)
+        if value is not None and _matches(value, kind):
+            return value
+
+    wanted = {"object": "{", "array": "["}.get(kind)
+    openers = wanted or "{["
+    for attempt, match in enumerate(re.finditer(f"[{re.escape(openers)}]", text)):
+        if attempt >= MAX_RAW_ATTEMPTS:
+            break
+        try:
+            value, _ = _DECODER.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        if _matches(value, kind):
+            return value
+
+    stack = []
+    start = skip = -1
+    in_string = False
+    # Jump between structural characters instead of visiting every character
+    for match in _STRUCTURAL.finditer(text):
+        i = match.start()
+        if i <= skip:
+            continue
+        ch = match.group()
+        if in_string:
+            if ch == "\\":
+                skip = i + 1  # escaped character
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            # Quotes only open strings inside a candidate; prose quotes are ignored
+            in_string = bool(stack)
+        elif ch in OPENERS:
+            if not stack:
+                if wanted is not None and ch != wanted:
+                    continue
+                start = i
+            stack.append(OPENERS[ch])
+        elif stack and ch == stack[-1]:
+            stack.pop()
+            if not stack:
+                value = _decode(text[start : i + 1])
+                if value is not None and _matches(value, kind):
+                    return value
+        elif stack and ch in "}]":
+            # Mismatched closer: abandon this candidate
+            stack.clear()
+    return None
@@ -0,0 +1,156 @@
+"""
+LLM response cache
+
+Responses are keyed on a SHA-256 of the response kind, the prompt template
+version and the canonicalized inputs (numbers rounded to a few significant
+digits, keys sorted), so identical dashboards hit the cache. Entries live in
+an in-memory LRU tier and an optional SQLite tier shared across workers and
+restarts; both expire after a TTL.
+
+The SQLite tier is bounded too: every write drops expired rows and then the
+least recently used rows beyond `disk_maxsize`. Async callers use `aget` and
+`aset`, which run the SQLite calls in a worker thread, so the event loop
+never waits on disk. One lock serializes access to the shared connection.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from app.services.cache import RevisionCache
+
+SIGNIFICANT_DIGITS = 4
+
+
+def canonical(value: Any) -> Any:
+    """Normalize inputs for hashing: rounded numbers, sorted keys, lists kept in order."""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        rounded = float(f"{float(value):.{SIGNIFICANT_DIGITS}g}")
+        return int(rounded) if rounded.is_integer() else rounded
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    return str(value)
+
+
+def cache_key(kind: str, template_version: str, inputs: Any) -> str:
+    payload = json.dumps(
+        {"kind": kind, "version": template_version, "inputs": canonical(inputs)},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + SQLite) TTL cache for JSON-serializable LLM results."""
+
+    def __init__(
+        self, ttl_s: float = 86_400.0, maxsize: int = 256, path: Optional[str] = None, disk_maxsize: int = 10_000
+    ):
+        self.ttl_s = ttl_s
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self._memory = RevisionCache(maxsize=maxsize)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        """Shared connection, opened on first use; callers hold `_lock`."""
+        if not self.path:
+            return None
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, kind TEXT, value TEXT, expires_at REAL, accessed_at REAL)"
+            )
+            if "accessed_at" not in {row[1] for row in conn.execute("PRAGMA table_info(llm_cache)")}:
+                conn.execute("ALTER TABLE llm_cache ADD COLUMN accessed_at REAL")
+                conn.execute("UPDATE llm_cache SET accessed_at = expires_at")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_expires_at ON llm_cache (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _memory_get(self, key: str, now: float) -> Optional[Any]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                return value
+        return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[Any]:
+        with self._lock:
+            conn = self._disk()
+            if conn is None:
+                return None
+            row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        value = json.loads(row[0])
+        self._memory.set(key, (row[1], value))
+        return value
+
+    def _disk_set(self, key: str, value: Any, kind: str, expires_at: float) -> None:
+        with self._lock:
+            conn = self._disk()
+            if conn is None:
+                return
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, kind, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(value, ensure_ascii=False), expires_at, now),
+            )
+            conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_maxsize,),
+            )
+            conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        value = self._memory_get(key, now)
+        return value if value is not None else self._disk_get(key, now)
+
+    def set(self, key: str, value: Any, kind: str = "") -> None:
+        expires_at = time.time() + self.ttl_s
+        self._memory.set(key, (expires_at, value))
+        self._disk_set(key, value, kind, expires_at)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """`get` for the event loop: memory hits return inline, the disk lookup runs in a thread."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None or not self.path:
+            return value
+        return await asyncio.to_thread(self._disk_get, key, now)
+
+    async def aset(self, key: str, value: Any, kind: str = "") -> None:
+        """`set` for the event loop; the disk write runs in a thread."""
+        expires_at = time.time() + self.ttl_s
+        self._memory.set(key, (expires_at, value))
+        if self.path:
+            await asyncio.to_thread(self._disk_set, key, value, kind, expires_at)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        with self._lock:
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
@@ -0,0 +1,177 @@
+"""
+Pooled async OpenAI client
+
+One `AsyncOpenAI` client per event loop shares a keep-alive httpx connection
+pool, so concurrent LLM calls reuse connections instead of blocking the loop.
+Retries are done here with capped exponential backoff and full jitter (the
+SDK's own retries are disabled). With `llm_mock` enabled the client talks to
+an in-process mock transport that answers like the chat completions API.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+MOCK_ANALYSIS = {
+    "executive_summary": "Mock analysis: emissions are above the allocated allowances.",
+    "key_findings": ["Scope 2 is the largest source", "EU ETS deficit detected", "Intensity trend is flat"],
+    "priority_areas": ["Energy efficiency", "Renewable electricity", "Allowance hedging"],
+    "financial_impact": "€0",
+    "compliance_status": "Monitoring required",
+}
+MOCK_RECOMMENDATIONS = [
+    {
+        "title": "Mock recommendation",
+        "description": "Switch electricity supply to renewable sources",
+        "cost": "€10,000",
+        "annual_savings": "€12,000",
+        "timeline": "6 months",
+        "priority": "high",
+        "emission_reduction": "100 tCO₂e",
+    }
+]
+MOCK_RISKS = {
+    "overall_risk_level": "Medium",
+    "risks": [{"risk": "Mock compliance risk", "probability": "Medium", "impact": "€0", "mitigation": "Monitor"}],
+}
+
+
+def _mock_content(prompt: str) -> str:
+    if '"overall_risk_level"' in prompt:
+        return json.dumps(MOCK_RISKS, ensure_ascii=False)
+    if '"executive_summary"' in prompt:
+        return json.dumps(MOCK_ANALYSIS, ensure_ascii=False)
+    if '"emission_reduction"' in prompt:
+        return json.dumps(MOCK_RECOMMENDATIONS, ensure_ascii=False)
+    return (
+        "Mock explanation: emissions are concentrated in purchased electricity.\n"
+        "- Move electricity supply to renewable contracts\n"
+        "- Upgrade compressors and lighting\n"
+        "- Track intensity monthly against targets"
+    )
+
+
+def mock_handler(request: httpx.Request) -> httpx.Response:
+    """Answer chat completion requests with canned content matching the prompt type."""
+    body = json.loads(request.content or b"{}")
+    messages = body.get("messages") or [{}]
+    content = _mock_content(messages[-1].get("content", ""))
+    if body.get("stream"):
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=mock_stream_body(content, body.get("model", "mock")),
+        )
+    return httpx.Response(
+        200,
+        json={
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        },
+    )
+
+
+def mock_stream_body(content: str, model: str = "mock") -> bytes:
+    """Server-sent chat completion chunks carrying `content` one word at a time."""
+    created = int(time.time())
+    events = []
+    for piece in re.findall(r"\S+\s*|\s+", content):
+        chunk = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }
+        events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode("utf-8")
+
+
+def build_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> AsyncOpenAI:
+    """Create an `AsyncOpenAI` client on a pooled keep-alive httpx client."""
+    if transport is None and settings.llm_mock:
+        transport = httpx.MockTransport(mock_handler)
+    http_client = httpx.AsyncClient(
+        transport=transport,
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry_s,
+        ),
+        timeout=httpx.Timeout(settings.llm_call_timeout_s, connect=5.0),
+    )
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key or "mock",
+        base_url=settings.openai_base_url or None,
+        http_client=http_client,
+        max_retries=0,
+    )
+
+
+class ClientPool:
+    """Lazily built client per running event loop (httpx pools cannot cross loops)."""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.transport = transport
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = build_client(self.transport)
+        return client
+
+    async def aclose(self) -> None:
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, APIConnectionError):  # includes timeouts
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter delay for the given retry attempt (0-based)."""
+    cap = min(settings.llm_retry_max_delay_s, settings.llm_retry_base_delay_s * 2**attempt)
+    return random.uniform(0, cap)
+
+
+async def with_retries(call: Callable[[], Awaitable[Any]], max_retries: Optional[int] = None) -> Any:
+    """Await `call()` and retry transient API errors with jittered exponential backoff."""
+    retries = settings.llm_max_retries if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"LLM call failed ({e!r}), retry {attempt + 1}/{retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -1,285 +1,339 @@
-import os
-import json
-from typing import Dict, List, Any, Optional
-from openai import OpenAI
+import asyncio
+import weakref
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional, Tuple
+import httpx
 from app.core.config import settings
+from app.services import prompts
+from app.services.insights import build_insights
+from app.services.json_extract import extract_json
+from app.services.llm_cache import LLMResponseCache, cache_key
+from app.services.llm_client import ClientPool, with_retries
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Inputs the insight prompts read; only these take part in the cache key
+PROMPT_FIELDS = ("total_emissions", "scope1", "scope2", "scope3", "eu_ets_allowances", "eu_ets_used", "eu_ets_price")
+
+
+class UnparsedResponse(ValueError):
+    """The model answered but not in the expected JSON shape; carries the fallback built from the text."""
+
+    def __init__(self, kind: str, fallback: Any):
+        super().__init__(f"Unparseable {kind} response")
+        self.fallback = fallback
+
+
 class LLMService:
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, cache: Optional[LLMResponseCache] = None):
+        self.clients = ClientPool(transport)
+        self.cache = cache or LLMResponseCache(
+            ttl_s=settings.llm_cache_ttl_s,
+            maxsize=settings.llm_cache_maxsize,
+            path=settings.llm_cache_path or None,
+            disk_maxsize=settings.llm_cache_disk_maxsize,
+        )
+        # Caps concurrent upstream calls from this worker (one semaphore per event loop)
+        self._semaphores = weakref.WeakKeyDictionary()
+    
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(settings.llm_max_concurrency)
+        return semaphore
+        
+    @property
+    def enabled(self) -> bool:
+        """LLM calls are opt-in; without them every method returns its fallback."""
+        return settings.llm_enabled and bool(settings.openai_api_key or settings.llm_mock or self.clients.transport)
+    
+    async def _complete(self, model: str, system: str, prompt: str, max_tokens: int) -> str:
+        """One chat completion on the pooled client, retried on transient errors."""
+        client = self.clients.get()
+        response = await with_retries(
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                max_tokens=max_tokens
+            )
+        )
+        return response.choices[0].message.content
+    
+    @staticmethod
+    def _prompt_inputs(data: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: data.get(field) for field in PROMPT_FIELDS}
+    
+    async def _cached(self, kind: str, inputs: Any, produce: Callable[[], Awaitable[Any]], version: Optional[str] = None) -> Any:
+        """Return the cached result for these inputs, or produce and store it; failures are not stored."""
+        key = cache_key(kind, version or prompts.get_template(kind).version, inputs)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return cached
+        result = await produce()
+        await self.cache.aset(key, result, kind)
+        return result
+    
+    async def aclose(self) -> None:
+        await self.clients.aclose()
+        
+    async def _guarded(self, name: str, call: Awaitable[Any], fallback: Callable[[], Any]) -> Tuple[Any, Optional[str]]:
+        """
+        Run one LLM leg under the concurrency cap and per-call timeout.
+        
+        Returns the result and None, or the fallback result and the leg name on failure.
+        """
+        try:
+            async with self._semaphore():
+                return await asyncio.wait_for(call, timeout=settings.llm_call_timeout_s), None
+        except UnparsedResponse as e:
+            logger.error(f"LLM {name} failed: {e!r}")
+            return e.fallback, name
+        except Exception as e:
+            logger.error(f"LLM {name} failed: {e!r}")
+            return fallback(), name
+    
+    async def gather_insights(self, emissions_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run analysis, recommendations and risk assessment concurrently.
+        
+        Each leg has its own timeout and fallback, so one failing leg yields a
+        partial result instead of failing the whole request.
+        """
+        legs = {
+            "analysis": (self._analysis, self._get_fallback_analysis),
+            "recommendations": (self._recommendations, self._get_fallback_recommendations),
+            "risk_assessment": (self._risk_assessment, self._get_fallback_risk_analysis),
+        }
+        results = await asyncio.gather(
+            *(
+                self._guarded(name, call(emissions_data), lambda fallback=fallback: fallback(emissions_data))
+                for name, (call, fallback) in legs.items()
+            )
+        )
+        insights = {name: value for name, (value, _) in zip(legs, results)}
+        insights["degraded"] = [failed for _, failed in results if failed]
+        return insights
         
     async def analyze_emissions_data(self, emissions_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyze emission data and provide AI-powered insights
         """
-        # Disable OpenAI calls to stay within free limits - use fallback only
-        return self._get_fallback_analysis(emissions_data)
-            
         try:
+            return await self._analysis(emissions_data)
+        except UnparsedResponse as e:
+            logger.error(f"LLM analysis failed: {e}")
+            return e.fallback
+        except Exception as e:
+            logger.error(f"LLM analysis failed: {e}")
+            return self._get_fallback_analysis(emissions_data)
+
+    async def _analysis(self, emissions_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Analysis leg; upstream and parse errors propagate to the caller."""
+        if not self.enabled:
+            return self._get_fallback_analysis(emissions_data)
+            
+        async def produce():
             prompt = self._build_emissions_analysis_prompt(emissions_data)
             
-            response = await self.client.chat.completions.create(
-                model="gpt-5",
-                messages=[
-                    {"role": "system", "content": "Sen bir karbon emisyonu analiz uzmanısın. Türkçe ve İngilizce analiz yapabilirsin. Verileri analiz edip actionable öneriler sun. GPT-5'in gelişmiş analiz yeteneklerini kullan."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
+            analysis_text = await self._complete(
+                "gpt-5",
+                prompts.ANALYSIS_SYSTEM,
+                prompt,
                 max_tokens=2000
             )
-            
-            analysis_text = response.choices[0].message.content
             return self._parse_llm_response(analysis_text, emissions_data)
             
-        except Exception as e:
-            logger.error(f"LLM analysis failed: {e}")
-            return self._get_fallback_analysis(emissions_data)
+        return await self._cached("analysis", self._prompt_inputs(emissions_data), produce)
     
     async def generate_explanation(self, prompt: str) -> str:
         """
         Generate AI-powered explanation from prompt
         """
-        # Disable OpenAI calls to stay within free limits - use fallback only
-        return self._get_fallback_explanation(prompt)
+        if not self.enabled:
+            return self._get_fallback_explanation(prompt)
             
-        try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a carbon emissions expert. Provide concise, actionable insights based on the data provided. Focus on specific metrics and practical recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
+        async def produce():
+            return await self._complete(
+                "gpt-4",
+                prompts.EXPLAIN_SYSTEM,
+                prompt,
                 max_tokens=500
             )
             
-            return response.choices[0].message.content
+        try:
+            return await self._cached("explanation", prompt, produce, version=prompts.EXPLAIN_SYSTEM_VERSION)
             
         except Exception as e:
             logger.error(f"LLM explanation failed: {e}")
             return self._get_fallback_explanation(prompt)
 
+    async def stream_explanation(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Stream an explanation as text deltas.
+        
+        Cached explanations and the fallback text are replayed as a stub stream
+        so callers handle every source the same way. If the upstream stream
+        fails before producing text, the fallback is streamed instead.
+        """
+        key = cache_key("explanation", prompts.EXPLAIN_SYSTEM_VERSION, prompt)
+        cached = await self.cache.aget(key) if self.enabled else None
+        if not self.enabled or cached is not None:
+            for piece in _word_chunks(cached or self._get_fallback_explanation(prompt)):
+                yield piece
+            return
+        
+        parts: List[str] = []
+        try:
+            client = self.clients.get()
+            async with self._semaphore():
+                stream = await with_retries(
+                    lambda: client.chat.completions.create(
+                        model="gpt-4",
+                        messages=[
+                            {"role": "system", "content": prompts.EXPLAIN_SYSTEM},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=0.7,
+                        max_tokens=500,
+                        stream=True
+                    )
+                )
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        except Exception as e:
+            logger.error(f"LLM explanation stream failed: {e!r}")
+            if not parts:
+                for piece in _word_chunks(self._get_fallback_explanation(prompt)):
+                    yield piece
+            return
+        
+        if parts:
+            await self.cache.aset(key, "".join(parts), "explanation")
+
     async def generate_recommendations(self, emissions_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Generate AI-powered carbon reduction recommendations
         """
-        # Disable OpenAI calls to stay within free limits - use fallback only
-        return self._get_fallback_recommendations(emissions_data)
-            
         try:
+            return await self._recommendations(emissions_data)
+        except UnparsedResponse as e:
+            logger.error(f"LLM recommendations failed: {e}")
+            return e.fallback
+        except Exception as e:
+            logger.error(f"LLM recommendations failed: {e}")
+            return self._get_fallback_recommendations(emissions_data)
+
+    async def _recommendations(self, emissions_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Recommendations leg; upstream and parse errors propagate to the caller."""
+        if not self.enabled:
+            return self._get_fallback_recommendations(emissions_data)
+            
+        async def produce():
             prompt = self._build_recommendations_prompt(emissions_data)
             
-            response = await self.client.chat.completions.create(
-                model="gpt-5",
-                messages=[
-                    {"role": "system", "content": "Sen bir sürdürülebilirlik danışmanısın. Karbon azaltma stratejileri konusunda uzman öneriler sun. GPT-5'in gelişmiş strateji geliştirme yeteneklerini kullan."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
+            recommendations_text = await self._complete(
+                "gpt-5",
+                prompts.RECOMMENDATIONS_SYSTEM,
+                prompt,
                 max_tokens=1500
             )
-            
-            recommendations_text = response.choices[0].message.content
             return self._parse_recommendations_response(recommendations_text)
             
-        except Exception as e:
-            logger.error(f"LLM recommendations failed: {e}")
-            return self._get_fallback_recommendations(emissions_data)
+        return await self._cached("recommendations", self._prompt_inputs(emissions_data), produce)
     
     async def assess_risks(self, emissions_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Assess carbon-related risks using AI
         """
-        # Disable OpenAI calls to stay within free limits - use fallback only
-        return self._get_fallback_risk_analysis(emissions_data)
-            
         try:
+            return await self._risk_assessment(emissions_data)
+        except UnparsedResponse as e:
+            logger.error(f"LLM risk assessment failed: {e}")
+            return e.fallback
+        except Exception as e:
+            logger.error(f"LLM risk assessment failed: {e}")
+            return self._get_fallback_risk_analysis(emissions_data)
+
+    async def _risk_assessment(self, emissions_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Risk assessment leg; upstream and parse errors propagate to the caller."""
+        if not self.enabled:
+            return self._get_fallback_risk_analysis(emissions_data)
+            
+        async def produce():
             prompt = self._build_risk_assessment_prompt(emissions_data)
             
-            response = await self.client.chat.completions.create(
-                model="gpt-5",
-                messages=[
-                    {"role": "system", "content": "Sen bir risk analiz uzmanısın. Karbon emisyonu ve iklim riskleri konusunda detaylı analiz yap. GPT-5'in gelişmiş risk değerlendirme yeteneklerini kullan."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
+            risk_text = await self._complete(
+                "gpt-5",
+                prompts.RISK_SYSTEM,
+                prompt,
                 max_tokens=1000
             )
-            
-            risk_text = response.choices[0].message.content
             return self._parse_risk_response(risk_text)
             
-        except Exception as e:
-            logger.error(f"LLM risk assessment failed: {e}")
-            return self._get_fallback_risk_analysis(emissions_data)
+        return await self._cached("risk_assessment", self._prompt_inputs(emissions_data), produce)
+    
+    @staticmethod
+    def _prompt_values(data: Dict[str, Any]) -> Dict[str, Any]:
+        total = data.get('total_emissions', 2847)
+        allowances = data.get('eu_ets_allowances', 2600)
+        used = data.get('eu_ets_used', 2847)
+        price = data.get('eu_ets_price', 85)
+        return {
+            "total_emissions": total,
+            "scope1": data.get('scope1', 891),
+            "scope2": data.get('scope2', 1456),
+            "scope3": data.get('scope3', 500),
+            "eu_ets_allowances": allowances,
+            "eu_ets_used": used,
+            "eu_ets_price": price,
+            "deficit": max(0, used - allowances),
+            "financial_impact": f"{price * max(0, used - allowances):,.0f}",
+        }
     
     def _build_emissions_analysis_prompt(self, data: Dict[str, Any]) -> str:
         """Build prompt for emissions analysis"""
-        import random
-        import time
-        
-        # Add some randomness to make each analysis unique
-        timestamp = int(time.time())
-        random_factor = random.randint(1, 100)
-        
-        return f"""
-        GPT-5 olarak aşağıdaki karbon emisyonu verilerini derinlemesine analiz et ve stratejik bir rapor hazırla (Analiz ID: {timestamp}-{random_factor}):
-
-        📊 VERİ SETİ:
-        Toplam Emisyonlar: {data.get('total_emissions', 2847)} tCO₂e
-        Scope 1 (Doğrudan): {data.get('scope1', 891)} tCO₂e
-        Scope 2 (Elektrik): {data.get('scope2', 1456)} tCO₂e  
-        Scope 3 (Diğer): {data.get('scope3', 500)} tCO₂e
-        EU ETS Allowances: {data.get('eu_ets_allowances', 2600)} tCO₂e
-        EU ETS Kullanımı: {data.get('eu_ets_used', 2847)} tCO₂e
-        Karbon Fiyatı: €{data.get('eu_ets_price', 85)}/tCO₂e
-        Analiz Tarihi: {time.strftime('%Y-%m-%d %H:%M')}
-
-        🎯 GPT-5 ANALİZ GÖREVİ:
-        1. **Stratejik Performans Değerlendirmesi**: Endüstri benchmarkları ile karşılaştır
-        2. **Kritik Emisyon Kaynakları**: Scope bazında detaylı analiz ve trendler
-        3. **EU ETS Stratejik Durumu**: Uyumluluk riski ve fırsatları
-        4. **Finansal Etki Modellemesi**: Kısa/orta/uzun vadeli maliyet projeksiyonları
-        5. **Öncelik Matrisi**: ROI ve etki bazında kritik alanlar
-        6. **Sürdürülebilirlik Yol Haritası**: 2025-2030 hedefleri
-
-        Her analiz benzersiz olmalı. GPT-5'in gelişmiş analitik yeteneklerini kullan.
-
-        JSON formatında yanıtla:
-        {{
-            "executive_summary": "Stratejik özet (2-3 cümle, veri-driven insights)",
-            "key_findings": ["Kritik bulgu 1", "Kritik bulgu 2", "Kritik bulgu 3"],
-            "priority_areas": ["Stratejik öncelik 1", "Stratejik öncelik 2", "Stratejik öncelik 3"],
-            "financial_impact": "€{data.get('eu_ets_price', 85) * max(0, data.get('eu_ets_used', 2847) - data.get('eu_ets_allowances', 2600)):,.0f}",
-            "compliance_status": "Stratejik uyumluluk durumu (risk/fırsat analizi)"
-        }}
-        """
+        return prompts.render("analysis", **self._prompt_values(data))
     
     def _build_recommendations_prompt(self, data: Dict[str, Any]) -> str:
         """Build prompt for recommendations"""
-        import random
-        import time
-        
-        timestamp = int(time.time())
-        random_factor = random.randint(1, 100)
-        
-        return f"""
-        Aşağıdaki emisyon verilerine göre karbon azaltma önerileri hazırla (Öneri ID: {timestamp}-{random_factor}):
-
-        Toplam: {data.get('total_emissions', 2847)} tCO₂e
-        Scope 1: {data.get('scope1', 891)} tCO₂e (Doğrudan)
-        Scope 2: {data.get('scope2', 1456)} tCO₂e (Elektrik)
-        Scope 3: {data.get('scope3', 500)} tCO₂e (Diğer)
-        EU ETS Açığı: {max(0, data.get('eu_ets_used', 2847) - data.get('eu_ets_allowances', 2600))} tCO₂e
-        Analiz Tarihi: {time.strftime('%Y-%m-%d %H:%M')}
-
-        Mevcut verilere göre en etkili 3-4 öneri hazırla. Her öneri farklı olmalı.
-
-        Her öneri için şunları belirt:
-        - Başlık (spesifik ve actionable)
-        - Açıklama (detaylı uygulama)
-        - Tahmini maliyet (gerçekçi)
-        - Yıllık tasarruf (hesaplanmış)
-        - Uygulama süresi (realistik)
-        - Öncelik seviyesi (high/medium/low)
-        - Beklenen emisyon azaltımı (tCO₂e)
-
-        JSON formatında yanıtla:
-        [
-            {{
-                "title": "Öneri başlığı",
-                "description": "Detaylı açıklama",
-                "cost": "€X,XXX",
-                "annual_savings": "€X,XXX",
-                "timeline": "X ay",
-                "priority": "high/medium/low",
-                "emission_reduction": "XXX tCO₂e"
-            }}
-        ]
-        """
+        return prompts.render("recommendations", **self._prompt_values(data))
     
     def _build_risk_assessment_prompt(self, data: Dict[str, Any]) -> str:
         """Build prompt for risk assessment"""
-        import random
-        import time
-        
-        timestamp = int(time.time())
-        random_factor = random.randint(1, 100)
-        
-        return f"""
-        Aşağıdaki verilere göre karbon risklerini değerlendir (Risk ID: {timestamp}-{random_factor}):
-
-        Toplam Emisyonlar: {data.get('total_emissions', 2847)} tCO₂e
-        EU ETS Allowances: {data.get('eu_ets_allowances', 2600)} tCO₂e
-        EU ETS Kullanımı: {data.get('eu_ets_used', 2847)} tCO₂e
-        EU ETS Açığı: {max(0, data.get('eu_ets_used', 2847) - data.get('eu_ets_allowances', 2600))} tCO₂e
-        Fiyat: €{data.get('eu_ets_price', 85)}/tCO₂e
-        Analiz Tarihi: {time.strftime('%Y-%m-%d %H:%M')}
-
-        Mevcut verilere göre riskleri şu kategorilerde değerlendir:
-        1. Uyumluluk riskleri (EU ETS, yasal)
-        2. Finansal riskler (karbon fiyatı, maliyet)
-        3. Operasyonel riskler (enerji, tedarik)
-        4. Reputasyon riskleri (sürdürülebilirlik)
-
-        Her risk için gerçekçi değerlendirmeler yap:
-        - Risk adı (spesifik)
-        - Olasılık (High/Medium/Low)
-        - Etki (€ miktarı, hesaplanmış)
-        - Azaltma stratejisi (actionable)
-
-        JSON formatında yanıtla:
-        {{
-            "overall_risk_level": "High/Medium/Low",
-            "risks": [
-                {{
-                    "risk": "Risk adı",
-                    "probability": "High/Medium/Low", 
-                    "impact": "€X,XXX",
-                    "mitigation": "Azaltma stratejisi"
-                }}
-            ]
-        }}
-        """
+        return prompts.render("risk_assessment", **self._prompt_values(data))
     
     def _parse_llm_response(self, response_text: str, original_data: Dict[str, Any]) -> Dict[str, Any]:
         """Parse LLM response for emissions analysis"""
-        try:
-            # Try to extract JSON from response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            if start_idx != -1 and end_idx != -1:
-                json_str = response_text[start_idx:end_idx]
-                return json.loads(json_str)
-        except:
-            pass
+        parsed = extract_json(response_text, "object")
+        if parsed is not None:
+            return parsed
         
-        # Fallback parsing
-        return {
+        # Fallback parsing; raised so it is not cached
+        raise UnparsedResponse("analysis", {
             "executive_summary": response_text[:500] + "..." if len(response_text) > 500 else response_text,
             "key_findings": ["LLM analizi tamamlandı"],
             "priority_areas": ["Emisyon azaltımı", "EU ETS uyumluluğu"],
             "financial_impact": f"€{original_data.get('eu_ets_price', 0) * (original_data.get('eu_ets_used', 0) - original_data.get('eu_ets_allowances', 0)):,.0f}",
             "compliance_status": "Değerlendirme gerekli"
-        }
+        })
     
     def _parse_recommendations_response(self, response_text: str) -> List[Dict[str, Any]]:
         """Parse LLM response for recommendations"""
-        try:
-            # Try to extract JSON array from response
-            start_idx = response_text.find('[')
-            end_idx = response_text.rfind(']') + 1
-            if start_idx != -1 and end_idx != -1:
-                json_str = response_text[start_idx:end_idx]
-                return json.loads(json_str)
-        except:
-            pass
+        parsed = extract_json(response_text, "array")
+        if parsed is not None:
+            return parsed
         
-        # Fallback recommendations
-        return [
+        # Fallback recommendations; raised so they are not cached
+        raise UnparsedResponse("recommendations", [
             {
                 "title": "Yenilenebilir Enerji Geçişi",
                 "description": "Elektrik tüketimini yenilenebilir kaynaklardan karşıla",
@@ -289,22 +343,16 @@ class LLMService:
                 "priority": "high",
                 "emission_reduction": "728 tCO₂e"
             }
-        ]
+        ])
     
     def _parse_risk_response(self, response_text: str) -> Dict[str, Any]:
         """Parse LLM response for risk assessment"""
-        try:
-            # Try to extract JSON from response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            if start_idx != -1 and end_idx != -1:
-                json_str = response_text[start_idx:end_idx]
-                return json.loads(json_str)
-        except:
-            pass
+        parsed = extract_json(response_text, "object")
+        if parsed is not None:
+            return parsed
         
-        # Fallback risk analysis
-        return {
+        # Fallback risk analysis; raised so it is not cached
+        raise UnparsedResponse("risk_assessment", {
             "overall_risk_level": "Medium",
             "risks": [
                 {
@@ -314,195 +362,19 @@ class LLMService:
                     "mitigation": "Enerji verimliliği önlemleri uygula"
                 }
             ]
-        }
+        })
     
     def _get_fallback_analysis(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Fallback analysis when LLM is not available"""
-        import random
-        import time
-        
-        # Create dynamic fallback responses
-        timestamp = int(time.time())
-        random_factor = random.randint(1, 100)
-        
-        deficit = max(0, data.get('eu_ets_used', 2847) - data.get('eu_ets_allowances', 2800))
-        
-        # GPT-5 style advanced summaries
-        summaries = [
-            f"🚨 CRITICAL: {data.get('total_emissions', 2847)} tCO₂e emissions detected. EU ETS limit exceeded by {((data.get('eu_ets_used', 2847) - data.get('eu_ets_allowances', 2800)) / data.get('eu_ets_allowances', 2800) * 100):.1f}%. Strategic intervention required. Immediate action needed to address compliance risks and financial impact.",
-            f"📊 STRATEGIC ANALYSIS: Carbon footprint of {data.get('total_emissions', 2847)} tCO₂e with Scope 2 dominance at {(data.get('scope2', 1456) / data.get('total_emissions', 2847) * 100):.1f}%. EU ETS deficit of {deficit} tCO₂e requires urgent attention. Energy efficiency improvements and renewable energy transition are critical priorities.",
-            f"🎯 PERFORMANCE ASSESSMENT: Total emissions of {data.get('total_emissions', 2847)} tCO₂e exceed industry benchmarks. EU ETS cost impact of €{data.get('eu_ets_price', 85) * deficit:,.0f} demands immediate strategic response. Focus on operational efficiency and carbon reduction initiatives."
-        ]
-        
-        findings = [
-            [f"🔍 Scope 2 emissions dominant: {data.get('scope2', 1456)} tCO₂e ({(data.get('scope2', 1456) / data.get('total_emissions', 2847) * 100):.1f}%)", f"⚠️ Critical EU ETS deficit: {deficit} tCO₂e", f"💰 Total cost impact: €{data.get('eu_ets_price', 85) * deficit:,.0f}"],
-            [f"⚡ Electricity consumption critical: {data.get('scope2', 1456)} tCO₂e", f"🚨 Compliance risk: {deficit} tCO₂e deficit", f"📈 Financial impact: €{data.get('eu_ets_price', 85) * deficit:,.0f}"],
-            [f"🏭 Scope 1 emissions: {data.get('scope1', 891)} tCO₂e", f"📊 EU ETS limit exceeded: {deficit} tCO₂e", f"💸 Additional cost: €{data.get('eu_ets_price', 85) * deficit:,.0f}"]
-        ]
-        
-        priorities = [
-            ["🎯 Energy efficiency (ROI: 138%)", "⚖️ EU ETS compliance (Critical)", "💡 Energy savings (Quick wins)"],
-            ["🌱 Renewable energy (Long-term)", "📉 Carbon reduction (Strategic)", "⚙️ Operational improvement (Medium-term)"],
-            ["🔋 Scope 2 optimization (High impact)", "📊 EU ETS management (Risk reduction)", "🌍 Sustainability (Reputation)"]
-        ]
-        
-        return {
-            "executive_summary": random.choice(summaries),
-            "key_findings": random.choice(findings),
-            "priority_areas": random.choice(priorities),
-            "financial_impact": f"€{data.get('eu_ets_price', 85) * deficit:,.0f}",
-            "compliance_status": "Monitoring required" if deficit > 0 else "Compliant"
-        }
+        """Fallback analysis when LLM is not available (rule-based, from the given figures)"""
+        return build_insights(data)["analysis"]
     
     def _get_fallback_recommendations(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Fallback recommendations when LLM is not available"""
-        import random
-        import time
-        
-        timestamp = int(time.time())
-        random_factor = random.randint(1, 100)
-        
-        deficit = max(0, data.get('eu_ets_used', 2847) - data.get('eu_ets_allowances', 2800))
-        
-        # Different recommendation sets
-        recommendation_sets = [
-            [
-                {
-                    "title": "Renewable Energy Transition",
-                    "description": "Source electricity consumption from renewable sources",
-                    "cost": "€45,000",
-                    "annual_savings": "€62,244",
-                    "timeline": "6 months",
-                    "priority": "high",
-                    "emission_reduction": "728 tCO₂e"
-                },
-                {
-                    "title": "Fleet Electrification",
-                    "description": "Replace diesel vehicles with electric vehicles",
-                    "cost": "€120,000",
-                    "annual_savings": "€9,145",
-                    "timeline": "12 months",
-                    "priority": "medium",
-                    "emission_reduction": "107 tCO₂e"
-                }
-            ],
-            [
-                {
-                    "title": "Energy Efficiency Program",
-                    "description": "Improve building and facility energy efficiency",
-                    "cost": "€75,000",
-                    "annual_savings": "€45,000",
-                    "timeline": "8 months",
-                    "priority": "high",
-                    "emission_reduction": "450 tCO₂e"
-                },
-                {
-                    "title": "Carbon Offset Strategy",
-                    "description": "Offset projects to close EU ETS deficit",
-                    "cost": "€21,000",
-                    "annual_savings": "€0",
-                    "timeline": "3 months",
-                    "priority": "high",
-                    "emission_reduction": f"{deficit} tCO₂e"
-                }
-            ],
-            [
-                {
-                    "title": "Smart Energy Management",
-                    "description": "IoT-based energy monitoring and optimization system",
-                    "cost": "€35,000",
-                    "annual_savings": "€28,000",
-                    "timeline": "4 months",
-                    "priority": "medium",
-                    "emission_reduction": "320 tCO₂e"
-                },
-                {
-                    "title": "Sustainable Supply Chain",
-                    "description": "Reduce supplier carbon footprint",
-                    "cost": "€60,000",
-                    "annual_savings": "€35,000",
-                    "timeline": "10 months",
-                    "priority": "medium",
-                    "emission_reduction": "280 tCO₂e"
-                }
-            ]
-        ]
-        
-        return random.choice(recommendation_sets)
+        return build_insights(data)["recommendations"]
     
     def _get_fallback_risk_analysis(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Fallback risk analysis when LLM is not available"""
-        import random
-        import time
-        
-        timestamp = int(time.time())
-        random_factor = random.randint(1, 100)
-        deficit = max(0, data.get('eu_ets_used', 2847) - data.get('eu_ets_allowances', 2800))
-        
-        # Dynamic risk content
-        risk_contents = [
-            f"🚨 CRITICAL RISK ASSESSMENT: EU ETS limit exceeded with {deficit} tCO₂e deficit. Immediate intervention required to address compliance risks and financial exposure. Strategic action plan needed to mitigate regulatory and cost impacts.",
-            f"⚠️ RISK ANALYSIS: High carbon price volatility with EU ETS cost impact of €{data.get('eu_ets_price', 85) * deficit:,.0f}. Strategic planning essential for risk management. Focus on hedging strategies and operational efficiency improvements.",
-            f"📊 RISK MATRIX: Total emissions of {data.get('total_emissions', 2847)} tCO₂e with Scope 2 dominant risk profile. Compliance risk at critical level requiring immediate attention. Implement comprehensive risk mitigation framework."
-        ]
-        
-        risk_sets = [
-            [
-                {
-                    "risk": "🚨 EU ETS Non-compliance Risk",
-                    "probability": "High",
-                    "impact": f"€{data.get('eu_ets_price', 85) * deficit:,.0f}",
-                    "mitigation": "Implement energy efficiency measures",
-                    "details": f"EU ETS limit {data.get('eu_ets_allowances', 2600)} tCO₂e, usage {data.get('eu_ets_used', 2847)} tCO₂e. Deficit: {deficit} tCO₂e requiring immediate action to avoid penalties and ensure regulatory compliance."
-                },
-                {
-                    "risk": "📈 Carbon Price Volatility",
-                    "probability": "Medium",
-                    "impact": "€15,000",
-                    "mitigation": "Hedge carbon prices",
-                    "details": f"Carbon prices at €{data.get('eu_ets_price', 85)}/tCO₂e with 20-30% increase expected over next 12 months. Price volatility creates financial uncertainty requiring strategic hedging approach."
-                }
-            ],
-            [
-                {
-                    "risk": "⚡ Electricity Consumption Risk",
-                    "probability": "High",
-                    "impact": f"€{data.get('eu_ets_price', 85) * data.get('scope2', 1456) * 0.1:,.0f}",
-                    "mitigation": "Transition to renewable energy",
-                    "details": f"Scope 2 emissions of {data.get('scope2', 1456)} tCO₂e represent significant risk. Electricity price increases and grid carbon intensity fluctuations create operational and financial exposure requiring renewable energy transition."
-                },
-                {
-                    "risk": "🏭 Operational Risk",
-                    "probability": "Medium",
-                    "impact": "€25,000",
-                    "mitigation": "Operational improvement",
-                    "details": f"Scope 1 emissions of {data.get('scope1', 891)} tCO₂e indicate efficiency improvement potential. Operational risks include equipment failures, process inefficiencies, and regulatory changes affecting direct emissions."
-                }
-            ],
-            [
-                {
-                    "risk": "📊 Compliance Risk",
-                    "probability": "High",
-                    "impact": f"€{data.get('eu_ets_price', 85) * deficit:,.0f}",
-                    "mitigation": "Develop EU ETS strategy",
-                    "details": f"Total emissions of {data.get('total_emissions', 2847)} tCO₂e exceed industry averages. Regulatory compliance requires comprehensive carbon management strategy with clear reduction targets and monitoring systems."
-                },
-                {
-                    "risk": "🌍 Reputation Risk",
-                    "probability": "Medium",
-                    "impact": "€50,000",
-                    "mitigation": "Sustainability reporting",
-                    "details": "High carbon footprint creates reputation exposure. Increasing customer and investor pressure for environmental responsibility requires transparent sustainability reporting and clear carbon reduction commitments."
-                }
-            ]
-        ]
-        
-        return {
-            "title": "Risk Analysis",
-            "content": random.choice(risk_contents),
-            "overall_risk_level": "High" if deficit > 0 else "Medium",
-            "risks": random.choice(risk_sets)
-        }
+        return build_insights(data)["risk_assessment"]
 
     def _get_fallback_explanation(self, prompt: str) -> str:
         """
@@ -519,5 +391,8 @@ class LLMService:
         else:
             return "Analysis completed successfully. Review the data for optimization opportunities and implement efficiency improvements."
 
+def _word_chunks(text: str) -> List[str]:
+    return re.findall(r"\S+\s*|\s+", text)
+
 # Global instance
 llm_service = LLMService()
\ No newline at end of file
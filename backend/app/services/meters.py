@@ -0,0 +1,258 @@
+"""
+Interval meter store
+
+Fixed-interval meter readings (e.g. 15-minute kWh) are kept out of the
+relational tables. Each meter-month is one float32 `.npy` block under
+`METER_STORE_PATH/<meter_id>/<YYYY-MM>.npy` with one slot per interval and
+NaN for missing readings (35,040 readings a year take about 140 kB).
+Blocks are rewritten atomically on ingest and memory-mapped on read.
+
+`meter_blocks` rows hold the location and per-month aggregates (total,
+reading count, peak). Monthly totals and whole-month peaks therefore come
+from one indexed query without touching the arrays. After each ingest,
+every touched month is written as a single UploadedActivity (amount =
+monthly total), so the emissions engine sees meters like any other
+activity without per-reading rows.
+"""
+
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.activity import UploadedActivity
+from ..models.meter import Meter, MeterBlock
+from ..models.org import Facility
+from .calendar import resolve_period_ids
+
+BLOCK_DTYPE = np.float32
+MINUTES_PER_DAY = 1440
+
+
+def _month_add(month: date, n: int = 1) -> date:
+    idx = month.year * 12 + month.month - 1 + n
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def slots_per_day(meter: Meter) -> int:
+    if MINUTES_PER_DAY % meter.interval_minutes:
+        raise ValueError("interval_minutes must divide a day evenly")
+    return MINUTES_PER_DAY // meter.interval_minutes
+
+
+def month_slots(meter: Meter, month: date) -> int:
+    return (_month_add(month) - month).days * slots_per_day(meter)
+
+
+def block_path(meter_id: int, month: date) -> Path:
+    return Path(settings.meter_store_path) / str(meter_id) / f"{month:%Y-%m}.npy"
+
+
+def load_block(block: MeterBlock) -> np.ndarray:
+    """Read-only memory map of a block's readings."""
+    return np.load(block.path, mmap_mode="r")
+
+
+def _write_block(path: Path, values: np.ndarray) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A temp file per writer: a shared name would let two writers replace each other's half-written file
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.stem, suffix=".tmp.npy", delete=False) as tmp:
+        try:
+            np.save(tmp, values)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    os.replace(tmp.name, path)
+
+
+_meter_locks: Dict[int, threading.Lock] = {}
+_meter_locks_guard = threading.Lock()
+
+
+def _meter_lock(meter_id: int) -> threading.Lock:
+    with _meter_locks_guard:
+        return _meter_locks.setdefault(meter_id, threading.Lock())
+
+
+def to_utc_minutes(timestamps: Sequence[datetime]) -> np.ndarray:
+    """datetime64[m] in naive UTC; timezone-aware inputs are converted, naive ones are taken as UTC."""
+    return np.array(
+        [t.astimezone(timezone.utc).replace(tzinfo=None) if t.tzinfo else t for t in timestamps],
+        dtype="datetime64[m]",
+    )
+
+
+def regular_timestamps(meter: Meter, start: datetime, count: int) -> np.ndarray:
+    first = to_utc_minutes([start])[0]
+    return first + np.arange(count) * np.timedelta64(meter.interval_minutes, "m")
+
+
+def ingest_readings(db: Session, meter: Meter, timestamps: np.ndarray, values: np.ndarray) -> Dict:
+    """
+    Write readings into their meter-month blocks and refresh the block aggregates.
+
+    Timestamps are floored to the meter interval; later readings of the same
+    slot (in input order) overwrite earlier ones and existing data. NaN marks
+    a gap and clears the slot. Ingests of the same meter run one at a time,
+    so concurrent uploads cannot lose each other's readings.
+
+    Returns:
+        Dict with the number of readings written, the touched months and
+        the number of monthly activities synced
+    """
+    timestamps = np.asarray(timestamps, dtype="datetime64[m]")
+    values = np.asarray(values, dtype=BLOCK_DTYPE)
+    if timestamps.shape != values.shape or timestamps.ndim != 1:
+        raise ValueError("timestamps and values must be 1-D arrays of equal length")
+    slots_per_day(meter)  # validates the interval
+    if values.size == 0:
+        return {"readings": 0, "months": [], "activities_synced": 0}
+    with _meter_lock(meter.id):
+        return _ingest_locked(db, meter, timestamps, values)
+
+
+def _ingest_locked(db: Session, meter: Meter, timestamps: np.ndarray, values: np.ndarray) -> Dict:
+    months, inverse = np.unique(timestamps.astype("datetime64[M]"), return_inverse=True)
+    existing = {
+        b.month: b
+        for b in db.scalars(
+            select(MeterBlock).where(MeterBlock.meter_id == meter.id, MeterBlock.month.in_(months.tolist()))
+        )
+    }
+    touched = []
+    for i, month64 in enumerate(months):
+        month = month64.astype(date)
+        sel = inverse == i
+        slots = ((timestamps[sel] - month64.astype("datetime64[m]")).astype(np.int64)) // meter.interval_minutes
+        block = existing.get(month)
+        path = block_path(meter.id, month)
+        n_slots = month_slots(meter, month)
+        data = np.load(block.path) if block is not None and os.path.exists(block.path) else np.full(n_slots, np.nan, BLOCK_DTYPE)
+        data[slots] = values[sel]
+        _write_block(path, data)
+
+        if block is None:
+            block = MeterBlock(meter_id=meter.id, month=month, path=str(path), slots=n_slots)
+            db.add(block)
+        present = ~np.isnan(data)
+        block.path = str(path)
+        block.readings = int(present.sum())
+        block.total = float(data.sum(dtype=np.float64, where=present))
+        block.peak_slot = int(np.nanargmax(data)) if block.readings else None
+        block.peak = float(data[block.peak_slot]) if block.readings else None
+        touched.append(block)
+
+    db.flush()
+    synced = sync_monthly_activities(db, meter, touched)
+    db.commit()
+    return {"readings": int(values.size), "months": [b.month for b in touched], "activities_synced": synced}
+
+
+def sync_monthly_activities(db: Session, meter: Meter, blocks: List[MeterBlock]) -> int:
+    """Upsert one UploadedActivity per meter-month carrying the monthly total."""
+    facility = db.get(Facility, meter.facility_id)
+    labels = [f"{b.month:%Y-%m}" for b in blocks]
+    period_ids = resolve_period_ids(db, labels)
+    for block, label in zip(blocks, labels):
+        activity = db.get(UploadedActivity, block.activity_id) if block.activity_id else None
+        if activity is None:
+            activity = UploadedActivity(
+                entity_id=facility.entity_id,
+                facility_id=meter.facility_id,
+                scope=meter.scope,
+                activity_name=f"Meter {meter.name}",
+                unit=meter.unit,
+                factor_code=meter.factor_code,
+                period=label,
+                period_id=period_ids[label],
+                amount=block.total,
+            )
+            db.add(activity)
+            db.flush()
+            block.activity_id = activity.id
+        else:
+            activity.amount = block.total
+            activity.needs_recalc = True
+            activity.needs_rescore = True
+    return len(blocks)
+
+
+def _blocks(db: Session, meter: Meter, start: date, end: date) -> List[MeterBlock]:
+    """Blocks of months intersecting [start, end)."""
+    first = start.replace(day=1)
+    return db.scalars(
+        select(MeterBlock)
+        .where(MeterBlock.meter_id == meter.id, MeterBlock.month >= first, MeterBlock.month < end)
+        .order_by(MeterBlock.month)
+    ).all()
+
+
+def _window(block: MeterBlock, start: date, end: date, per_day: int) -> slice:
+    """Slot range of the block that lies inside [start, end)."""
+    lo = max((start - block.month).days, 0) * per_day
+    hi = min((end - block.month).days * per_day, block.slots)
+    return slice(lo, max(hi, lo))
+
+
+def monthly_totals(db: Session, meter: Meter, start: date, end: date) -> List[Dict]:
+    """Per-month totals from the block aggregates (no array reads); months must be whole."""
+    return [
+        {"start": b.month, "total": b.total, "readings": b.readings, "peak": b.peak}
+        for b in _blocks(db, meter, start, end)
+    ]
+
+
+def daily_totals(db: Session, meter: Meter, start: date, end: date) -> List[Dict]:
+    """Per-day totals, reading counts and peaks for days in [start, end) with at least one reading."""
+    per_day = slots_per_day(meter)
+    out = []
+    for block in _blocks(db, meter, start, end):
+        window = _window(block, start, end, per_day)
+        days = np.asarray(load_block(block)[window]).reshape(-1, per_day)
+        present = ~np.isnan(days)
+        counts = present.sum(axis=1)
+        totals = days.sum(axis=1, dtype=np.float64, where=present)
+        peaks = np.where(present, days, -np.inf).max(axis=1)
+        first_day = block.month + timedelta(days=window.start // per_day)
+        for i in np.flatnonzero(counts):
+            out.append({
+                "start": first_day + timedelta(days=int(i)),
+                "total": float(totals[i]),
+                "readings": int(counts[i]),
+                "peak": float(peaks[i]),
+            })
+    return out
+
+
+def peak_reading(db: Session, meter: Meter, start: date, end: date) -> Dict:
+    """Highest interval reading in [start, end) with its timestamp and the implied average demand."""
+    per_day = slots_per_day(meter)
+    best: Optional[tuple] = None
+    for block in _blocks(db, meter, start, end):
+        if not block.readings:
+            continue
+        window = _window(block, start, end, per_day)
+        if window.start == 0 and window.stop == block.slots:
+            candidate = (block.peak, block, block.peak_slot)  # whole month: stored aggregate
+        else:
+            data = np.asarray(load_block(block)[window])
+            if np.isnan(data).all():
+                continue
+            slot = int(np.nanargmax(data))
+            candidate = (float(data[slot]), block, window.start + slot)
+        if best is None or candidate[0] > best[0]:
+            best = candidate
+    if best is None:
+        return {"timestamp": None, "value": None, "demand_kw": None}
+    value, block, slot = best
+    timestamp = datetime.combine(block.month, datetime.min.time()) + timedelta(minutes=slot * meter.interval_minutes)
+    demand = value * 60 / meter.interval_minutes if meter.unit == "kWh" else None
+    return {"timestamp": timestamp, "value": value, "demand_kw": demand}
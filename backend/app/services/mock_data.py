@@ -1,5 +1,8 @@
 from datetime import date, timedelta
 from typing import List, Dict, Any
+
+import numpy as np
+
 from ..schemas.common import KPI, ScopeShare, CategoryEmission, Allowance, IntensityPoint
 
 # Mock facilities
@@ -11,31 +14,44 @@ FACILITIES = [
     {"id": 5, "name": "Antalya Branch", "city": "Antalya", "country": "Turkey"},
 ]
 
+def _day_noise(ordinals: np.ndarray, modulus: int) -> np.ndarray:
+    """Deterministic per-day pseudo-random integers in [0, modulus) (Knuth multiplicative hash)."""
+    return (ordinals.astype(np.uint64) * np.uint64(2654435761) % np.uint64(2**32) % np.uint64(modulus)).astype(float)
+
+
 # Mock time series data for 2025
 def generate_time_series(start_date: date, end_date: date) -> List[Dict[str, Any]]:
     """Generate mock time series data for the given date range"""
-    data = []
-    current_date = start_date
-    
-    while current_date <= end_date:
-        # Generate realistic daily emissions with some variation
-        base_emissions = 100
-        seasonal_factor = 1 + 0.3 * abs((current_date.month - 6) / 6)  # Higher in summer/winter
-        daily_variation = 0.8 + 0.4 * (hash(str(current_date)) % 100) / 100
-        
-        daily_emissions = base_emissions * seasonal_factor * daily_variation
-        
-        data.append({
-            "date": current_date,
-            "emissions": round(daily_emissions, 2),
-            "scope_1": round(daily_emissions * 0.4, 2),
-            "scope_2": round(daily_emissions * 0.35, 2),
-            "scope_3": round(daily_emissions * 0.25, 2),
-            "revenue": round(50000 + (hash(str(current_date)) % 20000), 2),
-        })
-        current_date += timedelta(days=1)
-    
-    return data
+    days = np.arange(np.datetime64(start_date, "D"), np.datetime64(end_date, "D") + 1)
+    if days.size == 0:
+        return []
+    ordinals = days.astype(np.int64)
+    months = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+
+    # Realistic daily emissions: higher in summer/winter, with per-day variation
+    seasonal_factor = 1 + 0.3 * np.abs((months - 6) / 6)
+    daily_variation = 0.8 + 0.4 * _day_noise(ordinals, 100) / 100
+    emissions = 100 * seasonal_factor * daily_variation
+    revenue = 50000 + _day_noise(ordinals + 7919, 20000)
+
+    return [
+        {
+            "date": d,
+            "emissions": e,
+            "scope_1": s1,
+            "scope_2": s2,
+            "scope_3": s3,
+            "revenue": r,
+        }
+        for d, e, s1, s2, s3, r in zip(
+            days.tolist(),
+            np.round(emissions, 2).tolist(),
+            np.round(emissions * 0.4, 2).tolist(),
+            np.round(emissions * 0.35, 2).tolist(),
+            np.round(emissions * 0.25, 2).tolist(),
+            revenue.tolist(),
+        )
+    ]
 
 def get_mock_kpis() -> List[KPI]:
     """Get mock KPI data"""
@@ -13,7 +13,7 @@ REQUIRED_COLUMNS = [
 ]
 
 
-def _read_dataframe(file_bytes: bytes, filename: str) -> pd.DataFrame:
+def read_dataframe(file_bytes: bytes, filename: str) -> pd.DataFrame:
     if filename.lower().endswith(".csv"):
         return pd.read_csv(pd.io.common.BytesIO(file_bytes))
     if filename.lower().endswith(".xlsx") or filename.lower().endswith(".xls"):
@@ -22,7 +22,7 @@ def _read_dataframe(file_bytes: bytes, filename: str) -> pd.DataFrame:
 
 
 def parse_activity_file(file_bytes: bytes, filename: str) -> Tuple[pd.DataFrame, List[str]]:
-    df = _read_dataframe(file_bytes, filename)
+    df = read_dataframe(file_bytes, filename)
     missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
     return df, missing
 
@@ -0,0 +1,76 @@
+import re
+from datetime import date, timedelta
+from typing import List, Tuple
+
+_YEAR = re.compile(r"^(\d{4})$")
+_QUARTER = re.compile(r"^(\d{4})-?Q([1-4])$", re.IGNORECASE)
+_HALF = re.compile(r"^(\d{4})-?H([12])$", re.IGNORECASE)
+_MONTH = re.compile(r"^(\d{4})-(\d{1,2})$")
+
+
+def _month_end(year: int, month: int) -> date:
+    if month == 12:
+        return date(year, 12, 31)
+    return date(year, month + 1, 1) - timedelta(days=1)
+
+
+def parse_period(label: str) -> Tuple[date, date]:
+    """Parse a reporting period label (2025, 2025-H1, 2025-Q3, 2025-07) into inclusive start/end dates."""
+    text = str(label).strip()
+    if m := _YEAR.match(text):
+        year = int(m.group(1))
+        return date(year, 1, 1), date(year, 12, 31)
+    if m := _HALF.match(text):
+        year, half = int(m.group(1)), int(m.group(2))
+        first = 1 + 6 * (half - 1)
+        return date(year, first, 1), _month_end(year, first + 5)
+    if m := _QUARTER.match(text):
+        year, quarter = int(m.group(1)), int(m.group(2))
+        first = 1 + 3 * (quarter - 1)
+        return date(year, first, 1), _month_end(year, first + 2)
+    if m := _MONTH.match(text):
+        year, month = int(m.group(1)), int(m.group(2))
+        if 1 <= month <= 12:
+            return date(year, month, 1), _month_end(year, month)
+    raise ValueError(f"Unrecognised period: {label}")
+
+
+GRANULARITIES = {1: "month", 3: "quarter", 6: "half", 12: "year"}
+
+
+def granularity(start: date, end: date) -> str:
+    """month/quarter/half/year by the number of months covered, else "custom"."""
+    return GRANULARITIES.get(month_index(end) - month_index(start) + 1, "custom")
+
+
+def canonical_label(start: date, end: date) -> str:
+    """Normalised label of a parsed period (2025-Q3 for 2025Q3, 2025-07 for 2025-7)."""
+    kind = granularity(start, end)
+    if kind == "year":
+        return f"{start.year}"
+    if kind == "half":
+        return f"{start.year}-H{(start.month - 1) // 6 + 1}"
+    if kind == "quarter":
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    if kind == "month":
+        return f"{start.year}-{start.month:02d}"
+    return f"{start.isoformat()}/{end.isoformat()}"
+
+
+def month_index(d: date) -> int:
+    """Months since year 0; consecutive calendar months map to consecutive integers."""
+    return d.year * 12 + d.month - 1
+
+
+def month_from_index(idx: int) -> date:
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def month_grid(start: date, end: date) -> List[date]:
+    return [month_from_index(i) for i in range(month_index(start), month_index(end) + 1)]
+
+
+def period_months(label: str) -> List[int]:
+    """Month indices covered by a period label."""
+    start, end = parse_period(label)
+    return list(range(month_index(start), month_index(end) + 1))
@@ -0,0 +1,231 @@
+"""
+Prompt template registry
+
+Every LLM prompt is a versioned `string.Template` compiled once at import.
+Rendering is a single substitution of precomputed values; the version goes
+into the LLM cache key, so bump it whenever a template's wording changes.
+"""
+
+from string import Template
+from textwrap import dedent
+from typing import Any, Dict
+
+
+class PromptTemplate:
+    def __init__(self, name: str, version: str, system: str, body: str):
+        self.name = name
+        self.version = version
+        self.system = system
+        self.template = Template(dedent(body).strip())
+        # Fail at import rather than at render time on a malformed placeholder
+        fields = set()
+        for match in self.template.pattern.finditer(self.template.template):
+            if match.group("invalid") is not None:
+                raise ValueError(f"Malformed placeholder in prompt template {name}")
+            if match.group("named") or match.group("braced"):
+                fields.add(match.group("named") or match.group("braced"))
+        self.fields = frozenset(fields)
+
+    def render(self, **values: Any) -> str:
+        return self.template.substitute(values)
+
+
+ANALYSIS_SYSTEM = (
+    "Sen bir karbon emisyonu analiz uzmanısın. Türkçe ve İngilizce analiz yapabilirsin. "
+    "Verileri analiz edip actionable öneriler sun. GPT-5'in gelişmiş analiz yeteneklerini kullan."
+)
+RECOMMENDATIONS_SYSTEM = (
+    "Sen bir sürdürülebilirlik danışmanısın. Karbon azaltma stratejileri konusunda uzman öneriler sun. "
+    "GPT-5'in gelişmiş strateji geliştirme yeteneklerini kullan."
+)
+RISK_SYSTEM = (
+    "Sen bir risk analiz uzmanısın. Karbon emisyonu ve iklim riskleri konusunda detaylı analiz yap. "
+    "GPT-5'in gelişmiş risk değerlendirme yeteneklerini kullan."
+)
+# Explanation prompts are cached by their rendered text, so only the system prompt needs a version
+EXPLAIN_SYSTEM_VERSION = "1"
+EXPLAIN_SYSTEM = (
+    "You are a carbon emissions expert. Provide concise, actionable insights based on the data provided. "
+    "Focus on specific metrics and practical recommendations."
+)
+
+_TEMPLATES = [
+    PromptTemplate(
+        "analysis",
+        "3",
+        ANALYSIS_SYSTEM,
+        """
+        GPT-5 olarak aşağıdaki karbon emisyonu verilerini derinlemesine analiz et ve stratejik bir rapor hazırla:
+
+        📊 VERİ SETİ:
+        Toplam Emisyonlar: $total_emissions tCO₂e
+        Scope 1 (Doğrudan): $scope1 tCO₂e
+        Scope 2 (Elektrik): $scope2 tCO₂e
+        Scope 3 (Diğer): $scope3 tCO₂e
+        EU ETS Allowances: $eu_ets_allowances tCO₂e
+        EU ETS Kullanımı: $eu_ets_used tCO₂e
+        Karbon Fiyatı: €$eu_ets_price/tCO₂e
+
+        🎯 GPT-5 ANALİZ GÖREVİ:
+        1. **Stratejik Performans Değerlendirmesi**: Endüstri benchmarkları ile karşılaştır
+        2. **Kritik Emisyon Kaynakları**: Scope bazında detaylı analiz ve trendler
+        3. **EU ETS Stratejik Durumu**: Uyumluluk riski ve fırsatları
+        4. **Finansal Etki Modellemesi**: Kısa/orta/uzun vadeli maliyet projeksiyonları
+        5. **Öncelik Matrisi**: ROI ve etki bazında kritik alanlar
+        6. **Sürdürülebilirlik Yol Haritası**: 2025-2030 hedefleri
+
+        GPT-5'in gelişmiş analitik yeteneklerini kullan.
+
+        JSON formatında yanıtla:
+        {
+            "executive_summary": "Stratejik özet (2-3 cümle, veri-driven insights)",
+            "key_findings": ["Kritik bulgu 1", "Kritik bulgu 2", "Kritik bulgu 3"],
+            "priority_areas": ["Stratejik öncelik 1", "Stratejik öncelik 2", "Stratejik öncelik 3"],
+            "financial_impact": "€$financial_impact",
+            "compliance_status": "Stratejik uyumluluk durumu (risk/fırsat analizi)"
+        }
+        """,
+    ),
+    PromptTemplate(
+        "recommendations",
+        "3",
+        RECOMMENDATIONS_SYSTEM,
+        """
+        Aşağıdaki emisyon verilerine göre karbon azaltma önerileri hazırla:
+
+        Toplam: $total_emissions tCO₂e
+        Scope 1: $scope1 tCO₂e (Doğrudan)
+        Scope 2: $scope2 tCO₂e (Elektrik)
+        Scope 3: $scope3 tCO₂e (Diğer)
+        EU ETS Açığı: $deficit tCO₂e
+
+        Mevcut verilere göre en etkili 3-4 öneri hazırla.
+
+        Her öneri için şunları belirt:
+        - Başlık (spesifik ve actionable)
+        - Açıklama (detaylı uygulama)
+        - Tahmini maliyet (gerçekçi)
+        - Yıllık tasarruf (hesaplanmış)
+        - Uygulama süresi (realistik)
+        - Öncelik seviyesi (high/medium/low)
+        - Beklenen emisyon azaltımı (tCO₂e)
+
+        JSON formatında yanıtla:
+        [
+            {
+                "title": "Öneri başlığı",
+                "description": "Detaylı açıklama",
+                "cost": "€X,XXX",
+                "annual_savings": "€X,XXX",
+                "timeline": "X ay",
+                "priority": "high/medium/low",
+                "emission_reduction": "XXX tCO₂e"
+            }
+        ]
+        """,
+    ),
+    PromptTemplate(
+        "risk_assessment",
+        "3",
+        RISK_SYSTEM,
+        """
+        Aşağıdaki verilere göre karbon risklerini değerlendir:
+
+        Toplam Emisyonlar: $total_emissions tCO₂e
+        EU ETS Allowances: $eu_ets_allowances tCO₂e
+        EU ETS Kullanımı: $eu_ets_used tCO₂e
+        EU ETS Açığı: $deficit tCO₂e
+        Fiyat: €$eu_ets_price/tCO₂e
+
+        Mevcut verilere göre riskleri şu kategorilerde değerlendir:
+        1. Uyumluluk riskleri (EU ETS, yasal)
+        2. Finansal riskler (karbon fiyatı, maliyet)
+        3. Operasyonel riskler (enerji, tedarik)
+        4. Reputasyon riskleri (sürdürülebilirlik)
+
+        Her risk için gerçekçi değerlendirmeler yap:
+        - Risk adı (spesifik)
+        - Olasılık (High/Medium/Low)
+        - Etki (€ miktarı, hesaplanmış)
+        - Azaltma stratejisi (actionable)
+
+        JSON formatında yanıtla:
+        {
+            "overall_risk_level": "High/Medium/Low",
+            "risks": [
+                {
+                    "risk": "Risk adı",
+                    "probability": "High/Medium/Low",
+                    "impact": "€X,XXX",
+                    "mitigation": "Azaltma stratejisi"
+                }
+            ]
+        }
+        """,
+    ),
+    PromptTemplate(
+        "explain_overview",
+        "1",
+        EXPLAIN_SYSTEM,
+        """
+        Analyze this carbon emissions overview:
+        - Total Emissions: $total_emissions tCO₂e
+        - Year-over-Year Change: $yoy_change%
+        Provide a concise summary and 3 actionable recommendations.
+        """,
+    ),
+    PromptTemplate(
+        "explain_emissions",
+        "1",
+        EXPLAIN_SYSTEM,
+        """
+        Analyze these emissions data:
+        - Total: $total_emissions tCO₂e
+        - Scope 1: $scope1 tCO₂e
+        - Scope 2: $scope2 tCO₂e
+        - Scope 3: $scope3 tCO₂e
+        Provide insights and 3 specific actions to reduce emissions.
+        """,
+    ),
+    PromptTemplate(
+        "explain_compliance",
+        "1",
+        EXPLAIN_SYSTEM,
+        """
+        Analyze EU ETS compliance status:
+        - Overshoot: $overshoot tCO₂e
+        - Additional Cost: €$cost
+        Provide compliance insights and 3 urgent actions.
+        """,
+    ),
+    PromptTemplate(
+        "explain_intensity",
+        "1",
+        EXPLAIN_SYSTEM,
+        """
+        Analyze carbon intensity metrics:
+        - Current Intensity: $current_intensity tCO₂e/€M
+        - YoY Change: $yoy_change%
+        - Revenue Correlation: $correlation
+        Provide intensity insights and 3 efficiency actions.
+        """,
+    ),
+    PromptTemplate(
+        "explain_generic",
+        "1",
+        EXPLAIN_SYSTEM,
+        "Analyze this data and provide insights with 3 actionable recommendations.",
+    ),
+]
+
+REGISTRY: Dict[str, PromptTemplate] = {t.name: t for t in _TEMPLATES}
+
+
+def get_template(name: str) -> PromptTemplate:
+    if name not in REGISTRY:
+        raise ValueError(f"Unknown prompt template: {name}")
+    return REGISTRY[name]
+
+
+def render(name: str, **values: Any) -> str:
+    return get_template(name).render(**values)
@@ -0,0 +1,311 @@
+"""
+Hourly Scope 2 engine
+
+Dual reporting of purchased electricity from interval meter data:
+
+- Location-based: hourly consumption of each meter multiplied by the
+  hourly grid-intensity curve of its `grid_region`. The curves are read
+  from a local CSV (`GRID_INTENSITY_PATH`, columns region, hour, kgco2e_per_kwh
+  with hour as a UTC timestamp). Hours a curve doesn't cover fall back to
+  the meter's annual factor.
+- Market-based: contractual instruments (see models/instrument.py) are
+  matched against the remaining consumption hour by hour. Whatever is left
+  is charged at the meter's annual factor, which stands in for the
+  residual mix.
+
+All meters of a year are loaded into one (meters, hours) float32 matrix.
+Location-based totals are one matrix-vector product per grid region, and
+each instrument is a few vector operations over its pool of meters.
+"""
+
+import csv
+import os
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.factors import EmissionFactor
+from ..models.instrument import EnergyInstrument
+from ..models.meter import Meter, MeterBlock
+from ..models.org import Facility
+from .ghg import active_gwp_set, factor_gas_row, load_gwp_vector
+from .meters import load_block
+from .units import UnitConversionError, conversion_factor
+
+_CHUNK_ROWS = 1024
+_curve_cache: Dict[tuple, Tuple[List[str], np.ndarray]] = {}
+
+
+def year_hours(year: int) -> int:
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days * 24
+
+
+def _hour_index(start: date, year: int) -> int:
+    return (start - date(year, 1, 1)).days * 24
+
+
+def load_grid_curves(path: str, year: int) -> Tuple[List[str], np.ndarray]:
+    """
+    Hourly grid intensity of every region in the file for one year.
+
+    Returns:
+        (regions, matrix) where matrix[i, h] is kgCO2e/kWh of regions[i] in
+        hour h of the year (UTC), NaN where the file has no value. Cached
+        until the file changes.
+    """
+    if not os.path.exists(path):
+        return [], np.empty((0, year_hours(year)))
+    key = (os.path.abspath(path), os.path.getmtime(path), year)
+    if key not in _curve_cache:
+        n_hours = year_hours(year)
+        origin = np.datetime64(f"{year}-01-01T00", "h")
+        rows: Dict[str, Tuple[list, list]] = {}
+        with open(path, newline="", encoding="utf-8") as fh:
+            for rec in csv.DictReader(fh):
+                hours, values = rows.setdefault(rec["region"].strip(), ([], []))
+                hours.append(rec["hour"].strip().rstrip("Z"))
+                values.append(rec["kgco2e_per_kwh"])
+        regions = sorted(rows)
+        matrix = np.full((len(regions), n_hours), np.nan)
+        for i, region in enumerate(regions):
+            hours, values = rows[region]
+            idx = (np.array(hours, dtype="datetime64[h]") - origin).astype(np.int64)
+            inside = (idx >= 0) & (idx < n_hours)
+            matrix[i, idx[inside]] = np.asarray(values, dtype=float)[inside]
+        _curve_cache.clear()  # one file/year at a time is all the engine needs
+        _curve_cache[key] = (regions, matrix)
+    return _curve_cache[key]
+
+
+def hourly_consumption(db: Session, meters: Sequence[Meter], year: int) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    (meters, hours) kWh matrix of a year built from the meter blocks.
+
+    Sub-hourly readings are summed per hour and multi-hour readings are
+    spread evenly over their hours. Gaps count as zero.
+
+    Returns:
+        Tuple of (matrix, {row index: error}); rows with errors stay zero
+    """
+    n_hours = year_hours(year)
+    matrix = np.zeros((len(meters), n_hours), dtype=np.float32)
+    errors: Dict[int, str] = {}
+    row_of = {m.id: i for i, m in enumerate(meters)}
+    to_kwh = {}
+    for i, meter in enumerate(meters):
+        try:
+            to_kwh[meter.id] = conversion_factor(meter.unit, "kWh")
+        except UnitConversionError as exc:
+            errors[i] = str(exc)
+        if 60 % meter.interval_minutes and meter.interval_minutes % 60:
+            errors[i] = f"Interval of {meter.interval_minutes} min does not align with hours"
+
+    blocks = db.scalars(
+        select(MeterBlock).where(
+            MeterBlock.meter_id.in_(list(row_of)),
+            MeterBlock.month >= date(year, 1, 1),
+            MeterBlock.month < date(year + 1, 1, 1),
+            MeterBlock.readings > 0,
+        )
+    )
+    for block in blocks:
+        i = row_of[block.meter_id]
+        if i in errors:
+            continue
+        interval = meters[i].interval_minutes
+        data = np.nan_to_num(np.asarray(load_block(block)))
+        if interval <= 60:
+            hourly = data.reshape(-1, 60 // interval).sum(axis=1)
+        else:
+            hourly = np.repeat(data / (interval // 60), interval // 60)
+        lo = _hour_index(block.month, year)
+        matrix[i, lo : lo + len(hourly)] = hourly * to_kwh[meters[i].id]
+    return matrix, errors
+
+
+def annual_factors(db: Session, meters: Sequence[Meter], gwp_set: str) -> Tuple[np.ndarray, Dict[int, str]]:
+    """kgCO2e per kWh of each meter's annual factor; NaN (with an error) for unknown codes or non-energy units."""
+    gwp = load_gwp_vector(db, gwp_set)
+    codes = {m.factor_code for m in meters}
+    factors = {f.code: f for f in db.scalars(select(EmissionFactor).where(EmissionFactor.code.in_(codes)))}
+    out = np.full(len(meters), np.nan)
+    errors: Dict[int, str] = {}
+    for i, meter in enumerate(meters):
+        factor = factors.get(meter.factor_code)
+        if factor is None:
+            errors[i] = f"Unknown factor code: {meter.factor_code}"
+            continue
+        try:
+            out[i] = float(np.dot(factor_gas_row(factor), gwp)) * conversion_factor("kWh", factor.unit)
+        except UnitConversionError as exc:
+            errors[i] = str(exc)
+    return out, errors
+
+
+def location_based(
+    consumption: np.ndarray, regions: Sequence[str], curves: Tuple[List[str], np.ndarray], fallback: np.ndarray
+) -> np.ndarray:
+    """kgCO2e per meter: consumption against its region's hourly curve, `fallback` (kg/kWh) where the curve is missing."""
+    names, matrix = curves
+    index = {name: i for i, name in enumerate(names)}
+    out = np.zeros(len(consumption))
+    regions = np.asarray(regions, dtype=object)
+    for region in set(regions.tolist()):
+        curve = matrix[index[region]] if region in index else np.full(consumption.shape[1], np.nan)
+        missing = np.isnan(curve).astype(np.float64)
+        curve = np.nan_to_num(curve)
+        all_rows = np.flatnonzero(regions == region)
+        for start in range(0, len(all_rows), _CHUNK_ROWS):  # bounds the float64 copy
+            rows = all_rows[start : start + _CHUNK_ROWS]
+            chunk = consumption[rows].astype(np.float64)
+            out[rows] = chunk @ curve + fallback[rows] * (chunk @ missing)
+    return out
+
+
+def allocate_instrument(pool: np.ndarray, capacity_kw: Optional[float], volume_kwh: Optional[float]) -> np.ndarray:
+    """
+    kWh of `pool` (remaining hourly consumption) covered by one instrument.
+
+    A capacity covers up to that much in every hour; a volume is drawn down
+    chronologically until it runs out.
+    """
+    if capacity_kw is not None:
+        return np.minimum(pool, capacity_kw)
+    used_before = np.cumsum(pool) - pool
+    return np.clip((volume_kwh or 0.0) - used_before, 0.0, pool)
+
+
+def market_based(
+    remaining: np.ndarray,
+    instruments: Sequence[EnergyInstrument],
+    pools: Sequence[np.ndarray],
+    year: int,
+) -> Tuple[np.ndarray, np.ndarray, List[float]]:
+    """
+    Apply instruments in order, hour by hour, to the remaining consumption (modified in place).
+
+    Within a pool of several meters, covered energy is shared pro rata to
+    each meter's remaining consumption in that hour. Volumes of
+    certificates valid beyond the year count pro rata to the hours that
+    fall inside it.
+
+    Returns:
+        (covered kWh per meter, instrument kgCO2e per meter, allocated kWh per instrument)
+    """
+    n_hours = remaining.shape[1]
+    covered = np.zeros(len(remaining))
+    kg = np.zeros(len(remaining))
+    allocated = []
+    for inst, rows in zip(instruments, pools):
+        lo = max(_hour_index(inst.valid_from, year), 0)
+        hi = min(_hour_index(inst.valid_to, year) + 24, n_hours)
+        if hi <= lo or len(rows) == 0:
+            allocated.append(0.0)
+            continue
+        volume = inst.volume_kwh
+        if inst.capacity_kw is None and volume is not None:
+            span = _hour_index(inst.valid_to, year) + 24 - _hour_index(inst.valid_from, year)
+            volume = volume * (hi - lo) / span
+        window = remaining[rows, lo:hi]
+        pool = window.sum(axis=0, dtype=np.float64)
+        cover = allocate_instrument(pool, inst.capacity_kw, volume)
+        share = np.divide(cover, pool, out=np.zeros_like(pool), where=pool > 0)
+        taken = window * share.astype(np.float32)
+        remaining[rows, lo:hi] = window - taken
+        per_meter = taken.sum(axis=1, dtype=np.float64)
+        covered[rows] += per_meter
+        kg[rows] += per_meter * (inst.factor_kgco2e_per_kwh or 0.0)
+        allocated.append(float(cover.sum()))
+    return covered, kg, allocated
+
+
+def _instrument_order(inst: EnergyInstrument) -> tuple:
+    # Facility-specific before entity-wide, PPAs (physical delivery) before certificates
+    return (inst.facility_id is None, inst.capacity_kw is None, inst.valid_from, inst.id)
+
+
+def calc_scope2(db: Session, year: int, entities: Optional[List[int]] = None, gwp_set: Optional[str] = None) -> Dict:
+    """
+    Location- and market-based Scope 2 of all meters (optionally of some entities) for one year.
+
+    Returns:
+        Dict with totals, per-facility results, per-instrument allocations and per-meter errors
+    """
+    q = (
+        select(Meter, Facility.entity_id, Facility.name)
+        .join(Facility, Facility.id == Meter.facility_id)
+        .where(Meter.scope == "Scope2")
+        .order_by(Meter.id)
+    )
+    if entities:
+        q = q.where(Facility.entity_id.in_(entities))
+    rows = db.execute(q).all()
+    meters = [r[0] for r in rows]
+    entity_of = np.array([r[1] for r in rows], dtype=np.int64)
+    facility_of = np.array([m.facility_id for m in meters], dtype=np.int64)
+
+    consumption, errors = hourly_consumption(db, meters, year)
+    fallback, factor_errors = annual_factors(db, meters, gwp_set or active_gwp_set(db))
+    for i, msg in factor_errors.items():
+        errors.setdefault(i, msg)
+    bad = np.array(sorted(errors), dtype=np.int64)
+    consumption[bad] = 0.0
+    fallback = np.nan_to_num(fallback)
+
+    total_kwh = consumption.sum(axis=1, dtype=np.float64)
+    location_kg = location_based(
+        consumption, [m.grid_region for m in meters], load_grid_curves(settings.grid_intensity_path, year), fallback
+    )
+
+    iq = select(EnergyInstrument).where(
+        EnergyInstrument.valid_from <= date(year, 12, 31), EnergyInstrument.valid_to >= date(year, 1, 1)
+    )
+    if entities:
+        iq = iq.where(EnergyInstrument.entity_id.in_(entities))
+    instruments = sorted(db.scalars(iq).all(), key=_instrument_order)
+    pools = [
+        np.flatnonzero(facility_of == inst.facility_id)
+        if inst.facility_id is not None
+        else np.flatnonzero(entity_of == inst.entity_id)
+        for inst in instruments
+    ]
+    remaining = consumption.copy()
+    covered, instrument_kg, allocated = market_based(remaining, instruments, pools, year)
+    residual_kwh = remaining.sum(axis=1, dtype=np.float64)
+    market_kg = instrument_kg + residual_kwh * fallback
+
+    facilities = []
+    ids, first = np.unique(facility_of, return_index=True)
+    inverse = np.searchsorted(ids, facility_of)
+    sums = {
+        name: np.bincount(inverse, weights=values, minlength=len(ids))
+        for name, values in {
+            "consumption_kwh": total_kwh,
+            "location_kgco2e": location_kg,
+            "market_kgco2e": market_kg,
+            "instrument_kwh": covered,
+            "residual_kwh": residual_kwh,
+        }.items()
+    }
+    for j, facility_id in enumerate(ids.tolist()):
+        facilities.append({
+            "facility_id": facility_id,
+            "facility": rows[first[j]][2],
+            "entity_id": int(entity_of[first[j]]),
+            **{name: float(values[j]) for name, values in sums.items()},
+        })
+    return {
+        "year": year,
+        "hours": consumption.shape[1],
+        "meters": len(meters),
+        "totals": {name: float(values.sum()) for name, values in sums.items()},
+        "facilities": facilities,
+        "instruments": [
+            {"id": inst.id, "kind": inst.kind, "allocated_kwh": kwh} for inst, kwh in zip(instruments, allocated)
+        ],
+        "errors": [{"meter_id": meters[i].id, "error": msg} for i, msg in sorted(errors.items())],
+    }
@@ -0,0 +1,184 @@
+"""
+Spend-based Scope 3
+
+Purchase ledger lines (spend by sector and supplier country, in any
+currency) are converted to the EEIO base currency using annual FX rates.
+They are then multiplied through the EEIO matrix (services/eeio.py) as one
+sparse product per batch, with one row per (entity, Scope 3 category).
+Lines whose sector isn't in the model, or whose currency has no rate, are
+reported rather than silently dropped.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.period import Period
+from ..models.purchase import FxRate, PurchaseRecord
+from .calendar import resolve_period_ids
+from .eeio import EEIOModel, load_eeio, spend_emissions
+from .ghg import GASES, active_gwp_set, load_gwp_vector
+
+UNCATEGORISED = "Uncategorised"
+
+
+def _joined(*columns: np.ndarray) -> np.ndarray:
+    """Unit-separator-joined string keys of parallel columns, for np.unique over several columns."""
+    keys = columns[0].astype(str)
+    for col in columns[1:]:
+        keys = np.char.add(np.char.add(keys, "\x1f"), col.astype(str))
+    return keys
+
+
+def ingest_purchases(db: Session, rows: List[Dict]) -> int:
+    """Bulk insert ledger lines (dicts of PurchaseRecord columns) with their period keys."""
+    if not rows:
+        return 0
+    period_ids = resolve_period_ids(db, {r["period"] for r in rows})
+    bad = sorted(label for label, period_id in period_ids.items() if period_id is None)
+    if bad:
+        raise ValueError(f"Unrecognised period: {', '.join(bad)}")
+    db.execute(
+        insert(PurchaseRecord),
+        [
+            {
+                **r,
+                "sector": r["sector"].strip(),
+                "country": r["country"].strip().upper(),
+                "currency": r["currency"].strip().upper(),
+                "period_id": period_ids[r["period"]],
+            }
+            for r in rows
+        ],
+    )
+    db.commit()
+    return len(rows)
+
+
+def fx_multipliers(db: Session, currencies: np.ndarray, years: np.ndarray, base_currency: str) -> np.ndarray:
+    """
+    Base-currency multiplier of each (currency, year); NaN when no rate exists.
+
+    The rate of the same year is used, else the closest earlier year, else
+    the closest later one.
+    """
+    rates: Dict[str, Dict[int, float]] = {}
+    for currency, year, rate in db.execute(select(FxRate.currency, FxRate.year, FxRate.rate)).all():
+        rates.setdefault(currency.upper(), {})[year] = rate
+    pairs, inverse = np.unique(_joined(currencies, years), return_inverse=True)
+    values = np.full(len(pairs), np.nan)
+    for i, pair in enumerate(pairs):
+        currency, year = pair.split("\x1f")
+        year = int(year)
+        if currency == base_currency.upper():
+            value = 1.0
+        else:
+            by_year = rates.get(currency, {})
+            earlier = [y for y in by_year if y <= year]
+            chosen = max(earlier) if earlier else min(by_year, default=None)
+            value = by_year[chosen] if chosen is not None else np.nan
+        values[i] = value
+    return values[inverse]
+
+
+def _gas_columns(model: EEIOModel) -> np.ndarray:
+    """Position in GASES of every model gas column."""
+    unknown = [g for g in model.gases if g not in GASES]
+    if unknown:
+        raise ValueError(f"EEIO model has unsupported gases: {', '.join(unknown)}")
+    return np.array([GASES.index(g) for g in model.gases], dtype=np.int64)
+
+
+def calc_spend_scope3(
+    db: Session, year: int, entities: Optional[List[int]] = None, gwp_set: Optional[str] = None
+) -> Dict:
+    """
+    Spend-based Scope 3 of every entity (optionally a subset) for ledger periods starting in `year`.
+
+    Returns:
+        Dict with the model's base currency, per-entity totals with a
+        category breakdown, and the unmatched/unconverted spend
+    """
+    model = load_eeio(settings.eeio_path)
+    if model is None:
+        raise ValueError(f"No EEIO model found at {settings.eeio_path}")
+    gwp = load_gwp_vector(db, gwp_set or active_gwp_set(db))
+    columns = _gas_columns(model)
+
+    q = (
+        select(
+            PurchaseRecord.entity_id,
+            PurchaseRecord.sector,
+            PurchaseRecord.country,
+            PurchaseRecord.currency,
+            PurchaseRecord.amount,
+            PurchaseRecord.category,
+            Period.period_start,
+        )
+        .join(Period, Period.id == PurchaseRecord.period_id)
+        .where(Period.period_start >= date(year, 1, 1), Period.period_start <= date(year, 12, 31))
+    )
+    if entities:
+        q = q.where(PurchaseRecord.entity_id.in_(entities))
+    lines = db.execute(q).all()
+    if not lines:
+        return {"year": year, "base_currency": model.base_currency, "entities": [], "unmatched": [], "missing_fx": []}
+
+    entity_ids, sectors, countries, currencies, amounts, categories, starts = (
+        np.array(col, dtype=object) for col in zip(*lines)
+    )
+    amounts = amounts.astype(float)
+    categories = np.where(categories == None, UNCATEGORISED, categories).astype(str)  # noqa: E711
+
+    # Product rows: one dictionary lookup per distinct (sector, country)
+    keys, key_inverse = np.unique(_joined(sectors, countries), return_inverse=True)
+    products = np.array([model.product_index(*k.split("\x1f")) for k in keys], dtype=np.int64)[key_inverse]
+    fx = fx_multipliers(db, currencies.astype(str), np.array([d.year for d in starts]), model.base_currency)
+    spend = amounts * fx
+    matched = (products >= 0) & ~np.isnan(fx)
+
+    # One output row per (entity, category) of the matched lines
+    groups, group_inverse = np.unique(_joined(entity_ids[matched], categories[matched]), return_inverse=True)
+    per_gas = np.zeros((len(groups), len(GASES)))
+    per_gas[:, columns] = spend_emissions(model, group_inverse, products[matched], spend[matched], len(groups))
+    co2e = per_gas @ gwp
+    group_spend = np.bincount(group_inverse, weights=spend[matched], minlength=len(groups))
+
+    by_entity: Dict[int, Dict] = {}
+    for g, key in enumerate(groups):
+        entity_id, category = key.split("\x1f")
+        out = by_entity.setdefault(int(entity_id), {
+            "entity_id": int(entity_id), "spend": 0.0, "co2e_kg": 0.0, "co2_kg": 0.0, "ch4_kg": 0.0, "n2o_kg": 0.0,
+            "categories": [],
+        })
+        out["spend"] += float(group_spend[g])
+        out["co2e_kg"] += float(co2e[g])
+        for gas, value in zip(GASES, per_gas[g]):
+            out[f"{gas.lower()}_kg"] += float(value)
+        out["categories"].append({"category": category, "spend": float(group_spend[g]), "co2e_kg": float(co2e[g])})
+
+    unmatched = {}
+    for i in np.flatnonzero(products < 0):
+        item = unmatched.setdefault(
+            (sectors[i], countries[i]), {"sector": sectors[i], "country": countries[i], "lines": 0, "spend": 0.0}
+        )
+        item["lines"] += 1
+        item["spend"] += float(spend[i]) if not np.isnan(spend[i]) else 0.0
+    missing_fx = {}
+    for i in np.flatnonzero(np.isnan(fx)):
+        item = missing_fx.setdefault(
+            (currencies[i], starts[i].year), {"currency": currencies[i], "year": starts[i].year, "lines": 0}
+        )
+        item["lines"] += 1
+
+    return {
+        "year": year,
+        "base_currency": model.base_currency,
+        "entities": sorted(by_entity.values(), key=lambda e: e["entity_id"]),
+        "unmatched": list(unmatched.values()),
+        "missing_fx": list(missing_fx.values()),
+    }
@@ -0,0 +1,114 @@
+"""
+Vectorized trend statistics over series matrices.
+
+Every function works on the last axis of a 2-D (series × months) array, so a
+whole facility portfolio is processed with array operations instead of
+per-series loops. Leading positions without a full window are NaN.
+"""
+
+import warnings
+
+import numpy as np
+
+
+def rolling_sum(values: np.ndarray, window: int = 12) -> np.ndarray:
+    """Trailing sum over `window` months (NaN until a full window is available)."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if window <= 0 or values.shape[-1] < window:
+        return out
+    csum = np.cumsum(values, axis=-1)
+    out[..., window - 1] = csum[..., window - 1]
+    out[..., window:] = csum[..., window:] - csum[..., :-window]
+    return out
+
+
+def rolling_mean(values: np.ndarray, window: int = 12) -> np.ndarray:
+    return rolling_sum(values, window) / window
+
+
+def yoy_change(values: np.ndarray, lag: int = 12) -> np.ndarray:
+    """Percentage change of each month versus the same month `lag` months earlier."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] <= lag:
+        return out
+    current, previous = values[..., lag:], values[..., :-lag]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[..., lag:] = np.where(previous != 0, (current - previous) / previous * 100, np.nan)
+    return out
+
+
+def rankdata(values: np.ndarray) -> np.ndarray:
+    """Average ranks (1-based, ties share their mean rank) along the last axis."""
+    values = np.asarray(values, dtype=float)
+    matrix = np.atleast_2d(values)
+    n, m = matrix.shape
+    if m == 0:
+        return np.zeros(values.shape)
+    order = np.argsort(matrix, axis=1, kind="mergesort")
+    sorted_vals = np.take_along_axis(matrix, order, axis=1)
+
+    # Tie groups are numbered across the flattened matrix so one bincount averages them all
+    new_group = np.ones((n, m), dtype=bool)
+    new_group[:, 1:] = sorted_vals[:, 1:] != sorted_vals[:, :-1]
+    group_ids = np.cumsum(new_group.ravel()) - 1
+    ordinal = np.tile(np.arange(1, m + 1, dtype=float), n)
+    mean_rank = np.bincount(group_ids, weights=ordinal) / np.bincount(group_ids)
+
+    ranks = np.empty((n, m))
+    np.put_along_axis(ranks, order, mean_rank[group_ids].reshape(n, m), axis=1)
+    return ranks.reshape(values.shape)
+
+
+def rowwise_pearson(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pearson correlation of each row pair; NaN where a row has zero variance."""
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    denom = np.sqrt((xc * xc).sum(axis=1) * (yc * yc).sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denom > 0, (xc * yc).sum(axis=1) / denom, np.nan)
+
+
+def spearman(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Spearman rank correlation along the last axis (scalar result for 1-D inputs)."""
+    result = rowwise_pearson(rankdata(x), rankdata(y))
+    return result[0] if np.ndim(x) == 1 else result
+
+
+def theil_sen(values: np.ndarray, x: np.ndarray | None = None, max_chunk_cells: int = 2_000_000):
+    """
+    Theil–Sen robust regression of every row against `x` (month positions by default).
+
+    The slope is the median of all pairwise slopes, which tolerates up to ~29%
+    outliers. NaN observations are ignored; rows with fewer than two points get NaN.
+    Rows are processed in chunks to bound the (rows × pairs) working set.
+
+    Returns:
+        Tuple of (slopes, intercepts), one value per row
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n, m = values.shape
+    x = np.arange(m, dtype=float) if x is None else np.asarray(x, dtype=float)
+    slopes = np.full(n, np.nan)
+    intercepts = np.full(n, np.nan)
+    if m < 2 or n == 0:
+        return slopes, intercepts
+
+    i, j = np.triu_indices(m, k=1)
+    dx = x[j] - x[i]
+    valid_pair = dx != 0
+    i, j, dx = i[valid_pair], j[valid_pair], dx[valid_pair]
+    chunk = max(1, max_chunk_cells // max(len(i), 1))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+        for lo in range(0, n, chunk):
+            block = values[lo : lo + chunk]
+            pair_slopes = (block[:, j] - block[:, i]) / dx
+            s = np.nanmedian(pair_slopes, axis=1)
+            slopes[lo : lo + chunk] = s
+            intercepts[lo : lo + chunk] = np.nanmedian(block - s[:, None] * x, axis=1)
+    return slopes, intercepts
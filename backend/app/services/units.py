@@ -0,0 +1,130 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class UnitConversionError(ValueError):
+    pass
+
+
+# unit -> (dimension, multiplier to the dimension's base unit)
+# Base units: energy=kWh, volume=L, mass=kg, distance=km
+UNITS: Dict[str, Tuple[str, float]] = {
+    # energy
+    "wh": ("energy", 0.001),
+    "kwh": ("energy", 1.0),
+    "mwh": ("energy", 1_000.0),
+    "gwh": ("energy", 1_000_000.0),
+    "mj": ("energy", 1.0 / 3.6),
+    "gj": ("energy", 1_000.0 / 3.6),
+    "tj": ("energy", 1_000_000.0 / 3.6),
+    "therm": ("energy", 29.3071),
+    "mmbtu": ("energy", 293.071),
+    # volume
+    "ml": ("volume", 0.001),
+    "l": ("volume", 1.0),
+    "m3": ("volume", 1_000.0),
+    "gal": ("volume", 3.785411784),
+    "bbl": ("volume", 158.987294928),
+    # mass
+    "g": ("mass", 0.001),
+    "kg": ("mass", 1.0),
+    "t": ("mass", 1_000.0),
+    "lb": ("mass", 0.45359237),
+    "short_ton": ("mass", 907.18474),
+    "long_ton": ("mass", 1_016.0469088),
+    # distance
+    "m": ("distance", 0.001),
+    "km": ("distance", 1.0),
+    "mi": ("distance", 1.609344),
+    "nmi": ("distance", 1.852),
+}
+
+ALIASES: Dict[str, str] = {
+    "kilowatt-hour": "kwh",
+    "kilowatt hour": "kwh",
+    "megawatt-hour": "mwh",
+    "megawatt hour": "mwh",
+    "liter": "l",
+    "litre": "l",
+    "liters": "l",
+    "litres": "l",
+    "m³": "m3",
+    "cubic meter": "m3",
+    "cubic metre": "m3",
+    "tonne": "t",
+    "tonnes": "t",
+    "metric ton": "t",
+    "metric tons": "t",
+    # A bare "ton" is ambiguous (metric, short or long) and stays an unknown unit
+    "short ton": "short_ton",
+    "short tons": "short_ton",
+    "long ton": "long_ton",
+    "long tons": "long_ton",
+    "mile": "mi",
+    "miles": "mi",
+}
+
+
+def normalize_unit(unit: str) -> str:
+    key = str(unit).strip().lower()
+    return ALIASES.get(key, key)
+
+
+def unit_dimension(unit: str) -> str | None:
+    entry = UNITS.get(normalize_unit(unit))
+    return entry[0] if entry else None
+
+
+def conversion_factor(from_unit: str, to_unit: str) -> float:
+    """Multiplier that converts an amount in `from_unit` into `to_unit`."""
+    src, dst = normalize_unit(from_unit), normalize_unit(to_unit)
+    if src == dst:
+        return 1.0
+    if src not in UNITS:
+        raise UnitConversionError(f"Unknown unit: {from_unit}")
+    if dst not in UNITS:
+        raise UnitConversionError(f"Unknown unit: {to_unit}")
+    src_dim, src_mult = UNITS[src]
+    dst_dim, dst_mult = UNITS[dst]
+    if src_dim != dst_dim:
+        raise UnitConversionError(f"Cannot convert {from_unit} ({src_dim}) to {to_unit} ({dst_dim})")
+    return src_mult / dst_mult
+
+
+def convert_amounts(amounts, from_units, to_units) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    Convert a batch of amounts into their target units.
+
+    Rows are grouped by (from_unit, to_unit) pair so each distinct pair is
+    resolved once and applied as a single multiplier array.
+
+    Returns:
+        Tuple of (converted amounts, {row index: error message}) where rows
+        with incompatible units are NaN in the converted array.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    pairs = np.array(
+        [f"{normalize_unit(f)}\x00{normalize_unit(t)}" for f, t in zip(from_units, to_units)],
+        dtype=object,
+    )
+    if len(pairs) == 0:
+        return amounts.copy(), {}
+
+    uniq, inverse = np.unique(pairs.astype(str), return_inverse=True)
+    multipliers = np.empty(len(uniq), dtype=float)
+    pair_errors: Dict[int, str] = {}
+    for i, pair in enumerate(uniq):
+        src, dst = pair.split("\x00")
+        try:
+            multipliers[i] = conversion_factor(src, dst)
+        except UnitConversionError as exc:
+            multipliers[i] = np.nan
+            pair_errors[i] = str(exc)
+
+    converted = amounts * multipliers[inverse]
+    errors: Dict[int, str] = {}
+    if pair_errors:
+        bad = np.flatnonzero(np.isin(inverse, list(pair_errors)))
+        errors = {int(idx): pair_errors[int(inverse[idx])] for idx in bad}
+    return converted, errors
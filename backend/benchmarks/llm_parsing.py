@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of prompt rendering and JSON extraction for LLM insights.
+
+Replays the recorded model replies in data/llm_responses.jsonl through the
+legacy find/rfind extraction and `extract_json` (with and without orjson),
+and times prompt rendering from the template registry.
+
+    cd backend && python -m benchmarks.llm_parsing [--repeat 2000]
+"""
+
+import argparse
+import json
+import timeit
+from pathlib import Path
+
+from app.services import json_extract, prompts
+from app.services.llm_service import LLMService
+
+CORPUS = Path(__file__).parent / "data" / "llm_responses.jsonl"
+KINDS = {"analysis": "object", "risk_assessment": "object", "recommendations": "array"}
+DATA = {
+    "total_emissions": 2847,
+    "scope1": 1247,
+    "scope2": 1456,
+    "scope3": 144,
+    "eu_ets_allowances": 2800,
+    "eu_ets_used": 2847,
+    "eu_ets_price": 85.5,
+}
+
+
+def legacy_extract(text: str, kind: str):
+    """The find/rfind + json.loads extraction the parsers used before."""
+    opener, closer = ("[", "]") if kind == "array" else ("{", "}")
+    try:
+        start, end = text.find(opener), text.rfind(closer) + 1
+        if start != -1 and end != -1:
+            return json.loads(text[start:end])
+    except Exception:
+        pass
+    return None
+
+
+def load_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return [(KINDS[r["kind"]], r["text"]) for r in map(json.loads, f)]
+
+
+def per_call_us(fn, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=repeat, repeat=5)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    results = {}
+
+    def run(extract):
+        return lambda: [extract(text, kind) for kind, text in corpus]
+
+    results["legacy_extract"] = legacy = run(legacy_extract)()
+    results["extract_json"] = run(json_extract.extract_json)()
+    print(f"corpus: {len(corpus)} recorded replies")
+    for name, parsed in (("legacy find/rfind", legacy), ("extract_json", results["extract_json"])):
+        print(f"  {name:<22} decoded {sum(p is not None for p in parsed)}/{len(corpus)}")
+
+    timings = {
+        "legacy find/rfind": per_call_us(run(legacy_extract), args.repeat),
+        "extract_json": per_call_us(run(json_extract.extract_json), args.repeat),
+    }
+    if json_extract.orjson is not None:
+        orjson = json_extract.orjson
+        json_extract.orjson = None
+        try:
+            timings["extract_json (json)"] = per_call_us(run(json_extract.extract_json), args.repeat)
+        finally:
+            json_extract.orjson = orjson
+
+    service = LLMService()
+    timings["render analysis prompt"] = per_call_us(lambda: service._build_emissions_analysis_prompt(DATA), args.repeat)
+    timings["render explain prompt"] = per_call_us(
+        lambda: prompts.render("explain_overview", total_emissions=2847, yoy_change=-3.2), args.repeat
+    )
+
+    print("per call (corpus pass for extractors):")
+    for name, us in timings.items():
+        print(f"  {name:<24} {us:9.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Benchmark suite for the calculation engine and the hot API routes.
+
+For every dataset size a synthetic SQLite database is built in a temporary
+directory with `app.db.synthetic` (monthly activities for 2024-2025,
+emission records, revenues and allowance ledgers). Engine functions from
+`services/calc.py` and the batched forecaster are called directly. Routes are called through
+TestClient, with `get_db` overridden to use that database. Each case is
+timed `--repeat` times after one warm-up call. The results are written as
+JSON and can be compared with a baseline run:
+
+    cd backend && python -m benchmarks.suite --sizes 1000,10000 --out bench.json
+    cd backend && python -m benchmarks.suite --sizes 1000,10000 --baseline bench.json
+
+With `--baseline`, the command exits with status 1 when a case's median
+is more than `--tolerance` slower than the baseline median (and slower by
+at least `--min-delta-ms`, so sub-millisecond cases don't flap).
+"""
+
+import argparse
+import io
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import get_db
+from app.db.seed import FACTORS
+from app.db.synthetic import generate
+from app.main import app
+from app.models import EmissionRecord, Entity, Facility
+from app.schemas.emission import CategoryEmission
+from app.services import calc, intensity
+from app.services.forecast import holt_winters
+
+DEFAULT_SIZES = (1_000, 10_000)
+YEAR_RANGE = (date(2025, 1, 1), date(2025, 12, 31))
+YEARS = (2024, 2025)
+PERIODS = [f"{year}-{month:02d}" for year in YEARS for month in range(1, 13)]
+ENTITY_FACILITIES = 3
+
+
+def build_dataset(url: str, size: int, seed: int = 7) -> sessionmaker:
+    """Create a synthetic database with about `size` activity rows; returns its session factory."""
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    entities = max(2, size // 1_000)
+    streams = max(1, math.ceil(size / (entities * ENTITY_FACILITIES * 12 * len(YEARS))))
+    generate(engine, entities=entities, facilities=ENTITY_FACILITIES, streams=streams, years=YEARS, seed=seed)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def upload_csv(db, rows: int, seed: int) -> bytes:
+    """An activity file referencing existing entities/facilities."""
+    rng = np.random.default_rng(seed)
+    facilities = db.execute(
+        select(Facility.name, Entity.name).join(Entity, Entity.id == Facility.entity_id)
+    ).all()
+    lines = ["entity,facility,scope,activity_name,unit,amount,factor_code,period"]
+    for f, k, p, a in zip(
+        rng.integers(0, len(facilities), rows).tolist(),
+        rng.integers(0, len(FACTORS), rows).tolist(),
+        rng.integers(0, len(PERIODS), rows).tolist(),
+        rng.lognormal(8.0, 1.0, rows).round(2).tolist(),
+    ):
+        code, _, unit, *_, scope = FACTORS[k]
+        lines.append(f"{facilities[f][1]},{facilities[f][0]},{scope},{code},{unit},{a},{code},{PERIODS[p]}")
+    return "\n".join(lines).encode()
+
+
+def time_case(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    runs = []
+    for i in range(repeat + 1):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        if i:  # first call is a warm-up
+            runs.append(time.perf_counter() - started)
+    return {
+        "min_s": min(runs),
+        "median_s": statistics.median(runs),
+        "mean_s": statistics.fmean(runs),
+        "max_s": max(runs),
+        "runs": len(runs),
+    }
+
+
+def _checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text[:200]}")
+    return response
+
+
+def run_size(size: int, repeat: int, workdir: Path) -> List[dict]:
+    Session = build_dataset(f"sqlite:///{workdir / f'bench_{size}.db'}", size)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    results = []
+
+    def record(name: str, fn, setup=None):
+        stats = time_case(fn, repeat, setup)
+        results.append({"name": name, "size": size, **stats})
+        print(f"  {name:<28} n={size:<8} median {stats['median_s'] * 1000:9.2f} ms")
+
+    with Session() as db:
+        entities = db.scalars(select(Entity.id).order_by(Entity.id)).all()
+        subset = entities[: max(1, len(entities) // 2)]
+        records = [
+            {"scope": scope, "co2e_kg": kg}
+            for scope, kg in db.execute(select(EmissionRecord.scope, EmissionRecord.co2e_kg)).all()
+        ]
+        kg = np.random.default_rng(size).pareto(1.2, size) * 1_000
+        categories = sorted(
+            (CategoryEmission(category=f"cat-{i}", tco2e=float(v)) for i, v in enumerate(kg)),
+            key=lambda c: c.tco2e,
+            reverse=True,
+        )
+
+        record("engine.aggregate_emissions", lambda: calc.aggregate_emissions(records))
+        record("engine.calc_emissions", lambda: calc.calc_emissions(YEAR_RANGE, subset, pareto=True, db=db))
+        record("engine.calc_compliance", lambda: calc.calc_compliance(YEAR_RANGE, subset, db=db))
+        # Intensity is revision-cached; time the cold computation
+        record("engine.calc_intensity", lambda: calc.calc_intensity(YEAR_RANGE, subset, db=db), setup=intensity._cache.clear)
+        record("engine.pareto_80_20_cutoff", lambda: calc.pareto_80_20_cutoff(categories))
+        # One 36-month series per activity row, forecast a year ahead in a single batch
+        series = np.random.default_rng(size).gamma(2.0, 50.0, size=(size, 36))
+        record("engine.holt_winters", lambda: holt_winters(series, horizon=12))
+        upload = upload_csv(db, max(10, size // 10), seed=size)
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        client = TestClient(app)
+        record("route.emissions_legacy", lambda: _checked(
+            client.get("/emissions/legacy", params={"entity_id": entities[0], "period": "2025-06", "size": 200})
+        ))
+        record("route.allowances_transfer", lambda: _checked(client.post("/allowances/transfer", json={
+            "from_entity_id": entities[0], "to_entity_id": entities[1], "allowances": 1.0,
+        })))
+        record("route.upload", lambda: _checked(
+            client.post("/upload", files={"file": ("bench.csv", io.BytesIO(upload), "text/csv")})
+        ))
+        record("route.emissions_recalculate", lambda: _checked(client.post("/emissions/recalculate")))
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    return results
+
+
+def compare(current: List[dict], baseline: List[dict], tolerance: float, min_delta_s: float) -> List[dict]:
+    """Cases whose median regressed against the baseline run."""
+    before = {(r["name"], r["size"]): r for r in baseline}
+    regressions = []
+    for row in current:
+        old = before.get((row["name"], row["size"]))
+        if old is None:
+            continue
+        ratio = row["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        if ratio > 1 + tolerance and row["median_s"] - old["median_s"] >= min_delta_s:
+            regressions.append({**row, "baseline_median_s": old["median_s"], "ratio": ratio})
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated activity row counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", type=Path, help="write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="results JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown of the median")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="carbon-bench-") as tmp:
+        for size in sizes:
+            print(f"dataset: {size} activities")
+            results.extend(run_size(size, args.repeat, Path(tmp)))
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"results written to {args.out}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms / 1000)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['name']} n={r['size']}: median {r['median_s'] * 1000:.2f} ms "
+                f"vs {r['baseline_median_s'] * 1000:.2f} ms (x{r['ratio']:.2f})"
+            )
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
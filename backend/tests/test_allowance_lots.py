@@ -0,0 +1,72 @@
+from datetime import date, datetime
+
+import pytest
+
+from backend.app.models import AllowanceLot, AllowanceLotMatch, Entity, EUETSAllowanceLedger, Group
+from backend.app.services.allowance_lots import LotBook, backfill_opening_lots, weighted_average_cost
+from backend.app.services.budget import acquire_allowances, perform_transfer, surrender_allowances
+
+
+@pytest.fixture
+def entities(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    a, b = Entity(name="A", group_id=group.id), Entity(name="B", group_id=group.id)
+    db.add_all([a, b])
+    db.commit()
+    return a.id, b.id
+
+
+def test_lot_book_orders():
+    rows = [
+        (1, 2023, 80.0, date(2023, 3, 1), 10.0),
+        (2, 2024, 60.0, date(2024, 3, 1), 10.0),
+        (3, 2022, 90.0, date(2022, 3, 1), 10.0),
+    ]
+    book = LotBook(rows)
+    assert book.take(15, "fifo") == [(2, 10.0), (0, 5.0)]
+    assert book.take(8, "lowest_cost") == [(1, 8.0)]
+    # The lot exhausted through the FIFO heap is skipped here
+    assert book.take(6, "highest_cost") == [(0, 5.0), (1, 1.0)]
+    assert book.total() == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        book.take(2, "fifo")
+
+
+def test_surrender_transfer_and_cost(db, entities):
+    a, b = entities
+    # Seeded ledger balance without lots becomes an opening lot
+    db.add(EUETSAllowanceLedger(entity_id=a, delta_allowances=5, note="seed", created_at=datetime(2023, 1, 1)))
+    db.commit()
+    assert backfill_opening_lots(db) == 1
+    acquire_allowances(db, a, 10, vintage=2023, price_eur=80.0, acquired_on=date(2024, 1, 10))
+    acquire_allowances(db, a, 10, vintage=2024, price_eur=60.0, acquired_on=date(2024, 6, 1))
+
+    result = surrender_allowances(db, a, 8, method="fifo")
+    assert [(m["vintage"], m["quantity"]) for m in result["lots"]] == [(None, 5.0), (2023, 3.0)]
+    assert result["cost_eur"] == pytest.approx(3 * 80.0)
+    assert result["balance"]["owned"] == pytest.approx(17)
+
+    # Cached book stays in step with a surrender by cost
+    result = surrender_allowances(db, a, 4, method="lowest_cost")
+    assert [(m["vintage"], m["quantity"]) for m in result["lots"]] == [(2024, 4.0)]
+
+    transfer = perform_transfer(db, a, b, 9, method="fifo")
+    assert [(m["vintage"], m["quantity"]) for m in transfer["lots"]] == [(2023, 7.0), (2024, 2.0)]
+    assert transfer["to_balance"]["owned"] == pytest.approx(9)
+    carried = db.query(AllowanceLot).filter(AllowanceLot.entity_id == b).order_by(AllowanceLot.id).all()
+    assert [(l.vintage, l.price_eur, l.remaining, l.acquired_on) for l in carried] == [
+        (2023, 80.0, 7.0, date(2024, 1, 10)),
+        (2024, 60.0, 2.0, date(2024, 6, 1)),
+    ]
+    assert db.query(AllowanceLotMatch).count() == 5
+
+    with pytest.raises(ValueError):
+        surrender_allowances(db, a, 5)
+
+    cost = {e["entity_id"]: e for e in weighted_average_cost(db)}
+    assert cost[a]["allowances"] == pytest.approx(4)
+    assert cost[a]["weighted_average_price_eur"] == pytest.approx(60.0)
+    assert cost[b]["book_value_eur"] == pytest.approx(7 * 80.0 + 2 * 60.0)
+    assert [v["vintage"] for v in cost[b]["vintages"]] == [2023, 2024]
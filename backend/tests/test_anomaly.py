@@ -0,0 +1,102 @@
+from backend.app.models import (
+    Group, Entity, Facility, UploadedActivity, ActivityAnomaly, ActivitySeriesStats, EmissionFactor,
+)
+from backend.app.services.anomaly import detect_new_anomalies, rebuild_series_stats
+
+
+def _activity(facility, amount, period, unit="L"):
+    return UploadedActivity(entity_id=facility.entity_id, facility_id=facility.id, scope="Scope1",
+                            activity_name="Diesel", unit=unit, amount=amount, factor_code="diesel", period=period)
+
+
+def _facility(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    entity = Entity(name="E", group_id=group.id)
+    db.add(entity)
+    db.flush()
+    facility = Facility(name="F", entity_id=entity.id)
+    db.add(facility)
+    db.add(EmissionFactor(code="diesel", name="Diesel", unit="L", factor_kgco2_per_unit=2.68, scope_hint="Scope1"))
+    db.flush()
+    return facility
+
+
+def test_detects_spikes_incrementally(db):
+    facility = _facility(db)
+
+    db.add_all([_activity(facility, amount, f"2024-{m:02d}") for m, amount in enumerate([100, 104, 97, 101, 1000], start=1)])
+    db.commit()
+    first = detect_new_anomalies(db, threshold=4.0)
+    assert first == {"scanned": 5, "flagged": 1}  # robust in-batch MAD catches the 10x row
+
+    db.add_all([_activity(facility, 99, "2024-06"), _activity(facility, 950, "2024-07")])
+    db.commit()
+    second = detect_new_anomalies(db, threshold=4.0)
+    assert second == {"scanned": 2, "flagged": 1}  # only new rows, scored against running stats
+
+    flagged = db.query(ActivityAnomaly).order_by(ActivityAnomaly.id).all()
+    assert [a.period for a in flagged] == ["2024-05", "2024-07"]
+    assert [a.method for a in flagged] == ["mad", "zscore"]
+    series = db.query(ActivitySeriesStats).filter(ActivitySeriesStats.month == 0).one()
+    assert series.count == 5  # anomalies excluded from the baseline
+
+
+def test_scores_calendar_months_in_factor_units(db):
+    facility = _facility(db)
+    # Three years of a strongly seasonal series: 300 L in winter months, 100 L otherwise
+    db.add_all([
+        _activity(facility, (300 if m in (1, 2, 12) else 100) + year % 3, f"{year}-{m:02d}")
+        for year in (2021, 2022, 2023) for m in range(1, 13)
+    ])
+    db.commit()
+    assert detect_new_anomalies(db)["flagged"] == 0
+
+    winter = _activity(facility, 0.302, "2024-01", unit="m3")  # a normal January, in another unit
+    summer = _activity(facility, 300, "2024-07")  # winter-sized July
+    quarter = _activity(facility, 500, "2024-Q2")  # ~167 L per month
+    db.add_all([winter, summer, quarter])
+    db.commit()
+    assert detect_new_anomalies(db) == {"scanned": 3, "flagged": 1}
+    (anomaly,) = db.query(ActivityAnomaly).all()
+    assert anomaly.activity_id == summer.id
+    assert round(anomaly.expected) == 101
+
+    # An amount corrected in place is scored again
+    summer.amount, summer.needs_rescore = 101, True
+    winter.amount, winter.needs_rescore = 3.0, True
+    db.commit()
+    assert detect_new_anomalies(db) == {"scanned": 2, "flagged": 1}
+    assert [a.activity_id for a in db.query(ActivityAnomaly)] == [winter.id]
+
+
+def test_rescore_keeps_stats_equal_to_a_full_rebuild(db):
+    facility = _facility(db)
+    rows = [_activity(facility, 100 + (m * 7) % 11, f"{year}-{m:02d}") for year in (2022, 2023) for m in range(1, 13)]
+    db.add_all(rows)
+    db.commit()
+    detect_new_anomalies(db)
+
+    rows[3].amount, rows[3].needs_rescore = 109, True  # corrected within the normal range
+    rows[15].amount, rows[15].needs_rescore = 101, True
+    db.commit()
+    detect_new_anomalies(db)
+
+    def snapshot():
+        db.expire_all()
+        return {
+            (s.facility_id, s.factor_code, s.month): (s.count, s.mean, s.m2)
+            for s in db.query(ActivitySeriesStats)
+        }
+
+    incremental = snapshot()
+    rebuild_series_stats(db)
+    rebuilt = snapshot()
+    assert incremental.keys() == rebuilt.keys()
+    for key, (count, mean, m2) in rebuilt.items():
+        assert incremental[key][0] == count
+        assert abs(incremental[key][1] - mean) < 1e-9
+        assert abs(incremental[key][2] - m2) < 1e-6
+    assert rebuilt[(facility.id, "diesel", 4)][0] == 2
+    assert abs(rebuilt[(facility.id, "diesel", 0)][1] - sum(r.amount for r in rows) / 24) < 1e-9
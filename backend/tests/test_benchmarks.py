@@ -0,0 +1,15 @@
+import json
+
+from benchmarks import suite
+
+
+def test_suite_runs_and_flags_regressions(tmp_path):
+    out = tmp_path / "bench.json"
+    assert suite.main(["--sizes", "50", "--repeat", "1", "--out", str(out)]) == 0
+    results = json.loads(out.read_text())["results"]
+    assert {r["name"] for r in results} >= {"engine.calc_compliance", "route.upload", "route.emissions_recalculate"}
+
+    baseline = [{"name": "a", "size": 10, "median_s": 0.010}, {"name": "b", "size": 10, "median_s": 0.0001}]
+    current = [{"name": "a", "size": 10, "median_s": 0.015}, {"name": "b", "size": 10, "median_s": 0.0005}]
+    regressions = suite.compare(current, baseline, tolerance=0.2, min_delta_s=0.001)
+    assert [r["name"] for r in regressions] == ["a"]  # b is 5x slower but under the noise floor
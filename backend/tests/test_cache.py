@@ -0,0 +1,29 @@
+from sqlalchemy import update
+
+from backend.app.models import EmissionFactor, GasGWP
+from backend.app.services.cache import bump_revision, data_revision
+
+
+def test_revision_changes_with_every_kind_of_write(db):
+    assert data_revision(db, EmissionFactor) == (("emission_factors", None),)
+    factor = EmissionFactor(code="diesel", name="Diesel", unit="L", factor_kgco2_per_unit=2.5, scope_hint="Scope1")
+    db.add(factor)
+    db.commit()
+    seen = [data_revision(db, EmissionFactor)]
+
+    factor.factor_kgco2_per_unit = 2.6  # ORM flush of a dirty object, same ids
+    db.commit()
+    seen.append(data_revision(db, EmissionFactor))
+    db.execute(update(EmissionFactor).values(name="Diesel oil"))  # bulk statement
+    db.commit()
+    seen.append(data_revision(db, EmissionFactor))
+    bump_revision(db.connection(), EmissionFactor)  # writers outside the Session
+    db.commit()
+    seen.append(data_revision(db, EmissionFactor))
+    assert len(set(seen)) == 4 and all(token is not None for (_, token), in seen)
+
+    # Rolled-back writes leave the committed token in place; other tables are unaffected
+    db.execute(update(EmissionFactor).values(name="x"))
+    db.rollback()
+    assert data_revision(db, EmissionFactor) == seen[-1]
+    assert data_revision(db, GasGWP) == (("gas_gwp", None),)
@@ -1,4 +1,8 @@
-from backend.app.services.calc import compute_emissions_for_activity
+from datetime import date
+
+from backend.app.models import Group, Entity, EUETSAllowanceLedger, Facility, UploadedActivity, EmissionRecord
+from backend.app.services.calc import calc_compliance, calc_emissions, compute_emissions_for_activity
+from backend.app.services.hierarchy import rebuild_closure
 
 
 def test_compute_emissions_for_activity():
@@ -6,3 +10,68 @@ def test_compute_emissions_for_activity():
     assert compute_emissions_for_activity(0, 2.5) == 0.0
     assert compute_emissions_for_activity(10, 0) == 0.0
 
+
+
+def test_calc_emissions_from_records(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    a, b = Entity(name="A", group_id=group.id), Entity(name="B", group_id=group.id)
+    db.add_all([a, b])
+    db.flush()
+    fa, fb = Facility(name="FA", entity_id=a.id), Facility(name="FB", entity_id=b.id)
+    db.add_all([fa, fb])
+    db.flush()
+    rows = [(fa, "diesel", "Scope1", "2025-Q1", 3_000.0), (fa, "electricity", "Scope2", "2025-01", 1_000.0),
+            (fb, "diesel", "Scope1", "2025-01", 5_000.0), (fa, "diesel", "Scope1", "2024-Q1", 2_000.0),
+            (fa, "diesel", "Scope1", "2025-06", 9_000.0)]
+    for f, name, scope, period, kg in rows:
+        act = UploadedActivity(entity_id=f.entity_id, facility_id=f.id, scope=scope, activity_name=name,
+                               unit="L", amount=1, factor_code=name, period=period)
+        db.add(act)
+        db.flush()
+        db.add(EmissionRecord(activity_id=act.id, co2e_kg=kg, scope=scope, period=period))
+    db.commit()
+    rebuild_closure(db)
+
+    result = calc_emissions((date(2025, 1, 1), date(2025, 3, 31)), entities=[a.id], db=db)
+    assert [p.tco2e for p in result.series] == [2.0, 1.0, 1.0]
+    assert result.summary == {"total_tco2e": 4.0, "yoy_pct": 100.0}
+    assert [(s.scope, s.tco2e, s.pct) for s in result.scopes] == [("Scope1", 3.0, 75.0), ("Scope2", 1.0, 25.0)]
+    assert [c.category for c in result.top_categories] == ["diesel", "electricity"]
+
+    everyone = calc_emissions((date(2025, 1, 1), date(2025, 3, 31)), db=db)
+    assert everyone.summary["total_tco2e"] == 9.0
+
+
+def test_calc_compliance_uses_ledger(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    entity = Entity(name="A", group_id=group.id)
+    db.add(entity)
+    db.flush()
+    facility = Facility(name="FA", entity_id=entity.id)
+    db.add(facility)
+    db.flush()
+    for month in range(1, 4):
+        act = UploadedActivity(entity_id=entity.id, facility_id=facility.id, scope="Scope1", activity_name="diesel",
+                               unit="L", amount=1, factor_code="diesel", period=f"2025-{month:02d}")
+        db.add(act)
+        db.flush()
+        db.add(EmissionRecord(activity_id=act.id, co2e_kg=10_000.0, scope="Scope1", period=act.period))
+    db.commit()
+    rebuild_closure(db)
+    year = (date(2025, 1, 1), date(2025, 12, 31))
+
+    unallocated = calc_compliance(year, [entity.id], db=db)
+    assert unallocated.allowances == []
+    assert unallocated.projected_year_end_tco2e is not None
+    assert unallocated.projected_overshoot_tco2e is None
+
+    db.add(EUETSAllowanceLedger(entity_id=entity.id, delta_allowances=24.0, note="allocation:2025"))
+    db.commit()
+    result = calc_compliance(year, [entity.id], db=db)
+    assert result.current_overshoot_tco2e == 6.0
+    assert len(result.allowances) == 12
+    assert [(p.allocated, p.actual) for p in result.allowances[:3]] == [(2.0, 10.0)] * 3
@@ -0,0 +1,51 @@
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select, update
+
+from backend.app.models import Entity, Facility, Group, Period, UploadedActivity
+from backend.app.services.calendar import allocate_monthly, backfill_period_ids, month_weights, overlaps, resolve_period_ids
+
+
+def test_quarterly_and_annual_amounts_are_allocated_pro_rata():
+    starts = np.array(["2025-01-01", "2025-01-01"], dtype="datetime64[D]")
+    ends = np.array(["2025-03-31", "2025-12-31"], dtype="datetime64[D]")
+    jan = 2025 * 12
+
+    weights = month_weights(starts, ends, jan, 12)
+    assert np.allclose(weights[0, :3], [31 / 90, 28 / 90, 31 / 90]) and weights[0, 3:].sum() == 0
+    assert np.allclose(weights.sum(axis=1), 1.0) and np.isclose(weights[1, 1], 28 / 365)
+    assert np.allclose(month_weights(starts[:1], ends[:1], jan, 3, basis="months"), 1 / 3)
+
+    # Rows accumulate; months outside the grid are dropped
+    matrix = allocate_monthly([0, 0], [90.0, 365.0], starts, ends, 1, jan + 1, 2)
+    assert np.allclose(matrix, [[28 + 28, 31 + 31]])
+
+
+def test_period_keys_are_shared_and_backfilled(db):
+    ids = resolve_period_ids(db, ["2025Q3", "2025-Q3", "2025-7", "garbage"])
+    assert ids["2025Q3"] == ids["2025-Q3"] is not None and ids["garbage"] is None
+    quarter = db.get(Period, ids["2025-Q3"])
+    assert (quarter.label, quarter.granularity, quarter.period_end) == ("2025-Q3", "quarter", date(2025, 9, 30))
+
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    entity = Entity(name="E", group_id=group.id)
+    db.add(entity)
+    db.flush()
+    facility = Facility(name="F", entity_id=entity.id)
+    db.add(facility)
+    db.flush()
+    act = UploadedActivity(entity_id=entity.id, facility_id=facility.id, scope="Scope1", activity_name="x",
+                           unit="L", amount=1, factor_code="diesel", period="2025-07")
+    db.add(act)
+    db.commit()
+    assert act.period_id == ids["2025-7"]  # assigned on insert
+
+    db.execute(update(UploadedActivity).values(period_id=None))
+    assert backfill_period_ids(db) == 1
+    db.refresh(act)
+    assert act.period_id == ids["2025-7"]
+    in_q3 = db.scalars(select(Period.label).where(overlaps(date(2025, 8, 1), date(2025, 8, 31)))).all()
+    assert in_q3 == ["2025-Q3"]  # July does not overlap August
@@ -0,0 +1,82 @@
+import pandas as pd
+
+from backend.app.models import (
+    EmissionFactor,
+    EmissionFactorVersion,
+    EmissionRecord,
+    Entity,
+    Facility,
+    GasGWP,
+    Group,
+    UploadedActivity,
+)
+from backend.app.services.factor_library import import_factors
+from backend.app.services.ghg import recalculate_activities
+
+
+def _library(**overrides):
+    rows = [
+        {"code": "diesel", "name": "Diesel", "unit": "L", "factor_kgco2_per_unit": 2.68, "scope_hint": "Scope1"},
+        {"code": "petrol", "name": "Petrol", "unit": "L", "factor_kgco2_per_unit": 2.31, "scope_hint": "Scope1"},
+    ]
+    for row in rows:
+        row.update(overrides.get(row["code"], {}))
+    return pd.DataFrame(rows)
+
+
+def test_import_writes_only_changed_factors_as_versions(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    entity = Entity(name="E", group_id=group.id)
+    db.add(entity)
+    db.flush()
+    facility = Facility(name="F", entity_id=entity.id)
+    db.add_all([
+        facility,
+        # Seeded factor without version history
+        EmissionFactor(code="diesel", name="Diesel", unit="L", factor_kgco2_per_unit=2.5, scope_hint="Scope1"),
+        GasGWP(gas="CH4", gwp_set="AR5", gwp100=28), GasGWP(gas="N2O", gwp_set="AR5", gwp100=265),
+    ])
+    db.flush()
+    for code in ("diesel", "petrol"):
+        db.add(UploadedActivity(entity_id=entity.id, facility_id=facility.id, scope="Scope1", activity_name=code,
+                                unit="L", amount=100, factor_code=code, period="2025-01"))
+    db.commit()
+    assert recalculate_activities(db)["inserted"] == 1  # petrol unknown so far
+
+    preview = import_factors(db, _library(), dry_run=True)
+    assert (preview["inserted"], preview["updated"], preview["unchanged"]) == (1, 1, 0)
+    assert db.query(EmissionFactor).count() == 1
+
+    result = import_factors(db, _library(), source="DEFRA 2025")
+    assert (result["inserted"], result["updated"], result["activities_marked"]) == (1, 1, 2)
+    versions = db.query(EmissionFactorVersion).order_by(EmissionFactorVersion.code, EmissionFactorVersion.version).all()
+    assert [(v.code, v.version, v.factor_kgco2_per_unit, v.source) for v in versions] == [
+        ("diesel", 1, 2.5, None), ("diesel", 2, 2.68, "DEFRA 2025"), ("petrol", 1, 2.31, "DEFRA 2025"),
+    ]
+
+    # Only the flagged activities are recomputed, with the new factor values
+    assert recalculate_activities(db, dirty_only=True)["inserted"] == 2
+    assert recalculate_activities(db, dirty_only=True)["inserted"] == 0
+    assert sorted(r.co2e_kg for r in db.query(EmissionRecord)) == [231.0, 268.0]
+
+    # Re-importing the same file is a no-op; integer-valued floats hash the same as stored floats
+    again = import_factors(db, _library(petrol={"factor_kgco2_per_unit": 2.31}))
+    assert (again["inserted"], again["updated"], again["unchanged"]) == (0, 0, 2)
+    bumped = import_factors(db, _library(petrol={"factor_kgco2_per_unit": 3, "factor_kgch4_per_unit": "x"}))
+    assert (bumped["updated"], bumped["activities_marked"]) == (1, 1)
+    assert db.query(EmissionFactor).filter_by(code="petrol").one().factor_kgch4_per_unit == 0.0
+
+
+def test_invalid_rows_are_rejected(db):
+    df = pd.DataFrame([
+        {"code": "a", "name": "A", "unit": "kg", "factor_kgco2_per_unit": "n/a", "scope_hint": "Scope3"},
+        {"code": "b", "name": "B", "unit": "kg", "factor_kgco2_per_unit": -1, "scope_hint": "Scope3"},
+        {"code": "c", "name": "C", "unit": "kg", "factor_kgco2_per_unit": 1, "scope_hint": "Scope3"},
+        {"code": "c", "name": "C2", "unit": "kg", "factor_kgco2_per_unit": 2, "scope_hint": "Scope3"},
+        {"code": "d", "name": "D", "unit": "kg", "factor_kgco2_per_unit": 1, "scope_hint": "Scope3"},
+    ])
+    result = import_factors(db, df)
+    assert [(e["row"], e["code"]) for e in result["errors"]] == [(0, "a"), (1, "b"), (2, "c"), (3, "c")]
+    assert result["inserted"] == 1 and db.query(EmissionFactor.code).scalar() == "d"
@@ -0,0 +1,65 @@
+import io
+
+from fastapi.testclient import TestClient
+
+from app.db.database import get_db
+from app.main import app
+from app.models import EmissionFactor as AppEmissionFactor
+from backend.app.models import EmissionFactor
+from backend.app.services.factor_search import FactorIndex, get_index, suggest_for_rows
+
+FACTORS = [
+    ("electricity_TR", "Electricity TR Grid", "kWh", "Scope2"),
+    ("diesel_l", "Diesel (average biofuel blend)", "L", "Scope1"),
+    ("diesel_kg", "Diesel (average biofuel blend)", "kg", "Scope1"),
+    ("natural_gas_m3", "Natural gas", "m3", "Scope1"),
+    ("air_km", "Flights, short haul", "km", "Scope3"),
+]
+
+
+def test_typos_and_unit_dimension_filter():
+    index = FactorIndex(FACTORS)
+    assert index.search("electricty grid")[0]["code"] == "electricity_TR"
+    # Same name, different units: the query unit picks the dimension
+    assert [r["code"] for r in index.search("diesel", "gal")] == ["diesel_l"]
+    assert [r["code"] for r in index.search("diesel", "t")] == ["diesel_kg"]
+    assert index.search("diesel", "furlong") == [] and index.search("zzz") == []
+    batch = index.search_many([("natural gas boiler", "m3"), ("flight", None)], k=1)
+    assert [b[0]["code"] for b in batch] == ["natural_gas_m3", "air_km"]
+
+
+def test_suggestions_for_unmatched_rows_only(db):
+    db.add_all([
+        EmissionFactor(code=c, name=n, unit=u, factor_kgco2_per_unit=1.0, scope_hint=s) for c, n, u, s in FACTORS
+    ])
+    db.commit()
+    rows = [
+        {"activity_name": "Grid power", "unit": "MWh", "factor_code": "electricity_TR"},  # matched
+        {"activity_name": "Generator diesel", "unit": "L", "factor_code": "diesel"},
+        {"activity_name": "Generator diesel", "unit": "kg", "factor_code": "diesel_l"},  # wrong dimension
+    ]
+    result = suggest_for_rows(db, rows, k=1)
+    assert [(r["row"], r["suggestions"][0]["code"]) for r in result] == [(1, "diesel_l"), (2, "diesel_kg")]
+
+    first = get_index(db)
+    assert get_index(db) is first
+    db.add(EmissionFactor(code="steel_t", name="Steel", unit="t", factor_kgco2_per_unit=1.9, scope_hint="Scope3"))
+    db.commit()
+    assert get_index(db) is not first and len(get_index(db)) == len(FACTORS) + 1
+
+
+def test_search_routes(db):
+    db.add_all([
+        AppEmissionFactor(code=c, name=n, unit=u, factor_kgco2_per_unit=1.0, scope_hint=s) for c, n, u, s in FACTORS
+    ])
+    db.commit()
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        found = client.get("/factors/search", params={"q": "natural gas", "unit": "m3"}).json()
+        assert found[0]["code"] == "natural_gas_m3"
+        csv = b"activity_name,unit,factor_code\nShort flights,km,\nElectricity,kWh,electricity_TR\n"
+        upload = client.post("/factors/search/upload", files={"file": ("a.csv", io.BytesIO(csv), "text/csv")}).json()
+        assert [(r["row"], r["suggestions"][0]["code"]) for r in upload] == [(0, "air_km")]
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,24 @@
+import numpy as np
+
+from backend.app.services.forecast import holt_winters
+
+
+def test_holt_winters_tracks_seasonal_series():
+    months = np.arange(36)
+    pattern = 100 + 20 * np.sin(2 * np.pi * months / 12) + 0.5 * months
+    fit = holt_winters(np.vstack([pattern, np.full(36, 50.0)]), horizon=12)
+
+    expected = 100 + 20 * np.sin(2 * np.pi * np.arange(36, 48) / 12) + 0.5 * np.arange(36, 48)
+    assert np.abs(fit["mean"][0] - expected).max() < 5.0
+    assert np.allclose(fit["mean"][1], 50.0)
+    assert (fit["lower"] <= fit["mean"]).all() and (fit["mean"] <= fit["upper"]).all()
+
+
+def test_holt_winters_batches_many_series():
+    rng = np.random.default_rng(0)
+    values = rng.gamma(2.0, 50.0, size=(1_000, 36))
+    fit = holt_winters(values, horizon=12)
+    assert fit["mean"].shape == fit["lower"].shape == fit["upper"].shape == (1_000, 12)
+    assert np.isfinite(fit["mean"]).all()
+    # Batched rows match fitting each series on its own
+    assert np.allclose(fit["mean"][:3], np.vstack([holt_winters(values[i : i + 1], horizon=12)["mean"] for i in range(3)]))
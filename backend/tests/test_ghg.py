@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.app.db.database import Base
+from backend.app.services.calendar import backfill_period_ids
+from backend.app.models import Group, Entity, Facility, EmissionFactor, GasGWP, UploadedActivity, EmissionRecord
+from backend.app.services.ghg import active_gwp_set, compute_gas_emissions, ensure_gas_columns, load_gwp_vector, recalculate_activities, apply_gwp_set
+
+
+def test_compute_gas_emissions():
+    amounts = np.array([10.0, 2.0])
+    gas_factors = np.array([[2.0, 0.1, 0.01], [1.0, 0.0, 0.0]])
+    result = compute_gas_emissions(amounts, gas_factors, np.array([1.0, 28.0, 265.0]))
+    assert np.allclose(result["co2_kg"], [20.0, 2.0])
+    assert np.allclose(result["ch4_kg"], [1.0, 0.0])
+    assert np.allclose(result["co2e_kg"], [20.0 + 28.0 + 26.5, 2.0])
+
+
+def test_recalculate_and_switch_gwp_set(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    entity = Entity(name="E", group_id=group.id)
+    db.add(entity)
+    db.flush()
+    facility = Facility(name="F", entity_id=entity.id)
+    db.add(facility)
+    db.flush()
+    db.add_all(
+        [
+            EmissionFactor(code="gas", name="Gas", unit="m3", factor_kgco2_per_unit=2.0,
+                           factor_kgch4_per_unit=0.1, factor_kgn2o_per_unit=0.0, scope_hint="Scope1"),
+            GasGWP(gas="CH4", gwp_set="AR5", gwp100=28),
+            GasGWP(gas="N2O", gwp_set="AR5", gwp100=265),
+            GasGWP(gas="CH4", gwp_set="AR6", gwp100=27.9),
+            GasGWP(gas="N2O", gwp_set="AR6", gwp100=273),
+            UploadedActivity(entity_id=entity.id, facility_id=facility.id, scope="Scope1", activity_name="Boiler",
+                             unit="m3", amount=100, factor_code="gas", period="2025-Q1"),
+            UploadedActivity(entity_id=entity.id, facility_id=facility.id, scope="Scope1", activity_name="Unknown",
+                             unit="m3", amount=100, factor_code="missing", period="2025-Q1"),
+        ]
+    )
+    db.commit()
+
+    assert recalculate_activities(db, gwp_set="AR5")["inserted"] == 1
+    # recalculating again replaces rather than duplicates records
+    recalculate_activities(db, gwp_set="AR5")
+    records = db.query(EmissionRecord).all()
+    assert len(records) == 1
+    assert records[0].co2e_kg == 200.0 + 10.0 * 28
+
+    assert apply_gwp_set(db, "AR6") == 1
+    db.expire_all()
+    assert abs(db.query(EmissionRecord).one().co2e_kg - (200.0 + 10.0 * 27.9)) < 1e-9
+
+    # The switched set is the default of later recalculations
+    assert active_gwp_set(db) == "AR6"
+    assert recalculate_activities(db)["gwp_set"] == "AR6"
+    assert recalculate_activities(db, dirty_only=True)["gwp_set"] == "AR6"
+    with pytest.raises(ValueError):
+        recalculate_activities(db, period="2025-Q1", gwp_set="AR5")  # would mix AR5 and AR6 records
+    assert db.query(EmissionRecord).one().gwp_set == "AR6"
+
+
+def test_ensure_gas_columns_upgrades_old_tables():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        # Pre-multi-gas schema
+        conn.exec_driver_sql("CREATE TABLE emission_records (id INTEGER PRIMARY KEY, activity_id INTEGER NOT NULL, "
+                             "co2e_kg FLOAT NOT NULL, scope VARCHAR NOT NULL, period VARCHAR NOT NULL)")
+        conn.exec_driver_sql("CREATE TABLE emission_factors (id INTEGER PRIMARY KEY, code VARCHAR NOT NULL UNIQUE, "
+                             "name VARCHAR NOT NULL, unit VARCHAR NOT NULL, factor_kgco2_per_unit FLOAT NOT NULL, "
+                             "scope_hint VARCHAR NOT NULL)")
+        conn.exec_driver_sql("CREATE TABLE gas_gwp (id INTEGER PRIMARY KEY, gas VARCHAR NOT NULL UNIQUE, gwp100 FLOAT NOT NULL)")
+        conn.exec_driver_sql("INSERT INTO emission_records VALUES (1, 1, 12.5, 'Scope1', '2025-01')")
+        conn.exec_driver_sql("INSERT INTO gas_gwp (gas, gwp100) VALUES ('CH4', 28), ('N2O', 265)")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    ensure_gas_columns(db)
+    ensure_gas_columns(db)  # idempotent
+    backfill_period_ids(db)  # rest of the start-up upgrade
+
+    record = db.query(EmissionRecord).one()
+    assert (record.co2_kg, record.ch4_kg, record.gwp_set) == (12.5, 0.0, "AR5")
+    # Standard sets are completed, so AR6 can be switched to
+    assert load_gwp_vector(db, "AR6").tolist() == [1.0, 27.9, 273.0]
+    assert db.query(GasGWP).filter(GasGWP.gas == "CH4").count() == 2
+    assert apply_gwp_set(db, "AR6") == 1
+    db.add(EmissionFactor(code="diesel", name="Diesel", unit="L", factor_kgco2_per_unit=2.68, scope_hint="Scope1"))
+    db.commit()
+    assert db.query(EmissionFactor).one().factor_kgch4_per_unit == 0.0
+    db.close()
@@ -0,0 +1,33 @@
+from backend.app.models import Group, Entity, Facility, UploadedActivity, EmissionRecord
+from backend.app.services.hierarchy import rebuild_closure, resolve_facility_ids, rollup_emissions
+
+
+def _org(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    a, b = Entity(name="A", group_id=group.id), Entity(name="B", group_id=group.id)
+    db.add_all([a, b])
+    db.flush()
+    facilities = [Facility(name=f"F{i}", entity_id=e.id) for i, e in enumerate([a, a, b])]
+    db.add_all(facilities)
+    db.flush()
+    for i, (f, kg) in enumerate(zip(facilities, [100.0, 50.0, 250.0])):
+        act = UploadedActivity(entity_id=f.entity_id, facility_id=f.id, scope="Scope1", activity_name="x",
+                               unit="L", amount=1, factor_code="diesel", period="2025-Q1")
+        db.add(act)
+        db.flush()
+        db.add(EmissionRecord(activity_id=act.id, co2e_kg=kg, scope="Scope1", period="2025-Q1"))
+    db.commit()
+    return group, a, b
+
+
+def test_rollup_along_closure(db):
+    group, a, b = _org(db)
+    assert rebuild_closure(db) == 9
+
+    assert len(resolve_facility_ids(db, "group", [group.id])) == 3
+    by_entity = {r["name"]: r["co2e_kg"] for r in rollup_emissions(db, "entity")}
+    assert by_entity == {"A": 150.0, "B": 250.0}
+    (group_row,) = rollup_emissions(db, "group", by_scope=True)
+    assert group_row["totals_by_scope"] == {"Scope1": 400.0}
@@ -0,0 +1,80 @@
+from backend.app.models import Group, Entity, Facility, UploadedActivity, EmissionRecord, EUETSAllowanceLedger, EntityInsight
+from backend.app.services.insights import build_insights, refresh_balances, refresh_insights, stored_insights
+
+
+def _org(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    short, long_ = Entity(name="Short", group_id=group.id, yearly_budget_tco2e=100), Entity(name="Long", group_id=group.id)
+    db.add_all([short, long_])
+    db.flush()
+    for entity, scope, code, kg in [
+        (short, "Scope2", "electricity", 90_000.0),
+        (short, "Scope1", "diesel", 30_000.0),
+        (long_, "Scope1", "diesel", 10_000.0),
+    ]:
+        facility = Facility(name=f"{entity.name}-{code}", entity_id=entity.id)
+        db.add(facility)
+        db.flush()
+        act = UploadedActivity(entity_id=entity.id, facility_id=facility.id, scope=scope, activity_name=code,
+                               unit="kWh", amount=1, factor_code=code, period="2025")
+        db.add(act)
+        db.flush()
+        db.add(EmissionRecord(activity_id=act.id, co2e_kg=kg, scope=scope, period="2025"))
+    db.add_all([
+        EUETSAllowanceLedger(entity_id=short.id, delta_allowances=80),
+        EUETSAllowanceLedger(entity_id=long_.id, delta_allowances=500),
+    ])
+    db.commit()
+    return short, long_
+
+
+def test_insights_are_derived_from_recorded_data_and_stored(db):
+    short, long_ = _org(db)
+    assert refresh_insights(db) == 3  # portfolio + two entities
+    assert db.query(EntityInsight).count() == 3
+
+    insights = stored_insights(db, short.id)
+    snapshot = insights["snapshot"]
+    assert (snapshot["total_emissions"], snapshot["scope1"], snapshot["scope2"]) == (120.0, 30.0, 90.0)
+    assert snapshot["eu_ets_allowances"] == 80.0
+    assert snapshot["top_source"]["factor_code"] == "electricity"
+
+    analysis = insights["analysis"]
+    assert analysis["compliance_status"] == "Deficit"
+    assert analysis["financial_impact"] == f"€{40 * snapshot['eu_ets_price']:,.0f}"
+    titles = [r["title"] for r in insights["recommendations"]]
+    assert titles[0] == "Transfer allowances from Long"  # surplus elsewhere in the portfolio
+    assert "Renewable electricity contracts" in titles
+    risks = {r["risk"]: r for r in insights["risk_assessment"]["risks"]}
+    assert risks["EU ETS non-compliance"]["probability"] == "High"
+    assert "Emissions budget overrun" in risks
+    assert insights["risk_assessment"]["overall_risk_level"] == "High"
+
+    portfolio = stored_insights(db)["snapshot"]
+    assert portfolio["total_emissions"] == 130.0
+    assert {e["name"] for e in portfolio["entities"]} == {"Short", "Long"}
+    assert stored_insights(db, long_.id)["analysis"]["compliance_status"] == "Compliant"
+
+
+def test_allowance_movements_update_only_the_balance_rows(db):
+    short, long_ = _org(db)
+    refresh_insights(db)
+    assert stored_insights(db, short.id)["snapshot"]["projected_tco2e"] == 120.0  # one batched fit
+
+    db.add(EUETSAllowanceLedger(entity_id=short.id, delta_allowances=50))
+    db.commit()
+    assert refresh_balances(db, [short.id]) == 2  # the entity and the portfolio
+    insights = stored_insights(db, short.id)
+    assert insights["snapshot"]["eu_ets_allowances"] == 130.0
+    assert insights["analysis"]["compliance_status"] == "Compliant"
+    assert stored_insights(db)["snapshot"]["eu_ets_allowances"] == 630.0
+
+
+def test_rules_accept_partial_figures():
+    insights = build_insights({"total_emissions": 100, "scope1": 20, "scope2": 70, "scope3": 10,
+                               "eu_ets_allowances": 120, "eu_ets_price": 80})
+    assert insights["analysis"]["compliance_status"] == "Compliant"
+    assert insights["risk_assessment"]["overall_risk_level"] == "Low"
+    assert insights["recommendations"][0]["emission_reduction"] == "56 tCO₂e"
@@ -0,0 +1,51 @@
+from datetime import date
+
+import numpy as np
+
+from backend.app.models import Group, Entity, Facility, UploadedActivity, EmissionRecord, FacilityRevenue
+from backend.app.services.hierarchy import rebuild_closure
+from backend.app.services.intensity import _aggregates, compute_intensity, dated_month_matrix
+
+
+def test_dated_month_matrix_spreads_periods():
+    rows = [
+        (1, date(2025, 1, 1), date(2025, 3, 31), 300.0),
+        (2, date(2025, 2, 1), date(2025, 2, 28), 10.0),
+        (2, date(2024, 12, 1), date(2025, 1, 31), 8.0),  # half of it falls before the grid
+    ]
+    matrix = dated_month_matrix(rows, np.array([1, 2]), first_month=2025 * 12, n_months=3)
+    assert np.allclose(matrix, [[100.0, 100.0, 100.0], [4.0, 10.0, 0.0]])
+
+
+def test_compute_intensity_from_db(db):
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    entities = [Entity(name=f"E{i}", group_id=group.id) for i in range(2)]
+    db.add_all(entities)
+    db.flush()
+    facilities = [Facility(name=f"Site {i}", entity_id=entities[i].id) for i in range(2)]
+    db.add_all(facilities)
+    db.flush()
+    for f, kg, revenue in zip(facilities, [30_000.0, 90_000.0], [1_000_000.0, 2_000_000.0]):
+        act = UploadedActivity(entity_id=f.entity_id, facility_id=f.id, scope="Scope1", activity_name="x",
+                               unit="L", amount=1, factor_code="diesel", period="2025-Q1")
+        db.add(act)
+        db.flush()
+        db.add(EmissionRecord(activity_id=act.id, co2e_kg=kg, scope="Scope1", period="2025-Q1"))
+        db.add_all([FacilityRevenue(facility_id=f.id, period=f"2025-{m:02d}", revenue_eur=revenue) for m in (1, 2, 3)])
+        db.add(FacilityRevenue(facility_id=f.id, period="2019-06", revenue_eur=revenue))  # outside the window
+    db.commit()
+    rebuild_closure(db)
+
+    _, revenue_rows = _aggregates(db, None, date(2024, 4, 1), date(2025, 3, 31))
+    assert len(revenue_rows) == 6  # range filtered in SQL
+
+    result = compute_intensity(db, date(2025, 1, 1), date(2025, 3, 31))
+    assert [p.intensity for p in result.series] == [13.33, 13.33, 13.33]  # 40 t / 3 €M per month
+    assert {p.site: p.intensity for p in result.site_scatter} == {"Site 0": 10.0, "Site 1": 15.0}
+    assert result.correlation == 1.0
+
+    filtered = compute_intensity(db, date(2025, 1, 1), date(2025, 3, 31), entities=[entities[0].id])
+    assert [p.site for p in filtered.site_scatter] == ["Site 0"]
+    assert filtered.current_intensity == 10.0
@@ -0,0 +1,39 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.services import json_extract, prompts
+from app.services.json_extract import extract_json
+
+CORPUS = Path(__file__).parents[1] / "benchmarks" / "data" / "llm_responses.jsonl"
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_extracts_embedded_values_from_recorded_replies(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(json_extract, "orjson", None)
+    rows = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines()]
+    kinds = {"analysis": "object", "risk_assessment": "object", "recommendations": "array"}
+    parsed = [extract_json(r["text"], kinds[r["kind"]]) for r in rows]
+
+    # Braces in prose, fenced blocks, escaped quotes and trailing commas are handled
+    assert parsed[0]["financial_impact"] == "€4,019"
+    assert parsed[2]["key_findings"] == ["Boiler efficiency dropped", "Fleet diesel up"]
+    assert parsed[3] is None
+    assert [r["title"] for r in parsed[4]] == ["Yenilenebilir Enerji", "LED [aydınlatma]"]
+    assert parsed[5][0]["title"] == "Heat pumps"
+    assert parsed[6]["overall_risk_level"] == "High"
+    assert parsed[7]["risks"][0]["risk"] == "Grid intensity"
+
+
+def test_kind_filter_and_strings_with_braces():
+    assert extract_json('note [1, 2] then {"a": "}{"}', "object") == {"a": "}{"}
+    assert extract_json('{"a": [1, 2]}', "array") == [1, 2]
+    assert extract_json("no json here") is None
+
+
+def test_templates_render_every_declared_field():
+    for template in prompts.REGISTRY.values():
+        rendered = template.render(**{field: "X" for field in template.fields})
+        assert "$" not in rendered
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import time
+
+from app.core.config import settings
+from app.services import prompts
+from app.services.llm_cache import LLMResponseCache, cache_key
+from app.services.llm_service import LLMService
+
+DATA = {"total_emissions": 2847, "scope1": 1247, "scope2": 1456, "scope3": 144,
+        "eu_ets_allowances": 2800, "eu_ets_used": 2847, "eu_ets_price": 85.5}
+
+
+def test_gather_insights_runs_legs_concurrently_with_fallbacks(monkeypatch):
+    monkeypatch.setattr(settings, "llm_call_timeout_s", 0.5)
+    service = LLMService()
+
+    async def slow_analysis(data):
+        await asyncio.sleep(0.2)
+        return {"executive_summary": "ok"}
+
+    async def slow_recommendations(data):
+        await asyncio.sleep(0.2)
+        return [{"title": "ok"}]
+
+    async def hanging_risks(data):
+        await asyncio.sleep(10)
+
+    service._analysis = slow_analysis
+    service._recommendations = slow_recommendations
+    service._risk_assessment = hanging_risks
+
+    started = time.perf_counter()
+    insights = asyncio.run(service.gather_insights(DATA))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.65  # legs overlap; the hanging one is cut at the timeout
+    assert insights["analysis"] == {"executive_summary": "ok"}
+    assert insights["recommendations"] == [{"title": "ok"}]
+    assert insights["degraded"] == ["risk_assessment"]
+    assert "risks" in insights["risk_assessment"]  # fallback content
+
+
+def test_llm_path_uses_pooled_async_client_with_retries(monkeypatch):
+    import httpx
+
+    from app.services.llm_client import mock_handler
+
+    monkeypatch.setattr(settings, "llm_enabled", True)
+    monkeypatch.setattr(settings, "llm_retry_base_delay_s", 0.001)
+    calls = []
+
+    def flaky(request):
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return httpx.Response(503, json={"error": {"message": "overloaded"}})
+        return mock_handler(request)
+
+    service = LLMService(transport=httpx.MockTransport(flaky), cache=LLMResponseCache(path=None))
+
+    async def run():
+        try:
+            return await service.gather_insights(DATA)
+        finally:
+            await service.aclose()
+
+    insights = asyncio.run(run())
+
+    assert len(calls) == 4  # three legs, one retried after the 503
+    assert all(path.endswith("/chat/completions") for path in calls)
+    assert insights["degraded"] == []
+    assert insights["analysis"]["executive_summary"].startswith("Mock analysis")
+    assert insights["recommendations"][0]["title"] == "Mock recommendation"
+    assert insights["risk_assessment"]["risks"][0]["risk"] == "Mock compliance risk"
+
+
+def test_failed_and_unparseable_legs_are_reported_and_not_cached(monkeypatch):
+    import httpx
+
+    monkeypatch.setattr(settings, "llm_enabled", True)
+    monkeypatch.setattr(settings, "llm_retry_base_delay_s", 0.001)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if json.loads(request.content)["messages"][0]["content"] == prompts.RISK_SYSTEM:
+            return httpx.Response(400, json={"error": {"message": "bad request"}})
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": "m",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "Sorry, no JSON today."},
+                         "finish_reason": "stop"}],
+        })
+
+    service = LLMService(transport=httpx.MockTransport(handler), cache=LLMResponseCache(path=None))
+
+    async def run():
+        try:
+            return [await service.gather_insights(DATA) for _ in range(2)]
+        finally:
+            await service.aclose()
+
+    first, second = asyncio.run(run())
+    assert first["degraded"] == second["degraded"] == ["analysis", "recommendations", "risk_assessment"]
+    assert first["analysis"]["executive_summary"] == "Sorry, no JSON today."  # built from the text
+    assert "risks" in first["risk_assessment"]
+    assert len(calls) == 6  # nothing was cached
+
+
+def test_disabled_llm_returns_fallback_without_requests(monkeypatch):
+    import httpx
+
+    monkeypatch.setattr(settings, "llm_enabled", False)
+
+    def fail(request):
+        raise AssertionError("no request expected")
+
+    service = LLMService(transport=httpx.MockTransport(fail), cache=LLMResponseCache(path=None))
+    explanation = asyncio.run(service.generate_explanation("compliance overview"))
+    assert "Carbon emissions analysis" in explanation
+
+
+def test_identical_inputs_are_served_from_cache(monkeypatch, tmp_path):
+    import httpx
+
+    from app.services.llm_client import mock_handler
+
+    monkeypatch.setattr(settings, "llm_enabled", True)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return mock_handler(request)
+
+    path = str(tmp_path / "llm_cache.db")
+    service = LLMService(transport=httpx.MockTransport(handler), cache=LLMResponseCache(path=path))
+    first = asyncio.run(service.analyze_emissions_data(DATA))
+    # Rounding noise and unrelated keys do not change the key
+    second = asyncio.run(service.analyze_emissions_data({**DATA, "scope1": 1247.00001, "anomalies": [{"x": 1}]}))
+    assert first == second
+    assert len(calls) == 1
+
+    # A fresh process sees the disk tier
+    fresh = LLMService(transport=httpx.MockTransport(handler), cache=LLMResponseCache(path=path))
+    assert asyncio.run(fresh.analyze_emissions_data(DATA)) == first
+    assert len(calls) == 1
+
+    changed = asyncio.run(service.analyze_emissions_data({**DATA, "scope1": 2000}))
+    assert changed == first  # same mock content, but it took a new request
+    assert len(calls) == 2
+
+
+def test_cache_entries_expire():
+    cache = LLMResponseCache(ttl_s=-1, path=None)
+    key = cache_key("analysis", "1", {"total_emissions": 10.0})
+    assert key == cache_key("analysis", "1", {"total_emissions": 10})
+    cache.set(key, {"ok": True})
+    assert cache.get(key) is None
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMResponseCache(maxsize=1, path=path, disk_maxsize=2)
+
+    async def run():
+        await cache.aset("a", 1)
+        await cache.aset("b", 2)
+        await cache.aget("a")  # from disk: "a" becomes the most recently used
+        await cache.aset("c", 3)
+
+    asyncio.run(run())
+    fresh = LLMResponseCache(path=path)
+    assert [fresh.get(k) for k in "abc"] == [1, None, 3]
+
+
+def _sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_explain_stream_forwards_tokens_and_ends_with_structured_event(monkeypatch):
+    import httpx
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services.llm_client import ClientPool, mock_handler
+    from app.services.llm_service import llm_service
+
+    monkeypatch.setattr(settings, "llm_enabled", True)
+    monkeypatch.setattr(llm_service, "clients", ClientPool(httpx.MockTransport(mock_handler)))
+    monkeypatch.setattr(llm_service, "cache", LLMResponseCache(path=None))
+
+    with TestClient(app) as client:
+        response = client.post("/api/llm/explain/stream", json={"context": "overview", "data": {"total": 1}})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+
+    tokens = [data["text"] for event, data in events if event == "token"]
+    assert len(tokens) > 10
+    assert [event for event, _ in events if event != "token"] == ["summary", "action", "action", "action", "done"]
+    done = events[-1][1]
+    assert done["summary"] == "".join(tokens).split("\n")[0]
+    assert done["actions"][0] == "Move electricity supply to renewable contracts"
+
+
+def test_stream_parser_matches_batch_parser_for_any_chunking():
+    from app.routes.llm import _ExplainStreamParser, _parse_llm_response
+
+    text = "\nSummary line\n- first\nnot a bullet\n* second\n• third\n- fourth"
+    expected = _parse_llm_response(text, "emissions")
+    for size in (1, 3, 7, len(text)):
+        parser = _ExplainStreamParser("emissions")
+        for i in range(0, len(text), size):
+            parser.feed(text[i : i + size])
+        _, final = parser.close()
+        assert (final.summary, final.actions) == expected
@@ -0,0 +1,75 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from backend.app.core.config import settings
+from backend.app.models import Entity, Facility, Group, Meter, MeterBlock, UploadedActivity
+from backend.app.services.meters import (
+    daily_totals,
+    ingest_readings,
+    load_block,
+    monthly_totals,
+    peak_reading,
+    regular_timestamps,
+    to_utc_minutes,
+)
+
+
+@pytest.fixture
+def meter(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "meter_store_path", str(tmp_path))
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    entity = Entity(name="E", group_id=group.id)
+    db.add(entity)
+    db.flush()
+    facility = Facility(name="F", entity_id=entity.id)
+    db.add(facility)
+    db.flush()
+    m = Meter(facility_id=facility.id, name="Main", interval_minutes=15)
+    db.add(m)
+    db.commit()
+    return m
+
+
+def test_interval_readings_roll_up_to_blocks_days_and_activities(db, meter):
+    # 31 + 29 days of constant 1 kWh readings from January, one spike in February
+    values = np.ones(96 * 60, dtype=np.float32)
+    values[96 * 31 + 40] = 12.0
+    result = ingest_readings(db, meter, regular_timestamps(meter, datetime(2024, 1, 1), len(values)), values)
+    assert result["months"] == [date(2024, 1, 1), date(2024, 2, 1)] and result["activities_synced"] == 2
+
+    jan, feb = db.query(MeterBlock).order_by(MeterBlock.month).all()
+    assert (jan.slots, jan.readings, jan.total) == (96 * 31, 96 * 31, 96 * 31)
+    assert isinstance(load_block(feb), np.memmap) and feb.peak == 12.0
+
+    days = daily_totals(db, meter, date(2024, 1, 30), date(2024, 2, 2))
+    assert [d["start"] for d in days] == [date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1)]
+    assert [d["total"] for d in days] == [96, 96, 96 + 11]
+
+    assert [m["total"] for m in monthly_totals(db, meter, date(2024, 1, 1), date(2024, 3, 1))] == [96 * 31, 96 * 29 + 11]
+    peak = peak_reading(db, meter, date(2024, 1, 1), date(2024, 3, 1))
+    assert peak == {"timestamp": datetime(2024, 2, 1, 10, 0), "value": 12.0, "demand_kw": 48.0}
+    assert peak_reading(db, meter, date(2024, 1, 1), date(2024, 2, 1))["value"] == 1.0
+
+    activities = db.query(UploadedActivity).order_by(UploadedActivity.period).all()
+    assert [(a.period, a.amount, a.scope) for a in activities] == [("2024-01", 96 * 31, "Scope2"), ("2024-02", 96 * 29 + 11, "Scope2")]
+
+
+def test_reingest_overwrites_slots_and_updates_the_same_activity(db, meter, tmp_path):
+    start = datetime(2025, 3, 1)
+    ingest_readings(db, meter, regular_timestamps(meter, start, 4), np.array([1, 2, 3, 4], dtype=np.float32))
+    activity_id = db.query(MeterBlock).one().activity_id
+
+    # Explicit timestamps: slot 1 corrected, slot 2 cleared, one new reading (floored to its slot)
+    stamps = to_utc_minutes([datetime(2025, 3, 1, 0, 15), datetime(2025, 3, 1, 0, 30), datetime(2025, 3, 1, 1, 7)])
+    ingest_readings(db, meter, stamps, np.array([5, np.nan, 10], dtype=np.float32))
+
+    block = db.query(MeterBlock).one()
+    assert (block.readings, block.total, block.activity_id) == (4, 1 + 5 + 4 + 10, activity_id)
+    assert db.get(UploadedActivity, activity_id).amount == 20
+    assert [p.name for p in tmp_path.rglob("*.npy")] == ["2025-03.npy"]  # no temp file left behind
+    with pytest.raises(ValueError):
+        ingest_readings(db, meter, stamps, np.ones(2, dtype=np.float32))
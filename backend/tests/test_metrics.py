@@ -0,0 +1,48 @@
+import time
+
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Histogram, MetricsRegistry, TimingMiddleware, registry
+from app.main import app
+
+
+def test_requests_are_timed_with_query_counts():
+    registry.reset()
+    with TestClient(app) as client:
+        response = client.get("/emissions/anomalies", params={"limit": 5})
+        assert response.status_code == 200
+        timing = response.headers["server-timing"]
+        assert timing.startswith("db;dur=") and "queries" in timing and "app;dur=" in timing
+
+        text = client.get("/metrics").text
+    labels = 'method="GET",route="/emissions/anomalies",status="200"'
+    assert f"http_request_duration_seconds_count{{{labels}}} 1" in text
+    assert f'http_request_db_queries_bucket{{{labels},le="0"}} 0' in text  # at least one query ran
+    assert f"http_response_size_bytes_sum{{{labels}}} {len(response.content)}" in text
+
+
+def test_background_tasks_are_not_timed_with_the_request():
+    timed = MetricsRegistry()
+    api = FastAPI()
+
+    @api.get("/slow-tail")
+    def slow_tail(background_tasks: BackgroundTasks):
+        background_tasks.add_task(time.sleep, 0.3)
+        return {"status": "ok"}
+
+    with TestClient(TimingMiddleware(api, timed)) as client:
+        assert client.get("/slow-tail").status_code == 200
+    (series,) = timed.latency._series.values()
+    assert series[-2] < 0.3  # sum of durations: the response went out before the sleep
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("x", "help", ("route",), (1, 10))
+    for value in (0.5, 5, 50):
+        h.observe(("/a",), value)
+    lines = h.render()
+    assert 'x_bucket{route="/a",le="1"} 1' in lines
+    assert 'x_bucket{route="/a",le="10"} 2' in lines
+    assert 'x_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'x_sum{route="/a"} 55.5' in lines
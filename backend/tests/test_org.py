@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from backend.app.db.database import get_db
+from backend.app.main import app
+from backend.app.models import Group, Entity, Facility
+
+
+def test_org_tree_loads_each_level_once(db):
+    for g in range(3):
+        group = Group(name=f"G{g}")
+        db.add(group)
+        db.flush()
+        for e in range(4):
+            entity = Entity(name=f"G{g}E{e}", group_id=group.id)
+            db.add(entity)
+            db.flush()
+            db.add_all([Facility(name=f"G{g}E{e}F{f}", entity_id=entity.id) for f in range(5)])
+    db.commit()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = TestClient(app).get("/org/tree")
+        filtered = TestClient(app).get("/org/tree", params={"group_id": 2})
+    finally:
+        app.dependency_overrides.clear()
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    tree = response.json()
+    assert len(tree) == 3
+    assert sum(len(e["facilities"]) for g in tree for e in g["entities"]) == 60
+    assert len(statements) == 6  # groups, entities, facilities per request
+    assert [g["id"] for g in filtered.json()] == [2]
@@ -0,0 +1,61 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import profiling
+from app.core.config import settings
+from app.core.profiling import ProfileStore, ProfilingMiddleware
+from app.main import app
+
+
+def _busy_work():
+    deadline = time.perf_counter() + 0.08
+    while time.perf_counter() < deadline:
+        sum(range(200))
+
+
+def test_header_profiles_sync_endpoint_stacks(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    monkeypatch.setattr(settings, "profiling_interval_ms", 1.0)
+    store = ProfileStore(2)
+    mini = FastAPI()
+    mini.add_middleware(ProfilingMiddleware, store=store)
+
+    @mini.get("/slow")
+    def slow():
+        _busy_work()
+        return {"ok": True}
+
+    client = TestClient(mini)
+    assert "x-profile-id" not in client.get("/slow").headers
+    assert "x-profile-id" not in client.get("/slow", headers={"X-Profile": "wrong"}).headers
+    response = client.get("/slow", headers={"X-Profile": "secret"})
+    profile = store.get(response.headers["x-profile-id"])
+
+    assert profile.route == "/slow" and profile.status == 200 and profile.samples > 10
+    assert any("_busy_work (tests/test_profiling.py" in line for line in profile.collapsed().splitlines())
+    doc = profile.speedscope()
+    names = {f["name"] for f in doc["shared"]["frames"]}
+    assert {"slow", "_busy_work"} <= names
+    assert all(len(p["samples"]) == len(p["weights"]) for p in doc["profiles"])
+
+
+def test_slow_requests_are_kept_with_sql_and_served_to_admins(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    monkeypatch.setattr(settings, "profile_all_requests", True)
+    monkeypatch.setattr(settings, "profiling_slow_ms", 0.0)
+    profiling.profile_store.clear()
+    with TestClient(app) as client:
+        client.get("/emissions/anomalies", params={"limit": 5})
+        assert client.get("/admin/profiles").status_code == 403
+
+        admin = {"X-Admin-Token": "secret"}
+        latest = client.get("/admin/profiles", headers=admin).json()
+        anomalies = next(p for p in latest if p["route"] == "/emissions/anomalies")
+        detail = client.get(f"/admin/profiles/{anomalies['id']}", headers=admin).json()
+        assert detail["trigger"] == "slow" and detail["query_count"] == len(detail["statements"]) > 0
+        assert detail["statements"][0]["sql"].lstrip().upper().startswith("SELECT")
+        speedscope = client.get(f"/admin/profiles/{anomalies['id']}", params={"format": "speedscope"}, headers=admin)
+        assert speedscope.json()["$schema"].endswith("file-format-schema.json")
+        assert client.get("/admin/profiles/missing", headers=admin).status_code == 404
@@ -0,0 +1,82 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from backend.app.core.config import settings
+from backend.app.models import EmissionFactor, EnergyInstrument, Entity, Facility, GasGWP, Group, Meter
+from backend.app.services.meters import ingest_readings, regular_timestamps
+from backend.app.services.scope2 import allocate_instrument, calc_scope2
+
+
+@pytest.fixture
+def site(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "meter_store_path", str(tmp_path / "meters"))
+    curves = tmp_path / "grid.csv"
+    # TR curve for the first 24 hours of 2025 only; later hours fall back to the annual factor
+    curves.write_text("region,hour,kgco2e_per_kwh\n" + "".join(
+        f"TR,2025-01-01T{h:02d}:00:00Z,{0.1 if h < 12 else 0.5}\n" for h in range(24)
+    ))
+    monkeypatch.setattr(settings, "grid_intensity_path", str(curves))
+
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    entity = Entity(name="E", group_id=group.id)
+    db.add(entity)
+    db.flush()
+    plant, office = Facility(name="Plant", entity_id=entity.id), Facility(name="Office", entity_id=entity.id)
+    db.add_all([
+        plant, office,
+        EmissionFactor(code="electricity_TR", name="Grid", unit="kWh", factor_kgco2_per_unit=0.4, scope_hint="Scope2"),
+        GasGWP(gas="CH4", gwp_set="AR5", gwp100=28),
+        GasGWP(gas="N2O", gwp_set="AR5", gwp100=265),
+    ])
+    db.flush()
+    quarter_hourly = Meter(facility_id=plant.id, name="Plant", interval_minutes=15)
+    hourly = Meter(facility_id=office.id, name="Office", interval_minutes=60)
+    db.add_all([quarter_hourly, hourly])
+    db.commit()
+    # Two days from 2025-01-01: plant 2.5 kWh per quarter hour (10 kWh/h), office 5 kWh/h
+    start = datetime(2025, 1, 1)
+    ingest_readings(db, quarter_hourly, regular_timestamps(quarter_hourly, start, 4 * 48), np.full(4 * 48, 2.5))
+    ingest_readings(db, hourly, regular_timestamps(hourly, start, 48), np.full(48, 5.0))
+    return entity, plant, office
+
+
+def test_instrument_allocation_is_hourly_and_chronological():
+    pool = np.array([4.0, 10.0, 6.0])
+    assert allocate_instrument(pool, 5.0, None).tolist() == [4.0, 5.0, 5.0]
+    assert allocate_instrument(pool, None, 12.0).tolist() == [4.0, 8.0, 0.0]
+
+
+def test_location_and_market_based_scope2(db, site):
+    entity, plant, office = site
+    # Location-based: day 1 at the hourly curve (12h at 0.1, 12h at 0.5), day 2 at the annual 0.4
+    result = calc_scope2(db, 2025)
+    by_name = {f["facility"]: f for f in result["facilities"]}
+    assert result["hours"] == 8760 and result["errors"] == []
+    assert by_name["Plant"]["consumption_kwh"] == pytest.approx(480)
+    assert by_name["Plant"]["location_kgco2e"] == pytest.approx(10 * (12 * 0.1 + 12 * 0.5) + 240 * 0.4)
+    assert by_name["Office"]["location_kgco2e"] == pytest.approx(5 * (12 * 0.1 + 12 * 0.5) + 120 * 0.4)
+    # Without instruments the market-based figure is the residual (annual) factor
+    assert result["totals"]["market_kgco2e"] == pytest.approx(720 * 0.4)
+
+    db.add_all([
+        # On-site PPA of 4 kW at the plant, then an entity-wide 300 kWh GO drawn down from the first hour
+        EnergyInstrument(entity_id=entity.id, facility_id=plant.id, kind="PPA", capacity_kw=4,
+                         valid_from=date(2025, 1, 1), valid_to=date(2025, 12, 31)),
+        EnergyInstrument(entity_id=entity.id, kind="GO", volume_kwh=300, factor_kgco2e_per_kwh=0.01,
+                         valid_from=date(2025, 1, 1), valid_to=date(2025, 12, 31)),
+    ])
+    db.commit()
+    result = calc_scope2(db, 2025)
+    ppa, go = result["instruments"]
+    assert (ppa["kind"], ppa["allocated_kwh"]) == ("PPA", pytest.approx(4 * 48))
+    assert (go["kind"], go["allocated_kwh"]) == ("GO", pytest.approx(300))
+    # GO covers the first 300 / (6 + 5) hours of remaining load, shared 6:5 between plant and office
+    by_name = {f["facility"]: f for f in result["facilities"]}
+    assert by_name["Plant"]["instrument_kwh"] == pytest.approx(192 + 300 * 6 / 11)
+    totals = result["totals"]
+    assert totals["residual_kwh"] == pytest.approx(720 - 192 - 300)
+    assert totals["market_kgco2e"] == pytest.approx(300 * 0.01 + (720 - 492) * 0.4)
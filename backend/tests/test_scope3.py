@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from backend.app.core.config import settings
+from backend.app.models import Entity, FxRate, GasGWP, Group
+from backend.app.services.eeio import load_eeio, spend_emissions, write_eeio
+from backend.app.services.scope3 import calc_spend_scope3, ingest_purchases
+
+
+def test_sparse_spend_product_matches_dense(tmp_path):
+    rng = np.random.default_rng(3)
+    entries = [
+        (f"S{i}", country, gas, float(rng.random()))
+        for i in range(200)
+        for country in ("DE", "ROW")
+        for gas in ("CO2", "CH4", "N2O")
+        if rng.random() < 0.5
+    ]
+    model = write_eeio(str(tmp_path / "eeio"), entries, "EUR")
+    assert load_eeio(str(tmp_path / "eeio")) is model and isinstance(model.data, np.memmap)
+
+    dense = np.zeros(model.shape)
+    for s, c, g, v in entries:
+        dense[model.index[(s, c)], model.gases.index(g)] = v
+    rows = rng.integers(0, 5, 1_000)
+    products = rng.integers(0, model.shape[0], 1_000)
+    spend = rng.random(1_000) * 100
+    expected = np.zeros((5, model.shape[1]))
+    np.add.at(expected, rows, spend[:, None] * dense[products])
+    assert np.allclose(spend_emissions(model, rows, products, spend, 5), expected)
+
+
+def test_spend_based_scope3_per_entity_and_category(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "eeio_path", str(tmp_path / "eeio"))
+    write_eeio(settings.eeio_path, [
+        ("C24", "DE", "CO2", 1.5), ("C24", "ROW", "CO2", 2.0), ("C24", "ROW", "CH4", 0.01),
+        ("J62", "ROW", "CO2", 0.1),
+    ], "EUR", 2022)
+    group = Group(name="G")
+    db.add(group)
+    db.flush()
+    a, b = Entity(name="A", group_id=group.id), Entity(name="B", group_id=group.id)
+    db.add_all([
+        a, b,
+        GasGWP(gas="CH4", gwp_set="AR5", gwp100=28), GasGWP(gas="N2O", gwp_set="AR5", gwp100=265),
+        FxRate(currency="USD", year=2024, rate=0.9), FxRate(currency="USD", year=2025, rate=0.8),
+    ])
+    db.commit()
+
+    ingest_purchases(db, [
+        {"entity_id": a.id, "period": "2025-Q1", "sector": "C24", "country": "de", "currency": "EUR", "amount": 1000,
+         "category": "1 Purchased goods"},
+        # No TR row: falls back to rest-of-world; USD converted at the 2025 rate
+        {"entity_id": a.id, "period": "2025-03", "sector": "C24", "country": "TR", "currency": "USD", "amount": 500,
+         "category": "1 Purchased goods"},
+        {"entity_id": a.id, "period": "2025", "sector": "J62", "country": "US", "currency": "eur", "amount": 2000},
+        {"entity_id": b.id, "period": "2025-H2", "sector": "X99", "country": "DE", "currency": "EUR", "amount": 10},
+        {"entity_id": b.id, "period": "2025-H2", "sector": "J62", "country": "DE", "currency": "GBP", "amount": 10},
+        {"entity_id": b.id, "period": "2024-12", "sector": "J62", "country": "DE", "currency": "EUR", "amount": 99},
+    ])
+
+    result = calc_spend_scope3(db, 2025)
+    entity_a = result["entities"][0]
+    goods = 1000 * 1.5 + 400 * (2.0 + 0.01 * 28)
+    assert entity_a["categories"] == [
+        {"category": "1 Purchased goods", "spend": pytest.approx(1400), "co2e_kg": pytest.approx(goods)},
+        {"category": "Uncategorised", "spend": pytest.approx(2000), "co2e_kg": pytest.approx(200)},
+    ]
+    assert entity_a["ch4_kg"] == pytest.approx(4) and entity_a["co2e_kg"] == pytest.approx(goods + 200)
+    assert result["unmatched"] == [{"sector": "X99", "country": "DE", "lines": 1, "spend": 10.0}]
+    assert result["missing_fx"] == [{"currency": "GBP", "year": 2025, "lines": 1}]
+    assert [e["entity_id"] for e in calc_spend_scope3(db, 2025, [b.id])["entities"]] == []
+
+    with pytest.raises(ValueError):
+        ingest_purchases(db, [{"entity_id": a.id, "period": "soon", "sector": "C24", "country": "DE",
+                               "currency": "EUR", "amount": 1}])
@@ -0,0 +1,28 @@
+import numpy as np
+
+from backend.app.services.stats import rankdata, rolling_sum, spearman, theil_sen, yoy_change
+
+
+def test_rolling_sum_and_yoy():
+    values = np.arange(1, 15, dtype=float)[None, :]
+    sums = rolling_sum(values, 12)
+    assert np.isnan(sums[0, 10])
+    assert sums[0, 11] == 78.0 and sums[0, 13] == 102.0
+    assert np.isclose(yoy_change(values, 12)[0, 12], (13 - 1) / 1 * 100)
+
+
+def test_rank_correlation_handles_ties():
+    assert list(rankdata(np.array([10.0, 20.0, 20.0, 5.0]))) == [2.0, 3.5, 3.5, 1.0]
+    assert spearman(np.array([1.0, 2.0, 3.0, 4.0]), np.array([1.0, 4.0, 9.0, 16.0])) == 1.0
+
+
+def test_theil_sen_ignores_outliers_and_nans():
+    series = np.array([
+        [0.0, 2.0, 4.0, 100.0, 8.0, 10.0],
+        [5.0, np.nan, 5.0, 5.0, 5.0, 5.0],
+        [np.nan] * 6,
+    ])
+    slopes, intercepts = theil_sen(series)
+    assert slopes[0] == 2.0 and intercepts[0] == 0.0
+    assert slopes[1] == 0.0
+    assert np.isnan(slopes[2])
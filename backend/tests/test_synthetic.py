@@ -0,0 +1,37 @@
+from sqlalchemy import create_engine, func, inspect, select
+from sqlalchemy.orm import Session
+
+from backend.app.db.synthetic import generate
+from backend.app.models import EmissionRecord, Entity, EUETSAllowanceLedger, UploadedActivity
+from backend.app.services.anomaly import detect_new_anomalies
+
+
+def _build(path, **kwargs):
+    engine = create_engine(f"sqlite:///{path}")
+    counts = generate(engine, groups=2, entities=2, facilities=3, streams=4, years=[2024, 2025], seed=11, **kwargs)
+    return engine, counts
+
+
+def test_generator_is_deterministic_and_complete(tmp_path):
+    engine, counts = _build(tmp_path / "a.db")
+    other, _ = _build(tmp_path / "b.db", chunk_size=7)
+
+    assert counts["facilities"] == 12
+    assert counts["activities"] == counts["emission_records"] == 12 * 4 * 24
+    assert counts["closure_rows"] == 12 * 3
+    query = select(UploadedActivity.facility_id, UploadedActivity.factor_code, UploadedActivity.period,
+                   UploadedActivity.amount).order_by(UploadedActivity.id)
+    with engine.connect() as a, other.connect() as b:
+        assert a.execute(query).all() == b.execute(query).all()
+        assert a.execute(select(func.count()).select_from(EUETSAllowanceLedger)).scalar() == 4 * 2
+        assert a.execute(select(func.min(Entity.yearly_budget_tco2e))).scalar() > 0
+        co2e = a.execute(select(func.sum(EmissionRecord.co2e_kg))).scalar()
+        assert co2e > 0
+    # Secondary indexes dropped for the load are back
+    assert {"ix_uploaded_activities_entity_id", "ix_uploaded_activities_facility_id"} <= {
+        ix["name"] for ix in inspect(engine).get_indexes("uploaded_activities")
+    }
+    # The load is the anomaly baseline: every (facility, factor) series plus its 12 calendar months
+    assert counts["anomaly_series"] > 0 and counts["anomaly_series"] % 13 == 0
+    with Session(engine) as db:
+        assert detect_new_anomalies(db)["scanned"] == 0
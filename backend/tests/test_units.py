@@ -0,0 +1,21 @@
+import pytest
+
+from backend.app.services.units import UnitConversionError, conversion_factor, convert_amounts
+
+
+def test_conversion_factor():
+    assert conversion_factor("MWh", "kWh") == 1000.0
+    assert conversion_factor("litre", "L") == 1.0
+    with pytest.raises(UnitConversionError):
+        conversion_factor("kWh", "km")
+    assert conversion_factor("short tons", "kg") == pytest.approx(907.18474)
+    assert conversion_factor("long_ton", "t") == pytest.approx(1.0160469088)
+    with pytest.raises(UnitConversionError):
+        conversion_factor("ton", "kg")  # metric, short or long: not guessed
+
+
+def test_convert_amounts_groups_unit_pairs():
+    converted, errors = convert_amounts([2, 500, 3, 1], ["MWh", "Wh", "m3", "kg"], ["kWh", "kWh", "L", "km"])
+    assert list(converted[:3]) == [2000.0, 0.5, 3000.0]
+    assert list(errors) == [3]
+    assert "Cannot convert" in errors[3]